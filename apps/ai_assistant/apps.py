@@ -5,3 +5,7 @@ class AiAssistantConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.ai_assistant'
     verbose_name = 'AI Assistant'
+
+    def ready(self):
+        # Connect knowledge-base signals that invalidate cached answers
+        from . import response_cache  # noqa: F401
@@ -1,7 +1,89 @@
-"""OpenRouter API client for AI interactions."""
+"""OpenRouter API client for AI interactions.
+
+HTTP connections are pooled per process instead of opening a new client
+for every message:
+
+- ``get_async_http_client`` returns one ``httpx.AsyncClient`` per event
+  loop (one per worker under ASGI) with keep-alive and, when the ``h2``
+  package is installed, HTTP/2.
+- ``get_http_client`` returns one shared ``httpx.Client`` for the
+  synchronous code paths (views served over WSGI, Celery tasks).
+
+Pool limits come from ``settings.AI_HTTP_POOL``. Completion requests
+go through the breaker, concurrency limit, retries and single-flight
+coalescing in ``resilience``.
+"""
+import asyncio
+import importlib.util
+import json
+import logging
+import threading
+import time
+import weakref
+from typing import AsyncIterator
+
 import httpx
 from django.conf import settings
 
+from . import resilience
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for OpenRouter before giving up
+REQUEST_TIMEOUT = 60.0
+
+# Event loop -> pooled AsyncClient (an AsyncClient is bound to its loop)
+_async_clients = weakref.WeakKeyDictionary()
+_sync_client: httpx.Client | None = None
+_sync_lock = threading.Lock()
+
+
+def _client_options() -> dict:
+    """Keyword arguments shared by the pooled sync and async clients."""
+    pool = getattr(settings, 'AI_HTTP_POOL', {})
+    return {
+        'timeout': httpx.Timeout(REQUEST_TIMEOUT, connect=pool.get('CONNECT_TIMEOUT', 5.0)),
+        'limits': httpx.Limits(
+            max_connections=pool.get('MAX_CONNECTIONS', 100),
+            max_keepalive_connections=pool.get('MAX_KEEPALIVE', 20),
+            keepalive_expiry=pool.get('KEEPALIVE_EXPIRY', 30.0),
+        ),
+    }
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Return the pooled async client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        http2 = importlib.util.find_spec('h2') is not None
+        client = httpx.AsyncClient(http2=http2, **_client_options())
+        _async_clients[loop] = client
+    return client
+
+
+def get_http_client() -> httpx.Client:
+    """Return the pooled synchronous client."""
+    global _sync_client
+    if _sync_client is None or _sync_client.is_closed:
+        with _sync_lock:
+            if _sync_client is None or _sync_client.is_closed:
+                _sync_client = httpx.Client(**_client_options())
+    return _sync_client
+
+
+def reset_http_clients() -> None:
+    """Forget the pooled clients (settings changed, tests)."""
+    global _sync_client
+    with _sync_lock:
+        if _sync_client is not None:
+            try:
+                _sync_client.close()
+            except Exception:
+                pass
+        _sync_client = None
+    _async_clients.clear()
+
 
 class OpenRouterClient:
     """Client for OpenRouter API with Claude support."""
@@ -9,7 +91,7 @@ class OpenRouterClient:
     def __init__(self):
         self.api_key = getattr(settings, 'OPENROUTER_API_KEY', '')
         self.model = getattr(settings, 'AI_MODEL', 'anthropic/claude-sonnet-4')
-        self.base_url = 'https://openrouter.ai/api/v1'
+        self.base_url = getattr(settings, 'OPENROUTER_BASE_URL', 'https://openrouter.ai/api/v1')
         self.max_tokens = getattr(settings, 'AI_MAX_TOKENS', 4096)
 
     async def chat(
@@ -21,6 +103,9 @@ class OpenRouterClient:
     ) -> dict:
         """Send chat completion request to OpenRouter.
 
+        Identical requests in flight share one upstream call; failures are
+        retried within the deadline and retry budget (see resilience).
+
         Args:
             messages: List of message dicts with 'role' and 'content'
             tools: Optional list of tool definitions
@@ -28,7 +113,8 @@ class OpenRouterClient:
             max_tokens: Maximum tokens in response
 
         Returns:
-            Response dict from OpenRouter API
+            Response dict from OpenRouter API, or an ``{'error': True, ...}``
+            dict if every attempt failed
         """
         if not self.api_key:
             return {
@@ -36,38 +122,10 @@ class OpenRouterClient:
                 'message': 'OpenRouter API key not configured'
             }
 
-        headers = {
-            'Authorization': f'Bearer {self.api_key}',
-            'Content-Type': 'application/json',
-            'HTTP-Referer': 'https://petfriendlyvet.com',
-            'X-Title': 'Pet-Friendly Vet Assistant'
-        }
-
-        payload = {
-            'model': self.model,
-            'messages': messages,
-            'max_tokens': max_tokens or self.max_tokens,
-        }
-
-        if tools:
-            payload['tools'] = tools
-
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f'{self.base_url}/chat/completions',
-                headers=headers,
-                json=payload,
-                timeout=60.0
-            )
-
-            if response.status_code == 200:
-                return response.json()
-            else:
-                return {
-                    'error': True,
-                    'status_code': response.status_code,
-                    'message': response.text
-                }
+        payload = self._payload(messages, tools, max_tokens)
+        return await resilience.single_flight.do_async(
+            resilience.SingleFlight.key(payload), lambda: self._send(payload)
+        )
 
     def chat_sync(
         self,
@@ -82,13 +140,266 @@ class OpenRouterClient:
                 'message': 'OpenRouter API key not configured'
             }
 
-        headers = {
+        payload = self._payload(messages, tools, max_tokens)
+        return resilience.single_flight.do(
+            resilience.SingleFlight.key(payload),
+            lambda: self._send_sync(payload),
+            timeout=resilience.get_config()['DEADLINE'],
+        )
+
+    async def _send(self, payload: dict) -> dict:
+        """POST a completion with the breaker, concurrency limit and retries."""
+        config = resilience.get_config()
+        deadline = resilience.Deadline(config['DEADLINE'])
+        resilience.retry_budget.record_request()
+        attempt = 0
+        while True:
+            rejected = self._reject(deadline)
+            if rejected:
+                return rejected
+            semaphore = await resilience.limiter.acquire_async(deadline.remaining)
+            if semaphore is None:
+                return self._rejection('busy', 'Too many concurrent AI requests')
+
+            started = time.monotonic()
+            try:
+                response = await get_async_http_client().post(
+                    f'{self.base_url}/chat/completions',
+                    headers=self._headers(),
+                    json=payload,
+                    timeout=min(REQUEST_TIMEOUT, deadline.remaining),
+                )
+            except httpx.HTTPError as e:
+                response = e
+            finally:
+                semaphore.release()
+
+            result, retry_after = self._handle(response, time.monotonic() - started)
+            attempt += 1
+            delay = self._retry_delay(result, retry_after, attempt, deadline)
+            if delay is None:
+                return result
+            await asyncio.sleep(delay)
+
+    def _send_sync(self, payload: dict) -> dict:
+        """Synchronous version of _send."""
+        config = resilience.get_config()
+        deadline = resilience.Deadline(config['DEADLINE'])
+        resilience.retry_budget.record_request()
+        attempt = 0
+        while True:
+            rejected = self._reject(deadline)
+            if rejected:
+                return rejected
+            if not resilience.limiter.acquire(deadline.remaining):
+                return self._rejection('busy', 'Too many concurrent AI requests')
+
+            started = time.monotonic()
+            try:
+                response = get_http_client().post(
+                    f'{self.base_url}/chat/completions',
+                    headers=self._headers(),
+                    json=payload,
+                    timeout=min(REQUEST_TIMEOUT, deadline.remaining),
+                )
+            except httpx.HTTPError as e:
+                response = e
+            finally:
+                resilience.limiter.release()
+
+            result, retry_after = self._handle(response, time.monotonic() - started)
+            attempt += 1
+            delay = self._retry_delay(result, retry_after, attempt, deadline)
+            if delay is None:
+                return result
+            time.sleep(delay)
+
+    def _reject(self, deadline: 'resilience.Deadline') -> dict | None:
+        """Error dict if the call must not go upstream now."""
+        if deadline.remaining <= 0:
+            return self._rejection('deadline', 'OpenRouter request deadline exceeded')
+        if not resilience.breaker.allow():
+            return self._rejection('circuit_open', 'OpenRouter circuit open')
+        return None
+
+    @staticmethod
+    def _rejection(kind: str, message: str) -> dict:
+        resilience.latency.count_error(kind)
+        return {'error': True, 'status_code': 503, 'message': message, 'retryable': False}
+
+    @staticmethod
+    def _handle(response, elapsed: float) -> tuple[dict, float | None]:
+        """Turn a response or transport error into (result, Retry-After).
+
+        Records the attempt in the latency histogram and circuit breaker.
+        Error results carry ``retryable`` for transport errors, 429 and 5xx.
+        """
+        if isinstance(response, httpx.HTTPError):
+            kind = 'timeout' if isinstance(response, httpx.TimeoutException) else 'transport'
+            logger.warning("OpenRouter request failed: %s", response)
+            resilience.latency.observe(elapsed, kind)
+            resilience.breaker.record_failure()
+            return {
+                'error': True,
+                'message': str(response) or response.__class__.__name__,
+                'retryable': True,
+            }, None
+
+        if response.status_code == 200:
+            resilience.latency.observe(elapsed)
+            resilience.breaker.record_success()
+            return response.json(), None
+
+        status = response.status_code
+        resilience.latency.observe(elapsed, f'http_{status}')
+        if status >= 500:
+            resilience.breaker.record_failure()
+        else:
+            # The service answered; 4xx says nothing about its health
+            resilience.breaker.record_success()
+
+        retry_after = None
+        header = response.headers.get('Retry-After') if status == 429 else None
+        if isinstance(header, str):
+            try:
+                retry_after = min(float(header), resilience.MAX_RETRY_AFTER)
+            except ValueError:
+                pass
+        return {
+            'error': True,
+            'status_code': status,
+            'message': response.text,
+            'retryable': status == 429 or status >= 500,
+        }, retry_after
+
+    @staticmethod
+    def _retry_delay(result: dict, retry_after: float | None, attempt: int,
+                     deadline: 'resilience.Deadline') -> float | None:
+        """Seconds to wait before retrying, or None to return ``result``."""
+        config = resilience.get_config()
+        if not result.get('error') or not result.get('retryable'):
+            return None
+        if attempt >= config['MAX_ATTEMPTS']:
+            return None
+        delay = retry_after if retry_after is not None else resilience.backoff_delay(
+            attempt, config['BACKOFF']
+        )
+        # Leave the next attempt at least as long as the wait
+        if delay * 2 >= deadline.remaining:
+            return None
+        if not resilience.retry_budget.try_spend():
+            resilience.latency.count_error('retry_budget')
+            return None
+        return delay
+
+    async def stream_chat(
+        self,
+        messages: list[dict],
+        tools: list[dict] = None,
+        max_tokens: int = None,
+    ) -> AsyncIterator[dict]:
+        """Stream a chat completion from OpenRouter.
+
+        Args:
+            messages: List of message dicts with 'role' and 'content'
+            tools: Optional list of tool definitions
+            max_tokens: Maximum tokens in response
+
+        Yields:
+            ``{'delta': text}`` for each content chunk, then
+            ``{'tool_calls': [...]}`` if the model called tools and
+            ``{'usage': {...}}`` if token usage was reported, or a
+            single ``{'error': True, ...}`` dict if the request fails
+        """
+        if not self.api_key:
+            yield {
+                'error': True,
+                'message': 'OpenRouter API key not configured'
+            }
+            return
+
+        if not resilience.breaker.allow():
+            yield self._rejection('circuit_open', 'OpenRouter circuit open')
+            return
+
+        payload = self._payload(messages, tools, max_tokens)
+        payload['stream'] = True
+
+        client = get_async_http_client()
+        try:
+            async with client.stream(
+                'POST',
+                f'{self.base_url}/chat/completions',
+                headers=self._headers(),
+                json=payload,
+                timeout=REQUEST_TIMEOUT,
+            ) as response:
+                if response.status_code >= 500:
+                    resilience.breaker.record_failure()
+                else:
+                    resilience.breaker.record_success()
+                if response.status_code != 200:
+                    body = await response.aread()
+                    yield {
+                        'error': True,
+                        'status_code': response.status_code,
+                        'message': body.decode(errors='replace'),
+                    }
+                    return
+
+                # Tool calls arrive in fragments keyed by index
+                tool_calls: dict[int, dict] = {}
+                usage = None
+                async for line in response.aiter_lines():
+                    # Skip blank separators and ": OPENROUTER PROCESSING" comments
+                    if not line.startswith('data:'):
+                        continue
+                    data = line[5:].strip()
+                    if data == '[DONE]':
+                        break
+                    try:
+                        chunk = json.loads(data)
+                        if chunk.get('usage'):
+                            usage = chunk['usage']
+                        delta = chunk['choices'][0]['delta']
+                    except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+                        continue
+                    for fragment in delta.get('tool_calls') or ():
+                        call = tool_calls.setdefault(fragment.get('index', 0), {
+                            'id': '', 'type': 'function',
+                            'function': {'name': '', 'arguments': ''},
+                        })
+                        call['id'] = fragment.get('id') or call['id']
+                        function = fragment.get('function') or {}
+                        call['function']['name'] += function.get('name') or ''
+                        call['function']['arguments'] += function.get('arguments') or ''
+                    if delta.get('content'):
+                        yield {'delta': delta['content']}
+
+                if tool_calls:
+                    yield {'tool_calls': [tool_calls[i] for i in sorted(tool_calls)]}
+                if usage:
+                    yield {'usage': usage}
+        except httpx.HTTPError as e:
+            logger.warning("OpenRouter stream failed: %s", e)
+            resilience.breaker.record_failure()
+            yield {
+                'error': True,
+                'message': str(e) or e.__class__.__name__,
+            }
+
+    def _headers(self) -> dict:
+        """Request headers for OpenRouter."""
+        return {
             'Authorization': f'Bearer {self.api_key}',
             'Content-Type': 'application/json',
             'HTTP-Referer': 'https://petfriendlyvet.com',
             'X-Title': 'Pet-Friendly Vet Assistant'
         }
 
+    def _payload(self, messages: list[dict], tools: list[dict] = None,
+                 max_tokens: int = None) -> dict:
+        """Chat completion request body."""
         payload = {
             'model': self.model,
             'messages': messages,
@@ -98,19 +409,4 @@ class OpenRouterClient:
         if tools:
             payload['tools'] = tools
 
-        with httpx.Client() as client:
-            response = client.post(
-                f'{self.base_url}/chat/completions',
-                headers=headers,
-                json=payload,
-                timeout=60.0
-            )
-
-            if response.status_code == 200:
-                return response.json()
-            else:
-                return {
-                    'error': True,
-                    'status_code': response.status_code,
-                    'message': response.text
-                }
+        return payload
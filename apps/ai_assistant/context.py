@@ -2,7 +2,7 @@
 from django.utils import timezone
 
 from apps.knowledge.models import KnowledgeArticle
-from apps.knowledge.utils import search_knowledge_base
+from apps.knowledge.search import search_knowledge
 
 
 def calculate_relevance(query: str, article: KnowledgeArticle) -> float:
@@ -158,7 +158,7 @@ Guidelines:
         return f"Cliente: {name}"
 
     def _get_relevant_knowledge(self, query: str) -> str:
-        """Search and retrieve relevant knowledge articles.
+        """Retrieve the most relevant knowledge within the token budget.
 
         Args:
             query: User query to search for
@@ -166,46 +166,24 @@ Guidelines:
         Returns:
             Formatted knowledge context string
         """
-        # Search for relevant articles
-        articles = search_knowledge_base(query, self.language)
-
-        if not articles:
-            return ""
-
-        # Score and sort by relevance
-        scored = [(calculate_relevance(query, a), a) for a in articles]
-        scored.sort(key=lambda x: x[0], reverse=True)
-
-        # Build context within token budget
-        context_parts = []
-        remaining_tokens = self.max_tokens - self.token_count
-
         if self.language == 'en':
             header = "Relevant information:"
         else:
             header = "Información relevante:"
 
-        context_parts.append(header)
-
-        for score, article in scored[:5]:  # Max 5 articles
-            # Prefer ai_context, fallback to content
-            if article.ai_context:
-                text = article.ai_context
-            else:
-                content = article.get_content(self.language)
-                text = content[:300] if len(content) > 300 else content
-
-            # Check token budget
-            estimated_tokens = len(text) / 4
-            if self.token_count + estimated_tokens > self.max_tokens:
-                break
-
-            context_parts.append(f"- {text}")
-            self.token_count += estimated_tokens
-
-        if len(context_parts) <= 1:  # Only header
+        # Top articles and FAQs from the retrieval index, max 5
+        remaining_tokens = self.max_tokens - self.token_count - len(header) / 4
+        snippets = search_knowledge(
+            query, self.language, limit=5, max_tokens=remaining_tokens
+        )
+        if not snippets:
             return ""
 
+        context_parts = [header]
+        for snippet in snippets:
+            context_parts.append(f"- {snippet.text}")
+            self.token_count += snippet.tokens
+
         return "\n".join(context_parts)
 
 
@@ -0,0 +1,218 @@
+"""Conversation memory for the chat assistant.
+
+Each message is answered with the conversation so far, but prompts must not
+grow with the length of the session. The memory sends:
+
+- The stored ``Conversation.summary`` of earlier turns, if any.
+- A rolling window of the most recent user/assistant messages, capped by
+  message count and by estimated tokens (``Message.token_count``).
+
+Once the messages not yet summarized exceed ``SUMMARY_TRIGGER_TOKENS``, a
+Celery task folds everything older than the window into the summary, so
+later prompts stay bounded by the window plus ``SUMMARY_MAX_TOKENS``.
+
+Configuration (``settings.AI_CHAT_MEMORY``):
+    'WINDOW_MESSAGES': 12,
+    'WINDOW_TOKENS': 1500,
+    'SUMMARY_TRIGGER_TOKENS': 3000,
+    'SUMMARY_MAX_TOKENS': 400,
+"""
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+
+from .models import Conversation, Message
+
+logger = logging.getLogger(__name__)
+
+# Roles replayed to the model (tool results are not kept across turns)
+HISTORY_ROLES = ('user', 'assistant')
+
+SUMMARY_LOCK_TIMEOUT = 300
+
+SUMMARY_PROMPTS = {
+    'en': (
+        "Summarize this conversation between a customer or staff member and "
+        "the assistant of a veterinary clinic. Keep names, pets, dates, "
+        "appointments, products and any open requests. Be brief and factual."
+    ),
+    'es': (
+        "Resume esta conversación entre un cliente o empleado y el asistente "
+        "de una clínica veterinaria. Conserva nombres, mascotas, fechas, "
+        "citas, productos y cualquier solicitud pendiente. Sé breve y preciso."
+    ),
+}
+
+
+def get_config() -> dict:
+    """Chat memory configuration from settings."""
+    return {
+        'WINDOW_MESSAGES': 12,
+        'WINDOW_TOKENS': 1500,
+        'SUMMARY_TRIGGER_TOKENS': 3000,
+        'SUMMARY_MAX_TOKENS': 400,
+        **getattr(settings, 'AI_CHAT_MEMORY', {}),
+    }
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate prompt tokens for text (4 characters per token)."""
+    return (len(text) + 3) // 4
+
+
+class ConversationMemory:
+    """Bounded prompt history for one conversation."""
+
+    def __init__(self, conversation: Conversation):
+        """Initialize memory.
+
+        Args:
+            conversation: Conversation to remember
+        """
+        self.conversation = conversation
+        self.config = get_config()
+
+    def _unsummarized(self):
+        """User/assistant messages newer than the summary."""
+        messages = Message.objects.filter(
+            conversation_id=self.conversation.pk, role__in=HISTORY_ROLES
+        )
+        if self.conversation.summary_through_id:
+            messages = messages.filter(id__gt=self.conversation.summary_through_id)
+        return messages
+
+    def window(self) -> list[dict]:
+        """Most recent messages within the window limits (one query).
+
+        Returns:
+            Message rows (id, role, content, token_count), oldest first
+        """
+        rows = self._unsummarized().order_by('-id').values(
+            'id', 'role', 'content', 'token_count'
+        )[:self.config['WINDOW_MESSAGES']]
+
+        window = []
+        budget = self.config['WINDOW_TOKENS']
+        for row in rows:
+            tokens = row['token_count'] or estimate_tokens(row['content'])
+            if tokens > budget:
+                break
+            budget -= tokens
+            window.append(row)
+        window.reverse()
+        return window
+
+    def messages(self) -> list[dict]:
+        """Prior turns to send before the next user message.
+
+        Returns:
+            Chat messages: the summary as a system message, then the window
+        """
+        history = []
+        if self.conversation.summary:
+            if self.conversation.language == 'en':
+                heading = 'Summary of the earlier conversation:'
+            else:
+                heading = 'Resumen de la conversación anterior:'
+            history.append({
+                'role': 'system',
+                'content': f'{heading}\n{self.conversation.summary}',
+            })
+        history.extend(
+            {'role': row['role'], 'content': row['content']} for row in self.window()
+        )
+        return history
+
+    async def amessages(self) -> list[dict]:
+        """Async version of messages."""
+        return await sync_to_async(self.messages)()
+
+    def needs_summary(self) -> bool:
+        """Whether unsummarized messages exceed the summary trigger."""
+        tokens = self._unsummarized().aggregate(total=Sum('token_count'))['total'] or 0
+        return tokens > self.config['SUMMARY_TRIGGER_TOKENS']
+
+    def schedule_summary(self) -> bool:
+        """Queue summarization if it is due and not already queued.
+
+        Returns:
+            True if a summarization task was queued
+        """
+        try:
+            if not self.needs_summary():
+                return False
+            if not cache.add(self._lock_key(), 1, SUMMARY_LOCK_TIMEOUT):
+                return False
+            from .tasks import summarize_conversation
+            summarize_conversation.delay(self.conversation.pk)
+            return True
+        except Exception:
+            logger.warning(
+                "Could not schedule summary for conversation %s",
+                self.conversation.pk, exc_info=True
+            )
+            return False
+
+    def _lock_key(self) -> str:
+        return f'ai:memory:summarizing:{self.conversation.pk}'
+
+    def summarize(self, client=None) -> bool:
+        """Fold messages older than the window into the stored summary.
+
+        Args:
+            client: Optional OpenRouterClient
+
+        Returns:
+            True if the summary was updated
+        """
+        try:
+            return self._summarize(client)
+        finally:
+            cache.delete(self._lock_key())
+
+    def _summarize(self, client=None) -> bool:
+        window = self.window()
+        older = self._unsummarized().order_by('id')
+        if window:
+            older = older.filter(id__lt=window[0]['id'])
+        older = list(older.values('id', 'role', 'content'))
+        if not older:
+            return False
+
+        language = 'en' if self.conversation.language == 'en' else 'es'
+        transcript = '\n'.join(
+            f"{'User' if row['role'] == 'user' else 'Assistant'}: {row['content']}"
+            for row in older
+        )
+        if self.conversation.summary:
+            transcript = f'{self.conversation.summary}\n\n{transcript}'
+
+        if client is None:
+            from .clients import OpenRouterClient
+            client = OpenRouterClient()
+        response = client.chat_sync(
+            [
+                {'role': 'system', 'content': SUMMARY_PROMPTS[language]},
+                {'role': 'user', 'content': transcript},
+            ],
+            max_tokens=self.config['SUMMARY_MAX_TOKENS'],
+        )
+        try:
+            summary = response['choices'][0]['message']['content'].strip()
+        except (KeyError, IndexError, TypeError, AttributeError):
+            logger.warning(
+                "Summary failed for conversation %s: %s",
+                self.conversation.pk, response.get('message') if isinstance(response, dict) else response
+            )
+            return False
+
+        # update() leaves updated_at (conversation list order) alone
+        Conversation.objects.filter(pk=self.conversation.pk).update(
+            summary=summary, summary_through_id=older[-1]['id']
+        )
+        self.conversation.summary = summary
+        self.conversation.summary_through_id = older[-1]['id']
+        return True
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 21:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_assistant', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aiusage',
+            name='cache_hit',
+            field=models.BooleanField(default=False, help_text='Answered from the response cache without calling the model', verbose_name='cache hit'),
+        ),
+    ]
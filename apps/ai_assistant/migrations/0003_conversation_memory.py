@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-16 21:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_assistant', '0002_aiusage_cache_hit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='token_count',
+            field=models.PositiveIntegerField(default=0, help_text='Estimated prompt tokens of the content', verbose_name='token count'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='summary',
+            field=models.TextField(blank=True, default='', help_text='Summary of earlier turns, sent to the model instead of them', verbose_name='summary'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='summary_through',
+            field=models.ForeignKey(blank=True, help_text='Last message folded into the summary', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='ai_assistant.message', verbose_name='summarized through'),
+        ),
+    ]
@@ -4,6 +4,18 @@ from django.db import models
 from django.utils.translation import gettext_lazy as _
 
 
+class AIUsageQuerySet(models.QuerySet):
+    """QuerySet for AIUsage with response-cache metrics."""
+
+    def cache_hit_ratio(self) -> float:
+        """Share of answered messages served from the response cache."""
+        totals = self.aggregate(
+            total=models.Count('id'),
+            hits=models.Count('id', filter=models.Q(cache_hit=True)),
+        )
+        return totals['hits'] / totals['total'] if totals['total'] else 0.0
+
+
 class AIUsage(models.Model):
     """Track AI API usage for cost monitoring and rate limiting."""
 
@@ -27,8 +39,15 @@ class AIUsage(models.Model):
         decimal_places=6
     )
     model = models.CharField(_('model'), max_length=100)
+    cache_hit = models.BooleanField(
+        _('cache hit'),
+        default=False,
+        help_text=_('Answered from the response cache without calling the model')
+    )
     created_at = models.DateTimeField(_('created at'), auto_now_add=True)
 
+    objects = AIUsageQuerySet.as_manager()
+
     class Meta:
         verbose_name = _('AI usage')
         verbose_name_plural = _('AI usage')
@@ -38,6 +57,21 @@ class AIUsage(models.Model):
         return f'{self.model} - {self.input_tokens}+{self.output_tokens} tokens'
 
 
+class ConversationQuerySet(models.QuerySet):
+    """QuerySet for Conversation with list-page annotations."""
+
+    def with_message_stats(self):
+        """Annotate message_count, last_message_role and last_message_content."""
+        last = Message.objects.filter(
+            conversation=models.OuterRef('pk')
+        ).order_by('-created_at', '-id')
+        return self.annotate(
+            message_count=models.Count('messages'),
+            last_message_role=models.Subquery(last.values('role')[:1]),
+            last_message_content=models.Subquery(last.values('content')[:1]),
+        )
+
+
 class Conversation(models.Model):
     """Chat conversation session."""
 
@@ -67,9 +101,26 @@ class Conversation(models.Model):
         default='es'
     )
     is_active = models.BooleanField(_('active'), default=True)
+    summary = models.TextField(
+        _('summary'),
+        blank=True,
+        default='',
+        help_text=_('Summary of earlier turns, sent to the model instead of them')
+    )
+    summary_through = models.ForeignKey(
+        'Message',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name=_('summarized through'),
+        help_text=_('Last message folded into the summary')
+    )
     created_at = models.DateTimeField(_('created at'), auto_now_add=True)
     updated_at = models.DateTimeField(_('updated at'), auto_now=True)
 
+    objects = ConversationQuerySet.as_manager()
+
     class Meta:
         verbose_name = _('conversation')
         verbose_name_plural = _('conversations')
@@ -114,6 +165,11 @@ class Message(models.Model):
         blank=True,
         default=''
     )
+    token_count = models.PositiveIntegerField(
+        _('token count'),
+        default=0,
+        help_text=_('Estimated prompt tokens of the content')
+    )
     created_at = models.DateTimeField(_('created at'), auto_now_add=True)
 
     class Meta:
@@ -123,3 +179,10 @@ class Message(models.Model):
 
     def __str__(self):
         return f'{self.role}: {self.content[:50]}...'
+
+    def save(self, *args, **kwargs):
+        """Record the estimated token count of new content."""
+        if not self.token_count and self.content:
+            from .memory import estimate_tokens
+            self.token_count = estimate_tokens(self.content)
+        super().save(*args, **kwargs)
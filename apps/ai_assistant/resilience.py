@@ -0,0 +1,382 @@
+"""Resilience primitives for OpenRouter requests.
+
+When OpenRouter is slow or failing, every worker used to wait the full
+request timeout and then answer with the fallback anyway. The client now
+wraps each completion request with:
+
+- ``ConcurrencyLimiter``: at most ``MAX_CONCURRENCY`` upstream requests
+  per process; callers that cannot get a slot before their deadline fail
+  fast instead of queueing behind a stalled upstream.
+- ``CircuitBreaker``: state kept in the Django cache (Redis), so every
+  worker stops calling OpenRouter after ``BREAKER_FAILURES`` consecutive
+  failures. After ``BREAKER_RESET`` seconds a single probe request is let
+  through (half-open); its outcome closes or re-opens the circuit.
+- ``Deadline`` and ``RetryBudget``: transport errors, 429 and 5xx answers
+  are retried with jittered exponential backoff, only while the call's
+  deadline allows it and while retries stay under ``RETRY_RATIO`` of
+  recent requests, so retries cannot multiply load during an outage.
+- ``SingleFlight``: identical requests already in flight share one
+  upstream call (e.g. many widget users clicking the same quick action).
+- ``Histogram``: per-process latency and error counters, read with
+  ``client_metrics()``.
+
+Configuration (``settings.AI_RESILIENCE``):
+    'MAX_CONCURRENCY': 16,
+    'DEADLINE': 45.0,         # seconds per call, across retries
+    'MAX_ATTEMPTS': 3,
+    'BACKOFF': 0.5,           # first retry delay, doubled per retry
+    'RETRY_RATIO': 0.2,
+    'RETRY_MIN': 3,           # retries always allowed per window
+    'RETRY_WINDOW': 10.0,
+    'BREAKER_FAILURES': 5,
+    'BREAKER_RESET': 30.0,
+"""
+import asyncio
+import bisect
+import copy
+import hashlib
+import json
+import logging
+import math
+import random
+import threading
+import time
+import weakref
+from collections import Counter, deque
+from typing import Any, Awaitable, Callable
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'MAX_CONCURRENCY': 16,
+    'DEADLINE': 45.0,
+    'MAX_ATTEMPTS': 3,
+    'BACKOFF': 0.5,
+    'RETRY_RATIO': 0.2,
+    'RETRY_MIN': 3,
+    'RETRY_WINDOW': 10.0,
+    'BREAKER_FAILURES': 5,
+    'BREAKER_RESET': 30.0,
+}
+
+# Upper bound for a server-provided Retry-After
+MAX_RETRY_AFTER = 10.0
+
+
+def get_config() -> dict:
+    """Resilience configuration from settings."""
+    return {**DEFAULTS, **getattr(settings, 'AI_RESILIENCE', {})}
+
+
+def _ttl(seconds: float) -> int:
+    """A cache timeout of at least one second (0 would expire the key at once)."""
+    return max(1, math.ceil(seconds))
+
+
+class Deadline:
+    """Time left for one call, across all of its attempts."""
+
+    def __init__(self, seconds: float):
+        self.expires = time.monotonic() + seconds
+
+    @property
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+
+def backoff_delay(attempt: int, base: float) -> float:
+    """Jittered exponential delay before retry number ``attempt`` (from 1)."""
+    delay = base * 2 ** (attempt - 1)
+    return random.uniform(delay / 2, delay)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram with error counters (per process)."""
+
+    BUCKETS = (0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counts = [0] * (len(self.BUCKETS) + 1)
+            self.total = 0
+            self.sum = 0.0
+            self.errors: Counter = Counter()
+
+    def observe(self, seconds: float, error: str = None) -> None:
+        """Record one upstream attempt.
+
+        Args:
+            seconds: Attempt latency
+            error: Error kind (``timeout``, ``http_503``, ...) if it failed
+        """
+        with self._lock:
+            self.counts[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+            self.total += 1
+            self.sum += seconds
+            if error:
+                self.errors[error] += 1
+
+    def count_error(self, error: str) -> None:
+        """Record a call rejected before reaching OpenRouter."""
+        with self._lock:
+            self.errors[error] += 1
+
+    def snapshot(self) -> dict:
+        """Cumulative bucket counts, totals and error counts."""
+        with self._lock:
+            cumulative, running = {}, 0
+            for bound, count in zip((*self.BUCKETS, float('inf')), self.counts):
+                running += count
+                cumulative[f'le_{bound:g}'] = running
+            return {
+                'buckets': cumulative,
+                'count': self.total,
+                'sum': round(self.sum, 6),
+                'errors': dict(self.errors),
+            }
+
+
+class RetryBudget:
+    """Allow retries up to a fraction of recent requests (per process)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests: deque[float] = deque()
+        self._retries: deque[float] = deque()
+
+    def _prune(self, now: float, window: float) -> None:
+        for events in (self._requests, self._retries):
+            while events and events[0] < now - window:
+                events.popleft()
+
+    def record_request(self) -> None:
+        with self._lock:
+            self._requests.append(time.monotonic())
+
+    def try_spend(self) -> bool:
+        """Take one retry from the budget, if any is left."""
+        config = get_config()
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now, config['RETRY_WINDOW'])
+            allowed = max(config['RETRY_MIN'], config['RETRY_RATIO'] * len(self._requests))
+            if len(self._retries) >= allowed:
+                return False
+            self._retries.append(now)
+            return True
+
+    def reset(self) -> None:
+        with self._lock:
+            self._requests.clear()
+            self._retries.clear()
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker whose state lives in the Django cache."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.failures_key = f'{name}:failures'
+        self.open_key = f'{name}:open_until'
+        self.probe_key = f'{name}:probe'
+
+    @property
+    def state(self) -> str:
+        """``closed``, ``open`` or ``half-open``."""
+        try:
+            open_until = cache.get(self.open_key)
+        except Exception:
+            return 'closed'
+        if open_until is None:
+            return 'closed'
+        return 'open' if time.time() < open_until else 'half-open'
+
+    def allow(self) -> bool:
+        """Whether a request may go upstream now.
+
+        In half-open state exactly one caller (across processes) gets to
+        probe; the others are rejected until the probe reports back.
+        """
+        state = self.state
+        if state == 'closed':
+            return True
+        if state == 'open':
+            return False
+        try:
+            return cache.add(self.probe_key, 1, _ttl(get_config()['BREAKER_RESET']))
+        except Exception:
+            return True
+
+    def record_success(self) -> None:
+        """Close the circuit."""
+        try:
+            if cache.get_many([self.open_key, self.failures_key]):
+                cache.delete_many([self.failures_key, self.open_key, self.probe_key])
+        except Exception:
+            logger.warning("%s: could not close circuit", self.name, exc_info=True)
+
+    def record_failure(self) -> None:
+        """Count a failure; open the circuit at the threshold or on a failed probe."""
+        config = get_config()
+        try:
+            probing = cache.get(self.open_key) is not None
+            cache.add(self.failures_key, 0, _ttl(config['BREAKER_RESET'] * 4))
+            failures = cache.incr(self.failures_key)
+            if probing or failures >= config['BREAKER_FAILURES']:
+                cache.set(self.open_key, time.time() + config['BREAKER_RESET'], None)
+                cache.delete_many([self.failures_key, self.probe_key])
+                logger.warning("%s: circuit opened after %d failures", self.name, failures)
+        except Exception:
+            logger.warning("%s: could not record failure", self.name, exc_info=True)
+
+    def reset(self) -> None:
+        cache.delete_many([self.failures_key, self.open_key, self.probe_key])
+
+
+class ConcurrencyLimiter:
+    """Bound concurrent upstream requests in this process.
+
+    Threads share one semaphore; async callers get one per event loop
+    sized to the same limit.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._semaphore = None
+        self._async_semaphores = weakref.WeakKeyDictionary()
+
+    def _limit(self) -> int:
+        return get_config()['MAX_CONCURRENCY']
+
+    def acquire(self, timeout: float) -> bool:
+        """Take a slot, waiting up to ``timeout`` seconds."""
+        if self._semaphore is None:
+            with self._lock:
+                if self._semaphore is None:
+                    self._semaphore = threading.BoundedSemaphore(self._limit())
+        return self._semaphore.acquire(timeout=timeout)
+
+    def release(self) -> None:
+        self._semaphore.release()
+
+    async def acquire_async(self, timeout: float) -> asyncio.Semaphore | None:
+        """Take a slot on the running loop; returns the semaphore to release."""
+        loop = asyncio.get_running_loop()
+        semaphore = self._async_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._async_semaphores[loop] = asyncio.Semaphore(self._limit())
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        return semaphore
+
+    def reset(self) -> None:
+        with self._lock:
+            self._semaphore = None
+        self._async_semaphores.clear()
+
+
+class SingleFlight:
+    """Share one in-flight call among identical concurrent requests."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[str, tuple[threading.Event, list]] = {}
+        self._async_calls = weakref.WeakKeyDictionary()
+
+    @staticmethod
+    def key(payload: dict) -> str:
+        """Stable key for a request body."""
+        body = json.dumps(payload, sort_keys=True, default=str)
+        return hashlib.sha256(body.encode()).hexdigest()
+
+    def do(self, key: str, call: Callable[[], Any], timeout: float) -> Any:
+        """Run ``call`` unless an identical call is in flight; share its result.
+
+        Followers that wait longer than ``timeout`` run their own call.
+        """
+        with self._lock:
+            flight = self._calls.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._calls[key] = (threading.Event(), [])
+
+        event, result = flight
+        if not leader:
+            if event.wait(timeout) and result:
+                return copy.deepcopy(result[0])
+            return call()
+
+        try:
+            result.append(call())
+            return result[0]
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            event.set()
+
+    async def do_async(self, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Async version of do for callers on one event loop."""
+        loop = asyncio.get_running_loop()
+        calls = self._async_calls.setdefault(loop, {})
+        future = calls.get(key)
+        if future is not None:
+            try:
+                return copy.deepcopy(await asyncio.shield(future))
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The leader was cancelled, not us
+                return await call()
+
+        future = calls[key] = loop.create_future()
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so an unobserved failure is not logged
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            calls.pop(key, None)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._calls.clear()
+        self._async_calls.clear()
+
+
+# Process-wide instances used by OpenRouterClient
+limiter = ConcurrencyLimiter()
+breaker = CircuitBreaker('ai:openrouter:breaker')
+retry_budget = RetryBudget()
+single_flight = SingleFlight()
+latency = Histogram()
+
+
+def client_metrics() -> dict:
+    """Latency histogram, error counts and breaker state for this process."""
+    return {**latency.snapshot(), 'breaker': breaker.state}
+
+
+def reset() -> None:
+    """Reset all resilience state (settings changed, tests)."""
+    limiter.reset()
+    breaker.reset()
+    retry_budget.reset()
+    single_flight.reset()
+    latency.reset()
@@ -0,0 +1,189 @@
+"""Response cache for repeated assistant questions.
+
+The public widget's quick actions and common questions ("¿Cuál es su
+horario?", services, contact) produce nearly identical LLM calls all day.
+Answers to a conversation's first message that did not use any tool
+depend only on the question, the language and the system prompt, so they
+are cached in Redis:
+
+- The query is normalized: accents, casing, punctuation and extra
+  whitespace are removed. This gives the *exact* key.
+- Filler words (articles, pronouns, "please", ...) are also dropped and
+  the remaining words sorted. This gives the *near* key, so "¿Cuál es su
+  horario?" and "cual es el horario" share an answer.
+- Keys include the language, the caller's tool permission level, a hash
+  of the system prompt and a content generation. The generation is bumped
+  whenever a KnowledgeArticle or FAQ changes, which orphans every cached
+  answer; orphans expire with their TTL.
+
+Configuration (``settings.AI_RESPONSE_CACHE``):
+    'ENABLED': True,
+    'TTL': 21600,           # seconds
+    'MAX_QUERY_LENGTH': 300,  # longer messages are not cached
+"""
+import hashlib
+import logging
+import re
+import time
+import unicodedata
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'ai:response'
+GENERATION_KEY = f'{KEY_PREFIX}:generation'
+
+# Words that do not change what is being asked
+FILLER_WORDS = {
+    'es': frozenset((
+        'el la los las un una unos unas de del al a y o en con por para su sus '
+        'es son esta estan me mi mis tu tus usted ustedes nos nuestro nuestra '
+        'se lo le les favor hola gracias quiero quisiera puede pueden podria'
+    ).split()),
+    'en': frozenset((
+        'the a an of to and or in on at for with your you my me i we us our it '
+        'is are be please can could would do does tell hi hello thanks thank'
+    ).split()),
+}
+
+_PUNCTUATION = re.compile(r'[^\w\s]')
+
+
+def get_config() -> dict:
+    """Response cache configuration from settings."""
+    return getattr(settings, 'AI_RESPONSE_CACHE', {})
+
+
+def normalize_query(text: str) -> str:
+    """Lowercase, strip accents and punctuation, collapse whitespace.
+
+    Args:
+        text: User message
+
+    Returns:
+        Normalized message
+    """
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(_PUNCTUATION.sub(' ', stripped).split())
+
+
+def query_signature(normalized: str, language: str) -> str:
+    """Sorted content words of a normalized query (near-duplicate key).
+
+    Args:
+        normalized: Output of normalize_query
+        language: Language code
+
+    Returns:
+        Space-separated sorted words without filler
+    """
+    filler = FILLER_WORDS.get(language, frozenset())
+    words = {word for word in normalized.split() if word not in filler}
+    return ' '.join(sorted(words)) or normalized
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def prompt_version(system_prompt: str) -> str:
+    """Short hash identifying a system prompt."""
+    return _digest(system_prompt)[:12]
+
+
+def _generation() -> int:
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, time.time_ns(), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def cache_keys(query: str, language: str, level: str, version: str) -> tuple[str, str] | None:
+    """Return the (exact, near) keys for a query, or None if not cacheable.
+
+    Args:
+        query: User message
+        language: Language code
+        level: Caller's tool permission level
+        version: System prompt version
+
+    Returns:
+        Tuple of cache keys, or None
+    """
+    config = get_config()
+    if not config.get('ENABLED', True) or len(query) > config.get('MAX_QUERY_LENGTH', 300):
+        return None
+    normalized = normalize_query(query)
+    if not normalized:
+        return None
+
+    scope = f'{KEY_PREFIX}:{_generation()}:{version}:{language}:{level}'
+    return (
+        f'{scope}:exact:{_digest(normalized)}',
+        f'{scope}:near:{_digest(query_signature(normalized, language))}',
+    )
+
+
+def lookup(query: str, *, language: str, level: str, version: str) -> str | None:
+    """Return a cached answer for an exact or near-duplicate query.
+
+    Args:
+        query: User message
+        language: Language code
+        level: Caller's tool permission level
+        version: System prompt version
+
+    Returns:
+        Cached response text, or None on a miss
+    """
+    try:
+        keys = cache_keys(query, language, level, version)
+        if keys is None:
+            return None
+        found = cache.get_many(keys)
+    except Exception:
+        logger.warning("AI response cache lookup failed", exc_info=True)
+        return None
+    return found.get(keys[0]) or found.get(keys[1])
+
+
+def store(query: str, response: str, *, language: str, level: str, version: str) -> None:
+    """Cache an answer under both the exact and near-duplicate keys.
+
+    Args:
+        query: User message
+        response: Answer produced without tool calls
+        language: Language code
+        level: Caller's tool permission level
+        version: System prompt version
+    """
+    try:
+        keys = cache_keys(query, language, level, version)
+        if keys is None:
+            return
+        cache.set_many(dict.fromkeys(keys, response), get_config().get('TTL', 6 * 3600))
+    except Exception:
+        logger.warning("AI response cache store failed", exc_info=True)
+
+
+def invalidate() -> None:
+    """Drop every cached answer (knowledge base content changed)."""
+    cache.set(GENERATION_KEY, time.time_ns(), None)
+
+
+@receiver(post_save, sender='knowledge.KnowledgeArticle')
+@receiver(post_delete, sender='knowledge.KnowledgeArticle')
+@receiver(post_save, sender='knowledge.FAQ')
+@receiver(post_delete, sender='knowledge.FAQ')
+def invalidate_on_knowledge_change(sender, update_fields=None, **kwargs):
+    """Invalidate cached answers when knowledge base content changes."""
+    # FAQ.increment_view_count does not change any answer
+    if update_fields and set(update_fields) <= {'view_count'}:
+        return
+    invalidate()
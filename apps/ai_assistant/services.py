@@ -1,23 +1,42 @@
 """High-level AI service for the Pet-Friendly Vet application."""
+import logging
+from collections import Counter
+from decimal import Decimal
+from typing import AsyncIterator
+
+from asgiref.sync import async_to_sync, sync_to_async
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 
+from . import response_cache
 from .clients import OpenRouterClient
+from .models import AIUsage
+from .tools import ToolRegistry, handle_tool_calls
+
+logger = logging.getLogger(__name__)
+
+# Tool-call rounds per message before the model must answer in text
+MAX_TOOL_ROUNDS = 5
 
 
 class AIService:
     """High-level AI service for the application."""
 
-    def __init__(self, user=None, language='es'):
+    def __init__(self, user=None, language='es', session_id='', history=None):
         """Initialize AI service.
 
         Args:
             user: Optional Django user object for context
             language: Language code (es, en, etc.)
+            session_id: Chat session, recorded with AI usage
+            history: Prior turns sent before the message (see
+                ConversationMemory.messages)
         """
         self.client = OpenRouterClient()
         self.user = user
         self.language = language
+        self.session_id = session_id
+        self.history = history or []
         self.conversation = None
 
     def build_system_prompt(self) -> str:
@@ -61,6 +80,65 @@ Sobre la clínica:
 
 Sé amable, servicial y profesional. Si no sabes algo, admítelo y sugiere contactar directamente a la clínica."""
 
+    def _initial_messages(self, user_message: str) -> list[dict]:
+        return [
+            {'role': 'system', 'content': self.build_system_prompt()},
+            *self.history,
+            {'role': 'user', 'content': user_message}
+        ]
+
+    def tool_context(self) -> dict:
+        """Execution context passed to tool calls."""
+        return {'user': self.user, 'language': self.language}
+
+    @staticmethod
+    def _parse_choice(response: dict) -> tuple[str | None, list[dict]]:
+        """Return (content, tool_calls) from a completion; raises on malformed input."""
+        message = response['choices'][0]['message']
+        tool_calls = message.get('tool_calls') or []
+        if tool_calls:
+            return message.get('content'), tool_calls
+        return message['content'], []
+
+    @staticmethod
+    def _tool_call_message(content: str | None, tool_calls: list[dict]) -> dict:
+        """Assistant turn requesting tool calls, to send back with the results."""
+        return {'role': 'assistant', 'content': content or '', 'tool_calls': tool_calls}
+
+    def _cache_scope(self) -> dict | None:
+        """Response cache scope: language, permission level, prompt version.
+
+        None when prior turns are sent: the answer may depend on them.
+        """
+        if self.history:
+            return None
+        return {
+            'language': self.language,
+            'level': ToolRegistry.permission_level(self.user),
+            'version': response_cache.prompt_version(self.build_system_prompt()),
+        }
+
+    @staticmethod
+    def _add_usage(totals: Counter, usage: dict | None) -> None:
+        """Accumulate token usage reported by one completion."""
+        if usage:
+            totals['input_tokens'] += usage.get('prompt_tokens') or 0
+            totals['output_tokens'] += usage.get('completion_tokens') or 0
+            totals['cost_usd'] += Decimal(str(usage.get('cost') or 0))
+
+    def _usage_record(self, totals: Counter = None, cache_hit: bool = False) -> AIUsage:
+        """Unsaved AIUsage row for one answered message."""
+        totals = totals or Counter()
+        return AIUsage(
+            user=self.user if self.user is not None and self.user.is_authenticated else None,
+            session_id=self.session_id,
+            input_tokens=totals['input_tokens'],
+            output_tokens=totals['output_tokens'],
+            cost_usd=totals['cost_usd'],
+            model=self.client.model,
+            cache_hit=cache_hit,
+        )
+
     async def get_response(
         self,
         user_message: str,
@@ -68,6 +146,10 @@ Sé amable, servicial y profesional. Si no sabes algo, admítelo y sugiere conta
     ) -> str:
         """Get AI response with full tool handling.
 
+        Repeated questions are answered from the response cache. Otherwise
+        runs the agent loop: while the model asks for tools, execute them
+        (concurrently) and send the results back, up to MAX_TOOL_ROUNDS.
+
         Args:
             user_message: The user's message
             context: Optional additional context
@@ -75,20 +157,39 @@ Sé amable, servicial y profesional. Si no sabes algo, admítelo y sugiere conta
         Returns:
             AI assistant's response string
         """
-        messages = [
-            {'role': 'system', 'content': self.build_system_prompt()},
-            {'role': 'user', 'content': user_message}
-        ]
+        scope = await sync_to_async(self._cache_scope)()
+        cached = await sync_to_async(response_cache.lookup)(user_message, **scope) if scope else None
+        if cached is not None:
+            await self._usage_record(cache_hit=True).asave()
+            return cached
+
+        messages = self._initial_messages(user_message)
+        tools = await sync_to_async(self.get_available_tools)()
+        usage = Counter()
+
+        for round_number in range(MAX_TOOL_ROUNDS + 1):
+            # Last round: no tools, so the model has to answer
+            offered = tools if round_number < MAX_TOOL_ROUNDS else None
+            response = await self.client.chat(messages, tools=offered or None)
 
-        response = await self.client.chat(messages)
+            if response.get('error'):
+                return self._get_fallback_response()
 
-        if response.get('error'):
-            return self._get_fallback_response()
+            self._add_usage(usage, response.get('usage'))
+            try:
+                content, tool_calls = self._parse_choice(response)
+            except (KeyError, IndexError, TypeError):
+                return self._get_fallback_response()
+            if not tool_calls:
+                if round_number == 0 and scope:
+                    await sync_to_async(response_cache.store)(user_message, content, **scope)
+                await self._usage_record(usage).asave()
+                return content
 
-        try:
-            return response['choices'][0]['message']['content']
-        except (KeyError, IndexError):
-            return self._get_fallback_response()
+            messages.append(self._tool_call_message(content, tool_calls))
+            messages.extend(await handle_tool_calls(tool_calls, self.tool_context()))
+
+        return self._get_fallback_response()
 
     def get_response_sync(
         self,
@@ -96,20 +197,98 @@ Sé amable, servicial y profesional. Si no sabes algo, admítelo y sugiere conta
         context: dict = None,
     ) -> str:
         """Synchronous version of get_response."""
-        messages = [
-            {'role': 'system', 'content': self.build_system_prompt()},
-            {'role': 'user', 'content': user_message}
-        ]
+        scope = self._cache_scope()
+        cached = response_cache.lookup(user_message, **scope) if scope else None
+        if cached is not None:
+            self._usage_record(cache_hit=True).save()
+            return cached
+
+        messages = self._initial_messages(user_message)
+        tools = self.get_available_tools()
+        usage = Counter()
+
+        for round_number in range(MAX_TOOL_ROUNDS + 1):
+            offered = tools if round_number < MAX_TOOL_ROUNDS else None
+            response = self.client.chat_sync(messages, tools=offered or None)
+
+            if response.get('error'):
+                return self._get_fallback_response()
+
+            self._add_usage(usage, response.get('usage'))
+            try:
+                content, tool_calls = self._parse_choice(response)
+            except (KeyError, IndexError, TypeError):
+                return self._get_fallback_response()
+            if not tool_calls:
+                if round_number == 0 and scope:
+                    response_cache.store(user_message, content, **scope)
+                self._usage_record(usage).save()
+                return content
+
+            messages.append(self._tool_call_message(content, tool_calls))
+            messages.extend(async_to_sync(handle_tool_calls)(tool_calls, self.tool_context()))
+
+        return self._get_fallback_response()
+
+    async def stream_response(
+        self,
+        user_message: str,
+        context: dict = None,
+    ) -> AsyncIterator[str]:
+        """Stream the AI response as text chunks, running tools in between.
+
+        Args:
+            user_message: The user's message
+            context: Optional additional context
 
-        response = self.client.chat_sync(messages)
+        Yields:
+            Response text chunks (a cached answer as one chunk); the
+            fallback response if the request fails before any text was
+            produced
+        """
+        scope = await sync_to_async(self._cache_scope)()
+        cached = await sync_to_async(response_cache.lookup)(user_message, **scope) if scope else None
+        if cached is not None:
+            await self._usage_record(cache_hit=True).asave()
+            yield cached
+            return
 
-        if response.get('error'):
-            return self._get_fallback_response()
+        messages = self._initial_messages(user_message)
+        tools = await sync_to_async(self.get_available_tools)()
+        usage = Counter()
 
-        try:
-            return response['choices'][0]['message']['content']
-        except (KeyError, IndexError):
-            return self._get_fallback_response()
+        produced = False
+        for round_number in range(MAX_TOOL_ROUNDS + 1):
+            offered = tools if round_number < MAX_TOOL_ROUNDS else None
+            parts = []
+            tool_calls = []
+            async for event in self.client.stream_chat(messages, tools=offered or None):
+                if event.get('error'):
+                    logger.warning("AI stream error: %s", event.get('message'))
+                    if not produced:
+                        yield self._get_fallback_response()
+                    return
+                if 'tool_calls' in event:
+                    tool_calls = event['tool_calls']
+                    continue
+                if 'usage' in event:
+                    self._add_usage(usage, event['usage'])
+                    continue
+                produced = True
+                parts.append(event['delta'])
+                yield event['delta']
+
+            if not tool_calls:
+                if round_number == 0 and parts and scope:
+                    await sync_to_async(response_cache.store)(user_message, ''.join(parts), **scope)
+                break
+            messages.append(self._tool_call_message(''.join(parts), tool_calls))
+            messages.extend(await handle_tool_calls(tool_calls, self.tool_context()))
+
+        if produced:
+            await self._usage_record(usage).asave()
+        else:
+            yield self._get_fallback_response()
 
     def _get_fallback_response(self) -> str:
         """Return fallback response when AI is unavailable."""
@@ -124,70 +303,6 @@ Sé amable, servicial y profesional. Si no sabes algo, admítelo y sugiere conta
         """Get tools available based on user permissions.
 
         Returns:
-            List of tool definitions for Claude
+            List of tool definitions for Claude (cached; do not modify)
         """
-        tools = [
-            {
-                'type': 'function',
-                'function': {
-                    'name': 'get_business_hours',
-                    'description': 'Get the clinic business hours',
-                    'parameters': {
-                        'type': 'object',
-                        'properties': {},
-                        'required': []
-                    }
-                }
-            },
-            {
-                'type': 'function',
-                'function': {
-                    'name': 'get_services',
-                    'description': 'Get list of clinic services',
-                    'parameters': {
-                        'type': 'object',
-                        'properties': {
-                            'category': {
-                                'type': 'string',
-                                'description': 'Service category (clinic, pharmacy, store)',
-                                'enum': ['clinic', 'pharmacy', 'store', 'all']
-                            }
-                        },
-                        'required': []
-                    }
-                }
-            }
-        ]
-
-        if self.user and self.user.is_authenticated:
-            tools.append({
-                'type': 'function',
-                'function': {
-                    'name': 'schedule_appointment',
-                    'description': 'Schedule an appointment at the clinic',
-                    'parameters': {
-                        'type': 'object',
-                        'properties': {
-                            'date': {
-                                'type': 'string',
-                                'description': 'Preferred date (YYYY-MM-DD)'
-                            },
-                            'time': {
-                                'type': 'string',
-                                'description': 'Preferred time (HH:MM)'
-                            },
-                            'service': {
-                                'type': 'string',
-                                'description': 'Type of service needed'
-                            },
-                            'pet_name': {
-                                'type': 'string',
-                                'description': 'Name of the pet'
-                            }
-                        },
-                        'required': ['date', 'service']
-                    }
-                }
-            })
-
-        return tools
+        return ToolRegistry.get_tool_schemas(self.user)
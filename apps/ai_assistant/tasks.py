@@ -0,0 +1,28 @@
+"""Celery tasks for the AI assistant."""
+import logging
+
+from celery import shared_task
+
+from .memory import ConversationMemory
+from .models import Conversation
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def summarize_conversation(conversation_id: int) -> bool:
+    """Fold older turns of a conversation into its stored summary.
+
+    Args:
+        conversation_id: Conversation primary key
+
+    Returns:
+        True if the summary was updated
+    """
+    conversation = Conversation.objects.filter(pk=conversation_id).first()
+    if conversation is None:
+        return False
+    updated = ConversationMemory(conversation).summarize()
+    if updated:
+        logger.info("Summarized conversation %s", conversation_id)
+    return updated
@@ -1,11 +1,25 @@
 """Tool calling framework for AI assistant."""
+import asyncio
 import json
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from typing import Any, Callable
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
 logger = logging.getLogger(__name__)
 
+# Seconds a tool may run before its call is abandoned (settings.AI_TOOL_TIMEOUT)
+DEFAULT_TOOL_TIMEOUT = 15.0
+# Worker threads for synchronous handlers (settings.AI_TOOL_WORKERS)
+DEFAULT_TOOL_WORKERS = 8
+# Longest date range check_availability answers in one call
+MAX_AVAILABILITY_DAYS = 14
+
 
 @dataclass
 class ToolResult:
@@ -33,6 +47,7 @@ class Tool:
     handler: Callable
     permission_level: str = 'public'  # public, customer, staff, admin
     module: str = 'core'
+    timeout: float | None = None  # seconds; None uses AI_TOOL_TIMEOUT
 
     def to_openai_format(self) -> dict:
         """Convert to OpenAI function calling format."""
@@ -47,14 +62,95 @@ class Tool:
 
 
 class ToolRegistry:
-    """Central registry for all AI tools."""
+    """Central registry for all AI tools.
+
+    Tools register at import. The first lookup after that builds a
+    permission index: for each permission level, the tools it can use and
+    their ``to_openai_format`` payloads, serialized once. Per-message
+    lookups then only filter by enabled module (``ModuleConfig``, served
+    from the process-local flag cache).
+    """
 
     _tools: dict[str, Tool] = {}
 
+    # Permission hierarchy
+    ROLE_LEVELS = {
+        'public': 0,
+        'customer': 1,
+        'staff': 2,
+        'admin': 3,
+    }
+
+    # User.role values that are not themselves permission levels
+    USER_ROLE_LEVELS = {
+        'owner': 'customer',
+        'vet': 'staff',
+    }
+
+    # Arguments naming the user a call acts for; pinned to the caller below
+    # staff level
+    OWNER_PARAMS = ('user_id', 'owner_id', 'referrer_id')
+
+    # level -> ((tool, schema), ...); None until first use after a change
+    _index: dict[str, tuple[tuple[Tool, dict], ...]] | None = None
+    # level -> modules (besides 'core') its tools belong to
+    _modules: dict[str, tuple[str, ...]] = {}
+    # (level, disabled modules) -> schema list handed to the model
+    _schema_lists: dict[tuple[str, frozenset], list[dict]] = {}
+
     @classmethod
     def register(cls, tool: Tool) -> None:
         """Register a tool."""
         cls._tools[tool.name] = tool
+        cls._reset_index()
+
+    @classmethod
+    def unregister(cls, name: str) -> None:
+        """Remove a tool (for testing)."""
+        cls._tools.pop(name, None)
+        cls._reset_index()
+
+    @classmethod
+    def _reset_index(cls) -> None:
+        cls._index = None
+        cls._schema_lists = {}
+
+    @classmethod
+    def _get_index(cls) -> dict[str, tuple[tuple[Tool, dict], ...]]:
+        """Build (once) the per-permission-level tool and schema index."""
+        index = cls._index
+        if index is None:
+            schemas = {name: t.to_openai_format() for name, t in cls._tools.items()}
+            index = {}
+            for level, rank in cls.ROLE_LEVELS.items():
+                if level == 'public':
+                    allowed = [t for t in cls._tools.values() if t.permission_level == 'public']
+                else:
+                    allowed = [
+                        t for t in cls._tools.values()
+                        if cls.ROLE_LEVELS.get(t.permission_level, 0) <= rank
+                    ]
+                index[level] = tuple((t, schemas[t.name]) for t in allowed)
+                cls._modules[level] = tuple(sorted({t.module for t in allowed} - {'core'}))
+            cls._index = index
+        return index
+
+    @classmethod
+    def permission_level(cls, user=None) -> str:
+        """Return the permission level name for a user.
+
+        Args:
+            user: Django user object or None for anonymous
+
+        Returns:
+            'public' for anonymous users, else the level of the user's role
+            (unknown roles count as 'customer')
+        """
+        if user is None or not hasattr(user, 'is_authenticated') or not user.is_authenticated:
+            return 'public'
+        user_role = getattr(user, 'role', 'customer')
+        user_role = cls.USER_ROLE_LEVELS.get(user_role, user_role)
+        return user_role if user_role in cls.ROLE_LEVELS else 'customer'
 
     @classmethod
     def get_tools(cls) -> list[Tool]:
@@ -71,27 +167,67 @@ class ToolRegistry:
         Returns:
             List of Tool objects the user can access
         """
-        if user is None or not hasattr(user, 'is_authenticated') or not user.is_authenticated:
-            # Anonymous users get public tools only
-            return [t for t in cls._tools.values() if t.permission_level == 'public']
+        # Anonymous users get public tools only; others every tool at or
+        # below their level
+        return [t for t, _ in cls._get_index()[cls.permission_level(user)]]
 
-        user_role = getattr(user, 'role', 'customer')
+    @classmethod
+    def get_tool_schemas(cls, user=None) -> list[dict]:
+        """Get tool definitions for the model, in OpenAI format.
 
-        # Define permission hierarchy
-        role_levels = {
-            'public': 0,
-            'customer': 1,
-            'staff': 2,
-            'admin': 3,
-        }
+        Tools of disabled modules are left out. The returned list is cached
+        and shared: callers must not modify it.
 
-        user_level = role_levels.get(user_role, 1)
+        Args:
+            user: Django user object or None for anonymous
 
-        # Return tools at or below user's permission level
-        return [
-            t for t in cls._tools.values()
-            if role_levels.get(t.permission_level, 0) <= user_level
-        ]
+        Returns:
+            List of tool definitions the user can call
+        """
+        from apps.core.middleware.module_activation import get_module_enabled_status
+
+        level = cls.permission_level(user)
+        entries = cls._get_index()[level]
+        modules = cls._modules[level]
+        disabled = frozenset(m for m in modules if not get_module_enabled_status(m))
+
+        key = (level, disabled)
+        schemas = cls._schema_lists.get(key)
+        if schemas is None:
+            schemas = [schema for t, schema in entries if t.module not in disabled]
+            cls._schema_lists[key] = schemas
+        return schemas
+
+    @classmethod
+    def authorize(cls, tool: Tool, params: dict, context: dict) -> str | None:
+        """Check a model-issued call against the caller in ``context``.
+
+        Only applies when ``context`` carries a ``'user'`` (agent calls);
+        internal callers pass no user. Callers can only use tools at their
+        level. Arguments naming a user (``OWNER_PARAMS``) are pinned to a
+        customer's own id, and refused for anonymous callers.
+
+        Args:
+            tool: Tool being called
+            params: Call parameters (owner arguments may be rewritten)
+            context: Execution context
+
+        Returns:
+            Error message if the call is not allowed, else None
+        """
+        if 'user' not in context:
+            return None
+        user = context['user']
+        level = cls.permission_level(user)
+        if all(t is not tool for t, _ in cls._get_index()[level]):
+            return f"Tool '{tool.name}' is not available"
+        if cls.ROLE_LEVELS[level] < cls.ROLE_LEVELS['staff']:
+            owner_params = [p for p in cls.OWNER_PARAMS if p in tool.parameters.get('properties', {})]
+            if owner_params and level == 'public':
+                return f"Tool '{tool.name}' requires signing in"
+            for name in owner_params:
+                params[name] = user.pk
+        return None
 
     @classmethod
     def get_tool(cls, name: str) -> Tool | None:
@@ -126,6 +262,10 @@ class ToolRegistry:
                 error=f"Tool '{tool_name}' not found"
             )
 
+        denied = cls.authorize(tool, params, context)
+        if denied:
+            return ToolResult(success=False, data=None, error=denied)
+
         try:
             result = tool.handler(**params)
             return ToolResult(success=True, data=result)
@@ -137,10 +277,90 @@ class ToolRegistry:
                 error="Tool execution failed. Please try again."
             )
 
+    @classmethod
+    async def aexecute(cls, tool_name: str, params: dict, context: dict) -> ToolResult:
+        """Execute a tool without blocking the event loop.
+
+        Async handlers are awaited directly. Sync handlers (ORM work) run in
+        the bounded tool thread pool. Either way the call is cancelled, or
+        for a thread abandoned, after the tool's timeout.
+
+        Args:
+            tool_name: Name of the tool to execute
+            params: Parameters to pass to the tool
+            context: Execution context (user, language, etc.)
+
+        Returns:
+            ToolResult with success/failure and data
+        """
+        tool = cls._tools.get(tool_name)
+
+        if tool is None:
+            return ToolResult(
+                success=False,
+                data=None,
+                error=f"Tool '{tool_name}' not found"
+            )
+
+        denied = cls.authorize(tool, params, context)
+        if denied:
+            return ToolResult(success=False, data=None, error=denied)
+
+        timeout = tool.timeout or getattr(settings, 'AI_TOOL_TIMEOUT', DEFAULT_TOOL_TIMEOUT)
+        try:
+            if asyncio.iscoroutinefunction(tool.handler):
+                call = tool.handler(**params)
+            else:
+                call = sync_to_async(
+                    _run_sync_handler, thread_sensitive=False, executor=get_tool_executor()
+                )(tool.handler, params)
+            result = await asyncio.wait_for(call, timeout)
+            return ToolResult(success=True, data=result)
+        except asyncio.TimeoutError:
+            logger.warning("Tool '%s' timed out after %ss", tool_name, timeout)
+            return ToolResult(
+                success=False,
+                data=None,
+                error="Tool took too long to respond. Please try again."
+            )
+        except Exception:
+            logger.exception("Tool execution error for '%s'", tool_name)
+            return ToolResult(
+                success=False,
+                data=None,
+                error="Tool execution failed. Please try again."
+            )
+
     @classmethod
     def clear(cls) -> None:
         """Clear all registered tools (for testing)."""
         cls._tools.clear()
+        cls._reset_index()
+
+
+_tool_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def get_tool_executor() -> ThreadPoolExecutor:
+    """Return the bounded thread pool that runs synchronous tool handlers."""
+    global _tool_executor
+    if _tool_executor is None:
+        with _executor_lock:
+            if _tool_executor is None:
+                _tool_executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'AI_TOOL_WORKERS', DEFAULT_TOOL_WORKERS),
+                    thread_name_prefix='ai-tool',
+                )
+    return _tool_executor
+
+
+def _run_sync_handler(handler: Callable, params: dict) -> Any:
+    """Run a sync handler in a pool thread, then release stale DB connections."""
+    try:
+        return handler(**params)
+    finally:
+        close_old_connections()
 
 
 def tool(
@@ -148,7 +368,8 @@ def tool(
     description: str,
     parameters: dict = None,
     permission: str = 'public',
-    module: str = 'core'
+    module: str = 'core',
+    timeout: float = None,
 ):
     """Decorator to register a function as a tool.
 
@@ -158,6 +379,7 @@ def tool(
         parameters: JSON Schema for parameters
         permission: Required permission level
         module: Django app providing this tool
+        timeout: Seconds before the call is abandoned (default AI_TOOL_TIMEOUT)
 
     Usage:
         @tool(
@@ -178,7 +400,8 @@ def tool(
             parameters=parameters,
             handler=func,
             permission_level=permission,
-            module=module
+            module=module,
+            timeout=timeout,
         )
         ToolRegistry.register(t)
         return func
@@ -190,16 +413,21 @@ async def handle_tool_calls(
     tool_calls: list[dict],
     context: dict
 ) -> list[dict]:
-    """Execute multiple tool calls and return results.
+    """Execute multiple tool calls concurrently and return results.
+
+    The model emits parallel tool calls only when they are independent, so
+    they all run at once; each is bounded by its own timeout. If this
+    coroutine is cancelled (client disconnected) the pending calls are
+    cancelled with it.
 
     Args:
         tool_calls: List of tool call dicts from AI
         context: Execution context
 
     Returns:
-        List of result dicts for AI context
+        List of result dicts for AI context, in call order
     """
-    results = []
+    pending = []
     for call in tool_calls:
         func_data = call.get('function', {})
         tool_name = func_data.get('name', '')
@@ -209,15 +437,20 @@ async def handle_tool_calls(
             params = json.loads(arguments)
         except json.JSONDecodeError:
             params = {}
+        if not isinstance(params, dict):
+            params = {}
 
-        result = ToolRegistry.execute(tool_name, params, context)
-        results.append({
+        pending.append(ToolRegistry.aexecute(tool_name, params, context))
+
+    results = await asyncio.gather(*pending)
+    return [
+        {
             'tool_call_id': call.get('id', ''),
             'role': 'tool',
             'content': result.to_message()
-        })
-
-    return results
+        }
+        for call, result in zip(tool_calls, results)
+    ]
 
 
 # =============================================================================
@@ -549,6 +782,13 @@ def list_services(category: str = 'all') -> dict:
                 'type': 'string',
                 'description': 'Date to check availability (YYYY-MM-DD format)'
             },
+            'end_date': {
+                'type': 'string',
+                'description': (
+                    'Optional last date (YYYY-MM-DD) to check a range of up to '
+                    f'{MAX_AVAILABILITY_DAYS} days in one call'
+                )
+            },
             'staff_id': {
                 'type': 'integer',
                 'description': 'Optional staff member ID to filter by'
@@ -562,9 +802,10 @@ def list_services(category: str = 'all') -> dict:
 def check_availability(
     service_id: int,
     date: str,
-    staff_id: int = None
+    staff_id: int = None,
+    end_date: str = None
 ) -> dict:
-    """Return available time slots for a given date."""
+    """Return available time slots for a given date or date range."""
     from datetime import datetime
     from django.contrib.auth import get_user_model
     from apps.appointments.models import ServiceType
@@ -579,8 +820,13 @@ def check_availability(
 
     try:
         check_date = datetime.strptime(date, '%Y-%m-%d').date()
+        last_date = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
     except ValueError:
         return {'error': 'Invalid date format. Use YYYY-MM-DD'}
+    if last_date and not 0 <= (last_date - check_date).days < MAX_AVAILABILITY_DAYS:
+        return {
+            'error': f'end_date must be within {MAX_AVAILABILITY_DAYS} days after date'
+        }
 
     staff = None
     if staff_id:
@@ -589,25 +835,41 @@ def check_availability(
         except User.DoesNotExist:
             return {'error': f'Staff member with ID {staff_id} not found'}
 
+    def format_slots(slots):
+        return [
+            {'time': slot['time'].strftime('%H:%M'), 'staff_id': slot['staff_id']}
+            for slot in slots
+        ]
+
+    if last_date:
+        by_date = AvailabilityService.get_available_slots_range(
+            start_date=check_date,
+            end_date=last_date,
+            service=service,
+            staff=staff
+        )
+        return {
+            'date': date,
+            'end_date': end_date,
+            'service_id': service_id,
+            'service_name': service.name,
+            'days': [
+                {'date': day.isoformat(), 'slots': format_slots(slots)}
+                for day, slots in by_date.items()
+            ]
+        }
+
     slots = AvailabilityService.get_available_slots(
         date=check_date,
         service=service,
         staff=staff
     )
 
-    # Format slots for response
-    slot_list = []
-    for slot in slots:
-        slot_list.append({
-            'time': slot['time'].strftime('%H:%M'),
-            'staff_id': slot['staff_id']
-        })
-
     return {
         'date': date,
         'service_id': service_id,
         'service_name': service.name,
-        'slots': slot_list
+        'slots': format_slots(slots)
     }
 
 
@@ -666,7 +928,7 @@ def book_appointment(
     from django.utils import timezone
     from apps.pets.models import Pet
     from apps.appointments.models import ServiceType
-    from apps.appointments.services import AvailabilityService
+    from apps.appointments.services import AvailabilityService, BookingConflict
 
     User = get_user_model()
 
@@ -714,6 +976,9 @@ def book_appointment(
             start_time=start_datetime,
             notes=notes
         )
+    except BookingConflict as e:
+        # Someone else got the slot; let the assistant offer another time
+        return {'error': str(e), 'conflict': True}
     except ValueError as e:
         return {'error': str(e)}
 
@@ -3104,15 +3369,21 @@ def get_first_aid_instructions(
             "callback_number": {
                 "type": "string",
                 "description": "Phone number for callback"
+            },
+            "user_id": {
+                "type": "integer",
+                "description": "The ID of the user (for ownership verification)"
             }
         },
         "required": ["emergency_contact_id", "callback_number"]
-    }
+    },
+    permission="customer"
 )
 def escalate_to_oncall(
     emergency_contact_id: int,
     callback_number: str,
-    urgency: str = 'urgent'
+    urgency: str = 'urgent',
+    user_id: int = None
 ) -> dict:
     """Escalate emergency to on-call veterinarian."""
     from django.utils import timezone
@@ -3123,6 +3394,9 @@ def escalate_to_oncall(
     except EmergencyContact.DoesNotExist:
         return {'escalated': False, 'message': 'Emergency contact not found'}
 
+    if user_id is not None and contact.owner_id != user_id:
+        return {'escalated': False, 'message': 'Access denied. This emergency belongs to another user.'}
+
     # Find on-call staff
     now = timezone.now()
     current_time = now.time()
@@ -3194,7 +3468,8 @@ def escalate_to_oncall(
             }
         },
         "required": ["phone", "channel", "symptoms", "pet_species"]
-    }
+    },
+    permission="customer"
 )
 def create_emergency_contact(
     phone: str,
@@ -3224,6 +3499,9 @@ def create_emergency_contact(
         except Pet.DoesNotExist:
             pass
 
+    if pet and owner_id and pet.owner_id != owner_id:
+        return {'success': False, 'message': 'Access denied. This pet belongs to another user.'}
+
     contact = EmergencyContact.objects.create(
         owner=owner,
         pet=pet,
@@ -3261,7 +3539,8 @@ def create_emergency_contact(
             }
         },
         "required": ["emergency_contact_id", "outcome"]
-    }
+    },
+    permission="staff"
 )
 def log_emergency_resolution(
     emergency_contact_id: int,
@@ -3321,7 +3600,8 @@ def log_emergency_resolution(
             }
         },
         "required": ["user_id", "message", "channel"]
-    }
+    },
+    permission="staff"
 )
 def send_message(
     user_id: int,
@@ -3394,7 +3674,8 @@ def send_message(
             }
         },
         "required": []
-    }
+    },
+    permission="staff"
 )
 def get_unread_messages(
     channel: str = "all",
@@ -3456,7 +3737,8 @@ def get_unread_messages(
             }
         },
         "required": ["user_id", "reminder_type", "scheduled_for"]
-    }
+    },
+    permission="staff"
 )
 def schedule_reminder(
     user_id: int,
@@ -3517,7 +3799,8 @@ def schedule_reminder(
             }
         },
         "required": ["message_id"]
-    }
+    },
+    permission="staff"
 )
 def check_message_status(message_id: int) -> dict:
     """Check message delivery status."""
@@ -3562,7 +3845,8 @@ def check_message_status(message_id: int) -> dict:
             }
         },
         "required": ["user_id"]
-    }
+    },
+    permission="staff"
 )
 def get_conversation_history(
     user_id: int,
@@ -3616,7 +3900,8 @@ def get_conversation_history(
             }
         },
         "required": ["user_id"]
-    }
+    },
+    permission="staff"
 )
 def get_customer_profile(user_id: int) -> dict:
     """Get customer CRM profile."""
@@ -3675,7 +3960,8 @@ def get_customer_profile(user_id: int) -> dict:
             }
         },
         "required": ["user_id", "note"]
-    }
+    },
+    permission="staff"
 )
 def add_customer_note(
     user_id: int,
@@ -3752,7 +4038,8 @@ def add_customer_note(
             }
         },
         "required": ["user_id", "interaction_type", "channel", "direction"]
-    }
+    },
+    permission="staff"
 )
 def log_interaction(
     user_id: int,
@@ -3808,7 +4095,8 @@ def log_interaction(
             }
         },
         "required": ["user_id"]
-    }
+    },
+    permission="staff"
 )
 def get_customer_history(user_id: int, limit: int = 20) -> dict:
     """Get customer interaction history."""
@@ -3864,7 +4152,8 @@ def get_customer_history(user_id: int, limit: int = 20) -> dict:
             }
         },
         "required": ["query"]
-    }
+    },
+    permission="staff"
 )
 def search_customers(query: str, limit: int = 20) -> dict:
     """Search customers."""
@@ -3911,7 +4200,8 @@ def search_customers(query: str, limit: int = 20) -> dict:
             }
         },
         "required": ["user_id", "tag_name"]
-    }
+    },
+    permission="staff"
 )
 def tag_customer(user_id: int, tag_name: str) -> dict:
     """Add a tag to customer."""
@@ -3962,7 +4252,8 @@ def tag_customer(user_id: int, tag_name: str) -> dict:
             }
         },
         "required": []
-    }
+    },
+    permission="staff"
 )
 def get_competitors(active_only: bool = True, limit: int = 20) -> dict:
     """Get list of competitors."""
@@ -4007,7 +4298,8 @@ def get_competitors(active_only: bool = True, limit: int = 20) -> dict:
             }
         },
         "required": ["service_name"]
-    }
+    },
+    permission="staff"
 )
 def get_competitor_prices(
     service_name: str,
@@ -4067,7 +4359,8 @@ def get_competitor_prices(
             }
         },
         "required": ["name"]
-    }
+    },
+    permission="staff"
 )
 def add_competitor(
     name: str,
@@ -4113,7 +4406,8 @@ def add_competitor(
             }
         },
         "required": ["competitor_id", "service_name", "new_price"]
-    }
+    },
+    permission="staff"
 )
 def update_competitor_price(
     competitor_id: int,
@@ -4165,7 +4459,8 @@ def update_competitor_price(
         "type": "object",
         "properties": {},
         "required": []
-    }
+    },
+    permission="staff"
 )
 def get_market_position() -> dict:
     """Get market position analysis."""
@@ -4222,7 +4517,8 @@ def get_market_position() -> dict:
             }
         },
         "required": []
-    }
+    },
+    permission="staff"
 )
 def get_reviews(
     status: str = None,
@@ -4293,7 +4589,8 @@ def get_reviews(
             }
         },
         "required": ["rating", "content"]
-    }
+    },
+    permission="customer"
 )
 def submit_review(
     rating: int,
@@ -4362,7 +4659,8 @@ def submit_review(
             }
         },
         "required": ["user_id"]
-    }
+    },
+    permission="staff"
 )
 def request_review(
     user_id: int,
@@ -4430,7 +4728,8 @@ def request_review(
             }
         },
         "required": []
-    }
+    },
+    permission="staff"
 )
 def get_testimonials(
     homepage_only: bool = False,
@@ -4484,7 +4783,8 @@ def get_testimonials(
             }
         },
         "required": ["user_id"]
-    }
+    },
+    permission="customer"
 )
 def get_loyalty_status(user_id: int) -> dict:
     """Get loyalty program status for user."""
@@ -4533,7 +4833,8 @@ def get_loyalty_status(user_id: int) -> dict:
             }
         },
         "required": ["user_id", "points", "description"]
-    }
+    },
+    permission="staff"
 )
 def earn_points(
     user_id: int,
@@ -4587,7 +4888,8 @@ def earn_points(
             }
         },
         "required": ["user_id", "reward_id"]
-    }
+    },
+    permission="customer"
 )
 def redeem_reward(user_id: int, reward_id: int) -> dict:
     """Redeem a loyalty reward."""
@@ -4661,7 +4963,8 @@ def redeem_reward(user_id: int, reward_id: int) -> dict:
             }
         },
         "required": ["user_id"]
-    }
+    },
+    permission="customer"
 )
 def get_available_rewards(user_id: int) -> dict:
     """Get available rewards for customer."""
@@ -4718,7 +5021,8 @@ def get_available_rewards(user_id: int) -> dict:
             }
         },
         "required": ["referrer_id", "referred_email"]
-    }
+    },
+    permission="customer"
 )
 def create_friend_referral(referrer_id: int, referred_email: str) -> dict:
     """Create a friend referral for loyalty program."""
@@ -4777,7 +5081,8 @@ def create_friend_referral(referrer_id: int, referred_email: str) -> dict:
             }
         },
         "required": []
-    }
+    },
+    permission="staff"
 )
 def get_blog_posts(
     status: str = None,
@@ -4852,7 +5157,8 @@ def get_blog_posts(
             }
         },
         "required": ["title", "content"]
-    }
+    },
+    permission="staff"
 )
 def create_blog_post(
     title: str,
@@ -4909,7 +5215,8 @@ def create_blog_post(
             }
         },
         "required": ["path"]
-    }
+    },
+    permission="staff"
 )
 def get_seo_metadata(path: str) -> dict:
     """Get SEO metadata for path."""
@@ -4956,7 +5263,8 @@ def get_seo_metadata(path: str) -> dict:
             }
         },
         "required": ["path", "title", "description"]
-    }
+    },
+    permission="staff"
 )
 def update_seo_metadata(
     path: str,
@@ -5001,7 +5309,8 @@ def update_seo_metadata(
             }
         },
         "required": []
-    }
+    },
+    permission="staff"
 )
 def suggest_content(
     topic: str = None,
@@ -5065,7 +5374,8 @@ def suggest_content(
             }
         },
         "required": ["email"]
-    }
+    },
+    permission="customer"
 )
 def subscribe_newsletter(
     email: str,
@@ -5127,7 +5437,8 @@ def subscribe_newsletter(
             }
         },
         "required": []
-    }
+    },
+    permission="staff"
 )
 def get_email_campaigns(
     status: str = None,
@@ -5195,7 +5506,8 @@ def get_email_campaigns(
             }
         },
         "required": ["name", "subject", "html_content", "from_name", "from_email"]
-    }
+    },
+    permission="staff"
 )
 def create_email_campaign(
     name: str,
@@ -5243,7 +5555,8 @@ def create_email_campaign(
             }
         },
         "required": ["campaign_id"]
-    }
+    },
+    permission="staff"
 )
 def get_campaign_stats(campaign_id: int) -> dict:
     """Get campaign statistics."""
@@ -5293,7 +5606,8 @@ def get_campaign_stats(campaign_id: int) -> dict:
             }
         },
         "required": ["date"]
-    }
+    },
+    permission="staff"
 )
 def get_staff_schedule(date: str, staff_id: int = None) -> dict:
     """Get staff schedule for a date."""
@@ -5346,7 +5660,8 @@ def get_staff_schedule(date: str, staff_id: int = None) -> dict:
             }
         },
         "required": ["staff_id"]
-    }
+    },
+    permission="staff"
 )
 def clock_in(staff_id: int, notes: str = '') -> dict:
     """Clock in a staff member."""
@@ -5401,7 +5716,8 @@ def clock_in(staff_id: int, notes: str = '') -> dict:
             }
         },
         "required": ["staff_id"]
-    }
+    },
+    permission="staff"
 )
 def clock_out(staff_id: int, break_minutes: int = 0) -> dict:
     """Clock out a staff member."""
@@ -5474,7 +5790,8 @@ def clock_out(staff_id: int, break_minutes: int = 0) -> dict:
             }
         },
         "required": ["pet_id", "author_id", "note_type"]
-    }
+    },
+    permission="staff"
 )
 def create_clinical_note(
     pet_id: int,
@@ -5549,7 +5866,8 @@ def create_clinical_note(
             }
         },
         "required": ["title", "assigned_to_id"]
-    }
+    },
+    permission="staff"
 )
 def create_staff_task(
     title: str,
@@ -5608,7 +5926,8 @@ def create_staff_task(
             }
         },
         "required": []
-    }
+    },
+    permission="staff"
 )
 def get_dashboard_metrics(period: str = 'month') -> dict:
     """Get dashboard metrics for specified period."""
@@ -5672,7 +5991,8 @@ def get_dashboard_metrics(period: str = 'month') -> dict:
             }
         },
         "required": ["report_type"]
-    }
+    },
+    permission="staff"
 )
 def generate_report(
     report_type: str,
@@ -5741,7 +6061,8 @@ def generate_report(
             }
         },
         "required": []
-    }
+    },
+    permission="staff"
 )
 def get_analytics_summary(metric: str = 'revenue', days: int = 30) -> dict:
     """Get analytics summary."""
@@ -5792,7 +6113,8 @@ def get_analytics_summary(metric: str = 'revenue', days: int = 30) -> dict:
             }
         },
         "required": ["account_code"]
-    }
+    },
+    permission="admin"
 )
 def get_chart_account_balance(account_code: str) -> dict:
     """Get chart of accounts balance."""
@@ -5827,7 +6149,8 @@ def get_chart_account_balance(account_code: str) -> dict:
             }
         },
         "required": []
-    }
+    },
+    permission="admin"
 )
 def get_financial_summary(period: str = 'month') -> dict:
     """Get financial summary."""
@@ -5897,7 +6220,8 @@ def get_financial_summary(period: str = 'month') -> dict:
             }
         },
         "required": ["vendor_name", "amount", "description"]
-    }
+    },
+    permission="admin"
 )
 def record_expense(
     vendor_name: str,
@@ -5964,7 +6288,8 @@ def record_expense(
         "type": "object",
         "properties": {},
         "required": []
-    }
+    },
+    permission="admin"
 )
 def get_accounts_payable() -> dict:
     """Get accounts payable summary."""
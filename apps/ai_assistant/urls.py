@@ -7,6 +7,7 @@ app_name = 'ai_assistant'
 urlpatterns = [
     # Customer chat
     path('', views.chat_view, name='chat'),
+    path('stream/', views.chat_stream_view, name='chat_stream'),
     path('quick-actions/', views.get_quick_actions, name='quick_actions'),
     path('history/', views.get_chat_history, name='chat_history'),
 
@@ -16,5 +17,6 @@ urlpatterns = [
     # Admin chat
     path('admin/', views.admin_chat_view, name='admin_chat'),
     path('admin/api/', views.admin_chat_api_view, name='admin_chat_api'),
+    path('admin/api/stream/', views.admin_chat_stream_view, name='admin_chat_stream'),
     path('admin/conversations/', views.conversation_list, name='conversation_list'),
 ]
@@ -1,10 +1,12 @@
 """Views for AI assistant functionality."""
+import asyncio
 import json
 import logging
 import uuid
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from django.http import JsonResponse, HttpResponseForbidden
+from django.http import JsonResponse, HttpResponseForbidden, StreamingHttpResponse
 from django.shortcuts import render
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
@@ -13,9 +15,11 @@ from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 
+from django_ratelimit.core import is_ratelimited
 from django_ratelimit.decorators import ratelimit
 from django_ratelimit.exceptions import Ratelimited
 
+from .memory import ConversationMemory
 from .services import AIService
 from .models import Conversation, Message
 from .tools import ToolRegistry, handle_tool_calls
@@ -123,6 +127,8 @@ class ChatView(View):
                     'language': language,
                 }
             )
+            memory = ConversationMemory(conversation)
+            history = [] if created else memory.messages()
 
             # Save user message
             Message.objects.create(
@@ -134,7 +140,9 @@ class ChatView(View):
             # Get AI response
             ai_service = AIService(
                 user=request.user if request.user.is_authenticated else None,
-                language=language
+                language=language,
+                session_id=session_id,
+                history=history
             )
 
             # Get response synchronously for now
@@ -146,6 +154,7 @@ class ChatView(View):
                 role='assistant',
                 content=response_text
             )
+            memory.schedule_summary()
 
             return JsonResponse({
                 'success': True,
@@ -189,22 +198,30 @@ def get_quick_actions(request):
 
 
 def get_chat_history(request):
-    """Return chat history for a session."""
+    """Return chat history for a session, most recent page first.
+
+    Query params:
+        session_id: Chat session
+        before: Optional message id; returns the page before it
+    """
     session_id = request.GET.get('session_id')
 
     if not session_id:
         return JsonResponse({'messages': []})
 
-    try:
-        conversation = Conversation.objects.get(session_id=session_id)
-        messages = conversation.messages.order_by('created_at').values(
-            'role', 'content', 'created_at'
-        )
-        return JsonResponse({
-            'messages': list(messages)
-        })
-    except Conversation.DoesNotExist:
-        return JsonResponse({'messages': []})
+    limit = getattr(settings, 'AI_CHAT_HISTORY_LIMIT', 100)
+    messages = Message.objects.filter(conversation__session_id=session_id)
+    before = request.GET.get('before', '')
+    if before.isdigit():
+        messages = messages.filter(id__lt=int(before))
+
+    page = list(messages.order_by('-id').values(
+        'id', 'role', 'content', 'created_at'
+    )[:limit + 1])
+    return JsonResponse({
+        'messages': page[:limit][::-1],
+        'has_more': len(page) > limit,
+    })
 
 
 class AdminChatView(LoginRequiredMixin, View):
@@ -285,6 +302,8 @@ class AdminChatAPIView(LoginRequiredMixin, View):
                     'language': language,
                 }
             )
+            memory = ConversationMemory(conversation)
+            history = [] if created else memory.messages()
 
             # Save user message
             Message.objects.create(
@@ -296,7 +315,9 @@ class AdminChatAPIView(LoginRequiredMixin, View):
             # Get AI response with elevated permissions
             ai_service = AIService(
                 user=request.user,
-                language=language
+                language=language,
+                session_id=session_id,
+                history=history
             )
 
             response_text = ai_service.get_response_sync(message)
@@ -307,6 +328,7 @@ class AdminChatAPIView(LoginRequiredMixin, View):
                 role='assistant',
                 content=response_text
             )
+            memory.schedule_summary()
 
             # For admin, include tool execution info
             tools_used = []  # Would be populated from actual tool calls
@@ -336,13 +358,154 @@ class AdminChatAPIView(LoginRequiredMixin, View):
 admin_chat_api_view = AdminChatAPIView.as_view()
 
 
+def sse_event(event: str, data: dict) -> str:
+    """Format one server-sent event."""
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+class ChatStreamView(View):
+    """Stream AI responses to the chat widget as server-sent events.
+
+    Async view: served from config.asgi, a chat waiting on OpenRouter holds
+    no worker thread. Tokens are sent as ``token`` events, followed by one
+    ``done`` event with the full response once the assistant message is
+    saved. Database writes use the async ORM so the stream is not blocked.
+    """
+    staff_only = False
+    rate = '10/m'
+    ratelimit_group = 'ai_assistant.chat_stream'
+
+    def rate_key(self, group, request):
+        return rate_limit_key(group, request)
+
+    def default_session_id(self, user) -> str:
+        return str(uuid.uuid4())
+
+    async def post(self, request):
+        """Validate the message and start streaming the response."""
+        user = await request.auser()
+        if self.staff_only and not is_staff_or_admin(user):
+            message = 'Authentication required' if not user.is_authenticated else 'Access denied'
+            return JsonResponse({'error': True, 'message': message}, status=403)
+
+        limited = await sync_to_async(is_ratelimited)(
+            request,
+            group=self.ratelimit_group,
+            key=self.rate_key,
+            rate=self.rate,
+            method=['POST'],
+            increment=True,
+        )
+        if limited:
+            logger.warning("Chat stream rate limit exceeded for %s", get_client_ip(request))
+            return JsonResponse({
+                'error': True,
+                'message': 'Rate limit exceeded. Please try again later.'
+            }, status=429, headers={'Retry-After': '60'})
+
+        try:
+            if request.content_type == 'application/json':
+                data = json.loads(request.body)
+            else:
+                data = request.POST
+        except json.JSONDecodeError:
+            return JsonResponse({
+                'error': True,
+                'message': 'Invalid JSON'
+            }, status=400)
+
+        message = data.get('message', '').strip()
+        session_id = data.get('session_id') or self.default_session_id(user)
+        language = data.get('language', 'es')
+
+        if not message:
+            return JsonResponse({
+                'error': True,
+                'message': 'Message is required'
+            }, status=400)
+
+        owner = user if user.is_authenticated else None
+        conversation, created = await Conversation.objects.aget_or_create(
+            session_id=session_id,
+            defaults={'user': owner, 'language': language}
+        )
+        history = [] if created else await ConversationMemory(conversation).amessages()
+        ai_service = AIService(
+            user=owner, language=language, session_id=session_id, history=history
+        )
+
+        response = StreamingHttpResponse(
+            self.stream(ai_service, conversation, message),
+            content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # nginx: flush each event
+        return response
+
+    async def stream(self, ai_service, conversation, message):
+        """Yield SSE events while the response is generated."""
+        # Saved concurrently with the upstream request
+        save_user_message = asyncio.create_task(Message.objects.acreate(
+            conversation=conversation,
+            role='user',
+            content=message
+        ))
+
+        parts = []
+        try:
+            async for chunk in ai_service.stream_response(message):
+                parts.append(chunk)
+                yield sse_event('token', {'delta': chunk})
+        except Exception:
+            logger.exception("Chat stream error for session %s", conversation.session_id)
+            yield sse_event('error', {
+                'message': 'An unexpected error occurred. Please try again.'
+            })
+        finally:
+            await save_user_message
+
+        response_text = ''.join(parts)
+        if response_text:
+            await Message.objects.acreate(
+                conversation=conversation,
+                role='assistant',
+                content=response_text
+            )
+            await sync_to_async(ConversationMemory(conversation).schedule_summary)()
+        yield sse_event('done', {
+            'session_id': conversation.session_id,
+            'response': response_text,
+        })
+
+
+chat_stream_view = ChatStreamView.as_view()
+
+
+class AdminChatStreamView(ChatStreamView):
+    """Streaming admin chat with elevated permissions."""
+    staff_only = True
+    rate = '50/h'
+    ratelimit_group = 'ai_assistant.admin_chat_stream'
+
+    def rate_key(self, group, request):
+        return f'user:{request.user.pk}'
+
+    def default_session_id(self, user) -> str:
+        return f'admin_{user.id}_{uuid.uuid4().hex[:8]}'
+
+
+admin_chat_stream_view = AdminChatStreamView.as_view()
+
+
 @login_required
 def conversation_list(request):
     """List all conversations for admin/staff."""
     if not is_staff_or_admin(request.user):
         return HttpResponseForbidden("Access denied")
 
-    conversations = Conversation.objects.all().order_by('-updated_at')[:50]
+    conversations = Conversation.objects.with_message_stats().select_related(
+        'user'
+    ).order_by('-updated_at')[:50]
 
     if request.headers.get('Accept') == 'application/json':
         data = []
@@ -354,7 +517,7 @@ def conversation_list(request):
                 'language': conv.language,
                 'created_at': conv.created_at.isoformat(),
                 'updated_at': conv.updated_at.isoformat(),
-                'message_count': conv.messages.count(),
+                'message_count': conv.message_count,
             })
         return JsonResponse({'conversations': data})
 
@@ -368,7 +531,7 @@ def user_conversations(request):
     """List conversations for the current logged-in user."""
     conversations = Conversation.objects.filter(
         user=request.user
-    ).order_by('-updated_at')
+    ).with_message_stats().order_by('-updated_at')
 
     if request.headers.get('Accept') == 'application/json':
         data = []
@@ -380,7 +543,7 @@ def user_conversations(request):
                 'title': conv.title,
                 'created_at': conv.created_at.isoformat(),
                 'updated_at': conv.updated_at.isoformat(),
-                'message_count': conv.messages.count(),
+                'message_count': conv.message_count,
             })
         return JsonResponse({'conversations': data})
 
@@ -0,0 +1,228 @@
+"""Cached per-day availability bitmaps.
+
+Customers and the AI assistant keep asking for the same few days, so
+each day's availability is stored in the Django cache (Redis) as one
+entry holding, per vet:
+
+- ``free``: an int bitmap with bit ``i`` set when the
+  ``GRANULARITY``-minute cell starting at ``i * GRANULARITY`` minutes
+  after local midnight is inside a schedule block and not booked
+- ``blocks``: the (start cell, end cell) pairs of the vet's blocks, which
+  fix the slot grid
+
+Free slots for a service come from masking ``free`` at each grid
+position, and a 14-day calendar is a single ``get_many``. Appointment
+saves and deletes rebuild the days they touch once the transaction
+commits; schedule block changes bump a generation number that retires
+every cached day. Bulk updates that skip signals are covered by ``TTL``.
+
+Days whose blocks or bookings are not aligned to the granularity are
+stored as inexact and answered by ``AvailabilityEngine`` instead, so the
+cache never returns different slots than the engine.
+
+Configuration (``settings.APPOINTMENT_AVAILABILITY_CACHE``):
+    'TTL': 86400,       # seconds; 0 disables the cache
+    'GRANULARITY': 5,   # minutes per bit
+"""
+import logging
+import time as clock
+from datetime import date as date_type, datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .availability import AvailabilityEngine, staff_ids_of
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'TTL': 24 * 3600,
+    'GRANULARITY': 5,
+}
+
+GENERATION_KEY = 'availability:generation'
+
+
+def get_config() -> dict:
+    """Availability cache configuration from settings."""
+    return {**DEFAULTS, **getattr(settings, 'APPOINTMENT_AVAILABILITY_CACHE', {})}
+
+
+def is_enabled() -> bool:
+    return get_config()['TTL'] > 0
+
+
+def _day_key(day: date_type) -> str:
+    return f'availability:day:{day.isoformat()}'
+
+
+def _minute(value: datetime, day: date_type) -> tuple[int, bool]:
+    """Minutes from the day's local midnight, and whether it is on the minute."""
+    local = timezone.localtime(value)
+    minutes = (local.date() - day).days * 1440 + local.hour * 60 + local.minute
+    return minutes, local.second == 0 and local.microsecond == 0
+
+
+def build_entry(engine: AvailabilityEngine, day: date_type, generation: int) -> dict:
+    """Bitmaps for every vet with blocks on ``day``, from a loaded engine."""
+    granularity = get_config()['GRANULARITY']
+    staff = {}
+    for staff_id, start, end in engine.blocks.get(day.weekday(), ()):
+        free, blocks, exact = staff.get(staff_id, (0, (), True))
+        start_minute = start.hour * 60 + start.minute
+        end_minute = end.hour * 60 + end.minute
+        exact = exact and start.second == 0 and end.second == 0
+        exact = exact and start_minute % granularity == 0 and end_minute % granularity == 0
+        blocks += ((start_minute // granularity, end_minute // granularity),)
+        staff[staff_id] = (free, blocks, exact)
+
+    for staff_id, (_, blocks, exact) in staff.items():
+        free = 0
+        for free_start, free_end in engine.free_intervals(day, staff_id):
+            first, first_exact = _minute(free_start, day)
+            last, last_exact = _minute(free_end, day)
+            exact = exact and first_exact and last_exact
+            exact = exact and first % granularity == 0 and last % granularity == 0
+            # Only whole cells are marked free
+            first_cell = -(-first // granularity)
+            last_cell = last // granularity
+            if last_cell > first_cell:
+                free |= ((1 << (last_cell - first_cell)) - 1) << first_cell
+        staff[staff_id] = (free, blocks, exact)
+
+    return {'generation': generation, 'staff': staff}
+
+
+def _generation() -> int:
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Start from the clock so an evicted counter never reuses a value
+        cache.add(GENERATION_KEY, int(clock.time() * 1000), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def get_days(days: list[date_type]) -> dict[date_type, dict]:
+    """Cached entries for ``days``, building and storing any that are missing.
+
+    One ``get_many`` when every day is cached; otherwise one engine load
+    (two queries) for the span of the missing days.
+
+    Missing days are stored with ``cache.add``, so only ``refresh_days``
+    overwrites an entry: a reader whose engine was loaded before a booking
+    committed cannot replace the rebuilt day with its older slots.
+    Entries of an older generation are deleted before the engine loads
+    for the same reason.
+    """
+    keys = {_day_key(day): day for day in days}
+    found = cache.get_many([GENERATION_KEY, *keys])
+    generation = found.pop(GENERATION_KEY, None) or _generation()
+    entries = {
+        keys[key]: entry for key, entry in found.items()
+        if entry.get('generation') == generation
+    }
+    missing = [day for day in days if day not in entries]
+    if missing:
+        retired = [_day_key(day) for day in missing if _day_key(day) in found]
+        if retired:
+            cache.delete_many(retired)
+        engine = AvailabilityEngine(min(missing), max(missing))
+        ttl = get_config()['TTL']
+        for day in missing:
+            entries[day] = build_entry(engine, day, generation)
+            cache.add(_day_key(day), entries[day], ttl)
+    return entries
+
+
+def _cell_time(cell: int, granularity: int) -> time:
+    minutes = cell * granularity
+    return time(minutes // 60, minutes % 60)
+
+
+def entry_slots(entry: dict, duration: timedelta, staff_ids=None) -> list[dict] | None:
+    """Free slots from a day entry, or None when the engine must answer."""
+    granularity = get_config()['GRANULARITY']
+    minutes = duration.total_seconds() / 60
+    if minutes <= 0 or minutes % granularity:
+        return None
+    width = int(minutes) // granularity
+    mask = (1 << width) - 1
+
+    slots = []
+    for staff_id in sorted(entry['staff']):
+        if staff_ids is not None and staff_id not in staff_ids:
+            continue
+        free, blocks, exact = entry['staff'][staff_id]
+        if not exact:
+            return None
+        for start_cell, end_cell in blocks:
+            for cell in range(start_cell, end_cell - width + 1, width):
+                if (free >> cell) & mask == mask:
+                    slots.append({
+                        'time': _cell_time(cell, granularity),
+                        'staff_id': staff_id,
+                    })
+    return slots
+
+
+def slots_by_date(days: list[date_type], duration: timedelta, staff=None) -> dict:
+    """Free slots per day from cached bitmaps.
+
+    Days the bitmaps cannot answer exactly are computed by one engine load.
+
+    Args:
+        days: Days to answer
+        duration: Slot length
+        staff: Optional staff member, id, or iterable of either
+
+    Returns:
+        Dict mapping each day to a list of dicts with 'time' and 'staff_id'
+    """
+    staff_ids = staff_ids_of(staff)
+    wanted = set(staff_ids) if staff_ids is not None else None
+    entries = get_days(days)
+    result, inexact = {}, []
+    for day in days:
+        slots = entry_slots(entries[day], duration, wanted)
+        if slots is None:
+            inexact.append(day)
+        else:
+            result[day] = slots
+    if inexact:
+        engine = AvailabilityEngine(min(inexact), max(inexact), staff=staff_ids)
+        for day in inexact:
+            result[day] = engine.slots(day, duration)
+    return {day: result[day] for day in days}
+
+
+def refresh_days(days) -> None:
+    """Rebuild the cached entries for ``days`` from the database."""
+    if not is_enabled() or not days:
+        return
+    days = sorted(set(days))
+    try:
+        generation = _generation()
+        engine = AvailabilityEngine(days[0], days[-1])
+        cache.set_many(
+            {_day_key(day): build_entry(engine, day, generation) for day in days},
+            get_config()['TTL'],
+        )
+    except Exception:
+        logger.warning("Could not refresh availability for %s", days, exc_info=True)
+        cache.delete_many([_day_key(day) for day in days])
+
+
+def invalidate_all() -> None:
+    """Retire every cached day (schedule blocks changed)."""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        _generation()
+
+
+def appointment_days(start: datetime, end: datetime) -> list[date_type]:
+    """Local days an appointment covers."""
+    first = timezone.localtime(start).date()
+    last = timezone.localtime(end - timedelta(microseconds=1)).date()
+    return [first + timedelta(days=i) for i in range(max(0, (last - first).days) + 1)]
@@ -0,0 +1,79 @@
+from django.db import migrations
+
+CONSTRAINT = 'appointments_no_vet_overlap'
+
+BLOCKING_STATUSES = "('scheduled', 'confirmed', 'in_progress')"
+
+# Overlapping pairs listed when the constraint cannot be added
+REPORT_LIMIT = 50
+
+
+def find_overlaps(cursor, table):
+    """(id, id, vet id, start) of blocking appointments that already overlap.
+
+    Mirrors the constraint: half-open ranges, so empty ranges and
+    back-to-back appointments do not count.
+    """
+    cursor.execute(
+        f'SELECT a.id, b.id, a.veterinarian_id, a.scheduled_start'
+        f' FROM {table} a JOIN {table} b'
+        f' ON b.veterinarian_id = a.veterinarian_id AND b.id > a.id'
+        f' AND b.scheduled_start < a.scheduled_end AND a.scheduled_start < b.scheduled_end'
+        f' WHERE a.veterinarian_id IS NOT NULL'
+        f' AND a.scheduled_start < a.scheduled_end AND b.scheduled_start < b.scheduled_end'
+        f' AND a.status IN {BLOCKING_STATUSES} AND b.status IN {BLOCKING_STATUSES}'
+        f' ORDER BY a.scheduled_start LIMIT {REPORT_LIMIT}'
+    )
+    return cursor.fetchall()
+
+
+def add_overlap_constraint(apps, schema_editor):
+    """Reject overlapping blocking appointments for the same vet.
+
+    PostgreSQL only (needs btree_gist); other databases rely on
+    AvailabilityService's booking lock.
+
+    PostgreSQL cannot add an exclusion constraint NOT VALID, so existing
+    overlaps would fail the migration. They are reported instead and the
+    constraint is skipped; once they are rescheduled or cancelled, run
+    ``migrate appointments 0004`` then ``migrate appointments`` to add it.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    table = apps.get_model('appointments', 'Appointment')._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        overlaps = find_overlaps(cursor, table)
+    if overlaps:
+        print(
+            f"WARNING: {CONSTRAINT} not added; vets have overlapping appointments"
+            f" (first {REPORT_LIMIT} pairs shown):"
+        )
+        for first_id, second_id, vet_id, start in overlaps:
+            print(f"  vet {vet_id}: appointments {first_id} and {second_id} ({start:%Y-%m-%d %H:%M})")
+        return
+
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    schema_editor.execute(
+        f'ALTER TABLE {table} ADD CONSTRAINT {CONSTRAINT} EXCLUDE USING gist ('
+        "veterinarian_id WITH =, tstzrange(scheduled_start, scheduled_end, '[)') WITH &&"
+        ") WHERE (veterinarian_id IS NOT NULL"
+        f" AND status IN {BLOCKING_STATUSES})"
+    )
+
+
+def remove_overlap_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    table = apps.get_model('appointments', 'Appointment')._meta.db_table
+    schema_editor.execute(f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {CONSTRAINT}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0004_require_location'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_overlap_constraint, remove_overlap_constraint),
+    ]
@@ -1,18 +1,56 @@
 """Appointment availability and booking services."""
-from datetime import datetime, time, timedelta
-from typing import Optional
+import threading
+from contextlib import contextmanager
+from datetime import date as date_type, datetime, timedelta
 
-from django.db.models import Q
+from django.db import IntegrityError, connection, transaction
 from django.utils import timezone
 
-from .models import Appointment, ScheduleBlock, ServiceType
+from . import availability, availability_cache
+from .availability import AvailabilityEngine
+from .models import Appointment, ServiceType
+
+# PostgreSQL constraint backing the booking lock (migration 0005)
+OVERLAP_CONSTRAINT = 'appointments_no_vet_overlap'
+
+# Lock stripes for databases without advisory locks (single process only)
+_LOCAL_LOCKS = [threading.Lock() for _ in range(64)]
+
+
+class BookingConflict(ValueError):
+    """The requested time overlaps another appointment of the same vet."""
+
+    def __init__(self, staff_id=None, start_time=None):
+        super().__init__('The requested time slot is not available.')
+        self.staff_id = staff_id
+        self.start_time = start_time
+
+
+@contextmanager
+def booking_lock(staff_id: int, day: date_type):
+    """Run the block in a transaction that holds a per-vet, per-day lock.
+
+    PostgreSQL uses a transaction-scoped advisory lock, held until the
+    outermost transaction commits. Other databases fall back to a
+    per-process lock held until this block's transaction commits.
+    """
+    if connection.vendor == 'postgresql':
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT pg_advisory_xact_lock(%s, %s)', [staff_id, day.toordinal()]
+                )
+            yield
+        return
+    with _LOCAL_LOCKS[hash((staff_id, day)) % len(_LOCAL_LOCKS)], transaction.atomic():
+        yield
 
 
 class AvailabilityService:
     """Service for managing appointment availability and booking."""
 
     # Statuses that block a time slot
-    BLOCKING_STATUSES = ['scheduled', 'confirmed', 'in_progress']
+    BLOCKING_STATUSES = availability.BLOCKING_STATUSES
 
     @classmethod
     def get_available_slots(
@@ -26,85 +64,48 @@ class AvailabilityService:
         Args:
             date: The date to check availability for
             service: The service type being booked
-            staff: Optional specific staff member. If None, returns slots
-                   from any available staff.
+            staff: Optional specific staff member (or list of them). If
+                   None, returns slots from any available staff.
 
         Returns:
             List of dicts with 'time' and 'staff_id' keys
         """
-        day_of_week = date.weekday()
         duration = timedelta(minutes=service.duration_minutes)
+        if availability_cache.is_enabled():
+            return availability_cache.slots_by_date([date], duration, staff)[date]
+        return AvailabilityEngine(date, staff=staff).slots(date, duration)
 
-        # Get active schedule blocks for this day
-        blocks_query = ScheduleBlock.objects.filter(
-            day_of_week=day_of_week,
-            is_active=True
-        )
-        if staff:
-            blocks_query = blocks_query.filter(staff=staff)
-
-        blocks = blocks_query.order_by('staff', 'start_time')
-
-        if not blocks.exists():
-            return []
-
-        # Get existing appointments for this date
-        date_start = timezone.make_aware(datetime.combine(date, time.min))
-        date_end = timezone.make_aware(datetime.combine(date, time.max))
-
-        existing_appointments = Appointment.objects.filter(
-            scheduled_start__gte=date_start,
-            scheduled_start__lte=date_end,
-            status__in=cls.BLOCKING_STATUSES
-        )
-        if staff:
-            existing_appointments = existing_appointments.filter(
-                veterinarian=staff
-            )
-
-        # Build list of booked time ranges per staff
-        booked_ranges = {}
-        for appt in existing_appointments:
-            staff_id = appt.veterinarian_id
-            if staff_id not in booked_ranges:
-                booked_ranges[staff_id] = []
-            booked_ranges[staff_id].append(
-                (appt.scheduled_start, appt.scheduled_end)
-            )
-
-        # Generate available slots
-        available_slots = []
-
-        for block in blocks:
-            block_staff_id = block.staff_id
-            staff_booked = booked_ranges.get(block_staff_id, [])
-
-            # Generate slots within this block
-            current_time = datetime.combine(date, block.start_time)
-            block_end = datetime.combine(date, block.end_time)
-
-            while current_time + duration <= block_end:
-                slot_start = timezone.make_aware(current_time)
-                slot_end = slot_start + duration
-
-                # Check if slot overlaps with any booked appointment
-                is_available = True
-                for booked_start, booked_end in staff_booked:
-                    if cls._times_overlap(
-                        slot_start, slot_end, booked_start, booked_end
-                    ):
-                        is_available = False
-                        break
+    @classmethod
+    def get_available_slots_range(
+        cls,
+        start_date: datetime.date,
+        end_date: datetime.date,
+        service: ServiceType,
+        staff=None
+    ) -> dict:
+        """Get available time slots for every day in a date range.
 
-                if is_available:
-                    available_slots.append({
-                        'time': current_time.time(),
-                        'staff_id': block_staff_id
-                    })
+        Served from the availability cache when enabled (one cache fetch);
+        otherwise uses the same two queries as a single day.
 
-                current_time += duration
+        Args:
+            start_date: First day to check
+            end_date: Last day to check (inclusive)
+            service: The service type being booked
+            staff: Optional staff member or list of staff members
 
-        return available_slots
+        Returns:
+            Dict mapping each date to its list of slot dicts
+        """
+        duration = timedelta(minutes=service.duration_minutes)
+        if availability_cache.is_enabled():
+            days = [
+                start_date + timedelta(days=i)
+                for i in range((end_date - start_date).days + 1)
+            ]
+            return availability_cache.slots_by_date(days, duration, staff)
+        engine = AvailabilityEngine(start_date, end_date, staff=staff)
+        return engine.slots_by_date(duration)
 
     @classmethod
     def is_slot_available(
@@ -123,44 +124,14 @@ class AvailabilityService:
         Returns:
             True if slot is available, False otherwise
         """
-        date = start_time.date()
-        day_of_week = date.weekday()
-        slot_time = start_time.time()
-        duration = timedelta(minutes=service.duration_minutes)
-        end_time = start_time + duration
-
-        # Check if there's an active schedule block covering this time
-        matching_blocks = ScheduleBlock.objects.filter(
-            staff=staff,
-            day_of_week=day_of_week,
-            is_active=True,
-            start_time__lte=slot_time,
-        )
-
-        # Filter blocks where the slot fits within the block
-        slot_end_time = (
-            datetime.combine(date, slot_time) + duration
-        ).time()
-
-        valid_block = False
-        for block in matching_blocks:
-            if block.end_time >= slot_end_time:
-                valid_block = True
-                break
-
-        if not valid_block:
+        if staff is None:
             return False
-
-        # Check for conflicting appointments
-        conflicting = Appointment.objects.filter(
-            veterinarian=staff,
-            status__in=cls.BLOCKING_STATUSES
-        ).filter(
-            Q(scheduled_start__lt=end_time) & Q(scheduled_end__gt=start_time)
+        day = timezone.localtime(start_time).date()
+        engine = AvailabilityEngine(day, staff=staff)
+        return engine.is_free(
+            start_time, timedelta(minutes=service.duration_minutes), staff.pk
         )
 
-        return not conflicting.exists()
-
     @classmethod
     def book_appointment(
         cls,
@@ -169,10 +140,14 @@ class AvailabilityService:
         service: ServiceType,
         staff,
         start_time: datetime,
-        notes: str = ''
+        notes: str = '',
+        location=None
     ) -> Appointment:
         """Book an appointment.
 
+        The availability check and the insert run under ``booking_lock``,
+        so concurrent requests for the same vet cannot both book a slot.
+
         Args:
             owner: The pet owner (User)
             pet: The pet (can be None if service doesn't require pet)
@@ -180,48 +155,95 @@ class AvailabilityService:
             staff: The veterinarian/staff member
             start_time: The appointment start time
             notes: Optional notes
+            location: Clinic location; defaults to the first active one
 
         Returns:
             The created Appointment
 
         Raises:
-            ValueError: If slot is not available or pet is required but not provided
+            BookingConflict: If the slot is not available
+            ValueError: If pet is required but not provided, or no
+                location is available
         """
+        from apps.locations.models import Location
+
         # Check if pet is required
         if service.requires_pet and pet is None:
             raise ValueError(
                 'A pet is required for this service.'
             )
 
-        # Check availability
-        if not cls.is_slot_available(start_time, service, staff):
-            raise ValueError(
-                'The requested time slot is not available.'
-            )
+        if location is None:
+            location = Location.objects.filter(is_active=True).order_by('id').first()
+            if location is None:
+                raise ValueError('No active clinic location is available.')
 
         # Calculate end time
         end_time = start_time + timedelta(minutes=service.duration_minutes)
 
-        # Create appointment
-        appointment = Appointment.objects.create(
+        appointment = Appointment(
             owner=owner,
             pet=pet,
             service=service,
+            location=location,
             veterinarian=staff,
             scheduled_start=start_time,
             scheduled_end=end_time,
             status='scheduled',
             notes=notes
         )
+        day = timezone.localtime(start_time).date()
+        with cls._translate_conflict(appointment), booking_lock(staff.pk, day):
+            if not cls.is_slot_available(start_time, service, staff):
+                raise BookingConflict(staff.pk, start_time)
+            appointment.save()
 
         return appointment
 
+    @classmethod
+    def save_appointment(cls, appointment: Appointment) -> Appointment:
+        """Save an appointment unless it overlaps another of the same vet.
+
+        Used for staff-entered appointments, which may fall outside the
+        vet's schedule blocks but must not double-book them.
+
+        Raises:
+            BookingConflict: If a blocking appointment overlaps it
+        """
+        if (
+            appointment.veterinarian_id is None
+            or appointment.status not in cls.BLOCKING_STATUSES
+        ):
+            appointment.save()
+            return appointment
+
+        staff_id = appointment.veterinarian_id
+        day = timezone.localtime(appointment.scheduled_start).date()
+        with cls._translate_conflict(appointment), booking_lock(staff_id, day):
+            if cls.conflicting_appointments(appointment).exists():
+                raise BookingConflict(staff_id, appointment.scheduled_start)
+            appointment.save()
+        return appointment
+
+    @classmethod
+    def conflicting_appointments(cls, appointment: Appointment):
+        """Blocking appointments of the same vet that overlap ``appointment``."""
+        return Appointment.objects.filter(
+            veterinarian_id=appointment.veterinarian_id,
+            status__in=cls.BLOCKING_STATUSES,
+            scheduled_start__lt=appointment.scheduled_end,
+            scheduled_end__gt=appointment.scheduled_start,
+        ).exclude(pk=appointment.pk)
+
     @staticmethod
-    def _times_overlap(
-        start1: datetime,
-        end1: datetime,
-        start2: datetime,
-        end2: datetime
-    ) -> bool:
-        """Check if two time ranges overlap."""
-        return start1 < end2 and end1 > start2
+    @contextmanager
+    def _translate_conflict(appointment: Appointment):
+        """Turn an exclusion constraint violation into BookingConflict."""
+        try:
+            yield
+        except IntegrityError as e:
+            if OVERLAP_CONSTRAINT not in str(e):
+                raise
+            raise BookingConflict(
+                appointment.veterinarian_id, appointment.scheduled_start
+            ) from e
@@ -2,11 +2,18 @@
 
 Handles:
 - Appointment completed → Auto-create Invoice
+- Appointment or schedule block changed → Refresh cached availability
 """
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
 from django.dispatch import receiver
+from django.utils import timezone
 
-from .models import Appointment
+from . import availability_cache
+from .models import Appointment, ScheduleBlock
+
+# Fields whose changes can free or take a time slot
+AVAILABILITY_FIELDS = {'veterinarian', 'scheduled_start', 'scheduled_end', 'status'}
 
 
 @receiver(post_save, sender=Appointment)
@@ -33,3 +40,43 @@ def create_invoice_on_completion(sender, instance, **kwargs):
 
     # Create invoice for the completed appointment
     InvoiceService.create_from_appointment(appointment)
+
+
+def _booked_days(start, end) -> set:
+    if not (start and end and timezone.is_aware(start)):
+        return set()
+    return set(availability_cache.appointment_days(start, end))
+
+
+@receiver(post_init, sender=Appointment)
+def remember_scheduled_time(sender, instance, **kwargs):
+    """Keep the loaded times so a reschedule also refreshes the old days."""
+    # __dict__ avoids loading deferred fields
+    instance._scheduled_was = (
+        instance.__dict__.get('scheduled_start'),
+        instance.__dict__.get('scheduled_end'),
+    )
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def refresh_availability(sender, instance, update_fields=None, **kwargs):
+    """Rebuild cached availability for the days an appointment touched."""
+    if not availability_cache.is_enabled():
+        return
+    if update_fields and not set(update_fields) & AVAILABILITY_FIELDS:
+        return
+
+    days = _booked_days(*instance._scheduled_was)
+    days |= _booked_days(instance.scheduled_start, instance.scheduled_end)
+    instance._scheduled_was = (instance.scheduled_start, instance.scheduled_end)
+    if days:
+        transaction.on_commit(lambda: availability_cache.refresh_days(days))
+
+
+@receiver(post_save, sender=ScheduleBlock)
+@receiver(post_delete, sender=ScheduleBlock)
+def invalidate_availability(sender, **kwargs):
+    """Schedule changes affect every future week; retire all cached days."""
+    if availability_cache.is_enabled():
+        transaction.on_commit(availability_cache.invalidate_all)
@@ -19,6 +19,7 @@ from apps.locations.models import Location
 
 from .forms import StaffAppointmentForm
 from .models import Appointment, ServiceType
+from .services import AvailabilityService, BookingConflict
 
 
 def staff_required(view_func):
@@ -288,9 +289,13 @@ def staff_edit(request, pk):
     if request.method == 'POST':
         form = StaffAppointmentForm(request.POST, instance=appointment)
         if form.is_valid():
-            form.save()
-            messages.success(request, _('Appointment updated successfully.'))
-            return staff_redirect(request, f'operations/appointments/{pk}/')
+            try:
+                AvailabilityService.save_appointment(form.save(commit=False))
+            except BookingConflict:
+                form.add_error(None, _('The veterinarian already has an appointment at this time.'))
+            else:
+                messages.success(request, _('Appointment updated successfully.'))
+                return staff_redirect(request, f'operations/appointments/{pk}/')
     else:
         form = StaffAppointmentForm(instance=appointment)
 
@@ -308,9 +313,13 @@ def staff_create(request):
     if request.method == 'POST':
         form = StaffAppointmentForm(request.POST)
         if form.is_valid():
-            appointment = form.save()
-            messages.success(request, _('Appointment created successfully.'))
-            return staff_redirect(request, f'operations/appointments/{appointment.pk}/')
+            try:
+                appointment = AvailabilityService.save_appointment(form.save(commit=False))
+            except BookingConflict:
+                form.add_error(None, _('The veterinarian already has an appointment at this time.'))
+            else:
+                messages.success(request, _('Appointment created successfully.'))
+                return staff_redirect(request, f'operations/appointments/{appointment.pk}/')
     else:
         form = StaffAppointmentForm()
 
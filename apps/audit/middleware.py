@@ -1,14 +1,29 @@
-"""Audit logging middleware."""
+"""Audit logging middleware.
+
+Staff page views are written behind: rows are queued in ``audit_buffer``
+and bulk-inserted off the request path. High-sensitivity views (see
+``AUDIT_SYNC_SENSITIVITIES``) are still written synchronously, so the
+compliance trail for those pages never depends on a later flush.
+
+Configuration:
+    AUDIT_WRITE_MODE = 'buffered'  # 'buffered', 'celery' or 'sync'
+    AUDIT_SYNC_SENSITIVITIES = ('high', 'critical')
+"""
 import re
 
+from django.conf import settings
+
+from apps.core.routing import classify_path, classify_request
+
 from .models import AuditLog
+from .services import audit_buffer
 from .signals import set_current_user
 
 
 class AuditMiddleware:
     """Middleware to automatically log staff page views."""
 
-    # Routes to audit (staff-only pages)
+    # Routes to audit (staff-only pages); compiled by apps.core.routing
     AUDITED_PREFIXES = [
         '/inventory/',
         '/practice/',
@@ -30,6 +45,39 @@ class AuditMiddleware:
     # Pattern to extract resource ID from URL
     ID_PATTERN = re.compile(r'/(\d+)/?$')
 
+    # Trailing numeric ID (stripped before resource type lookup)
+    TRAILING_ID_PATTERN = re.compile(r'/\d+/?$')
+
+    # Map path (without trailing slash and ID) to resource type
+    RESOURCE_TYPES = {
+        '/inventory': 'inventory.dashboard',
+        '/inventory/stock': 'inventory.stock',
+        '/inventory/batches': 'inventory.batch',
+        '/inventory/movements': 'inventory.movement',
+        '/inventory/movements/add': 'inventory.movement',
+        '/inventory/suppliers': 'inventory.supplier',
+        '/inventory/purchase-orders': 'inventory.purchase_order',
+        '/inventory/alerts': 'inventory.alert',
+        '/inventory/expiring': 'inventory.expiring',
+        '/practice': 'practice.dashboard',
+        '/practice/staff': 'practice.staff',
+        '/practice/schedule': 'practice.schedule',
+        '/practice/shifts': 'practice.shift',
+        '/practice/time': 'practice.time_tracking',
+        '/practice/tasks': 'practice.task',
+        '/practice/settings': 'practice.settings',
+        '/referrals': 'referrals.dashboard',
+        '/referrals/specialists': 'referrals.specialist',
+        '/referrals/outbound': 'referrals.referral',
+        '/referrals/visiting': 'referrals.visiting',
+        '/pharmacy': 'pharmacy.dashboard',
+        '/pharmacy/prescriptions': 'pharmacy.prescription',
+        '/crm': 'crm.dashboard',
+        '/crm/customers': 'crm.customer',
+        '/billing': 'billing.dashboard',
+        '/billing/invoices': 'billing.invoice',
+    }
+
     def __init__(self, get_response):
         self.get_response = get_response
 
@@ -46,19 +94,24 @@ class AuditMiddleware:
             request.user.is_staff and
             request.method == 'GET' and
             response.status_code == 200 and
-            self._should_audit(request.path)):
-
-            AuditLog.objects.create(
-                user=request.user,
-                action='view',
-                resource_type=self._get_resource_type(request.path),
-                resource_id=self._extract_resource_id(request.path),
-                url_path=request.path,
-                method=request.method,
-                ip_address=self._get_client_ip(request),
-                user_agent=request.META.get('HTTP_USER_AGENT', '')[:500],
-                sensitivity=self._get_sensitivity(request.path),
-            )
+            classify_request(request).audited):
+
+            sensitivity = classify_request(request).sensitivity
+            row = {
+                'user_id': request.user.pk,
+                'action': 'view',
+                'resource_type': self._get_resource_type(request.path),
+                'resource_id': self._extract_resource_id(request.path),
+                'url_path': request.path[:500],
+                'method': request.method,
+                'ip_address': self._get_client_ip(request),
+                'user_agent': request.META.get('HTTP_USER_AGENT', '')[:500],
+                'sensitivity': sensitivity,
+            }
+            if self._write_sync(sensitivity):
+                AuditLog.objects.create(**row)
+            else:
+                audit_buffer.add(row)
 
         # Clear thread-local user after request
         set_current_user(None, None)
@@ -67,45 +120,21 @@ class AuditMiddleware:
 
     def _should_audit(self, path):
         """Check if path should be audited."""
-        return any(path.startswith(prefix) for prefix in self.AUDITED_PREFIXES)
+        return classify_path(path).audited
+
+    def _write_sync(self, sensitivity):
+        """Whether this view must be written before the response returns."""
+        if getattr(settings, 'AUDIT_WRITE_MODE', 'buffered') == 'sync':
+            return True
+        return sensitivity in getattr(settings, 'AUDIT_SYNC_SENSITIVITIES', ('high', 'critical'))
 
     def _get_resource_type(self, path):
         """Extract resource type from URL path."""
         # Remove trailing slash and ID
-        clean_path = re.sub(r'/\d+/?$', '', path)
+        clean_path = self.TRAILING_ID_PATTERN.sub('', path)
         clean_path = clean_path.rstrip('/')
 
-        # Map path to resource type
-        path_map = {
-            '/inventory': 'inventory.dashboard',
-            '/inventory/stock': 'inventory.stock',
-            '/inventory/batches': 'inventory.batch',
-            '/inventory/movements': 'inventory.movement',
-            '/inventory/movements/add': 'inventory.movement',
-            '/inventory/suppliers': 'inventory.supplier',
-            '/inventory/purchase-orders': 'inventory.purchase_order',
-            '/inventory/alerts': 'inventory.alert',
-            '/inventory/expiring': 'inventory.expiring',
-            '/practice': 'practice.dashboard',
-            '/practice/staff': 'practice.staff',
-            '/practice/schedule': 'practice.schedule',
-            '/practice/shifts': 'practice.shift',
-            '/practice/time': 'practice.time_tracking',
-            '/practice/tasks': 'practice.task',
-            '/practice/settings': 'practice.settings',
-            '/referrals': 'referrals.dashboard',
-            '/referrals/specialists': 'referrals.specialist',
-            '/referrals/outbound': 'referrals.referral',
-            '/referrals/visiting': 'referrals.visiting',
-            '/pharmacy': 'pharmacy.dashboard',
-            '/pharmacy/prescriptions': 'pharmacy.prescription',
-            '/crm': 'crm.dashboard',
-            '/crm/customers': 'crm.customer',
-            '/billing': 'billing.dashboard',
-            '/billing/invoices': 'billing.invoice',
-        }
-
-        return path_map.get(clean_path, f'unknown.{clean_path}')
+        return self.RESOURCE_TYPES.get(clean_path, f'unknown.{clean_path}')
 
     def _extract_resource_id(self, path):
         """Extract resource ID from URL if present."""
@@ -114,10 +143,7 @@ class AuditMiddleware:
 
     def _get_sensitivity(self, path):
         """Determine sensitivity level based on path."""
-        for pattern in self.HIGH_SENSITIVITY_PATTERNS:
-            if re.match(pattern, path):
-                return 'high'
-        return 'normal'
+        return classify_path(path).sensitivity
 
     def _get_client_ip(self, request):
         """Extract client IP from request."""
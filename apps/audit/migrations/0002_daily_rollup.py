@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('audit', 'Audit Log'), ('security', 'Security Event'), ('error', 'Error Log')], max_length=20)),
+                ('day', models.DateField()),
+                ('dimension', models.CharField(max_length=30)),
+                ('key', models.CharField(blank=True, max_length=200)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Daily Rollup',
+                'verbose_name_plural': 'Daily Rollups',
+                'indexes': [models.Index(fields=['source', 'dimension', 'day'], name='audit_daily_source_10ff53_idx')],
+                'constraints': [models.UniqueConstraint(fields=('source', 'day', 'dimension', 'key'), name='audit_dailyrollup_unique')],
+            },
+        ),
+    ]
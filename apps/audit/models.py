@@ -67,3 +67,40 @@ class AuditLog(models.Model):
     def __str__(self):
         user_str = self.user.email if self.user else 'Anonymous'
         return f"{user_str} {self.action} {self.resource_type}"
+
+
+class DailyRollup(models.Model):
+    """Per-day counts of append-only log rows, by one dimension.
+
+    Maintained by ``apps.audit.rollups`` for AuditLog, SecurityEvent and
+    ErrorLog, so dashboards can aggregate history without scanning raw rows.
+    """
+
+    SOURCE_CHOICES = [
+        ('audit', 'Audit Log'),
+        ('security', 'Security Event'),
+        ('error', 'Error Log'),
+    ]
+
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    day = models.DateField()
+    dimension = models.CharField(max_length=30)
+    key = models.CharField(max_length=200, blank=True)
+    count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Daily Rollup'
+        verbose_name_plural = 'Daily Rollups'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['source', 'day', 'dimension', 'key'],
+                name='audit_dailyrollup_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['source', 'dimension', 'day']),
+        ]
+
+    def __str__(self):
+        return f"{self.source} {self.day} {self.dimension}={self.key}: {self.count}"
@@ -0,0 +1,197 @@
+"""Daily rollups for the append-only log tables.
+
+``AuditLog``, ``SecurityEvent`` and ``ErrorLog`` grow without bound, so
+dashboards must not aggregate them directly. Each table is summarized into
+``DailyRollup`` rows: one count per (day, dimension, key), e.g.
+``('audit', 2026-01-05, 'action', 'view') -> 412``.
+
+Rollups are maintained incrementally by ``update_rollups`` (Celery task
+``update_log_rollups``). Each source keeps a frontier: the latest day that
+has a ``total`` rollup. Every run re-rolls the frontier day, which may have
+been partial, and every day after it, up to today. Readers (``rollup_counts``)
+sum rollups for days before the frontier and count raw rows only from the
+frontier onward. Results are exact, and the raw scan stays about one day
+wide as history grows.
+
+Days must be rolled up before their raw rows are archived
+(``manage.py archive_logs`` does this first). Re-rolling an archived day
+would zero its counts, so ``rollup_day`` is never called on them.
+"""
+import datetime
+from collections import Counter
+from typing import Iterable, NamedTuple
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+from django.utils import timezone
+
+from .models import DailyRollup
+
+# Longest key stored; longer values (URLs, user agents) are clipped
+MAX_KEY_LENGTH = 200
+
+
+class RollupSource(NamedTuple):
+    """A log table and the dimensions it is rolled up by."""
+    model: str
+    # dimension name -> model fields forming the key ('' key for ``total``)
+    dimensions: dict[str, tuple[str, ...]]
+
+
+SOURCES: dict[str, RollupSource] = {
+    'audit': RollupSource('audit.AuditLog', {
+        'total': (),
+        'user': ('user_id',),
+        'resource_type': ('resource_type',),
+        'action': ('action',),
+        'sensitivity': ('sensitivity',),
+        'ip': ('ip_address',),
+        'user_action': ('user_id', 'action'),
+    }),
+    'security': RollupSource('waf.SecurityEvent', {
+        'total': (),
+        'event_type': ('event_type',),
+        'ip': ('ip_address',),
+        'user': ('user_id',),
+        'action_taken': ('action_taken',),
+    }),
+    'error': RollupSource('error_tracking.ErrorLog', {
+        'total': (),
+        'status_code': ('status_code',),
+        'error_type': ('error_type',),
+        'fingerprint': ('fingerprint',),
+        'ip': ('ip_address',),
+        'user': ('user_id',),
+    }),
+}
+
+
+def get_model(source: str):
+    """Return the log model for a rollup source."""
+    return apps.get_model(SOURCES[source].model)
+
+
+def day_bounds(day: datetime.date) -> tuple[datetime.datetime, datetime.datetime]:
+    """Start and end (exclusive) of a local calendar day as aware datetimes."""
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min), tz)
+    end = timezone.make_aware(
+        datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time.min), tz
+    )
+    return start, end
+
+
+def _key(values: Iterable) -> str:
+    return ':'.join('' if value is None else str(value) for value in values)[:MAX_KEY_LENGTH]
+
+
+def _grouped_counts(queryset, fields: tuple[str, ...]) -> Counter:
+    """Count rows of a queryset grouped by ``fields``."""
+    if not fields:
+        return Counter({'': queryset.count()})
+    counts = Counter()
+    for row in queryset.values(*fields).annotate(_n=Count('pk')).order_by():
+        counts[_key(row[field] for field in fields)] += row['_n']
+    return counts
+
+
+def rollup_day(source: str, day: datetime.date) -> int:
+    """Recompute every dimension of one source for one day.
+
+    Args:
+        source: Key of ``SOURCES``.
+        day: Local calendar day.
+
+    Returns:
+        Number of rollup rows written.
+    """
+    start, end = day_bounds(day)
+    queryset = get_model(source).objects.filter(created_at__gte=start, created_at__lt=end)
+
+    rows = []
+    for dimension, fields in SOURCES[source].dimensions.items():
+        for key, count in _grouped_counts(queryset, fields).items():
+            rows.append(DailyRollup(
+                source=source, day=day, dimension=dimension, key=key, count=count,
+            ))
+
+    with transaction.atomic():
+        DailyRollup.objects.filter(source=source, day=day).delete()
+        DailyRollup.objects.bulk_create(rows)
+    return len(rows)
+
+
+def frontier(source: str) -> datetime.date | None:
+    """Latest day rolled up for a source (its counts may be partial)."""
+    return DailyRollup.objects.filter(
+        source=source, dimension='total'
+    ).aggregate(day=Max('day'))['day']
+
+
+def update_rollups(sources: Iterable[str] | None = None,
+                   until: datetime.date | None = None) -> dict[str, int]:
+    """Roll up every day from each source's frontier through ``until``.
+
+    Args:
+        sources: Sources to update (default: all).
+        until: Last day to roll up (default: today).
+
+    Returns:
+        Mapping of source to number of days rolled up.
+    """
+    until = until or timezone.localdate()
+    rolled = {}
+    for source in sources or SOURCES:
+        day = frontier(source)
+        if day is None:
+            first = get_model(source).objects.aggregate(first=Min('created_at'))['first']
+            if first is None:
+                rolled[source] = 0
+                continue
+            day = timezone.localtime(first).date()
+
+        rolled[source] = 0
+        while day <= until:
+            rollup_day(source, day)
+            rolled[source] += 1
+            day += datetime.timedelta(days=1)
+    return rolled
+
+
+def rollup_counts(source: str, dimension: str,
+                  since: datetime.date | None = None) -> Counter:
+    """Exact counts per key for a dimension, from rollups plus recent raw rows.
+
+    Args:
+        source: Key of ``SOURCES``.
+        dimension: Dimension name of that source.
+        since: First local day to include (default: all history).
+
+    Returns:
+        Counter of key to row count.
+    """
+    fields = SOURCES[source].dimensions[dimension]
+    last = frontier(source)
+
+    counts = Counter()
+    if last is not None and (since is None or since < last):
+        rollups = DailyRollup.objects.filter(
+            source=source, dimension=dimension, day__lt=last,
+        )
+        if since is not None:
+            rollups = rollups.filter(day__gte=since)
+        for row in rollups.values('key').annotate(total=Sum('count')).order_by():
+            counts[row['key']] += row['total']
+
+    raw = get_model(source).objects.all()
+    raw_from = max(filter(None, [last, since]), default=None)
+    if raw_from is not None:
+        raw = raw.filter(created_at__gte=day_bounds(raw_from)[0])
+    counts.update(_grouped_counts(raw, fields))
+    return +counts
+
+
+def rollup_total(source: str, since: datetime.date | None = None) -> int:
+    """Total rows for a source since a day (default: all history)."""
+    return rollup_counts(source, 'total', since).get('', 0)
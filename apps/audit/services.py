@@ -1,7 +1,43 @@
 """Audit logging service."""
+from django.conf import settings
+
+from apps.core.write_behind import WriteBehindBuffer
+
 from .models import AuditLog
 
 
+def write_audit_logs(rows: list[dict]) -> int:
+    """Bulk-insert queued audit rows.
+
+    Args:
+        rows: AuditLog field dicts (``user_id`` rather than ``user``).
+
+    Returns:
+        Number of rows written.
+    """
+    AuditLog.objects.bulk_create([AuditLog(**row) for row in rows], batch_size=500)
+    return len(rows)
+
+
+def _flush_audit_rows(rows: list[dict]) -> None:
+    """Persist a batch directly or through Celery, per AUDIT_WRITE_MODE."""
+    if getattr(settings, 'AUDIT_WRITE_MODE', 'buffered') == 'celery':
+        from .tasks import persist_audit_logs
+        persist_audit_logs.delay(rows)
+    else:
+        write_audit_logs(rows)
+
+
+# Per-process write-behind buffer for middleware page views
+audit_buffer = WriteBehindBuffer(
+    'audit-log-writer',
+    _flush_audit_rows,
+    batch_size=getattr(settings, 'AUDIT_BATCH_SIZE', 100),
+    flush_interval=getattr(settings, 'AUDIT_FLUSH_INTERVAL', 2.0),
+    max_size=getattr(settings, 'AUDIT_QUEUE_SIZE', 10000),
+)
+
+
 class AuditService:
     """Service for creating audit log entries."""
 
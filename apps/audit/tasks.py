@@ -0,0 +1,37 @@
+"""Celery tasks for audit logging."""
+import logging
+
+from celery import shared_task
+
+from .services import write_audit_logs
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def persist_audit_logs(rows: list[dict]) -> int:
+    """Bulk-insert a batch of audit rows queued by AuditMiddleware.
+
+    Args:
+        rows: AuditLog field dicts.
+
+    Returns:
+        Number of rows written.
+    """
+    written = write_audit_logs(rows)
+    logger.info("Persisted %d audit log rows", written)
+    return written
+
+
+@shared_task
+def update_log_rollups() -> dict:
+    """Bring the daily log rollups up to date (schedule every few minutes).
+
+    Returns:
+        Mapping of source to number of days rolled up.
+    """
+    from .rollups import update_rollups
+
+    rolled = update_rollups()
+    logger.info("Updated log rollups: %s", rolled)
+    return rolled
@@ -1,14 +1,19 @@
 """Views for audit log functionality."""
 from django.contrib.auth import get_user_model
-from django.db.models import Count
 from django.views.generic import TemplateView, ListView, DetailView
 
 from apps.accounts.mixins import ModulePermissionMixin
 from .models import AuditLog
+from .rollups import rollup_counts, rollup_total
 
 User = get_user_model()
 
 
+def _stats(counts, field: str) -> list[dict]:
+    """Rollup counts as ``values(field).annotate(count=...)``-style rows."""
+    return [{field: key, 'count': count} for key, count in counts.most_common()]
+
+
 class AuditPermissionMixin(ModulePermissionMixin):
     """Mixin requiring audit module permission."""
     required_module = 'audit'
@@ -23,8 +28,8 @@ class AuditDashboardView(AuditPermissionMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        # Total logs
-        context['total_logs'] = AuditLog.objects.count()
+        # Aggregates come from daily rollups; raw rows only for drill-down
+        context['total_logs'] = rollup_total('audit')
 
         # Recent logs
         context['recent_logs'] = AuditLog.objects.select_related(
@@ -32,19 +37,16 @@ class AuditDashboardView(AuditPermissionMixin, TemplateView):
         ).order_by('-created_at')[:20]
 
         # Logs by action type
-        context['action_stats'] = AuditLog.objects.values('action').annotate(
-            count=Count('id')
-        ).order_by('-count')
+        context['action_stats'] = _stats(rollup_counts('audit', 'action'), 'action')
 
         # Logs by sensitivity
-        context['sensitivity_stats'] = AuditLog.objects.values('sensitivity').annotate(
-            count=Count('id')
-        ).order_by('-count')
+        sensitivity = rollup_counts('audit', 'sensitivity')
+        context['sensitivity_stats'] = _stats(sensitivity, 'sensitivity')
 
         # High sensitivity count
-        context['high_sensitivity_count'] = AuditLog.objects.filter(
-            sensitivity__in=['high', 'critical']
-        ).count()
+        context['high_sensitivity_count'] = sensitivity['high'] + sensitivity['critical']
+        context['sensitive_actions'] = context['high_sensitivity_count']
+        context['unique_users'] = sum(1 for key in rollup_counts('audit', 'user') if key)
 
         return context
 
@@ -115,17 +117,35 @@ class UserActivityReportView(AuditPermissionMixin, TemplateView):
         context = super().get_context_data(**kwargs)
 
         # Activity stats by user
-        context['user_stats'] = AuditLog.objects.values(
-            'user__id', 'user__email', 'user__first_name', 'user__last_name'
-        ).annotate(
-            total_actions=Count('id')
-        ).order_by('-total_actions')[:20]
+        by_user = rollup_counts('audit', 'user')
+        top_users = [
+            (int(key), count) for key, count in by_user.most_common() if key
+        ][:20]
+        users = User.objects.in_bulk([user_id for user_id, _ in top_users])
+        context['user_stats'] = [
+            {
+                'user__id': user_id,
+                'user__email': users[user_id].email,
+                'user__first_name': users[user_id].first_name,
+                'user__last_name': users[user_id].last_name,
+                'total_actions': count,
+            }
+            for user_id, count in top_users if user_id in users
+        ]
 
         # Activity by action type per user
-        context['action_breakdown'] = AuditLog.objects.values(
-            'user__email', 'action'
-        ).annotate(
-            count=Count('id')
-        ).order_by('user__email', '-count')
+        emails = dict(User.objects.filter(
+            pk__in={key.split(':')[0] for key in by_user if key}
+        ).values_list('pk', 'email'))
+        breakdown = []
+        for key, count in rollup_counts('audit', 'user_action').items():
+            user_id, action = key.split(':', 1)
+            breakdown.append({
+                'user__email': emails.get(int(user_id)) if user_id else None,
+                'action': action,
+                'count': count,
+            })
+        breakdown.sort(key=lambda row: (row['user__email'] or '', -row['count']))
+        context['action_breakdown'] = breakdown
 
         return context
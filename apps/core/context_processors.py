@@ -6,6 +6,7 @@ Provides navigation data for staff and customer portals.
 from django.core.cache import cache
 from django.utils.translation import gettext_lazy as _
 
+from apps.core.local_cache import flag_cache
 from apps.core.middleware.dynamic_urls import get_admin_token, get_staff_token
 
 
@@ -70,6 +71,11 @@ NAMESPACE_MAPPING = {
 
 def get_enabled_modules():
     """Get set of enabled module app names, cached."""
+    return flag_cache.get('enabled_modules', _load_enabled_modules)
+
+
+def _load_enabled_modules():
+    """Read enabled modules from the Django cache, falling back to the database."""
     cache_key = 'enabled_modules'
     enabled = cache.get(cache_key)
     if enabled is not None:
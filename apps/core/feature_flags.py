@@ -2,19 +2,29 @@
 
 This module provides utilities for checking feature flags in code,
 including a decorator for views and cache management.
+
+Flag checks are answered from a process-local cache (``flag_cache``)
+in front of the Django cache, kept in sync by a version stamp that the
+save/delete signals bump once their transaction commits.
 """
 from functools import wraps
 from typing import Callable
 
 from django.core.cache import cache
+from django.db import transaction
 from django.http import Http404
 
-from apps.core.models import FeatureFlag
+from apps.core.local_cache import flag_cache
+from apps.core.models import FeatureFlag, ModuleConfig
 
 
 # Cache timeout for feature flags (5 minutes)
 FEATURE_CACHE_TIMEOUT = 300
 
+# Set of enabled module app names (see context_processors.get_enabled_modules)
+ENABLED_MODULES_KEY = 'enabled_modules'
+ENABLED_MODULES_TIMEOUT = 60
+
 
 def is_enabled(key: str) -> bool:
     """Check if a feature flag is enabled.
@@ -27,7 +37,11 @@ def is_enabled(key: str) -> bool:
         Returns False for non-existent flags.
     """
     cache_key = f'feature_flag:{key}'
+    return flag_cache.get(cache_key, lambda: _load_flag(key, cache_key))
+
 
+def _load_flag(key: str, cache_key: str) -> bool:
+    """Read a flag from the Django cache, falling back to the database."""
     # Try cache first
     cached = cache.get(cache_key)
     if cached is not None:
@@ -46,6 +60,28 @@ def is_enabled(key: str) -> bool:
     return result
 
 
+def preload_all() -> None:
+    """Warm every feature flag and module status with one query each.
+
+    Runs automatically on a worker's first lookup and whenever the flags
+    change, so later checks are answered from process memory.
+    """
+    from apps.core.middleware.module_activation import MODULE_CACHE_TIMEOUT
+
+    flags = {
+        f'feature_flag:{key}': enabled
+        for key, enabled in FeatureFlag.objects.values_list('key', 'is_enabled')
+    }
+    statuses = dict(ModuleConfig.objects.values_list('app_name', 'is_enabled'))
+    modules = {f'module_enabled:{app_name}': enabled for app_name, enabled in statuses.items()}
+    enabled_modules = {app_name for app_name, enabled in statuses.items() if enabled}
+
+    cache.set_many(flags, FEATURE_CACHE_TIMEOUT)
+    cache.set_many(modules, MODULE_CACHE_TIMEOUT)
+    cache.set(ENABLED_MODULES_KEY, enabled_modules, ENABLED_MODULES_TIMEOUT)
+    flag_cache.set_many({**flags, **modules, ENABLED_MODULES_KEY: enabled_modules})
+
+
 def invalidate_feature_cache(key: str) -> None:
     """Invalidate the cache for a specific feature flag.
 
@@ -56,6 +92,9 @@ def invalidate_feature_cache(key: str) -> None:
     """
     cache_key = f'feature_flag:{key}'
     cache.delete(cache_key)
+    # Again after commit, in case another process cached the old row meanwhile
+    transaction.on_commit(lambda: cache.delete(cache_key))
+    flag_cache.invalidate()
 
 
 def require_feature(key: str) -> Callable:
@@ -0,0 +1,160 @@
+"""Process-local LRU/TTL cache in front of the Django cache.
+
+Feature flags and module status are read many times per request but change
+rarely. Reading them from Redis each time costs a network round trip per
+check. ``LocalCache`` keeps the values in a per-process dictionary:
+
+- Entries expire after ``ttl`` seconds and the least recently used are
+  evicted beyond ``max_size``.
+- A version stamp in the Django cache is bumped whenever the source rows
+  change (post_save/post_delete signals), once the saving transaction
+  commits. Each process checks the stamp at most once per
+  ``FEATURE_CACHE_SYNC_INTERVAL`` seconds and drops its entries when the
+  stamp has moved. Changes made in the same process apply immediately.
+- When entries are dropped (first use, version change) an optional
+  ``warm`` callable reloads everything in bulk, so steady-state lookups
+  make no network calls at all.
+
+Misses fall through to a loader, which normally reads the Django cache and
+then the database.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class LocalCache:
+    """Per-process LRU/TTL dictionary invalidated by a shared version stamp."""
+
+    def __init__(self, version_key: str, max_size: int = 2048, ttl: float = 60,
+                 warm: str | None = None):
+        """Create a cache.
+
+        Args:
+            version_key: Django cache key holding the version stamp.
+            max_size: Maximum entries kept.
+            ttl: Seconds an entry stays valid without a version change.
+            warm: Dotted path of a callable that bulk-loads entries via
+                ``set_many`` after the cache is emptied.
+        """
+        self.version_key = version_key
+        self.max_size = max_size
+        self.ttl = ttl
+        self.warm = warm
+
+        self._entries: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._next_check = 0.0
+
+        # Counters (per worker process)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def sync_interval(self) -> float:
+        return getattr(settings, 'FEATURE_CACHE_SYNC_INTERVAL', 5)
+
+    def get(self, key: str, loader: Callable[[], Any]) -> Any:
+        """Return a cached value, calling ``loader`` on a miss.
+
+        Args:
+            key: Cache key.
+            loader: Produces the value on a miss.
+
+        Returns:
+            The cached or freshly loaded value.
+        """
+        self._sync()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        self.misses += 1
+        value = loader()
+        self.set_many({key: value})
+        return value
+
+    def set_many(self, values: dict[str, Any]) -> None:
+        """Store several values locally."""
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in values.items():
+                self._entries[key] = (value, expires)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self) -> None:
+        """Drop local entries and tell every other process to do the same.
+
+        Other processes are told once the current transaction commits;
+        bumped earlier, they would reload the rows as they were before it.
+        """
+        self.clear()
+        transaction.on_commit(self._bump_version)
+
+    def _bump_version(self) -> None:
+        try:
+            cache.set(self.version_key, time.time_ns(), None)
+        except Exception:
+            logger.warning('%s: could not bump version', self.version_key, exc_info=True)
+
+    def clear(self) -> None:
+        """Drop local entries; the next lookup re-checks the version."""
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+            self._next_check = 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _sync(self) -> None:
+        """Drop entries (and re-warm) if the shared version stamp changed."""
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+
+        with self._lock:
+            if now < self._next_check:
+                return
+            self._next_check = now + self.sync_interval
+            try:
+                version = cache.get(self.version_key)
+                if version is None:
+                    cache.add(self.version_key, time.time_ns(), None)
+                    version = cache.get(self.version_key)
+            except Exception:
+                logger.warning('%s: version check failed', self.version_key, exc_info=True)
+                return
+            if version == self._version and version is not None:
+                return
+            self._entries.clear()
+            self._version = version
+
+        if self.warm:
+            try:
+                import_string(self.warm)()
+            except Exception:
+                logger.warning('%s: warm-up failed', self.version_key, exc_info=True)
+
+
+# Feature flags and module status (apps.core.feature_flags,
+# apps.core.middleware.module_activation, apps.core.context_processors)
+flag_cache = LocalCache('core:flags:version', warm='apps.core.feature_flags.preload_all')
@@ -13,6 +13,8 @@ import secrets
 
 from django.http import Http404
 
+from apps.core.routing import classify_path, classify_request
+
 
 # Token configuration
 TOKEN_LENGTH = 6
@@ -23,6 +25,8 @@ TOKEN_LENGTH = 6
 ADMIN_PATTERN = re.compile(r'^(/[a-z]{2})?/panel-([a-zA-Z0-9]{6})(/.*)?$')
 STAFF_PATTERN = re.compile(r'^(/[a-z]{2})?/staff-([a-zA-Z0-9]{6})/(.*)$')
 
+# Path tables below are compiled by apps.core.routing
+
 # URLs that are always blocked (return 404)
 BLOCKED_PATTERNS = [
     re.compile(r'^/admin(/.*)?$'),
@@ -167,16 +171,7 @@ def is_public_path(path: str) -> bool:
     Returns:
         True if path is public and doesn't need token.
     """
-    # Exact matches
-    if path in PUBLIC_PATHS:
-        return True
-
-    # Static/media prefixes
-    for prefix in STATIC_PREFIXES:
-        if path.startswith(prefix):
-            return True
-
-    return False
+    return classify_path(path).public
 
 
 def is_blocked_path(path: str) -> bool:
@@ -188,17 +183,8 @@ def is_blocked_path(path: str) -> bool:
     Returns:
         True if path should return 404.
     """
-    # Check blocked patterns (like /admin/)
-    for pattern in BLOCKED_PATTERNS:
-        if pattern.match(path):
-            return True
-
-    # Check direct module access (like /accounting/)
-    for pattern in DIRECT_MODULE_PATTERNS:
-        if pattern.match(path):
-            return True
-
-    return False
+    # Blocked patterns (like /admin/) and direct module access (like /accounting/)
+    return classify_path(path).blocked
 
 
 class DynamicURLMiddleware:
@@ -217,17 +203,18 @@ class DynamicURLMiddleware:
 
     def __call__(self, request):
         path = request.path
+        route = classify_request(request)
 
         # Public paths pass through
-        if is_public_path(path):
+        if route.public:
             return self.get_response(request)
 
         # Blocked paths return 404
-        if is_blocked_path(path):
+        if route.blocked:
             raise Http404("Page not found")
 
         # Check for admin panel access (/panel-{token}/ or /en/panel-{token}/)
-        admin_match = ADMIN_PATTERN.match(path)
+        admin_match = ADMIN_PATTERN.match(path) if route.admin_panel else None
         if admin_match:
             lang_prefix = admin_match.group(1) or ''  # e.g., '/en' or ''
             token = admin_match.group(2)
@@ -252,7 +239,7 @@ class DynamicURLMiddleware:
             return self.get_response(request)
 
         # Check for staff access (/staff-{token}/... or /en/staff-{token}/...)
-        staff_match = STAFF_PATTERN.match(path)
+        staff_match = STAFF_PATTERN.match(path) if route.staff_portal else None
         if staff_match:
             lang_prefix = staff_match.group(1) or ''  # e.g., '/en' or ''
             token = staff_match.group(2)
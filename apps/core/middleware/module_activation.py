@@ -5,15 +5,18 @@ It integrates with the ModuleConfig model to control access to entire Django app
 """
 import re
 from django.core.cache import cache
+from django.db import transaction
 from django.http import Http404
 
+from apps.core.local_cache import flag_cache
 from apps.core.models import ModuleConfig
+from apps.core.routing import classify_path, classify_request
 
 
 # Cache timeout for module status (5 minutes)
 MODULE_CACHE_TIMEOUT = 300
 
-# Patterns that are always allowed (never blocked)
+# Patterns that are always allowed (never blocked); compiled by apps.core.routing
 ALWAYS_ALLOWED_PATTERNS = [
     r'^/$',                          # Homepage
     r'^/about/?',                    # About page
@@ -49,12 +52,8 @@ def get_module_from_path(path: str) -> str | None:
     Returns:
         Module name (e.g., 'appointments') or None if path doesn't match a module.
     """
-    # Check if this is a staff URL
-    match = STAFF_URL_PATTERN.match(path)
-    if match:
-        return match.group(1).replace('-', '_')  # Convert URL slug to app name
-
-    return None
+    # Staff URLs are matched by the shared route classifier
+    return classify_path(path).module
 
 
 def get_module_enabled_status(app_name: str) -> bool:
@@ -67,7 +66,11 @@ def get_module_enabled_status(app_name: str) -> bool:
         True if enabled or no config exists (default enabled), False if explicitly disabled.
     """
     cache_key = f'module_enabled:{app_name}'
+    return flag_cache.get(cache_key, lambda: _load_module_status(app_name, cache_key))
+
 
+def _load_module_status(app_name: str, cache_key: str) -> bool:
+    """Read a module status from the Django cache, falling back to the database."""
     # Try cache first
     cached = cache.get(cache_key)
     if cached is not None:
@@ -95,8 +98,11 @@ def invalidate_module_cache(app_name: str) -> None:
     Args:
         app_name: The Django app name to invalidate.
     """
-    cache_key = f'module_enabled:{app_name}'
-    cache.delete(cache_key)
+    keys = [f'module_enabled:{app_name}', 'enabled_modules']
+    cache.delete_many(keys)
+    # Again after commit, in case another process cached the old row meanwhile
+    transaction.on_commit(lambda: cache.delete_many(keys))
+    flag_cache.invalidate()
 
 
 def is_always_allowed(path: str) -> bool:
@@ -108,10 +114,7 @@ def is_always_allowed(path: str) -> bool:
     Returns:
         True if the path should always be allowed.
     """
-    for pattern in ALWAYS_ALLOWED_PATTERNS:
-        if re.match(pattern, path):
-            return True
-    return False
+    return classify_path(path).always_allowed
 
 
 class ModuleActivationMiddleware:
@@ -125,14 +128,14 @@ class ModuleActivationMiddleware:
         self.get_response = get_response
 
     def __call__(self, request):
-        path = request.path
+        route = classify_request(request)
 
         # Always allow certain patterns
-        if is_always_allowed(path):
+        if route.always_allowed:
             return self.get_response(request)
 
         # Extract module from path
-        module_name = get_module_from_path(path)
+        module_name = route.module
 
         # If no module identified, allow through
         if module_name is None:
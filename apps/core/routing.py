@@ -0,0 +1,270 @@
+"""Compiled route classification shared by the path-based middlewares.
+
+Several middlewares classify the same request path with their own linear
+scans: the WAF exclusion list, the module-activation allow list, the
+dynamic-URL public/blocked tables and the audit prefix/sensitivity
+tables. This module compiles all of those tables, once per process, into
+a single classifier:
+
+- A character trie over the literal prefix of every rule. Rules that are
+  plain prefixes (``'/static/'``) or exact paths (``'/about/'``) are
+  resolved by the trie walk alone.
+- For rules with a regex tail, each trie node holds one combined regex of
+  all regex rules reachable on the way to it. Every rule is wrapped in an
+  optional lookahead with its own named group, so a single ``match`` call
+  reports every rule that matches.
+
+The tables stay where they are (the middleware modules own them). Results
+are cached per path, and ``classify_request`` attaches the ``RouteClass``
+to ``request.route_class`` for downstream middlewares. Because
+``DynamicURLMiddleware`` may rewrite ``request.path``, it is reclassified
+when it changes.
+
+Usage:
+    from apps.core.routing import classify_request
+
+    route = classify_request(request)
+    if route.static: ...
+"""
+import re
+import threading
+from functools import lru_cache
+from typing import NamedTuple
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover
+    import sre_parse
+
+# Distinct paths remembered by classify_path
+CACHE_SIZE = 4096
+
+
+class RouteClass(NamedTuple):
+    """Everything the middlewares need to know about a path."""
+    path: str
+    static: bool = False          # WAF_EXCLUDED_PATHS (static, media, ...)
+    always_allowed: bool = False  # never blocked by module activation
+    public: bool = False          # needs no staff/admin token
+    blocked: bool = False         # direct admin/module URL (404)
+    admin_panel: bool = False     # /panel-{token}/...
+    staff_portal: bool = False    # /staff-{token}/...
+    module: str | None = None     # staff module app name
+    audited: bool = False         # staff page view is audit-logged
+    high_sensitivity: bool = False
+
+    @property
+    def sensitivity(self) -> str:
+        return 'high' if self.high_sensitivity else 'normal'
+
+
+class _Rule(NamedTuple):
+    flag: str
+    literal: str          # literal prefix every match starts with
+    kind: str             # 'prefix', 'exact' or 'regex'
+    regex: re.Pattern | None
+
+
+def _literal_prefix(pattern: str) -> tuple[str, bool]:
+    """Return a regex's leading literal text and whether that is all of it."""
+    chars = []
+    items = list(sre_parse.parse(pattern))
+    for index, (op, av) in enumerate(items):
+        if op is sre_parse.AT and av is sre_parse.AT_BEGINNING and index == 0:
+            continue
+        if op is not sre_parse.LITERAL:
+            return ''.join(chars), False
+        chars.append(chr(av))
+    return ''.join(chars), True
+
+
+def _prefix_rule(flag: str, prefix: str) -> _Rule:
+    return _Rule(flag, prefix, 'prefix', None)
+
+
+def _exact_rule(flag: str, path: str) -> _Rule:
+    return _Rule(flag, path, 'exact', None)
+
+
+# Compiled-pattern flags carried into rule sources as scoped inline flags
+_INLINE_FLAGS = {re.ASCII: 'a', re.IGNORECASE: 'i', re.MULTILINE: 'm', re.DOTALL: 's', re.VERBOSE: 'x'}
+
+
+def _regex_rule(flag: str, pattern: str | re.Pattern) -> _Rule:
+    source = pattern.pattern if isinstance(pattern, re.Pattern) else pattern
+    if not source.startswith('^'):
+        source = '^' + source
+    inline = ''.join(
+        letter for value, letter in _INLINE_FLAGS.items()
+        if isinstance(pattern, re.Pattern) and pattern.flags & value
+    )
+    if inline:
+        # Scoped so the flags survive in the combined regex; the rule then
+        # has no literal prefix and is tried from the trie root
+        source = f'(?{inline}:{source}\n)' if 'x' in inline else f'(?{inline}:{source})'
+    literal, pure = _literal_prefix(source)
+    if pure:
+        return _prefix_rule(flag, literal)
+    return _Rule(flag, literal, 'regex', re.compile(source))
+
+
+def collect_rules() -> list[_Rule]:
+    """Gather the path tables of every path-based middleware."""
+    from django.conf import settings
+
+    from apps.audit.middleware import AuditMiddleware
+    from apps.core.middleware import dynamic_urls, module_activation
+    from apps.waf.middleware import DEFAULT_EXCLUDED_PATHS
+
+    rules = []
+    for prefix in getattr(settings, 'WAF_EXCLUDED_PATHS', DEFAULT_EXCLUDED_PATHS):
+        rules.append(_prefix_rule('static', prefix))
+
+    for pattern in module_activation.ALWAYS_ALLOWED_PATTERNS:
+        rules.append(_regex_rule('always_allowed', pattern))
+    rules.append(_regex_rule('module', module_activation.STAFF_URL_PATTERN))
+
+    for path in dynamic_urls.PUBLIC_PATHS:
+        rules.append(_exact_rule('public', path))
+    for prefix in dynamic_urls.STATIC_PREFIXES:
+        rules.append(_prefix_rule('public', prefix))
+    for pattern in dynamic_urls.BLOCKED_PATTERNS + dynamic_urls.DIRECT_MODULE_PATTERNS:
+        rules.append(_regex_rule('blocked', pattern))
+    rules.append(_regex_rule('admin_panel', dynamic_urls.ADMIN_PATTERN))
+    rules.append(_regex_rule('staff_portal', dynamic_urls.STAFF_PATTERN))
+
+    for prefix in AuditMiddleware.AUDITED_PREFIXES:
+        rules.append(_prefix_rule('audited', prefix))
+    for pattern in AuditMiddleware.HIGH_SENSITIVITY_PATTERNS:
+        rules.append(_regex_rule('high_sensitivity', pattern))
+
+    return rules
+
+
+class _Node:
+    __slots__ = ('children', 'prefix_flags', 'exact_flags', 'regex_rules', 'combined')
+
+    def __init__(self):
+        self.children: dict[str, '_Node'] = {}
+        self.prefix_flags: set[str] = set()
+        self.exact_flags: set[str] = set()
+        self.regex_rules: list[int] = []
+        self.combined: re.Pattern | None = None
+
+
+class RouteClassifier:
+    """Prefix trie plus per-node combined regex over a list of rules."""
+
+    def __init__(self, rules: list[_Rule]):
+        self.rules = rules
+        self.root = _Node()
+        for index, rule in enumerate(rules):
+            node = self.root
+            for char in rule.literal:
+                node = node.children.setdefault(char, _Node())
+            if rule.kind == 'prefix':
+                node.prefix_flags.add(rule.flag)
+            elif rule.kind == 'exact':
+                node.exact_flags.add(rule.flag)
+            else:
+                node.regex_rules.append(index)
+        self._compile(self.root, [])
+
+    def _compile(self, node: _Node, inherited: list[int]) -> None:
+        """Give each node one regex covering its and its ancestors' regex rules."""
+        reachable = inherited + node.regex_rules
+        if reachable:
+            node.combined = re.compile(''.join(
+                f'(?=(?P<r{index}>{self.rules[index].regex.pattern}))?'
+                for index in reachable
+            ))
+        for child in node.children.values():
+            self._compile(child, reachable)
+
+    def classify(self, path: str) -> RouteClass:
+        """Classify a request path.
+
+        Args:
+            path: Request path.
+
+        Returns:
+            RouteClass with every flag set for this path.
+        """
+        node = self.root
+        flags = set(node.prefix_flags)
+        consumed = 0
+        for char in path:
+            child = node.children.get(char)
+            if child is None:
+                break
+            node = child
+            consumed += 1
+            flags.update(node.prefix_flags)
+        if consumed == len(path):
+            flags.update(node.exact_flags)
+
+        values = {flag: True for flag in flags}
+        if node.combined is not None:
+            match = node.combined.match(path)
+            for name, text in match.groupdict().items():
+                if text is None:
+                    continue
+                rule = self.rules[int(name[1:])]
+                if rule.flag == 'module':
+                    values['module'] = rule.regex.match(path).group(1).replace('-', '_')
+                else:
+                    values[rule.flag] = True
+        return RouteClass(path, **values)
+
+
+_classifier: RouteClassifier | None = None
+_lock = threading.Lock()
+
+
+def get_classifier() -> RouteClassifier:
+    """Build the process-wide classifier on first use."""
+    global _classifier
+    if _classifier is None:
+        with _lock:
+            if _classifier is None:
+                _classifier = RouteClassifier(collect_rules())
+    return _classifier
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def classify_path(path: str) -> RouteClass:
+    """Classify a path with the shared classifier (cached per path)."""
+    return get_classifier().classify(path)
+
+
+def classify_request(request) -> RouteClass:
+    """Classify ``request.path`` once and attach it as ``request.route_class``.
+
+    Args:
+        request: Django request.
+
+    Returns:
+        RouteClass for the request's current path.
+    """
+    route = getattr(request, 'route_class', None)
+    if route is None or route.path != request.path:
+        route = classify_path(request.path)
+        request.route_class = route
+    return route
+
+
+def reset_classifier() -> None:
+    """Drop the compiled classifier and cached results (tables changed)."""
+    global _classifier
+    with _lock:
+        _classifier = None
+    classify_path.cache_clear()
+
+
+@receiver(setting_changed)
+def _on_setting_changed(setting, **kwargs):
+    if setting == 'WAF_EXCLUDED_PATHS':
+        reset_classifier()
@@ -0,0 +1,162 @@
+"""Write-behind buffers for high-volume, append-only writes.
+
+Some rows (audit trails, error samples, GPS breadcrumbs) are written far
+more often than they are read. Writing each one inside the request costs
+a database round trip per request. A ``WriteBehindBuffer`` collects items
+in memory and hands them to a flush function in batches:
+
+- when ``batch_size`` items are waiting,
+- every ``flush_interval`` seconds (background daemon thread),
+- at interpreter exit (gunicorn worker shutdown).
+
+The buffer is bounded by ``max_size``; items beyond it are dropped and
+counted so a traffic spike cannot exhaust worker memory.
+
+Usage:
+    from apps.core.write_behind import WriteBehindBuffer
+
+    def write_rows(rows):
+        MyModel.objects.bulk_create([MyModel(**row) for row in rows])
+
+    buffer = WriteBehindBuffer('my-rows', write_rows, batch_size=100)
+    buffer.add({'field': 'value'})
+"""
+import atexit
+import logging
+import os
+import threading
+from typing import Any, Callable
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """Bounded per-process buffer flushed in batches by a daemon thread."""
+
+    def __init__(
+        self,
+        name: str,
+        flush_func: Callable[[list[Any]], Any],
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_size: int = 10000,
+    ):
+        """Create a buffer.
+
+        Args:
+            name: Name for the flush thread and log messages.
+            flush_func: Called with a list of items; should persist them.
+            batch_size: Wake the flush thread once this many items wait.
+            flush_interval: Seconds between time-based flushes.
+            max_size: Maximum items held; extra items are dropped.
+        """
+        self.name = name
+        self.flush_func = flush_func
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+
+        self._items: list[Any] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._worker = None
+        self._pid = None
+
+        # Counters (per worker process)
+        self.flushed = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+    def add(self, item: Any) -> bool:
+        """Queue an item for the next flush.
+
+        Args:
+            item: Anything ``flush_func`` accepts in its list.
+
+        Returns:
+            False if the item was dropped because the buffer is full.
+        """
+        with self._lock:
+            if len(self._items) >= self.max_size:
+                self.dropped += 1
+                return False
+            self._items.append(item)
+            full = len(self._items) >= self.batch_size
+
+        self._ensure_worker()
+        if full:
+            self.wake()
+        return True
+
+    def wake(self) -> None:
+        """Ask the flush thread to flush now instead of at the next interval."""
+        self._wake.set()
+
+    def flush(self) -> int:
+        """Hand every queued item to ``flush_func`` now.
+
+        Returns:
+            Number of items flushed successfully.
+        """
+        with self._flush_lock:
+            with self._lock:
+                items, self._items = self._items, []
+            if not items:
+                return 0
+
+            try:
+                self.flush_func(items)
+            except Exception:
+                self.failed += len(items)
+                logger.exception('%s: failed to flush %d items', self.name, len(items))
+                return 0
+
+            self.flushed += len(items)
+            return len(items)
+
+    def stats(self) -> dict:
+        """Counters for monitoring."""
+        return {
+            'pending': len(self),
+            'flushed': self.flushed,
+            'dropped': self.dropped,
+            'failed': self.failed,
+        }
+
+    def clear(self) -> None:
+        """Discard queued items without flushing them."""
+        with self._lock:
+            self._items = []
+
+    def _ensure_worker(self) -> None:
+        """Start the flush thread once per process (restarted after fork)."""
+        pid = os.getpid()
+        if self._worker is not None and self._pid == pid:
+            return
+        with self._lock:
+            if self._worker is not None and self._pid == pid:
+                return
+            if self._pid is not None and self._pid != pid:
+                # Forked child: the parent owns whatever it had queued
+                self._items = []
+            self._pid = pid
+            self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._worker.start()
+            atexit.register(self.flush)
+
+    def _run(self) -> None:
+        """Flush loop: on batch size or every flush interval."""
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
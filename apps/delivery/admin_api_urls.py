@@ -19,11 +19,13 @@ from .admin_views import (
     ContractorPaymentsAPIView,
     ContractorPaymentDetailAPIView,
 )
+from .stream_views import AdminDeliveryEventStreamView
 
 app_name = 'delivery_admin_api'
 
 urlpatterns = [
     path('deliveries/', AdminDeliveriesAPIView.as_view(), name='deliveries'),
+    path('events/', AdminDeliveryEventStreamView.as_view(), name='events'),
     path('drivers/', AdminDriversAPIView.as_view(), name='drivers'),
     path('assign/<int:delivery_id>/', AdminAssignDriverView.as_view(), name='assign'),
     path('reports/', AdminReportsAPIView.as_view(), name='reports'),
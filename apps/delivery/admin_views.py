@@ -5,11 +5,12 @@ from decimal import Decimal
 from django.shortcuts import render
 from django.views import View
 from django.http import JsonResponse
-from django.db.models import Count, Q, Avg
+from django.db.models import Count, Q
 from django.utils import timezone
 
 from apps.accounts.mixins import ModulePermissionMixin
-from .models import Delivery, DeliveryDriver, DeliveryZone, DeliverySlot, DeliveryRating
+from .models import Delivery, DeliveryDriver, DeliveryZone, DeliverySlot
+from . import analytics
 from .services import DeliveryPaymentService
 
 
@@ -135,6 +136,7 @@ class AdminDriversAPIView(DeliveryPermissionMixin, View):
         for driver in drivers:
             driver_data = {
                 'id': driver.id,
+                'user_id': driver.user_id,
                 'name': driver.user.get_full_name() or driver.user.username,
                 'is_available': driver.is_available,
                 'latitude': float(driver.current_latitude) if driver.current_latitude else None,
@@ -247,106 +249,10 @@ class AdminReportsAPIView(DeliveryPermissionMixin, View):
         else:
             end_date = today
 
-        # Filter deliveries
-        deliveries = Delivery.objects.filter(
-            scheduled_date__gte=start_date,
-            scheduled_date__lte=end_date
-        )
-
-        # Basic stats
-        total = deliveries.count()
-        delivered = deliveries.filter(status='delivered').count()
-        failed = deliveries.filter(status='failed').count()
-        pending = deliveries.filter(status='pending').count()
-
-        # On-time rate calculation
-        on_time_count = 0
-        late_count = 0
-        for d in deliveries.filter(status='delivered'):
-            if d.delivered_at and d.scheduled_time_end:
-                scheduled_end = datetime.combine(d.scheduled_date, d.scheduled_time_end)
-                if d.delivered_at.replace(tzinfo=None) <= scheduled_end:
-                    on_time_count += 1
-                else:
-                    late_count += 1
-
-        on_time_rate = (on_time_count / (on_time_count + late_count) * 100) if (on_time_count + late_count) > 0 else 0
-
-        # Average rating
-        ratings = DeliveryRating.objects.filter(
-            delivery__scheduled_date__gte=start_date,
-            delivery__scheduled_date__lte=end_date
-        )
-        avg_rating = ratings.aggregate(avg=Avg('rating'))['avg'] or 0
-
-        stats = {
-            'total': total,
-            'delivered': delivered,
-            'failed': failed,
-            'pending': pending,
-            'delivery_rate': (delivered / total * 100) if total > 0 else 0,
-            'failure_rate': (failed / total * 100) if total > 0 else 0,
-            'on_time_rate': round(on_time_rate, 1),
-            'average_rating': round(float(avg_rating), 2) if avg_rating else 0,
-        }
-
-        # Driver performance
-        driver_performance = []
-        drivers = DeliveryDriver.objects.filter(is_active=True).select_related('user')
-
-        for driver in drivers:
-            driver_deliveries = deliveries.filter(driver=driver)
-            driver_delivered = driver_deliveries.filter(status='delivered').count()
-            driver_failed = driver_deliveries.filter(status='failed').count()
-            driver_total = driver_deliveries.count()
-
-            # Get driver's average rating
-            driver_ratings = DeliveryRating.objects.filter(
-                delivery__driver=driver,
-                delivery__scheduled_date__gte=start_date,
-                delivery__scheduled_date__lte=end_date
-            )
-            driver_avg_rating = driver_ratings.aggregate(avg=Avg('rating'))['avg']
-
-            if driver_total > 0:
-                driver_performance.append({
-                    'id': driver.id,
-                    'name': driver.user.get_full_name() or driver.user.username,
-                    'total_deliveries': driver_total,
-                    'delivered': driver_delivered,
-                    'failed': driver_failed,
-                    'success_rate': round(driver_delivered / driver_total * 100, 1) if driver_total > 0 else 0,
-                    'average_rating': round(float(driver_avg_rating), 2) if driver_avg_rating else 0,
-                })
-
-        # Sort by total deliveries descending
-        driver_performance.sort(key=lambda x: x['total_deliveries'], reverse=True)
-
-        # Zone stats
-        zone_stats = []
-        zones = DeliveryZone.objects.filter(is_active=True)
-
-        for zone in zones:
-            zone_deliveries = deliveries.filter(zone=zone)
-            zone_total = zone_deliveries.count()
-            zone_delivered = zone_deliveries.filter(status='delivered').count()
-
-            if zone_total > 0:
-                zone_stats.append({
-                    'code': zone.code,
-                    'name': zone.name,
-                    'total': zone_total,
-                    'delivered': zone_delivered,
-                    'delivery_rate': round(zone_delivered / zone_total * 100, 1) if zone_total > 0 else 0,
-                })
-
-        # Sort by total deliveries descending
-        zone_stats.sort(key=lambda x: x['total'], reverse=True)
+        report = analytics.delivery_report(start_date, end_date)
 
         return JsonResponse({
-            'stats': stats,
-            'driver_performance': driver_performance,
-            'zone_stats': zone_stats,
+            **report,
             'date_range': {
                 'start_date': start_date.isoformat(),
                 'end_date': end_date.isoformat(),
@@ -391,39 +297,7 @@ class AdminDriverReportAPIView(DeliveryPermissionMixin, View):
         else:
             end_date = today
 
-        # Get driver deliveries
-        deliveries = Delivery.objects.filter(
-            driver=driver,
-            scheduled_date__gte=start_date,
-            scheduled_date__lte=end_date
-        )
-
-        total = deliveries.count()
-        delivered = deliveries.filter(status='delivered').count()
-        failed = deliveries.filter(status='failed').count()
-
-        # Ratings
-        ratings = DeliveryRating.objects.filter(
-            delivery__driver=driver,
-            delivery__scheduled_date__gte=start_date,
-            delivery__scheduled_date__lte=end_date
-        )
-        avg_rating = ratings.aggregate(avg=Avg('rating'))['avg']
-
-        # Daily breakdown
-        daily_stats = []
-        current_date = start_date
-        while current_date <= end_date:
-            day_deliveries = deliveries.filter(scheduled_date=current_date)
-            day_delivered = day_deliveries.filter(status='delivered').count()
-            day_total = day_deliveries.count()
-            if day_total > 0:
-                daily_stats.append({
-                    'date': current_date.isoformat(),
-                    'total': day_total,
-                    'delivered': day_delivered,
-                })
-            current_date += timedelta(days=1)
+        report = analytics.driver_report(driver, start_date, end_date)
 
         return JsonResponse({
             'driver': {
@@ -433,14 +307,7 @@ class AdminDriverReportAPIView(DeliveryPermissionMixin, View):
                 'vehicle_type': driver.vehicle_type,
                 'is_available': driver.is_available,
             },
-            'stats': {
-                'total': total,
-                'delivered': delivered,
-                'failed': failed,
-                'success_rate': round(delivered / total * 100, 1) if total > 0 else 0,
-                'average_rating': round(float(avg_rating), 2) if avg_rating else 0,
-            },
-            'daily_stats': daily_stats,
+            **report,
             'date_range': {
                 'start_date': start_date.isoformat(),
                 'end_date': end_date.isoformat(),
@@ -1196,16 +1063,17 @@ class ContractorPaymentsAPIView(DeliveryPermissionMixin, View):
             end_date = date.today()
 
         # Get all contractors
-        contractors = DeliveryDriver.objects.filter(driver_type='contractor')
+        contractors = DeliveryDriver.objects.filter(
+            driver_type='contractor'
+        ).select_related('user')
+        all_earnings = analytics.driver_earnings(contractors, start_date, end_date)
 
         contractor_data = []
         total_earnings = Decimal('0.00')
         total_deliveries = 0
 
         for contractor in contractors:
-            earnings = DeliveryPaymentService.calculate_driver_earnings(
-                contractor, start_date, end_date
-            )
+            earnings = all_earnings[contractor.id]
 
             contractor_data.append({
                 'id': contractor.id,
@@ -1272,7 +1140,7 @@ class ContractorPaymentDetailAPIView(DeliveryPermissionMixin, View):
             status='delivered',
             created_at__date__gte=start_date,
             created_at__date__lte=end_date
-        ).select_related('order', 'zone').order_by('-delivered_at')
+        ).select_related('order', 'zone', 'driver').order_by('-delivered_at')
 
         delivery_data = []
         total_flat_rate = Decimal('0.00')
@@ -0,0 +1,361 @@
+"""Delivery report aggregates.
+
+Reports used to run a handful of COUNTs per driver and per zone and to
+load every delivered row to compute the on-time rate. Here every metric
+is a conditional aggregate grouped by any of day, driver and zone, so a
+report costs the same few queries however many drivers, zones or days it
+covers.
+
+Past days are also summarized into ``DeliveryDailyRollup`` rows, one per
+(day, driver, zone), by ``update_rollups`` (Celery task
+``update_delivery_rollups``). Every rolled-up day has at least one row,
+so ``breakdown`` sums rollups for the days that have them and aggregates
+live deliveries only for the rest, usually just the last day or two.
+Delivery and rating changes retire their day's rollups (see
+``apps.delivery.signals``) so the day is answered live until it is
+rolled up again. Bulk updates skip signals, so every run also re-rolls
+the last ``REFRESH_DAYS`` days.
+"""
+import datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Count, F, Min, Q, Sum
+from django.utils import timezone
+
+from .models import Delivery, DeliveryDailyRollup, DeliveryDriver, DeliveryZone
+
+METRICS = (
+    'total', 'delivered', 'failed', 'pending', 'on_time', 'late',
+    'rating_count', 'rating_sum',
+)
+
+# Grouping name -> (Delivery field, DeliveryDailyRollup field)
+DIMENSIONS = {
+    'day': ('scheduled_date', 'day'),
+    'driver': ('driver_id', 'driver_id'),
+    'zone': ('zone_id', 'zone_id'),
+}
+
+# Days re-rolled on every run, to pick up changes made without signals
+REFRESH_DAYS = 7
+
+# Delivered with a delivery window: counts toward the on-time rate
+_TIMED = Q(status='delivered', delivered_at__isnull=False, scheduled_time_end__isnull=False)
+# Delivered (in local time) no later than the end of the scheduled window
+_ON_TIME = (
+    Q(delivered_at__date__lt=F('scheduled_date'))
+    | Q(delivered_at__date=F('scheduled_date'), delivered_at__time__lte=F('scheduled_time_end'))
+)
+
+LIVE_METRICS = {
+    'total': Count('id'),
+    'delivered': Count('id', filter=Q(status='delivered')),
+    'failed': Count('id', filter=Q(status='failed')),
+    'pending': Count('id', filter=Q(status='pending')),
+    'on_time': Count('id', filter=_TIMED & _ON_TIME),
+    'late': Count('id', filter=_TIMED & ~_ON_TIME),
+    'rating_count': Count('rating'),
+    'rating_sum': Sum('rating__rating'),
+}
+
+ROLLUP_METRICS = {name: Sum(name) for name in METRICS}
+
+
+def _grouped(queryset, fields: Tuple[str, ...], aggregates: dict):
+    """Yield (key, metrics) per group of ``fields`` (one group if none)."""
+    aliases = {f'_{name}': aggregate for name, aggregate in aggregates.items()}
+    if not fields:
+        row = queryset.aggregate(**aliases)
+        yield (), {name: row[f'_{name}'] or 0 for name in aggregates}
+        return
+    for row in queryset.values(*fields).annotate(**aliases).order_by():
+        yield (
+            tuple(row[field] for field in fields),
+            {name: row[f'_{name}'] or 0 for name in aggregates},
+        )
+
+
+def _add(results: dict, key: tuple, metrics: dict) -> None:
+    totals = results.setdefault(key, dict.fromkeys(METRICS, 0))
+    for name in METRICS:
+        totals[name] += metrics[name]
+
+
+def _runs(days: Iterable[datetime.date]) -> List[Tuple[datetime.date, datetime.date]]:
+    """Collapse days into sorted, inclusive (first, last) runs."""
+    runs = []
+    for day in sorted(days):
+        if runs and day - runs[-1][1] == datetime.timedelta(days=1):
+            runs[-1] = (runs[-1][0], day)
+        else:
+            runs.append((day, day))
+    return runs
+
+
+def _days(first: datetime.date, last: datetime.date) -> List[datetime.date]:
+    return [first + datetime.timedelta(days=i) for i in range((last - first).days + 1)]
+
+
+def rolled_days(start: datetime.date, end: datetime.date) -> set:
+    """Days between ``start`` and ``end`` that have rollups."""
+    return set(
+        DeliveryDailyRollup.objects.filter(day__range=(start, end))
+        .values_list('day', flat=True).distinct()
+    )
+
+
+def breakdown(
+    start: datetime.date,
+    end: datetime.date,
+    by: Tuple[str, ...] = (),
+    driver: Optional[int] = None,
+    use_rollups: bool = True,
+) -> Dict[tuple, Dict[str, int]]:
+    """Delivery metrics for deliveries scheduled from ``start`` to ``end``.
+
+    At most three queries: rolled-up days, their rollups, and one live
+    aggregate over the remaining days.
+
+    Args:
+        start: First scheduled date
+        end: Last scheduled date
+        by: Names from DIMENSIONS to group by, e.g. ('driver', 'zone')
+        driver: Only this driver's deliveries (driver id)
+        use_rollups: False to aggregate live deliveries only
+
+    Returns:
+        Dict mapping a key tuple (one value per ``by`` name; ``()`` when
+        ungrouped) to a dict of METRICS counts. Groups without
+        deliveries may be missing.
+    """
+    live_fields = tuple(DIMENSIONS[name][0] for name in by)
+    rollup_fields = tuple(DIMENSIONS[name][1] for name in by)
+    rolled = rolled_days(start, end) if use_rollups else set()
+
+    results = {}
+    if rolled:
+        rollups = DeliveryDailyRollup.objects.filter(day__range=(start, end))
+        if driver is not None:
+            rollups = rollups.filter(driver_id=driver)
+        for key, metrics in _grouped(rollups, rollup_fields, ROLLUP_METRICS):
+            _add(results, key, metrics)
+
+    live_runs = _runs(day for day in _days(start, end) if day not in rolled)
+    if live_runs:
+        in_runs = Q()
+        for first, last in live_runs:
+            in_runs |= Q(scheduled_date__range=(first, last))
+        deliveries = Delivery.objects.filter(in_runs)
+        if driver is not None:
+            deliveries = deliveries.filter(driver_id=driver)
+        for key, metrics in _grouped(deliveries, live_fields, LIVE_METRICS):
+            _add(results, key, metrics)
+    return results
+
+
+def _total(groups: Iterable[Dict[str, int]]) -> Dict[str, int]:
+    totals = dict.fromkeys(METRICS, 0)
+    for metrics in groups:
+        for name in METRICS:
+            totals[name] += metrics[name]
+    return totals
+
+
+def _average_rating(metrics: Dict[str, int]) -> float:
+    if not metrics['rating_count']:
+        return 0
+    return round(metrics['rating_sum'] / metrics['rating_count'], 2)
+
+
+def delivery_report(start: datetime.date, end: datetime.date) -> Dict[str, Any]:
+    """Overall stats, driver performance and zone stats for a date range.
+
+    Five queries at most, independent of the number of drivers, zones and
+    days.
+
+    Returns:
+        Dict with 'stats', 'driver_performance' and 'zone_stats' as served
+        by the admin reports API
+    """
+    groups = breakdown(start, end, by=('driver', 'zone'))
+    overall = _total(groups.values())
+    by_driver, by_zone = {}, {}
+    for (driver_id, zone_id), metrics in groups.items():
+        _add(by_driver, driver_id, metrics)
+        _add(by_zone, zone_id, metrics)
+
+    total = overall['total']
+    timed = overall['on_time'] + overall['late']
+    stats = {
+        'total': total,
+        'delivered': overall['delivered'],
+        'failed': overall['failed'],
+        'pending': overall['pending'],
+        'delivery_rate': (overall['delivered'] / total * 100) if total > 0 else 0,
+        'failure_rate': (overall['failed'] / total * 100) if total > 0 else 0,
+        'on_time_rate': round(overall['on_time'] / timed * 100, 1) if timed > 0 else 0,
+        'average_rating': _average_rating(overall),
+    }
+
+    driver_performance = []
+    for driver in DeliveryDriver.objects.filter(is_active=True).select_related('user'):
+        metrics = by_driver.get(driver.id)
+        if not metrics or not metrics['total']:
+            continue
+        driver_performance.append({
+            'id': driver.id,
+            'name': driver.user.get_full_name() or driver.user.username,
+            'total_deliveries': metrics['total'],
+            'delivered': metrics['delivered'],
+            'failed': metrics['failed'],
+            'success_rate': round(metrics['delivered'] / metrics['total'] * 100, 1),
+            'average_rating': _average_rating(metrics),
+        })
+    driver_performance.sort(key=lambda x: x['total_deliveries'], reverse=True)
+
+    zone_stats = []
+    for zone in DeliveryZone.objects.filter(is_active=True):
+        metrics = by_zone.get(zone.id)
+        if not metrics or not metrics['total']:
+            continue
+        zone_stats.append({
+            'code': zone.code,
+            'name': zone.name,
+            'total': metrics['total'],
+            'delivered': metrics['delivered'],
+            'delivery_rate': round(metrics['delivered'] / metrics['total'] * 100, 1),
+        })
+    zone_stats.sort(key=lambda x: x['total'], reverse=True)
+
+    return {
+        'stats': stats,
+        'driver_performance': driver_performance,
+        'zone_stats': zone_stats,
+    }
+
+
+def driver_report(driver: DeliveryDriver, start: datetime.date, end: datetime.date) -> Dict[str, Any]:
+    """Stats and daily breakdown for one driver.
+
+    Returns:
+        Dict with 'stats' and 'daily_stats' (days with deliveries, oldest
+        first) as served by the admin driver report API
+    """
+    days = breakdown(start, end, by=('day',), driver=driver.id)
+    overall = _total(days.values())
+    total = overall['total']
+    return {
+        'stats': {
+            'total': total,
+            'delivered': overall['delivered'],
+            'failed': overall['failed'],
+            'success_rate': round(overall['delivered'] / total * 100, 1) if total > 0 else 0,
+            'average_rating': _average_rating(overall),
+        },
+        'daily_stats': [
+            {'date': day.isoformat(), 'total': metrics['total'], 'delivered': metrics['delivered']}
+            for (day,), metrics in sorted(days.items())
+            if metrics['total'] > 0
+        ],
+    }
+
+
+def driver_earnings(
+    drivers: Iterable[DeliveryDriver], start: datetime.date, end: datetime.date
+) -> Dict[int, Dict[str, Any]]:
+    """Earnings per driver for deliveries delivered in a period, in one query.
+
+    Same rules as ``DeliveryPaymentService.calculate_payment``: employees
+    earn nothing per delivery; contractors earn their flat rate per
+    delivery plus their per-km rate times the delivered distance.
+
+    Returns:
+        Dict mapping driver id to total_deliveries, total_flat_rate,
+        total_distance_payment and total_earnings
+    """
+    drivers = list(drivers)
+    rows = {
+        row['driver_id']: row
+        for row in Delivery.objects.filter(
+            driver__in=drivers,
+            status='delivered',
+            created_at__date__gte=start,
+            created_at__date__lte=end,
+        ).values('driver_id').annotate(
+            _deliveries=Count('id'),
+            _distance_km=Sum('delivered_distance_km', filter=Q(delivered_distance_km__gt=0)),
+        ).order_by()
+    }
+
+    earnings = {}
+    for driver in drivers:
+        row = rows.get(driver.id, {})
+        count = row.get('_deliveries', 0)
+        distance_km = row.get('_distance_km')
+        flat_rate = Decimal('0.00')
+        distance_payment = Decimal('0.00')
+        if driver.driver_type != 'employee':
+            flat_rate = (driver.rate_per_delivery or Decimal('0.00')) * count
+            if driver.rate_per_km and distance_km:
+                distance_payment = driver.rate_per_km * distance_km
+        earnings[driver.id] = {
+            'total_deliveries': count,
+            'total_flat_rate': flat_rate,
+            'total_distance_payment': distance_payment,
+            'total_earnings': flat_rate + distance_payment,
+        }
+    return earnings
+
+
+def rollup_days(first: datetime.date, last: datetime.date) -> int:
+    """Recompute the rollups for every day from ``first`` through ``last``.
+
+    Returns:
+        Number of rollup rows written.
+    """
+    rows = []
+    for (day, driver_id, zone_id), metrics in breakdown(
+        first, last, by=('day', 'driver', 'zone'), use_rollups=False
+    ).items():
+        rows.append(DeliveryDailyRollup(day=day, driver_id=driver_id, zone_id=zone_id, **metrics))
+    # An empty row marks days without deliveries as rolled up
+    covered = {row.day for row in rows}
+    rows.extend(DeliveryDailyRollup(day=day) for day in _days(first, last) if day not in covered)
+
+    with transaction.atomic():
+        DeliveryDailyRollup.objects.filter(day__range=(first, last)).delete()
+        DeliveryDailyRollup.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def update_rollups(until: Optional[datetime.date] = None) -> int:
+    """Roll up every past day that has no rollups, and the last REFRESH_DAYS.
+
+    Args:
+        until: Last day to roll up (default and latest: yesterday)
+
+    Returns:
+        Number of days rolled up.
+    """
+    yesterday = timezone.localdate() - datetime.timedelta(days=1)
+    until = min(until or yesterday, yesterday)
+    first = Delivery.objects.aggregate(first=Min('scheduled_date'))['first']
+    if first is None or first > until:
+        return 0
+
+    rolled = rolled_days(first, until)
+    refresh_from = until - datetime.timedelta(days=REFRESH_DAYS - 1)
+    days = [day for day in _days(first, until) if day not in rolled or day >= refresh_from]
+    for run_first, run_last in _runs(days):
+        rollup_days(run_first, run_last)
+    return len(days)
+
+
+def retire_days(days: Iterable[Optional[datetime.date]]) -> None:
+    """Drop the rollups of ``days`` so reports read them live."""
+    today = timezone.localdate()
+    days = {day for day in days if day is not None and day < today}
+    if days:
+        DeliveryDailyRollup.objects.filter(day__in=days).delete()
@@ -3,6 +3,7 @@ from django.urls import path
 
 from .api_views import (
     DriverDeliveriesView,
+    DriverRouteView,
     DriverDeliveryDetailView,
     DriverUpdateStatusView,
     DriverLocationUpdateView,
@@ -14,6 +15,7 @@ app_name = 'delivery_api'
 
 urlpatterns = [
     path('deliveries/', DriverDeliveriesView.as_view(), name='driver_deliveries'),
+    path('route/', DriverRouteView.as_view(), name='driver_route'),
     path('deliveries/<int:delivery_id>/', DriverDeliveryDetailView.as_view(), name='driver_delivery_detail'),
     path('deliveries/<int:delivery_id>/status/', DriverUpdateStatusView.as_view(), name='driver_update_status'),
     path('deliveries/<int:delivery_id>/proof/', DriverProofSubmitView.as_view(), name='driver_proof_submit'),
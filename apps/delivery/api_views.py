@@ -1,14 +1,15 @@
 """API views for delivery driver mobile app."""
 import json
+from datetime import date
 from decimal import Decimal
 
 from django.http import JsonResponse
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
-from django.utils import timezone
 from django.contrib.auth.mixins import LoginRequiredMixin
 
+from . import locations, routing
 from .models import Delivery, DeliveryDriver, DriverCapability, DeliveryProof, PROOF_TYPES
 from .services import DeliveryNotificationService
 
@@ -94,6 +95,42 @@ class DriverDeliveriesView(DriverRequiredMixin, View):
         return JsonResponse(data)
 
 
+@method_decorator(csrf_exempt, name='dispatch')
+class DriverRouteView(DriverRequiredMixin, View):
+    """Driver's remaining stops for a day in suggested visiting order."""
+
+    def get(self, request):
+        """Sequence the day's stops from the driver's position (or the depot)."""
+        try:
+            day = date.fromisoformat(request.GET['date']) if 'date' in request.GET else date.today()
+        except ValueError:
+            return JsonResponse({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=400)
+
+        position = locations.current_position(self.driver)
+        start = (position['latitude'], position['longitude']) if position else None
+        route = routing.driver_route(self.driver, day, start)
+
+        def stop_data(delivery, leg_km=None):
+            return {
+                'id': delivery.id,
+                'delivery_number': delivery.delivery_number,
+                'status': delivery.status,
+                'address': delivery.address,
+                'latitude': str(delivery.latitude) if delivery.latitude else None,
+                'longitude': str(delivery.longitude) if delivery.longitude else None,
+                'scheduled_time_start': str(delivery.scheduled_time_start) if delivery.scheduled_time_start else None,
+                'scheduled_time_end': str(delivery.scheduled_time_end) if delivery.scheduled_time_end else None,
+                'leg_km': round(leg_km, 2) if leg_km is not None else None,
+            }
+
+        return JsonResponse({
+            'date': str(day),
+            'stops': [stop_data(d, leg) for d, leg in zip(route.stops, route.legs_km)],
+            'unrouted': [stop_data(d) for d in route.unrouted],
+            'total_km': round(route.total_km, 2),
+        })
+
+
 @method_decorator(csrf_exempt, name='dispatch')
 class DriverDeliveryDetailView(DriverRequiredMixin, View):
     """Get details of a specific delivery."""
@@ -143,30 +180,28 @@ class DriverDeliveryDetailView(DriverRequiredMixin, View):
 
 @method_decorator(csrf_exempt, name='dispatch')
 class DriverLocationUpdateView(DriverRequiredMixin, View):
-    """Update driver's current location."""
+    """Record driver GPS positions (see ``apps.delivery.locations``)."""
 
     def post(self, request):
-        """Update driver location with GPS coordinates."""
+        """Accept one fix or a batch: {"points": [{"latitude", "longitude", "recorded_at"}]}."""
         try:
             data = json.loads(request.body)
         except json.JSONDecodeError:
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
 
-        latitude = data.get('latitude')
-        longitude = data.get('longitude')
-
-        if latitude is None or longitude is None:
-            return JsonResponse({'error': 'Coordinates required'}, status=400)
+        try:
+            points = locations.parse_points(request.user.id, data)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
 
-        self.driver.current_latitude = Decimal(str(latitude))
-        self.driver.current_longitude = Decimal(str(longitude))
-        self.driver.location_updated_at = timezone.now()
-        self.driver.save(update_fields=['current_latitude', 'current_longitude', 'location_updated_at'])
+        locations.record(points)
+        latest = max(points, key=lambda point: point.recorded_at)
 
         return JsonResponse({
             'success': True,
-            'latitude': str(self.driver.current_latitude),
-            'longitude': str(self.driver.current_longitude),
+            'accepted': len(points),
+            'latitude': str(latest.latitude),
+            'longitude': str(latest.longitude),
         })
 
 
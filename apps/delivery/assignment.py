@@ -0,0 +1,262 @@
+"""Batch assignment of pending deliveries to drivers.
+
+``auto_assign_pending`` used to look up each delivery's zone drivers and
+count every driver's deliveries for today twice, then save each
+assignment separately: deliveries x drivers x 2 COUNT queries. The batch
+engine instead:
+
+1. loads the day's pending deliveries, available drivers, their zones
+   and today's load per driver (four queries)
+2. solves the assignment in memory, either
+   - ``greedy``: each delivery, in order, goes to the least loaded
+     driver of its zone, best rated first (the previous behaviour), or
+   - ``distance``: a min-cost matching that assigns as many deliveries
+     as possible while minimising the total distance from each driver's
+     last GPS position to the delivery address
+3. writes assignments with ``bulk_update`` and the status history with
+   ``bulk_create``
+"""
+import heapq
+import math
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, List, Optional
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from . import events
+from .models import Delivery, DeliveryDriver, DeliveryStatusHistory
+
+# Statuses that count toward a driver's daily limit
+ACTIVE_STATUSES = ['assigned', 'picked_up', 'out_for_delivery', 'arrived', 'delivered']
+
+# Cost (meters) for a pair whose distance is unknown, so known-distance
+# drivers are preferred but the delivery can still be assigned
+UNKNOWN_DISTANCE = 1_000_000
+
+ASSIGNMENT_MODES = ('greedy', 'distance')
+
+
+@dataclass
+class DriverLoad:
+    """A driver's state while solving."""
+
+    driver: DeliveryDriver
+    zone_ids: set = field(default_factory=set)
+    load: int = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.driver.max_deliveries_per_day - self.load
+
+    @property
+    def rating(self) -> float:
+        return float(self.driver.average_rating or 0)
+
+
+def distance_km(lat1, lng1, lat2, lng2) -> Optional[float]:
+    """Great-circle distance in km, or None if a coordinate is missing."""
+    if None in (lat1, lng1, lat2, lng2):
+        return None
+    lat1, lng1, lat2, lng2 = map(math.radians, map(float, (lat1, lng1, lat2, lng2)))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 6371.0 * 2 * math.asin(math.sqrt(a))
+
+
+def load_state(day: date, lock: bool = False):
+    """Pending deliveries and driver loads for a day.
+
+    Args:
+        day: Scheduled date to assign
+        lock: Lock the pending rows (skipping rows another run holds)
+
+    Returns:
+        (deliveries, drivers) where drivers are DriverLoad objects in the
+        drivers' default order
+    """
+    deliveries = Delivery.objects.filter(
+        status='pending', scheduled_date=day, zone__isnull=False
+    )
+    if lock:
+        deliveries = deliveries.select_for_update(skip_locked=True, of=('self',))
+    deliveries = list(deliveries)
+    if not deliveries:
+        return [], []
+
+    drivers = {
+        driver.pk: DriverLoad(driver)
+        for driver in DeliveryDriver.objects.filter(is_active=True, is_available=True)
+    }
+    memberships = DeliveryDriver.zones.through.objects.filter(
+        deliverydriver_id__in=list(drivers)
+    ).values_list('deliverydriver_id', 'deliveryzone_id')
+    for driver_id, zone_id in memberships:
+        drivers[driver_id].zone_ids.add(zone_id)
+
+    loads = Delivery.objects.filter(
+        driver_id__in=list(drivers), scheduled_date=day, status__in=ACTIVE_STATUSES
+    ).values('driver_id').annotate(count=Count('id')).values_list('driver_id', 'count')
+    for driver_id, count in loads:
+        drivers[driver_id].load = count
+
+    return deliveries, list(drivers.values())
+
+
+def solve_greedy(deliveries: List[Delivery], drivers: List[DriverLoad]) -> Dict[int, DriverLoad]:
+    """Assign each delivery in turn to its zone's least loaded, best rated driver."""
+    by_zone = {}
+    for driver in drivers:
+        for zone_id in driver.zone_ids:
+            by_zone.setdefault(zone_id, []).append(driver)
+
+    assignments = {}
+    for delivery in deliveries:
+        eligible = [d for d in by_zone.get(delivery.zone_id, ()) if d.capacity > 0]
+        if not eligible:
+            continue
+        best = min(eligible, key=lambda d: (d.load, -d.rating))
+        best.load += 1
+        assignments[delivery.pk] = best
+    return assignments
+
+
+def solve_min_distance(
+    deliveries: List[Delivery], drivers: List[DriverLoad]
+) -> Dict[int, DriverLoad]:
+    """Assign as many deliveries as possible at minimum total driver distance.
+
+    Min-cost flow (successive shortest paths with Dijkstra and node
+    potentials) over source -> delivery -> driver -> sink, where driver
+    -> sink capacity is the driver's remaining daily capacity and
+    delivery -> driver edges exist for the driver's zones, costing the
+    distance in meters.
+    """
+    n, m = len(deliveries), len(drivers)
+    source, sink = n + m, n + m + 1
+    size = n + m + 2
+    # Edge arrays: target, remaining capacity, cost; edge e ^ 1 is its reverse
+    to, cap, cost = [], [], []
+    graph = [[] for _ in range(size)]
+
+    def add_edge(u, v, capacity, weight):
+        for a, b, c, w in ((u, v, capacity, weight), (v, u, 0, -weight)):
+            graph[a].append(len(to))
+            to.append(b)
+            cap.append(c)
+            cost.append(w)
+
+    by_zone = {}
+    for j, driver in enumerate(drivers):
+        if driver.capacity > 0:
+            add_edge(n + j, sink, driver.capacity, 0)
+            for zone_id in driver.zone_ids:
+                by_zone.setdefault(zone_id, []).append(j)
+
+    for i, delivery in enumerate(deliveries):
+        add_edge(source, i, 1, 0)
+        for j in by_zone.get(delivery.zone_id, ()):
+            position = drivers[j].driver
+            km = distance_km(
+                position.current_latitude, position.current_longitude,
+                delivery.latitude, delivery.longitude,
+            )
+            add_edge(i, n + j, 1, UNKNOWN_DISTANCE if km is None else round(km * 1000))
+
+    potential = [0] * size
+    while True:
+        dist = [math.inf] * size
+        parent = [-1] * size
+        dist[source] = 0
+        queue = [(0, source)]
+        while queue:
+            d, u = heapq.heappop(queue)
+            if d > dist[u]:
+                continue
+            if u == sink:
+                break
+            for e in graph[u]:
+                if cap[e] <= 0:
+                    continue
+                v = to[e]
+                nd = d + cost[e] + potential[u] - potential[v]
+                if nd < dist[v]:
+                    dist[v] = nd
+                    parent[v] = e
+                    heapq.heappush(queue, (nd, v))
+        if dist[sink] == math.inf:
+            break
+        # Keep reduced costs non-negative for nodes settled past the sink
+        for v in range(size):
+            potential[v] += min(dist[v], dist[sink])
+        v = sink
+        while v != source:
+            e = parent[v]
+            cap[e] -= 1
+            cap[e ^ 1] += 1
+            v = to[e ^ 1]
+
+    assignments = {}
+    for i, delivery in enumerate(deliveries):
+        for e in graph[i]:
+            j = to[e] - n
+            if 0 <= j < m and e % 2 == 0 and cap[e] == 0:
+                drivers[j].load += 1
+                assignments[delivery.pk] = drivers[j]
+    return assignments
+
+
+def apply_assignments(
+    deliveries: List[Delivery], assignments: Dict[int, DriverLoad], assigned_by=None
+) -> List[Delivery]:
+    """Write assignments and their status history in bulk."""
+    now = timezone.now()
+    assigned = []
+    for delivery in deliveries:
+        driver = assignments.get(delivery.pk)
+        if driver is None:
+            continue
+        delivery.driver = driver.driver
+        delivery.status = 'assigned'
+        delivery.assigned_at = now
+        delivery.updated_at = now
+        assigned.append(delivery)
+
+    Delivery.objects.bulk_update(
+        assigned, ['driver', 'status', 'assigned_at', 'updated_at'], batch_size=500
+    )
+    DeliveryStatusHistory.objects.bulk_create([
+        DeliveryStatusHistory(
+            delivery=delivery, from_status='pending', to_status='assigned',
+            changed_by=assigned_by,
+        )
+        for delivery in assigned
+    ], batch_size=500)
+    events.publish_status(assigned, 'pending')
+    return assigned
+
+
+def auto_assign(day: date = None, mode: str = 'greedy', assigned_by=None) -> List[Delivery]:
+    """Assign a day's pending deliveries in one batch.
+
+    Args:
+        day: Scheduled date (default today)
+        mode: 'greedy' (load, then rating) or 'distance' (min total distance)
+        assigned_by: User recorded in the status history
+
+    Returns:
+        The deliveries that were assigned
+    """
+    if mode not in ASSIGNMENT_MODES:
+        raise ValueError(f"Unknown assignment mode: {mode}")
+    solve = solve_min_distance if mode == 'distance' else solve_greedy
+
+    with transaction.atomic():
+        deliveries, drivers = load_state(day or date.today(), lock=True)
+        if not deliveries or not drivers:
+            return []
+        return apply_assignments(deliveries, solve(deliveries, drivers), assigned_by)
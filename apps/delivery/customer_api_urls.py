@@ -8,6 +8,7 @@ from .customer_api_views import (
     DeliveryTrackingAPIView,
     DeliveryRatingAPIView,
 )
+from .stream_views import DeliveryEventStreamView
 
 app_name = 'delivery_customer_api'
 
@@ -16,5 +17,6 @@ urlpatterns = [
     path('slots/dates/', AvailableDatesView.as_view(), name='available_dates'),
     path('zones/', DeliveryZonesView.as_view(), name='delivery_zones'),
     path('track/<str:delivery_number>/', DeliveryTrackingAPIView.as_view(), name='tracking_api'),
+    path('track/<str:delivery_number>/events/', DeliveryEventStreamView.as_view(), name='tracking_events'),
     path('rate/<str:delivery_number>/', DeliveryRatingAPIView.as_view(), name='rating_api'),
 ]
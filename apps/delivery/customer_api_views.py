@@ -7,6 +7,7 @@ from django.db.models import F
 
 import json
 
+from . import locations
 from .models import Delivery, DeliverySlot, DeliveryZone, DeliveryRating
 
 
@@ -105,6 +106,43 @@ class DeliveryZonesView(View):
         return JsonResponse({'zones': zones_data})
 
 
+def tracking_data(delivery) -> dict:
+    """Tracking payload for a delivery loaded with its driver's user."""
+    data = {
+        'delivery_number': delivery.delivery_number,
+        'status': delivery.status,
+        'status_display': delivery.get_status_display(),
+        'address': delivery.address,
+        'scheduled_date': str(delivery.scheduled_date) if delivery.scheduled_date else None,
+        'scheduled_time': None,
+        'driver': None,
+        'driver_location': None,
+        'timestamps': {
+            'assigned_at': delivery.assigned_at.isoformat() if delivery.assigned_at else None,
+            'picked_up_at': delivery.picked_up_at.isoformat() if delivery.picked_up_at else None,
+            'out_for_delivery_at': delivery.out_for_delivery_at.isoformat() if delivery.out_for_delivery_at else None,
+            'arrived_at': delivery.arrived_at.isoformat() if delivery.arrived_at else None,
+            'delivered_at': delivery.delivered_at.isoformat() if delivery.delivered_at else None,
+        }
+    }
+
+    # Add scheduled time
+    if delivery.scheduled_time_start and delivery.scheduled_time_end:
+        data['scheduled_time'] = f"{delivery.scheduled_time_start.strftime('%H:%M')} - {delivery.scheduled_time_end.strftime('%H:%M')}"
+
+    # Add driver info if assigned
+    if delivery.driver:
+        data['driver'] = {
+            'name': delivery.driver.user.get_full_name() or delivery.driver.user.username,
+            'phone': delivery.driver.phone,
+        }
+        # Add driver location if available and out for delivery
+        if delivery.status in ['out_for_delivery', 'arrived']:
+            data['driver_location'] = locations.current_position(delivery.driver)
+
+    return data
+
+
 class DeliveryTrackingAPIView(View):
     """API to get delivery tracking status."""
 
@@ -115,7 +153,7 @@ class DeliveryTrackingAPIView(View):
 
         try:
             delivery = Delivery.objects.select_related(
-                'driver', 'zone', 'slot'
+                'driver__user', 'zone', 'slot', 'order'
             ).get(delivery_number=delivery_number)
         except Delivery.DoesNotExist:
             return JsonResponse({'error': 'Delivery not found'}, status=404)
@@ -124,44 +162,7 @@ class DeliveryTrackingAPIView(View):
         if delivery.order.user != request.user:
             return JsonResponse({'error': 'Delivery not found'}, status=404)
 
-        # Build response data
-        data = {
-            'delivery_number': delivery.delivery_number,
-            'status': delivery.status,
-            'status_display': delivery.get_status_display(),
-            'address': delivery.address,
-            'scheduled_date': str(delivery.scheduled_date) if delivery.scheduled_date else None,
-            'scheduled_time': None,
-            'driver': None,
-            'driver_location': None,
-            'timestamps': {
-                'assigned_at': delivery.assigned_at.isoformat() if delivery.assigned_at else None,
-                'picked_up_at': delivery.picked_up_at.isoformat() if delivery.picked_up_at else None,
-                'out_for_delivery_at': delivery.out_for_delivery_at.isoformat() if delivery.out_for_delivery_at else None,
-                'arrived_at': delivery.arrived_at.isoformat() if delivery.arrived_at else None,
-                'delivered_at': delivery.delivered_at.isoformat() if delivery.delivered_at else None,
-            }
-        }
-
-        # Add scheduled time
-        if delivery.scheduled_time_start and delivery.scheduled_time_end:
-            data['scheduled_time'] = f"{delivery.scheduled_time_start.strftime('%H:%M')} - {delivery.scheduled_time_end.strftime('%H:%M')}"
-
-        # Add driver info if assigned
-        if delivery.driver:
-            data['driver'] = {
-                'name': delivery.driver.user.get_full_name() or delivery.driver.user.username,
-                'phone': delivery.driver.phone,
-            }
-            # Add driver location if available and out for delivery
-            if delivery.status in ['out_for_delivery', 'arrived'] and delivery.driver.current_latitude:
-                data['driver_location'] = {
-                    'latitude': float(delivery.driver.current_latitude),
-                    'longitude': float(delivery.driver.current_longitude),
-                    'updated_at': delivery.driver.location_updated_at.isoformat() if delivery.driver.location_updated_at else None,
-                }
-
-        return JsonResponse(data)
+        return JsonResponse(tracking_data(delivery))
 
 
 class DeliveryRatingAPIView(View):
@@ -0,0 +1,338 @@
+"""Delivery event channels for server-push tracking.
+
+Customers on the tracking page and dispatchers on the admin dashboard
+used to poll JSON endpoints that re-ran their queries on every hit. Status
+transitions and driver positions are now published to channels that the
+server-sent event views in ``stream_views`` relay as they happen:
+
+- ``delivery:<delivery_number>``: status transitions of one delivery
+- ``dispatch``: status transitions of every delivery
+- ``driver:<user_id>``: positions of one driver
+- ``fleet``: positions of every driver
+
+With a Redis cache each channel is a capped Redis Stream, so a client
+reconnecting with ``Last-Event-ID`` replays the transitions it missed,
+and streams wait in a blocking ``XREAD`` instead of polling. Other
+caches (tests, local development) fall back to an in-process log that
+readers poll. Position channels are never replayed: a reconnecting
+client is sent the current position and follows new fixes from there.
+
+Publishing is best effort: a Redis error is logged and the change still
+commits; clients that miss events resync on their next reconnect.
+
+Configuration (``settings.DELIVERY_EVENTS``):
+    'ENABLED': True,
+    'MAXLEN': 100,             # entries kept per delivery or driver channel
+    'DISPATCH_MAXLEN': 5000,   # entries kept on dispatch and fleet
+    'STREAM_TTL': 86400,       # seconds an idle channel is kept
+    'HEARTBEAT': 15,           # seconds between keep-alive comments
+    'MAX_DURATION': 600,       # seconds before a stream asks to reconnect
+    'RETRY': 3000,             # client reconnect delay in milliseconds
+    'POLL_INTERVAL': 0.5,      # in-process fallback only
+"""
+import asyncio
+import itertools
+import json
+import logging
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.redis import RedisCacheClient
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'MAXLEN': 100,
+    'DISPATCH_MAXLEN': 5000,
+    'STREAM_TTL': 86400,
+    'HEARTBEAT': 15,
+    'MAX_DURATION': 600,
+    'RETRY': 3000,
+    'POLL_INTERVAL': 0.5,
+}
+
+STREAM_KEY = 'delivery:events:{}'
+
+DISPATCH = 'dispatch'
+FLEET = 'fleet'
+
+# Stream id before any entry
+START = '0-0'
+
+# Entries returned per read
+READ_COUNT = 100
+
+
+def get_config() -> dict:
+    """Delivery event configuration from settings."""
+    return {**DEFAULTS, **getattr(settings, 'DELIVERY_EVENTS', {})}
+
+
+def delivery_channel(delivery_number: str) -> str:
+    return f'delivery:{delivery_number}'
+
+
+def driver_channel(user_id: int) -> str:
+    return f'driver:{user_id}'
+
+
+class Event(NamedTuple):
+    """One published event as read from a channel."""
+    channel: str
+    id: str
+    event: str
+    data: dict
+
+
+def parse_id(value) -> Optional[Tuple[int, int]]:
+    """A stream id ('<ms>-<seq>') as a comparable tuple, or None if invalid."""
+    try:
+        ms, seq = str(value).split('-')
+        return int(ms), int(seq)
+    except (TypeError, ValueError):
+        return None
+
+
+def _maxlen(channel: str, config: dict) -> int:
+    return config['DISPATCH_MAXLEN'] if channel in (DISPATCH, FLEET) else config['MAXLEN']
+
+
+class RedisChannels:
+    """Channels as Redis Streams on the default cache's server."""
+
+    def __init__(self, backend_client: RedisCacheClient):
+        self.backend_client = backend_client
+        # redis.asyncio clients are bound to the loop that created them
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    def key(self, channel: str) -> str:
+        return cache.make_key(STREAM_KEY.format(channel))
+
+    def publish(self, messages: List[Tuple[str, str]]) -> None:
+        config = get_config()
+        client = self.backend_client.get_client(write=True)
+        with client.pipeline(transaction=False) as pipe:
+            for channel, payload in messages:
+                key = self.key(channel)
+                pipe.xadd(key, {'payload': payload}, maxlen=_maxlen(channel, config), approximate=True)
+                pipe.expire(key, config['STREAM_TTL'])
+            pipe.execute()
+
+    def _async_client(self):
+        import redis.asyncio
+
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = redis.asyncio.Redis.from_url(
+                self.backend_client._servers[0], decode_responses=True
+            )
+            self._async_clients[loop] = client
+        return client
+
+    async def read(self, cursors: Dict[str, str], block: Optional[float]) -> List[Event]:
+        keys = {self.key(channel): channel for channel in cursors}
+        response = await self._async_client().xread(
+            {key: cursors[channel] for key, channel in keys.items()},
+            count=READ_COUNT,
+            block=None if block is None else max(int(block * 1000), 1),
+        )
+        events = []
+        for key, entries in response or ():
+            for entry_id, fields in entries:
+                message = json.loads(fields['payload'])
+                events.append(Event(keys[key], entry_id, message['event'], message['data']))
+        return events
+
+    async def bounds(self, channel: str) -> Tuple[Optional[str], str]:
+        client = self._async_client()
+        key = self.key(channel)
+        first = await client.xrange(key, count=1)
+        last = await client.xrevrange(key, count=1)
+        return (first[0][0] if first else None), (last[0][0] if last else START)
+
+
+class LocalChannels:
+    """In-process channels for caches without Redis; readers poll."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._channels: Dict[str, deque] = {}
+        self._sequence = itertools.count(1)
+        self._last_ms = 0
+
+    def publish(self, messages: List[Tuple[str, str]]) -> None:
+        config = get_config()
+        with self._lock:
+            for channel, payload in messages:
+                entries = self._channels.get(channel)
+                if entries is None:
+                    entries = self._channels[channel] = deque(maxlen=_maxlen(channel, config))
+                # Ids must grow even if the wall clock steps back
+                self._last_ms = max(self._last_ms, int(time.time() * 1000))
+                entry_id = f'{self._last_ms}-{next(self._sequence)}'
+                entries.append((entry_id, json.loads(payload)))
+
+    def _after(self, cursors: Dict[str, str]) -> List[Event]:
+        events = []
+        with self._lock:
+            for channel, cursor in cursors.items():
+                after = parse_id(cursor)
+                for entry_id, message in self._channels.get(channel, ()):
+                    if parse_id(entry_id) > after:
+                        events.append(Event(channel, entry_id, message['event'], message['data']))
+        return events[:READ_COUNT]
+
+    async def read(self, cursors: Dict[str, str], block: Optional[float]) -> List[Event]:
+        events = self._after(cursors)
+        if events or block is None:
+            return events
+        deadline = time.monotonic() + block
+        interval = get_config()['POLL_INTERVAL']
+        while not events and time.monotonic() < deadline:
+            await asyncio.sleep(min(interval, max(deadline - time.monotonic(), 0)))
+            events = self._after(cursors)
+        return events
+
+    async def bounds(self, channel: str) -> Tuple[Optional[str], str]:
+        with self._lock:
+            entries = self._channels.get(channel)
+            if not entries:
+                return None, START
+            return entries[0][0], entries[-1][0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._channels.clear()
+
+
+local_channels = LocalChannels()
+_redis_channels = None
+
+
+def get_channels():
+    """Redis Streams if the default cache is Redis, else the in-process log."""
+    backend_client = getattr(cache, '_cache', None)
+    if isinstance(backend_client, RedisCacheClient):
+        global _redis_channels
+        if _redis_channels is None or _redis_channels.backend_client is not backend_client:
+            _redis_channels = RedisChannels(backend_client)
+        return _redis_channels
+    return local_channels
+
+
+def publish(channels: Iterable[str], event: str, data: dict) -> None:
+    """Publish one event to several channels, logging (not raising) failures."""
+    publish_many([(channel, event, data) for channel in channels])
+
+
+def publish_many(events: List[Tuple[str, str, dict]]) -> None:
+    """Publish (channel, event, data) triples in one round trip."""
+    if not events or not get_config()['ENABLED']:
+        return
+    messages = [
+        (channel, json.dumps({'event': event, 'data': data}, cls=DjangoJSONEncoder))
+        for channel, event, data in events
+    ]
+    try:
+        get_channels().publish(messages)
+    except Exception:
+        logger.exception("Failed to publish %d delivery events", len(messages))
+
+
+def status_data(delivery, from_status: str) -> dict:
+    """Payload of a status event; uses only fields already on the row."""
+    changed_at = getattr(delivery, f'{delivery.status}_at', None) or delivery.updated_at
+    return {
+        'delivery_id': delivery.pk,
+        'delivery_number': delivery.delivery_number,
+        'from_status': from_status,
+        'status': delivery.status,
+        'status_display': delivery.get_status_display(),
+        'driver_id': delivery.driver_id,
+        'scheduled_date': delivery.scheduled_date,
+        'changed_at': changed_at.isoformat() if changed_at else None,
+    }
+
+
+def publish_status(deliveries: Iterable, from_status: str) -> None:
+    """Publish status transitions once the current transaction commits.
+
+    Args:
+        deliveries: Deliveries just moved out of ``from_status``
+        from_status: Their previous status
+    """
+    messages = []
+    for delivery in deliveries:
+        data = status_data(delivery, from_status)
+        messages.append((delivery_channel(delivery.delivery_number), 'status', data))
+        messages.append((DISPATCH, 'status', data))
+    if messages:
+        transaction.on_commit(lambda: publish_many(messages))
+
+
+def publish_positions(points: Iterable) -> None:
+    """Publish the newest fix per driver to their channel and the fleet.
+
+    Args:
+        points: LocationPoint objects, at most one per user
+    """
+    messages = []
+    for point in points:
+        data = {
+            'user_id': point.user_id,
+            'latitude': float(point.latitude),
+            'longitude': float(point.longitude),
+            'updated_at': point.recorded_at.isoformat(),
+        }
+        messages.append((driver_channel(point.user_id), 'location', data))
+        messages.append((FLEET, 'location', data))
+    publish_many(messages)
+
+
+async def read(cursors: Dict[str, str], block: Optional[float] = None) -> List[Event]:
+    """Events published after each channel's cursor.
+
+    Args:
+        cursors: Channel -> last id seen
+        block: Seconds to wait for an event when none are pending (None
+            returns immediately)
+    """
+    return await get_channels().read(cursors, block)
+
+
+async def bounds(channel: str) -> Tuple[Optional[str], str]:
+    """(oldest kept id or None, newest id or START) of a channel."""
+    return await get_channels().bounds(channel)
+
+
+async def resume_from(channel: str, last_event_id: Optional[str]) -> Tuple[str, bool]:
+    """Where a (re)connecting client continues reading a channel.
+
+    Returns:
+        (cursor, resync): the cursor to read after, and whether the client
+        must reload its state first because ``last_event_id`` is missing,
+        invalid or older than the channel keeps
+    """
+    oldest, newest = await bounds(channel)
+    last = parse_id(last_event_id) if last_event_id else None
+    if last is None or last > parse_id(newest):
+        return newest, True
+    if oldest is not None and last_event_id != START and last < parse_id(oldest):
+        # Entries between the client's id and the oldest kept were trimmed
+        return newest, True
+    return last_event_id, False
+
+
+def sse_event(event: str, data: dict, event_id: Optional[str] = None) -> str:
+    """Format one server-sent event, with an id clients resume from."""
+    head = f'id: {event_id}\n' if event_id else ''
+    return f'{head}event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n'
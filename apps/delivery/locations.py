@@ -0,0 +1,316 @@
+"""Driver GPS ingestion.
+
+The fleet app pings every few seconds, so saving the driver row on every
+ping made ``DriverLocationUpdateView`` the busiest write path, contending
+with admin reads and keeping no history. Pings, one or a batch per
+request, now go to three places:
+
+- the latest position per driver is kept in the cache (Redis); customer
+  tracking reads it from there (``latest_position``)
+- every point is appended to ``DriverLocationPing`` breadcrumbs through
+  a write-behind buffer flushed with ``bulk_create``
+- ``current_latitude``/``current_longitude`` on the driver rows are
+  written through by ``write_through`` (Celery task
+  ``write_through_driver_locations``, schedule every
+  ``WRITE_THROUGH_INTERVAL`` seconds) from the breadcrumbs of the last
+  two intervals
+
+Breadcrumbs older than ``RETENTION_DAYS`` are deleted by
+``purge_breadcrumbs`` (Celery task ``purge_driver_location_pings``,
+schedule nightly).
+
+Drivers exist as both DriverCapability and the deprecated DeliveryDriver
+during the migration, so positions are keyed by the user they share.
+
+Configuration (``settings.DRIVER_LOCATIONS``):
+    'WRITE_MODE': 'buffered',      # or 'sync' to write everything inside the request
+    'MAX_POINTS': 120,             # points accepted per request
+    'POSITION_TTL': 3600,          # seconds a latest position is kept
+    'WRITE_THROUGH_INTERVAL': 60,
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 2.0,
+    'QUEUE_SIZE': 20000,
+    'RETENTION_DAYS': 30,          # days breadcrumbs are kept
+"""
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.core.write_behind import WriteBehindBuffer
+
+from . import events
+from .models import DeliveryDriver, DriverCapability, DriverLocationPing
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'WRITE_MODE': 'buffered',
+    'MAX_POINTS': 120,
+    'POSITION_TTL': 3600,
+    'WRITE_THROUGH_INTERVAL': 60,
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 2.0,
+    'QUEUE_SIZE': 20000,
+    'RETENTION_DAYS': 30,
+}
+
+POSITION_KEY = 'delivery:driver_position:{}'
+
+# Breadcrumbs deleted per statement when purging
+PURGE_BATCH_SIZE = 5000
+
+# DecimalField(max_digits=9, decimal_places=6)
+COORDINATE_PLACES = Decimal('0.000001')
+
+# Driver models and the field linking each to its user
+DRIVER_MODELS = ((DeliveryDriver, 'user_id'), (DriverCapability, 'person_id'))
+
+
+def get_config() -> dict:
+    """Driver location configuration from settings."""
+    return {**DEFAULTS, **getattr(settings, 'DRIVER_LOCATIONS', {})}
+
+
+class LocationPoint(NamedTuple):
+    """One GPS fix from a driver's device."""
+    user_id: int
+    latitude: Decimal
+    longitude: Decimal
+    recorded_at: datetime
+
+
+def _coordinate(value, limit: int) -> Decimal:
+    try:
+        coordinate = Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"Invalid coordinate: {value}")
+    if not coordinate.is_finite() or abs(coordinate) > limit:
+        raise ValueError(f"Coordinate out of range: {value}")
+    return coordinate.quantize(COORDINATE_PLACES)
+
+
+def _recorded_at(value, received_at: datetime) -> datetime:
+    """Device timestamp (ISO 8601 or epoch seconds), never later than receipt."""
+    if value is None:
+        return received_at
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        try:
+            recorded_at = datetime.fromtimestamp(value, tz=dt_timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            raise ValueError(f"Invalid recorded_at: {value}")
+    else:
+        recorded_at = parse_datetime(str(value))
+        if recorded_at is None:
+            raise ValueError(f"Invalid recorded_at: {value}")
+        if timezone.is_naive(recorded_at):
+            recorded_at = timezone.make_aware(recorded_at)
+    # Device clocks run ahead; a future fix would hide every later one
+    return min(recorded_at, received_at)
+
+
+def parse_points(user_id: int, data: dict, received_at: Optional[datetime] = None) -> List[LocationPoint]:
+    """Points from a location update body.
+
+    Accepts a single fix (``{"latitude", "longitude"[, "recorded_at"]}``)
+    or a batch (``{"points": [fix, ...]}``).
+
+    Raises:
+        ValueError: Missing or invalid coordinates, or too many points
+    """
+    received_at = received_at or timezone.now()
+    fixes = data.get('points') if isinstance(data, dict) and 'points' in data else [data]
+    if not isinstance(fixes, list) or not fixes:
+        raise ValueError("Coordinates required")
+    max_points = get_config()['MAX_POINTS']
+    if len(fixes) > max_points:
+        raise ValueError(f"At most {max_points} points per request")
+
+    points = []
+    for fix in fixes:
+        if not isinstance(fix, dict) or fix.get('latitude') is None or fix.get('longitude') is None:
+            raise ValueError("Coordinates required")
+        points.append(LocationPoint(
+            user_id=user_id,
+            latitude=_coordinate(fix['latitude'], 90),
+            longitude=_coordinate(fix['longitude'], 180),
+            recorded_at=_recorded_at(fix.get('recorded_at'), received_at),
+        ))
+    return points
+
+
+def latest_position(user_id: int) -> Optional[dict]:
+    """Latest cached position of a driver's user, or None."""
+    return cache.get(POSITION_KEY.format(user_id))
+
+
+def latest_positions(user_ids: Iterable[int]) -> Dict[int, dict]:
+    """Latest cached positions for several users, in one cache round trip."""
+    keys = {POSITION_KEY.format(user_id): user_id for user_id in user_ids}
+    return {keys[key]: position for key, position in cache.get_many(list(keys)).items()}
+
+
+def current_position(driver) -> Optional[dict]:
+    """A driver's latest position for display: the cached fix, else the row.
+
+    Args:
+        driver: DeliveryDriver or DriverCapability
+
+    Returns:
+        Dict with 'latitude', 'longitude' (floats) and 'updated_at' (ISO
+        string or None), or None if the position is unknown
+    """
+    user_id = driver.person_id if isinstance(driver, DriverCapability) else driver.user_id
+    position = latest_position(user_id)
+    if position:
+        return {
+            'latitude': float(position['latitude']),
+            'longitude': float(position['longitude']),
+            'updated_at': position['recorded_at'].isoformat(),
+        }
+    if driver.current_latitude:
+        return {
+            'latitude': float(driver.current_latitude),
+            'longitude': float(driver.current_longitude),
+            'updated_at': driver.location_updated_at.isoformat() if driver.location_updated_at else None,
+        }
+    return None
+
+
+def _newest(points: Iterable[LocationPoint]) -> Dict[int, LocationPoint]:
+    newest = {}
+    for point in points:
+        current = newest.get(point.user_id)
+        if current is None or point.recorded_at >= current.recorded_at:
+            newest[point.user_id] = point
+    return newest
+
+
+def _store_position(point: LocationPoint) -> None:
+    """Cache a fix unless a newer one is already cached.
+
+    Read-then-write: two requests for the same driver racing can keep the
+    older fix until the next ping, which is a few seconds away.
+    """
+    key = POSITION_KEY.format(point.user_id)
+    current = cache.get(key)
+    if current is not None and current['recorded_at'] > point.recorded_at:
+        return
+    cache.set(key, {
+        'latitude': point.latitude,
+        'longitude': point.longitude,
+        'recorded_at': point.recorded_at,
+    }, get_config()['POSITION_TTL'])
+
+
+def write_breadcrumbs(points: List[LocationPoint]) -> int:
+    """Append points to the breadcrumb table in bulk."""
+    DriverLocationPing.objects.bulk_create([
+        DriverLocationPing(
+            user_id=point.user_id, latitude=point.latitude,
+            longitude=point.longitude, recorded_at=point.recorded_at,
+        )
+        for point in points
+    ], batch_size=1000)
+    return len(points)
+
+
+def write_driver_positions(newest: Dict[int, LocationPoint]) -> int:
+    """Copy the newest fix per user to their driver rows, if it is newer.
+
+    Returns:
+        Number of driver rows updated.
+    """
+    fields = ['current_latitude', 'current_longitude', 'location_updated_at']
+    updated = 0
+    for model, user_field in DRIVER_MODELS:
+        changed = []
+        drivers = model.objects.filter(**{f'{user_field}__in': list(newest)}).only(
+            'pk', user_field, 'location_updated_at'
+        )
+        for driver in drivers:
+            point = newest[getattr(driver, user_field)]
+            if driver.location_updated_at and driver.location_updated_at >= point.recorded_at:
+                continue
+            driver.current_latitude = point.latitude
+            driver.current_longitude = point.longitude
+            driver.location_updated_at = point.recorded_at
+            changed.append(driver)
+        model.objects.bulk_update(changed, fields, batch_size=500)
+        updated += len(changed)
+    return updated
+
+
+def write_through(since: Optional[datetime] = None) -> int:
+    """Write the newest breadcrumb per driver through to the driver rows.
+
+    Args:
+        since: Oldest fix to consider (default: two write-through
+            intervals ago)
+
+    Returns:
+        Number of driver rows updated.
+    """
+    if since is None:
+        since = timezone.now() - timedelta(seconds=2 * get_config()['WRITE_THROUGH_INTERVAL'])
+    rows = DriverLocationPing.objects.filter(recorded_at__gte=since).values_list(
+        'user_id', 'latitude', 'longitude', 'recorded_at'
+    )
+    newest = _newest(LocationPoint(*row) for row in rows)
+    if not newest:
+        return 0
+    return write_driver_positions(newest)
+
+
+def purge_breadcrumbs(now: Optional[datetime] = None) -> int:
+    """Delete breadcrumbs older than ``RETENTION_DAYS``.
+
+    Deletes in batches of ``PURGE_BATCH_SIZE`` so a large backlog does not
+    hold one long transaction against the ingest path.
+
+    Returns:
+        Number of breadcrumbs deleted.
+    """
+    cutoff = (now or timezone.now()) - timedelta(days=get_config()['RETENTION_DAYS'])
+    expired = DriverLocationPing.objects.filter(recorded_at__lt=cutoff)
+    deleted = 0
+    while True:
+        ids = list(expired.values_list('pk', flat=True)[:PURGE_BATCH_SIZE])
+        if not ids:
+            return deleted
+        deleted += DriverLocationPing.objects.filter(pk__in=ids).delete()[0]
+
+
+# Per-process breadcrumb buffer used by DriverLocationUpdateView
+breadcrumb_buffer = WriteBehindBuffer(
+    'driver-location-writer',
+    write_breadcrumbs,
+    batch_size=get_config()['BATCH_SIZE'],
+    flush_interval=get_config()['FLUSH_INTERVAL'],
+    max_size=get_config()['QUEUE_SIZE'],
+)
+
+
+def record(points: List[LocationPoint]) -> None:
+    """Ingest parsed points: cache and publish the latest, then queue or write the rest.
+
+    In sync mode the breadcrumbs and driver rows are written now.
+    """
+    newest = _newest(points)
+    for point in newest.values():
+        _store_position(point)
+    events.publish_positions(newest.values())
+
+    if get_config()['WRITE_MODE'] == 'sync':
+        write_breadcrumbs(points)
+        write_driver_positions(newest)
+        return
+    for point in points:
+        if not breadcrumb_buffer.add(point):
+            logger.warning("Driver location buffer full; dropped points for user %s", point.user_id)
+            break
@@ -19,6 +19,8 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 
 from apps.core.storage import delivery_contract_path, delivery_id_path, delivery_proof_path
 
+from . import events
+
 
 class DeliveryZone(models.Model):
     """Geographic delivery zone with specific fees and ETAs."""
@@ -466,6 +468,9 @@ class Delivery(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['scheduled_date', 'status']),
+        ]
 
     def __str__(self):
         return self.delivery_number
@@ -518,6 +523,7 @@ class Delivery(models.Model):
             latitude=latitude,
             longitude=longitude
         )
+        events.publish_status([self], old_status)
 
     def assign_driver(self, driver, assigned_by=None):
         """Assign driver to delivery."""
@@ -702,3 +708,76 @@ class DeliveryNotification(models.Model):
 
     def __str__(self):
         return f"{self.delivery.delivery_number} - {self.notification_type}"
+
+
+class DeliveryDailyRollup(models.Model):
+    """Per-day delivery counts by driver and zone.
+
+    Maintained by ``apps.delivery.analytics`` for past days, so reports over
+    long ranges sum a few rows per day instead of scanning deliveries.
+    """
+
+    day = models.DateField()
+    # No FK constraint: rollups keep their counts if a driver or zone is deleted
+    driver = models.ForeignKey(
+        DeliveryDriver,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    zone = models.ForeignKey(
+        DeliveryZone,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    total = models.PositiveIntegerField(default=0)
+    delivered = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    pending = models.PositiveIntegerField(default=0)
+    on_time = models.PositiveIntegerField(default=0)
+    late = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Delivery Daily Rollup'
+        verbose_name_plural = 'Delivery Daily Rollups'
+        indexes = [
+            models.Index(fields=['day', 'driver']),
+        ]
+
+    def __str__(self):
+        return f"{self.day} driver={self.driver_id} zone={self.zone_id}: {self.total}"
+
+
+class DriverLocationPing(models.Model):
+    """One GPS breadcrumb from a driver's device (append-only).
+
+    Written in batches by ``apps.delivery.locations``. Keyed by user, which
+    DriverCapability and the deprecated DeliveryDriver share.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+'
+    )
+    latitude = models.DecimalField(max_digits=9, decimal_places=6)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6)
+    recorded_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'recorded_at']),
+            models.Index(fields=['recorded_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} @ {self.recorded_at}: {self.latitude}, {self.longitude}"
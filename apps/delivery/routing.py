@@ -0,0 +1,321 @@
+"""Offline route sequencing and distance estimates for delivery batches.
+
+``delivered_distance_km`` was entered by hand, so contractors were paid
+per km only when someone typed it in, and nothing ordered a driver's
+stops. Routes are now computed locally from ``Delivery.latitude`` and
+``longitude`` with no maps service:
+
+- ``distance_matrix``: great-circle distances between every pair of
+  stops, vectorised with NumPy
+- ``sequence``: a driver's stops ordered by nearest neighbour, then
+  improved with 2-opt. Slots are visited in time order; stops are only
+  reordered within a slot
+- ``estimate_leg_km`` / ``estimate_distances``: the distance of each
+  delivered stop from the driver's previous one (or the depot), stored
+  in ``delivered_distance_km`` where it is still empty, for
+  ``DeliveryPaymentService.calculate_payment``
+
+Straight-line distances are scaled by ``ROAD_FACTOR`` to approximate the
+road network. A few hundred stops sequence in well under a second.
+
+Configuration (``settings.DELIVERY_ROUTING``):
+    'DEPOT': '',            # 'latitude,longitude' routes start from
+    'ROAD_FACTOR': 1.3,     # road distance / straight-line distance
+    'MAX_LEG_KM': 60,       # longer legs are taken as bad coordinates
+    'MAX_PASSES': 50,       # 2-opt improvement passes
+"""
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Delivery
+
+DEFAULTS = {
+    'DEPOT': '',
+    'ROAD_FACTOR': 1.3,
+    'MAX_LEG_KM': 60,
+    'MAX_PASSES': 50,
+}
+
+EARTH_RADIUS_KM = 6371.0
+
+# Smallest 2-opt gain (km) worth a reversal; avoids float ping-pong
+MIN_GAIN_KM = 1e-9
+
+# DecimalField(max_digits=10, decimal_places=2)
+DISTANCE_PLACES = Decimal('0.01')
+
+Point = Tuple[float, float]
+
+
+def get_config() -> dict:
+    """Routing configuration from settings."""
+    return {**DEFAULTS, **getattr(settings, 'DELIVERY_ROUTING', {})}
+
+
+def depot() -> Optional[Point]:
+    """The configured depot as (latitude, longitude), or None."""
+    value = get_config()['DEPOT']
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = value.split(',')
+    latitude, longitude = (float(part) for part in value)
+    return latitude, longitude
+
+
+def distance_matrix(points: Sequence[Point], others: Optional[Sequence[Point]] = None) -> np.ndarray:
+    """Great-circle distances in km between (latitude, longitude) points.
+
+    Args:
+        points: N points
+        others: M points (default: ``points``)
+
+    Returns:
+        N x M array
+    """
+    a = np.radians(np.asarray(points, dtype=float).reshape(-1, 2))
+    b = a if others is None else np.radians(np.asarray(others, dtype=float).reshape(-1, 2))
+    lat1, lng1 = a[:, 0, None], a[:, 1, None]
+    lat2, lng2 = b[None, :, 0], b[None, :, 1]
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def leg_distances(points: Sequence[Point]) -> np.ndarray:
+    """Great-circle distances in km between consecutive points (N - 1 legs)."""
+    p = np.radians(np.asarray(points, dtype=float).reshape(-1, 2))
+    lat1, lng1, lat2, lng2 = p[:-1, 0], p[:-1, 1], p[1:, 0], p[1:, 1]
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def nearest_neighbour(dist: np.ndarray, start: Optional[int] = None) -> List[int]:
+    """Visit order of all nodes of ``dist``, always moving to the nearest unvisited.
+
+    Args:
+        dist: Square distance matrix
+        start: First node (default: the most outlying node, so the path
+            sweeps across rather than starting in the middle)
+    """
+    n = len(dist)
+    if start is None:
+        start = int(np.argmax(dist.sum(axis=1)))
+    visited = np.zeros(n, dtype=bool)
+    visited[start] = True
+    path = [start]
+    for _ in range(n - 1):
+        nearest = int(np.argmin(np.where(visited, np.inf, dist[path[-1]])))
+        visited[nearest] = True
+        path.append(nearest)
+    return path
+
+
+def two_opt(dist: np.ndarray, path: List[int], fixed_start: bool = True, max_passes: int = None) -> List[int]:
+    """Improve an open path by reversing segments while that shortens it.
+
+    For each segment start ``i`` every segment end ``j`` is scored at
+    once; the best shortening reversal is applied. Passes repeat until
+    none shortens the path or ``max_passes`` is reached.
+
+    Args:
+        dist: Square distance matrix
+        path: Node order to improve
+        fixed_start: Keep ``path[0]`` first (the depot or previous stop)
+    """
+    if max_passes is None:
+        max_passes = get_config()['MAX_PASSES']
+    route = np.asarray(path, dtype=int)
+    n = len(route)
+    for _ in range(max_passes):
+        improved = False
+        for i in range(1 if fixed_start else 0, n - 1):
+            j = np.arange(i + 1, n)
+            first, last = route[i], route[j]
+            # Node after each segment end; the path is open, so none after the last
+            after = route[np.minimum(j + 1, n - 1)]
+            has_after = j + 1 < n
+            gain = (dist[last, after] - dist[first, after]) * has_after
+            if i > 0:
+                before = route[i - 1]
+                gain = gain + dist[before, first] - dist[before, last]
+            best = int(np.argmax(gain))
+            if gain[best] > MIN_GAIN_KM:
+                end = j[best] + 1
+                route[i:end] = route[i:end][::-1].copy()
+                improved = True
+        if not improved:
+            break
+    return route.tolist()
+
+
+def path_length(dist: np.ndarray, path: Sequence[int]) -> float:
+    """Length of an open path through ``dist``."""
+    path = np.asarray(path, dtype=int)
+    return float(dist[path[:-1], path[1:]].sum())
+
+
+class Route(NamedTuple):
+    """A sequenced list of stops.
+
+    ``legs_km[k]`` is the estimated road distance to ``stops[k]`` from the
+    previous stop, or from the start; None for the first stop of a route
+    without a start.
+    """
+    stops: List[Delivery]
+    legs_km: List[Optional[float]]
+    unrouted: List[Delivery]
+
+    @property
+    def total_km(self) -> float:
+        return sum(leg for leg in self.legs_km if leg is not None)
+
+
+def _slot_key(stop) -> Tuple[bool, time]:
+    start = stop.scheduled_time_start
+    return start is None, start or time.min
+
+
+def sequence(stops: Sequence[Delivery], start: Optional[Point] = None) -> Route:
+    """Order stops into a short route, keeping their slots in time order.
+
+    Args:
+        stops: Deliveries to visit (one driver's day)
+        start: (latitude, longitude) the route starts from, such as the
+            depot or the driver's position
+
+    Returns:
+        Route; stops without coordinates are returned as ``unrouted``
+    """
+    routable = [stop for stop in stops if stop.latitude is not None and stop.longitude is not None]
+    unrouted = [stop for stop in stops if stop.latitude is None or stop.longitude is None]
+    if not routable:
+        return Route([], [], unrouted)
+
+    points = [(float(stop.latitude), float(stop.longitude)) for stop in routable]
+    offset = 0 if start is None else 1
+    if start is not None:
+        points.insert(0, start)
+    dist = distance_matrix(points)
+
+    slots: Dict[Tuple[bool, time], List[int]] = {}
+    for index, stop in enumerate(routable):
+        slots.setdefault(_slot_key(stop), []).append(index + offset)
+
+    order = []
+    current = None if start is None else 0
+    for key in sorted(slots):
+        nodes = slots[key] if current is None else [current] + slots[key]
+        sub = dist[np.ix_(nodes, nodes)]
+        path = nearest_neighbour(sub, None if current is None else 0)
+        path = two_opt(sub, path, fixed_start=current is not None)
+        visit = [nodes[k] for k in path]
+        order.extend(visit if current is None else visit[1:])
+        current = order[-1]
+
+    road_factor = get_config()['ROAD_FACTOR']
+    legs = [None if start is None else float(dist[0, order[0]]) * road_factor]
+    legs.extend(float(dist[a, b]) * road_factor for a, b in zip(order, order[1:]))
+    return Route([routable[node - offset] for node in order], legs, unrouted)
+
+
+def driver_route(driver, day: date, start: Optional[Point] = None) -> Route:
+    """A driver's stops still to make on a day, sequenced from ``start``.
+
+    Args:
+        driver: DeliveryDriver
+        day: Scheduled date
+        start: Where the route starts (default: the depot)
+    """
+    stops = list(Delivery.objects.filter(
+        driver=driver, scheduled_date=day,
+        status__in=['assigned', 'picked_up', 'out_for_delivery', 'arrived'],
+    ).order_by('scheduled_time_start', 'pk'))
+    return sequence(stops, start if start is not None else depot())
+
+
+def _to_decimal(km: float) -> Decimal:
+    return Decimal(str(km)).quantize(DISTANCE_PLACES)
+
+
+def _valid_leg(km: float) -> bool:
+    return 0 <= km <= get_config()['MAX_LEG_KM']
+
+
+def estimate_leg_km(delivery: Delivery) -> Optional[Decimal]:
+    """Estimated road distance to a delivery from the driver's previous stop.
+
+    The previous stop is the driver's last delivery delivered earlier the
+    same day; the first of the day starts from the depot.
+
+    Returns:
+        Distance in km, or None if a position is unknown or implausible
+    """
+    if delivery.latitude is None or delivery.longitude is None or not delivery.driver_id:
+        return None
+    delivered_at = delivery.delivered_at or timezone.now()
+    day_start = timezone.make_aware(datetime.combine(timezone.localdate(delivered_at), time.min))
+    previous = Delivery.objects.filter(
+        driver_id=delivery.driver_id, status='delivered',
+        delivered_at__gte=day_start, delivered_at__lt=delivered_at,
+        latitude__isnull=False, longitude__isnull=False,
+    ).exclude(pk=delivery.pk).order_by('-delivered_at').values_list('latitude', 'longitude').first()
+    origin = previous or depot()
+    if origin is None:
+        return None
+    km = float(leg_distances([origin, (delivery.latitude, delivery.longitude)])[0])
+    km *= get_config()['ROAD_FACTOR']
+    return _to_decimal(km) if _valid_leg(km) else None
+
+
+def estimate_distances(day: Optional[date] = None) -> int:
+    """Fill in missing ``delivered_distance_km`` for a day's deliveries.
+
+    Each driver's deliveries delivered that day (local time) are taken in
+    delivery order; a delivery's distance is the leg from the previous
+    one, the first starting from the depot. Distances entered by hand
+    are kept.
+
+    Args:
+        day: Local delivery date (default yesterday)
+
+    Returns:
+        Number of deliveries updated.
+    """
+    day = day or timezone.localdate() - timedelta(days=1)
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    deliveries = list(Delivery.objects.filter(
+        status='delivered', driver__isnull=False,
+        delivered_at__gte=start, delivered_at__lt=start + timedelta(days=1),
+        latitude__isnull=False, longitude__isnull=False,
+    ).only(
+        'pk', 'driver_id', 'delivered_at', 'latitude', 'longitude',
+        'scheduled_date', 'delivered_distance_km',
+    ).order_by('driver_id', 'delivered_at'))
+
+    by_driver: Dict[int, List[Delivery]] = {}
+    for delivery in deliveries:
+        by_driver.setdefault(delivery.driver_id, []).append(delivery)
+
+    origin = depot()
+    road_factor = get_config()['ROAD_FACTOR']
+    changed = []
+    for stops in by_driver.values():
+        points = [(stop.latitude, stop.longitude) for stop in stops]
+        if origin is not None:
+            points.insert(0, origin)
+        legs = leg_distances(points) * road_factor
+        if origin is None:
+            # No known start for the first stop of the day
+            legs = np.concatenate([[np.nan], legs])
+        for stop, km in zip(stops, legs.tolist()):
+            if stop.delivered_distance_km is None and not np.isnan(km) and _valid_leg(km):
+                stop.delivered_distance_km = _to_decimal(km)
+                changed.append(stop)
+
+    Delivery.objects.bulk_update(changed, ['delivered_distance_km'], batch_size=500)
+    return len(changed)
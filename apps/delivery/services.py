@@ -8,6 +8,8 @@ from django.db.models import Count, Q, Sum
 from django.utils import timezone
 
 from apps.communications.models import MessageTemplate
+from .analytics import driver_earnings
+from .assignment import auto_assign
 from .models import Delivery, DeliveryDriver, DeliveryNotification, DeliveryZone
 
 
@@ -230,27 +232,23 @@ class DeliveryAssignmentService:
         return drivers_with_count[0][0] if drivers_with_count else None
 
     @classmethod
-    def auto_assign_pending(cls) -> List[Delivery]:
-        """Auto-assign pending deliveries to available drivers."""
-        today = date.today()
-        assigned_deliveries = []
+    def auto_assign_pending(
+        cls, day: Optional[date] = None, mode: str = 'greedy', assigned_by=None
+    ) -> List[Delivery]:
+        """Auto-assign pending deliveries to available drivers.
 
-        # Get pending deliveries scheduled for today
-        pending_deliveries = Delivery.objects.filter(
-            status='pending',
-            scheduled_date=today
-        ).select_related('zone')
+        Solves the whole day in one batch; see ``apps.delivery.assignment``.
 
-        for delivery in pending_deliveries:
-            driver = cls.get_best_driver_for_delivery(delivery)
-            if driver:
-                delivery.driver = driver
-                delivery.status = 'assigned'
-                delivery.assigned_at = timezone.now()
-                delivery.save()
-                assigned_deliveries.append(delivery)
+        Args:
+            day: Scheduled date to assign (default today)
+            mode: 'greedy' (least loaded, then best rated driver) or
+                'distance' (minimum total distance from drivers' last GPS fix)
+            assigned_by: User recorded in the status history
 
-        return assigned_deliveries
+        Returns:
+            The deliveries that were assigned
+        """
+        return auto_assign(day=day, mode=mode, assigned_by=assigned_by)
 
 
 class DeliveryPaymentService:
@@ -303,29 +301,4 @@ class DeliveryPaymentService:
 
         Returns dict with total_deliveries, total_earnings, breakdown.
         """
-        # Get delivered deliveries in date range
-        deliveries = Delivery.objects.filter(
-            driver=driver,
-            status='delivered',
-            created_at__date__gte=start_date,
-            created_at__date__lte=end_date
-        )
-
-        total_deliveries = deliveries.count()
-        total_flat_rate = Decimal('0.00')
-        total_distance_payment = Decimal('0.00')
-
-        for delivery in deliveries:
-            payment = cls.calculate_payment(delivery)
-            if payment:
-                total_flat_rate += payment['flat_rate']
-                total_distance_payment += payment['distance_payment']
-
-        total_earnings = total_flat_rate + total_distance_payment
-
-        return {
-            'total_deliveries': total_deliveries,
-            'total_earnings': total_earnings,
-            'total_flat_rate': total_flat_rate,
-            'total_distance_payment': total_distance_payment,
-        }
+        return driver_earnings([driver], start_date, end_date)[driver.id]
@@ -0,0 +1,58 @@
+"""Django signals for the delivery app.
+
+Handles:
+- Delivery or rating changed → Retire the day's report rollups
+- Delivery delivered without a distance → Estimate it for contractor pay
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from . import analytics, routing
+from .models import Delivery, DeliveryRating
+
+
+@receiver(post_init, sender=Delivery)
+def remember_loaded_state(sender, instance, **kwargs):
+    """Keep the loaded date and status.
+
+    A rescheduled delivery also retires its old day, and a status
+    transition can be told apart from a re-save.
+    """
+    # __dict__ avoids loading deferred fields
+    instance._scheduled_date_was = instance.__dict__.get('scheduled_date')
+    instance._status_was = instance.__dict__.get('status')
+
+
+@receiver(pre_save, sender=Delivery)
+def estimate_delivered_distance(sender, instance, **kwargs):
+    """Estimate the distance of a delivery just delivered, unless entered by hand."""
+    if (
+        instance.status == 'delivered'
+        and getattr(instance, '_status_was', None) != 'delivered'
+        and instance.delivered_distance_km is None
+    ):
+        instance.delivered_distance_km = routing.estimate_leg_km(instance)
+
+
+@receiver(post_save, sender=Delivery)
+@receiver(post_delete, sender=Delivery)
+def retire_delivery_rollups(sender, instance, **kwargs):
+    """Report rollups of the delivery's days are stale once this commits."""
+    days = {instance.scheduled_date, getattr(instance, '_scheduled_date_was', None)}
+    transaction.on_commit(lambda: analytics.retire_days(days))
+    instance._scheduled_date_was = instance.scheduled_date
+    instance._status_was = instance.status
+
+
+@receiver(post_save, sender=DeliveryRating)
+@receiver(post_delete, sender=DeliveryRating)
+def retire_rating_rollups(sender, instance, **kwargs):
+    """A new, changed or removed rating changes its delivery day's averages."""
+    delivery_id = instance.delivery_id
+
+    def retire():
+        analytics.retire_days(
+            Delivery.objects.filter(pk=delivery_id).values_list('scheduled_date', flat=True)
+        )
+    transaction.on_commit(retire)
@@ -0,0 +1,177 @@
+"""Server-sent event streams for delivery tracking and dispatch.
+
+Async views served from config.asgi: an open stream waits on the event
+channels (see ``events``) without holding a worker thread. Browsers
+reconnect automatically after ``MAX_DURATION`` or a dropped connection
+and send the id of the last status event they saw as ``Last-Event-ID``;
+the stream replays what was missed, or tells the client to resync when
+the gap is no longer kept.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+
+from . import events, locations
+from .customer_api_views import tracking_data
+from .models import Delivery, DeliveryDriver
+
+# Statuses in which the customer sees the driver's position
+EN_ROUTE = ('out_for_delivery', 'arrived')
+
+# Statuses after which a delivery no longer changes
+FINAL = ('delivered', 'returned')
+
+KEEP_ALIVE = ': keep-alive\n\n'
+
+
+def event_stream_response(stream) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: flush each event
+    return response
+
+
+async def read_until_deadline(cursors: dict):
+    """Yield batches of events, or [] every heartbeat, until MAX_DURATION.
+
+    The first batch is read without waiting so missed events are replayed
+    at once. Cursors are advanced as events are yielded; callers may add
+    or remove channels between batches.
+    """
+    config = events.get_config()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + config['MAX_DURATION']
+    block = None
+    while True:
+        batch = await events.read(cursors, block)
+        for event in batch:
+            if event.channel in cursors:
+                cursors[event.channel] = event.id
+        yield batch
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return
+        block = min(config['HEARTBEAT'], remaining)
+
+
+class DeliveryEventStreamView(View):
+    """Push a delivery's status transitions and driver position to its customer.
+
+    Events:
+        snapshot: The tracking payload (as DeliveryTrackingAPIView), sent
+            on first connect and when missed transitions were trimmed
+        status: A status transition (see ``events.status_data``)
+        location: The driver's position while out for delivery
+    """
+
+    async def get(self, request, delivery_number):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required'}, status=403)
+
+        # Cursor first: transitions committed after it are replayed, so
+        # none fall between the snapshot and the stream
+        channel = events.delivery_channel(delivery_number)
+        cursor, resync = await events.resume_from(channel, request.headers.get('Last-Event-ID'))
+
+        delivery = await Delivery.objects.select_related(
+            'driver__user', 'order'
+        ).filter(delivery_number=delivery_number).afirst()
+        if delivery is None or delivery.order.user_id != user.pk:
+            return JsonResponse({'error': 'Delivery not found'}, status=404)
+
+        return event_stream_response(self.stream(delivery, channel, cursor, resync))
+
+    async def stream(self, delivery, channel, cursor, resync):
+        yield f"retry: {events.get_config()['RETRY']}\n\n"
+        if resync:
+            yield events.sse_event('snapshot', await sync_to_async(tracking_data)(delivery), cursor)
+
+        status, driver_id = delivery.status, delivery.driver_id
+        driver_user_id = delivery.driver.user_id if delivery.driver else None
+        cursors = {channel: cursor}
+        following = None
+
+        async for batch in read_until_deadline(cursors):
+            for event in batch:
+                if event.channel == channel:
+                    status = event.data['status']
+                    yield events.sse_event(event.event, event.data, event.id)
+                elif event.channel == following:
+                    yield events.sse_event(event.event, _position(event.data))
+            if not batch:
+                yield KEEP_ALIVE
+
+            if status in FINAL:
+                return
+
+            # Follow the driver's channel only while they are on the way
+            latest_driver_id = next(
+                (e.data['driver_id'] for e in reversed(batch) if e.channel == channel), driver_id
+            )
+            if latest_driver_id != driver_id:
+                driver_id = latest_driver_id
+                driver_user_id = driver_id and await DeliveryDriver.objects.filter(
+                    pk=driver_id
+                ).values_list('user_id', flat=True).afirst()
+            wanted = events.driver_channel(driver_user_id) if driver_user_id and status in EN_ROUTE else None
+            if wanted != following:
+                cursors.pop(following, None)
+                following = wanted
+                if wanted:
+                    cursors[wanted] = (await events.bounds(wanted))[1]
+                    position = await sync_to_async(locations.latest_position)(driver_user_id)
+                    if position:
+                        yield events.sse_event('location', _position({
+                            'latitude': float(position['latitude']),
+                            'longitude': float(position['longitude']),
+                            'updated_at': position['recorded_at'].isoformat(),
+                        }))
+
+
+def _position(data: dict) -> dict:
+    """A location event as shown to customers (without the driver's user id)."""
+    return {key: data[key] for key in ('latitude', 'longitude', 'updated_at')}
+
+
+class AdminDeliveryEventStreamView(View):
+    """Push every status transition and driver position to dispatchers.
+
+    Events:
+        ready: Sent on first connect, with the id to resume from
+        resync: Transitions were missed and are no longer kept; reload
+            AdminDeliveriesAPIView
+        status: A status transition (see ``events.status_data``)
+        location: A driver's position, with their ``user_id``
+    """
+
+    async def get(self, request):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required'}, status=403)
+        if not user.is_staff or not await sync_to_async(user.has_module_permission)('delivery', 'view'):
+            return JsonResponse({'error': 'Staff access required'}, status=403)
+
+        last_event_id = request.headers.get('Last-Event-ID')
+        cursor, resync = await events.resume_from(events.DISPATCH, last_event_id)
+        fleet_cursor = (await events.bounds(events.FLEET))[1]
+        return event_stream_response(self.stream(cursor, fleet_cursor, resync, last_event_id is None))
+
+    async def stream(self, cursor, fleet_cursor, resync, first_connect):
+        yield f"retry: {events.get_config()['RETRY']}\n\n"
+        if first_connect:
+            # The page has just loaded the deliveries; this only sets the
+            # id to resume from
+            yield events.sse_event('ready', {}, cursor)
+        elif resync:
+            yield events.sse_event('resync', {}, cursor)
+
+        cursors = {events.DISPATCH: cursor, events.FLEET: fleet_cursor}
+        async for batch in read_until_deadline(cursors):
+            for event in batch:
+                event_id = event.id if event.channel == events.DISPATCH else None
+                yield events.sse_event(event.event, event.data, event_id)
+            if not batch:
+                yield KEEP_ALIVE
@@ -0,0 +1,65 @@
+"""Celery tasks for the delivery app."""
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def update_delivery_rollups() -> int:
+    """Bring the daily delivery report rollups up to date (schedule nightly).
+
+    Returns:
+        Number of days rolled up.
+    """
+    from .analytics import update_rollups
+
+    rolled = update_rollups()
+    logger.info("Rolled up %d delivery report days", rolled)
+    return rolled
+
+
+@shared_task
+def write_through_driver_locations() -> int:
+    """Copy the latest GPS breadcrumbs to the driver rows (schedule every minute).
+
+    Returns:
+        Number of driver rows updated.
+    """
+    from .locations import write_through
+
+    updated = write_through()
+    logger.info("Wrote through %d driver locations", updated)
+    return updated
+
+
+@shared_task
+def purge_driver_location_pings() -> int:
+    """Delete GPS breadcrumbs past their retention (schedule nightly).
+
+    Returns:
+        Number of breadcrumbs deleted.
+    """
+    from .locations import purge_breadcrumbs
+
+    deleted = purge_breadcrumbs()
+    logger.info("Purged %d driver location pings", deleted)
+    return deleted
+
+
+@shared_task
+def estimate_delivery_distances() -> int:
+    """Fill in yesterday's missing delivered distances (schedule nightly).
+
+    Earnings and contractor payments read the stored distances directly;
+    the report rollups hold no distances, so they are left alone.
+
+    Returns:
+        Number of deliveries updated.
+    """
+    from .routing import estimate_distances
+
+    updated = estimate_distances()
+    logger.info("Estimated distances for %d deliveries", updated)
+    return updated
@@ -1,19 +1,24 @@
 """Tests for the delivery app."""
 import json
+import random
+import time as clock
 from decimal import Decimal
-from datetime import date, time, timedelta
+from datetime import date, datetime, time, timedelta
 
-from django.test import TestCase, Client
+import pytest
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.apps import apps
 from django.utils import timezone
-from django.db import IntegrityError
+from django.db import IntegrityError, connection, transaction
 
 from .models import (
     DeliveryZone, DeliverySlot, DeliveryDriver,
     Delivery, DeliveryStatusHistory,
-    DeliveryProof, DeliveryRating, DeliveryNotification
+    DeliveryProof, DeliveryRating, DeliveryNotification, DriverLocationPing
 )
 from apps.store.models import Category, Product, Cart, Order
 
@@ -974,6 +979,140 @@ class DriverLocationAPITests(TestCase):
         )
         self.assertEqual(response.status_code, 403)
 
+    def _post_points(self, points):
+        return self.client.post(
+            '/api/driver/location/', data={'points': points},
+            content_type='application/json'
+        )
+
+    def _fix(self, minutes_ago, latitude):
+        recorded_at = timezone.now() - timedelta(minutes=minutes_ago)
+        return {'latitude': latitude, 'longitude': -86.87, 'recorded_at': recorded_at.isoformat()}
+
+    def test_batch_update_keeps_breadcrumbs_and_newest_position(self):
+        """A batch is stored as breadcrumbs; the newest fix is the position."""
+        from apps.delivery import locations
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client.force_login(self.driver_user)
+        response = self._post_points([self._fix(1, 20.81), self._fix(0, 20.83), self._fix(2, 20.80)])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['accepted'], 3)
+        self.assertEqual(response.json()['latitude'], '20.830000')
+        self.assertEqual(
+            DriverLocationPing.objects.filter(user=self.driver_user).count(), 3
+        )
+        self.assertEqual(
+            locations.latest_position(self.driver_user.id)['latitude'], Decimal('20.830000')
+        )
+        self.driver.refresh_from_db()
+        self.assertEqual(self.driver.current_latitude, Decimal('20.830000'))
+
+    def test_older_batch_does_not_replace_position(self):
+        """Fixes that arrive late are kept as history only."""
+        from apps.delivery import locations
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client.force_login(self.driver_user)
+        self._post_points([self._fix(0, 20.83)])
+        self._post_points([self._fix(5, 20.70)])
+
+        self.assertEqual(
+            locations.latest_position(self.driver_user.id)['latitude'], Decimal('20.830000')
+        )
+        self.driver.refresh_from_db()
+        self.assertEqual(self.driver.current_latitude, Decimal('20.830000'))
+        self.assertEqual(DriverLocationPing.objects.count(), 2)
+
+    def test_invalid_points_rejected(self):
+        """Out-of-range coordinates and oversized batches are rejected."""
+        self.client.force_login(self.driver_user)
+        self.assertEqual(self._post_points([self._fix(0, 95)]).status_code, 400)
+        self.assertEqual(self._post_points([self._fix(0, 'north')]).status_code, 400)
+        self.assertEqual(self._post_points([self._fix(0, 20.8)] * 121).status_code, 400)
+        self.assertEqual(DriverLocationPing.objects.count(), 0)
+
+    @override_settings(DRIVER_LOCATIONS={'WRITE_MODE': 'buffered'})
+    def test_buffered_mode_writes_driver_row_periodically(self):
+        """Buffered pings update the cache now and the database later."""
+        from apps.delivery import locations
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+        buffer = locations.breadcrumb_buffer
+        original = buffer.batch_size, buffer.flush_interval
+        buffer.batch_size, buffer.flush_interval = 10 ** 6, 3600
+        self.addCleanup(setattr, buffer, 'batch_size', original[0])
+        self.addCleanup(setattr, buffer, 'flush_interval', original[1])
+        self.addCleanup(buffer.clear)
+
+        self.client.force_login(self.driver_user)
+        with self.assertNumQueries(0):
+            locations.record(locations.parse_points(self.driver_user.id, self._fix(0, 20.83)))
+        self._post_points([self._fix(1, 20.82), self._fix(0, 20.84)])
+
+        self.assertEqual(DriverLocationPing.objects.count(), 0)
+        self.driver.refresh_from_db()
+        self.assertIsNone(self.driver.current_latitude)
+        self.assertEqual(
+            locations.latest_position(self.driver_user.id)['latitude'], Decimal('20.840000')
+        )
+
+        self.assertEqual(buffer.flush(), 3)
+        self.assertEqual(locations.write_through(), 1)
+        self.driver.refresh_from_db()
+        self.assertEqual(self.driver.current_latitude, Decimal('20.840000'))
+
+    @override_settings(DRIVER_LOCATIONS={'RETENTION_DAYS': 30})
+    def test_purge_deletes_expired_breadcrumbs(self):
+        """Breadcrumbs past the retention period are deleted in batches."""
+        from unittest.mock import patch
+
+        from apps.delivery import locations
+        from apps.delivery.tasks import purge_driver_location_pings
+
+        now = timezone.now()
+        DriverLocationPing.objects.bulk_create([
+            DriverLocationPing(
+                user=self.driver_user, latitude=Decimal('20.83'), longitude=Decimal('-86.87'),
+                recorded_at=now - timedelta(days=days),
+            )
+            for days in (31, 31, 40, 29, 0)
+        ])
+
+        with patch.object(locations, 'PURGE_BATCH_SIZE', 2):
+            self.assertEqual(purge_driver_location_pings(), 3)
+        self.assertEqual(DriverLocationPing.objects.count(), 2)
+        self.assertEqual(locations.purge_breadcrumbs(), 0)
+
+    def test_tracking_reads_cached_position(self):
+        """Customer tracking shows the cached fix before it reaches the driver row."""
+        from apps.delivery import locations
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+        customer = User.objects.create_user('trackcust', 'trackcust@test.com', 'pass')
+        order = Order.objects.create(
+            user=customer, order_number='ORD-TRACK-1', fulfillment_method='delivery',
+            subtotal=Decimal('100.00'), total=Decimal('100.00'),
+        )
+        delivery = Delivery.objects.create(
+            order=order, driver=self.driver, status='out_for_delivery',
+            scheduled_date=date.today()
+        )
+        locations._store_position(locations.LocationPoint(
+            self.driver_user.id, Decimal('20.830000'), Decimal('-86.870000'), timezone.now()
+        ))
+
+        self.client.force_login(customer)
+        response = self.client.get(f'/api/delivery/track/{delivery.delivery_number}/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['driver_location']['latitude'], 20.83)
+
 
 class ProofOfDeliveryAPITests(TestCase):
     """Tests for Proof of Delivery API."""
@@ -1497,6 +1636,208 @@ class DeliveryTrackingPageTests(TestCase):
         self.assertEqual(response.status_code, 404)
 
 
+class DeliveryEventStreamTests(TestCase):
+    """Tests for server-sent delivery events."""
+
+    def setUp(self):
+        """Set up a delivery, its customer, a driver and a dispatcher."""
+        from apps.delivery import events
+
+        events.local_channels.clear()
+        self.addCleanup(events.local_channels.clear)
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+        self.user = User.objects.create_user('customer', 'customer@test.com', 'pass')
+        self.other_user = User.objects.create_user('other', 'other@test.com', 'pass')
+        self.admin_user = User.objects.create_superuser('admin', 'admin@test.com', 'pass')
+        self.driver = DeliveryDriver.objects.create(
+            user=User.objects.create_user('driver', 'driver@test.com', 'pass'),
+            driver_type='employee', is_active=True, is_available=True
+        )
+        zone = DeliveryZone.objects.create(code='CENTRO', name='Centro', delivery_fee=Decimal('50.00'))
+        category = Category.objects.create(name='Food', slug='food')
+        product = Product.objects.create(
+            name='Dog Food', slug='dog-food', category=category,
+            price=Decimal('100.00'), sku='FOOD-001'
+        )
+        cart = Cart.objects.create(user=self.user)
+        cart.add_item(product, 1)
+        order = Order.create_from_cart(
+            cart=cart, user=self.user, fulfillment_method='delivery',
+            payment_method='cash', shipping_address='123 Main St',
+            shipping_name='John Doe', shipping_phone='555-1234'
+        )
+        self.delivery = Delivery.objects.create(
+            order=order, zone=zone, address='123 Main St',
+            scheduled_date=date.today(), status='pending'
+        )
+        self.url = f'/api/delivery/track/{self.delivery.delivery_number}/events/'
+
+    def _stream(self, url, user, last_event_id=None):
+        """Open a stream (ending after one read) and parse its events."""
+        from asgiref.sync import async_to_sync
+
+        self.async_client.force_login(user)
+        headers = {'Last-Event-ID': last_event_id} if last_event_id else {}
+
+        async def read():
+            response = await self.async_client.get(url, headers=headers)
+            if not response.streaming:
+                return response, []
+            body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+            return response, body.strip().split('\n\n')
+
+        with override_settings(DELIVERY_EVENTS={'MAX_DURATION': 0}):
+            response, blocks = async_to_sync(read)()
+        parsed = []
+        for block in blocks:
+            fields = dict(line.split(': ', 1) for line in block.split('\n') if not line.startswith(':'))
+            if 'event' in fields:
+                parsed.append((fields['event'], json.loads(fields['data']), fields.get('id')))
+        return response, parsed
+
+    def _advance(self, *steps):
+        """Run status changes, publishing as their transactions commit."""
+        for step in steps:
+            with self.captureOnCommitCallbacks(execute=True):
+                step()
+            self.delivery.refresh_from_db()
+
+    def _channel_ids(self, channel):
+        from asgiref.sync import async_to_sync
+        from apps.delivery import events
+
+        return [event.id for event in async_to_sync(events.read)({channel: events.START})]
+
+    def test_status_change_published_after_commit(self):
+        """Transitions reach the delivery and dispatch channels once committed."""
+        from asgiref.sync import async_to_sync
+        from apps.delivery import events
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.delivery.assign_driver(self.driver)
+            self.assertEqual(self._channel_ids(events.DISPATCH), [])
+        for callback in callbacks:
+            callback()
+
+        channel = events.delivery_channel(self.delivery.delivery_number)
+        published = async_to_sync(events.read)({channel: events.START, events.DISPATCH: events.START})
+        self.assertEqual([e.channel for e in published], [channel, events.DISPATCH])
+        data = published[0].data
+        self.assertEqual(data['status'], 'assigned')
+        self.assertEqual(data['from_status'], 'pending')
+        self.assertEqual(data['driver_id'], self.driver.pk)
+
+    def test_batch_assignment_publishes_status(self):
+        """Deliveries assigned in a batch are published too."""
+        from apps.delivery import events
+        from apps.delivery.services import DeliveryAssignmentService
+
+        self.driver.zones.add(self.delivery.zone)
+        with self.captureOnCommitCallbacks(execute=True):
+            DeliveryAssignmentService.auto_assign_pending()
+        self.assertEqual(len(self._channel_ids(events.DISPATCH)), 1)
+
+    def test_stream_requires_owner(self):
+        """Only the customer who placed the order can follow it."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+        response, parsed = self._stream(self.url, self.other_user)
+        self.assertEqual(response.status_code, 404)
+
+    def test_first_connect_sends_snapshot(self):
+        """A new stream starts with the current tracking payload."""
+        response, parsed = self._stream(self.url, self.user)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertEqual([name for name, _, _ in parsed], ['snapshot'])
+        self.assertEqual(parsed[0][1]['status'], 'pending')
+        self.assertIsNotNone(parsed[0][2])
+
+    def test_reconnect_replays_missed_transitions(self):
+        """Reconnecting with Last-Event-ID replays what was missed, in order."""
+        _, parsed = self._stream(self.url, self.user)
+        last_event_id = parsed[0][2]
+
+        self._advance(
+            lambda: self.delivery.assign_driver(self.driver),
+            lambda: self.delivery.mark_picked_up(),
+        )
+        _, parsed = self._stream(self.url, self.user, last_event_id)
+        self.assertEqual([(name, data['status']) for name, data, _ in parsed], [
+            ('status', 'assigned'), ('status', 'picked_up'),
+        ])
+
+        _, parsed = self._stream(self.url, self.user, parsed[-1][2])
+        self.assertEqual(parsed, [])
+
+    def test_reconnect_after_trim_resyncs(self):
+        """A Last-Event-ID older than the channel keeps gets a new snapshot."""
+        from apps.delivery import events
+
+        with override_settings(DELIVERY_EVENTS={'MAXLEN': 1}):
+            self._advance(
+                lambda: self.delivery.assign_driver(self.driver),
+                lambda: self.delivery.mark_picked_up(),
+            )
+        self.assertEqual(len(self._channel_ids(events.delivery_channel(self.delivery.delivery_number))), 1)
+
+        _, parsed = self._stream(self.url, self.user, '1-0')
+        self.assertEqual([(name, data['status']) for name, data, _ in parsed], [('snapshot', 'picked_up')])
+
+    def test_driver_position_sent_while_en_route(self):
+        """Out for delivery, the customer gets the driver's position."""
+        from apps.delivery import locations
+
+        self._advance(
+            lambda: self.delivery.assign_driver(self.driver),
+            lambda: self.delivery.mark_picked_up(),
+        )
+        locations.record(locations.parse_points(self.driver.user_id, {'latitude': 20.5, 'longitude': -87.1}))
+        _, parsed = self._stream(self.url, self.user)
+        self.assertNotIn('location', [name for name, _, _ in parsed])
+
+        self._advance(lambda: self.delivery.mark_out_for_delivery())
+        _, parsed = self._stream(self.url, self.user)
+        location = [data for name, data, _ in parsed if name == 'location']
+        self.assertEqual(len(location), 1)
+        self.assertEqual(location[0]['latitude'], 20.5)
+        self.assertNotIn('user_id', location[0])
+
+    def test_dispatch_stream_requires_staff(self):
+        """Customers cannot follow the dispatch stream."""
+        response, _ = self._stream('/api/delivery/admin/events/', self.user)
+        self.assertEqual(response.status_code, 403)
+
+    def test_dispatch_stream_relays_status_and_positions(self):
+        """Dispatchers get every transition (with ids) and driver positions."""
+        from apps.delivery import locations
+
+        _, parsed = self._stream('/api/delivery/admin/events/', self.admin_user)
+        self.assertEqual([name for name, _, _ in parsed], ['ready'])
+
+        # Positions are not replayed, transitions are
+        locations.record(locations.parse_points(self.driver.user_id, {'latitude': 20.4, 'longitude': -87.1}))
+        self._advance(lambda: self.delivery.assign_driver(self.driver))
+        _, parsed = self._stream('/api/delivery/admin/events/', self.admin_user, parsed[0][2])
+        self.assertEqual([name for name, _, _ in parsed], ['status'])
+        self.assertEqual(parsed[0][1]['delivery_id'], self.delivery.pk)
+        self.assertIsNotNone(parsed[0][2])
+
+        _, parsed = self._stream('/api/delivery/admin/events/', self.admin_user, '1-0')
+        self.assertEqual([name for name, _, _ in parsed], ['resync'])
+
+    def test_publish_failure_does_not_break_status_change(self):
+        """Publishing is best effort."""
+        from unittest.mock import patch
+        from apps.delivery import events
+
+        with patch.object(events.local_channels, 'publish', side_effect=ConnectionError):
+            self._advance(lambda: self.delivery.assign_driver(self.driver))
+        self.assertEqual(self.delivery.status, 'assigned')
+
+
 class DeliveryNotificationServiceTests(TestCase):
     """Tests for delivery notification service."""
 
@@ -2036,6 +2377,203 @@ class AutoAssignmentTests(TestCase):
         drivers = DeliveryAssignmentService.get_available_drivers_for_zone(self.zone2)
         self.assertEqual(len(drivers), 1)  # Only driver2 covers zone2
 
+    def _add_pending(self, count, zone, **fields):
+        user = User.objects.create_user(
+            f'bulk{zone.code}{count}', f'bulk{zone.code}{count}@test.com'
+        )
+        deliveries = []
+        for i in range(count):
+            order = Order.objects.create(
+                user=user, order_number=f'ORD-{zone.code}-{count}-{i}',
+                fulfillment_method='delivery', subtotal=Decimal('100.00'),
+                total=Decimal('100.00'),
+            )
+            deliveries.append(Delivery.objects.create(
+                order=order, zone=zone, status='pending',
+                scheduled_date=date.today(), **fields
+            ))
+        return deliveries
+
+    def test_auto_assign_query_count_does_not_grow(self):
+        """The batch uses the same number of queries for 3 or 10 deliveries."""
+        from apps.delivery.services import DeliveryAssignmentService
+
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as few:
+                DeliveryAssignmentService.auto_assign_pending()
+            transaction.set_rollback(True)
+
+        self._add_pending(7, self.zone1)
+        with CaptureQueriesContext(connection) as many:
+            assigned = DeliveryAssignmentService.auto_assign_pending()
+
+        self.assertEqual(len(assigned), 10)
+        self.assertEqual(len(many), len(few))
+
+    def test_auto_assign_records_status_history(self):
+        """Every assignment gets a pending -> assigned history row."""
+        from apps.delivery.services import DeliveryAssignmentService
+
+        admin = User.objects.create_user('dispatcher', 'dispatcher@test.com', 'pass')
+        assigned = DeliveryAssignmentService.auto_assign_pending(assigned_by=admin)
+
+        history = DeliveryStatusHistory.objects.filter(delivery__in=assigned)
+        self.assertEqual(history.count(), 3)
+        for entry in history:
+            self.assertEqual(entry.from_status, 'pending')
+            self.assertEqual(entry.to_status, 'assigned')
+            self.assertEqual(entry.changed_by, admin)
+
+    def test_auto_assign_balances_load(self):
+        """Greedy mode spreads deliveries over the zone's drivers."""
+        from apps.delivery.services import DeliveryAssignmentService
+
+        assigned = DeliveryAssignmentService.auto_assign_pending()
+
+        counts = sorted(
+            sum(1 for d in assigned if d.driver == driver)
+            for driver in (self.driver1, self.driver2)
+        )
+        self.assertEqual(counts, [1, 2])
+
+    def test_distance_mode_assigns_nearest_driver(self):
+        """Distance mode sends each delivery to the closest eligible driver."""
+        from apps.delivery.services import DeliveryAssignmentService
+
+        Delivery.objects.all().delete()
+        self.driver1.current_latitude = Decimal('20.830000')
+        self.driver1.current_longitude = Decimal('-86.870000')
+        self.driver1.save()
+        self.driver2.current_latitude = Decimal('20.500000')
+        self.driver2.current_longitude = Decimal('-87.230000')
+        self.driver2.save()
+        near_driver1 = self._add_pending(
+            2, self.zone1, latitude=Decimal('20.831000'), longitude=Decimal('-86.871000')
+        )
+        near_driver2 = self._add_pending(
+            1, self.zone2, latitude=Decimal('20.832000'), longitude=Decimal('-86.872000')
+        )
+
+        assigned = DeliveryAssignmentService.auto_assign_pending(mode='distance')
+
+        self.assertEqual(len(assigned), 3)
+        drivers = {d.pk: d.driver for d in assigned}
+        for delivery in near_driver1:
+            self.assertEqual(drivers[delivery.pk], self.driver1)
+        # Zone2 is only covered by driver2, however far away
+        self.assertEqual(drivers[near_driver2[0].pk], self.driver2)
+
+    def test_distance_mode_respects_daily_limit(self):
+        """Distance mode overflows to a farther driver once the nearest is full."""
+        from apps.delivery.services import DeliveryAssignmentService
+
+        self.driver1.max_deliveries_per_day = 1
+        self.driver1.current_latitude = Decimal('20.830000')
+        self.driver1.current_longitude = Decimal('-86.870000')
+        self.driver1.save()
+        Delivery.objects.update(latitude=Decimal('20.831000'), longitude=Decimal('-86.871000'))
+
+        assigned = DeliveryAssignmentService.auto_assign_pending(mode='distance')
+
+        self.assertEqual(len(assigned), 3)
+        self.assertEqual(sum(1 for d in assigned if d.driver == self.driver1), 1)
+
+    def test_unknown_mode_raises(self):
+        """An unknown assignment mode is rejected."""
+        from apps.delivery.services import DeliveryAssignmentService
+
+        with self.assertRaises(ValueError):
+            DeliveryAssignmentService.auto_assign_pending(mode='random')
+
+
+def _legacy_auto_assign():
+    """The per-delivery assignment loop the batch engine replaced."""
+    from apps.delivery.services import DeliveryAssignmentService
+
+    assigned = []
+    for delivery in Delivery.objects.filter(
+        status='pending', scheduled_date=date.today()
+    ).select_related('zone'):
+        driver = DeliveryAssignmentService.get_best_driver_for_delivery(delivery)
+        if driver:
+            delivery.driver = driver
+            delivery.status = 'assigned'
+            delivery.assigned_at = timezone.now()
+            delivery.save()
+            assigned.append(delivery)
+    return assigned
+
+
+@pytest.mark.slow
+class AutoAssignmentBenchmarkTests(TestCase):
+    """500 pending deliveries across 50 drivers and 5 zones."""
+
+    def setUp(self):
+        rng = random.Random(7)
+        zones = [
+            DeliveryZone.objects.create(code=f'Z{i}', name=f'Zone {i}') for i in range(5)
+        ]
+        self.drivers = []
+        for i in range(50):
+            driver = DeliveryDriver.objects.create(
+                user=User.objects.create_user(f'benchdriver{i}', f'benchdriver{i}@test.com'),
+                driver_type='employee', is_active=True, is_available=True,
+                max_deliveries_per_day=12,
+                current_latitude=Decimal(f'{20.80 + rng.random() / 10:.6f}'),
+                current_longitude=Decimal(f'{-86.95 + rng.random() / 10:.6f}'),
+            )
+            driver.zones.add(*rng.sample(zones, 2))
+            self.drivers.append(driver)
+
+        customer = User.objects.create_user('benchcustomer', 'benchcustomer@test.com')
+        orders = Order.objects.bulk_create([
+            Order(
+                user=customer, order_number=f'ORD-BENCH-{i}', fulfillment_method='delivery',
+                subtotal=Decimal('100.00'), total=Decimal('100.00'),
+            )
+            for i in range(500)
+        ])
+        Delivery.objects.bulk_create([
+            Delivery(
+                order=order, delivery_number=f'DEL-BENCH-{i}', zone=rng.choice(zones),
+                status='pending', scheduled_date=date.today(),
+                latitude=Decimal(f'{20.80 + rng.random() / 10:.6f}'),
+                longitude=Decimal(f'{-86.95 + rng.random() / 10:.6f}'),
+            )
+            for i, order in enumerate(orders)
+        ])
+
+    def _time(self, assign):
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                started = clock.perf_counter()
+                assigned = assign()
+                elapsed = clock.perf_counter() - started
+            loads = {}
+            for delivery in assigned:
+                loads[delivery.driver_id] = loads.get(delivery.driver_id, 0) + 1
+            transaction.set_rollback(True)
+        self.assertTrue(all(count <= 12 for count in loads.values()))
+        return len(assigned), len(queries), elapsed
+
+    def test_batch_vs_per_delivery(self):
+        from apps.delivery.services import DeliveryAssignmentService
+
+        legacy = self._time(_legacy_auto_assign)
+        greedy = self._time(DeliveryAssignmentService.auto_assign_pending)
+        distance = self._time(
+            lambda: DeliveryAssignmentService.auto_assign_pending(mode='distance')
+        )
+
+        for name, (count, queries, elapsed) in (
+            ('per-delivery', legacy), ('greedy', greedy), ('distance', distance)
+        ):
+            print(f'\n{name}: {count} assigned, {queries} queries, {elapsed * 1000:.1f} ms')
+        # The matching assigns as many deliveries as any greedy order can
+        self.assertGreaterEqual(distance[0], max(greedy[0], legacy[0]))
+        self.assertLess(greedy[1], 10)
+        self.assertLess(greedy[2], legacy[2])
+
 
 class DeliveryReportsTests(TestCase):
     """Tests for delivery reports and analytics."""
@@ -2045,6 +2583,11 @@ class DeliveryReportsTests(TestCase):
         self.staff_user = User.objects.create_user(
             'staff', 'staff@test.com', 'staffpass', is_staff=True
         )
+        # Reports need the delivery.view module permission
+        from apps.accounts.models import Role, UserRole
+        UserRole.objects.create(
+            user=self.staff_user, role=Role.objects.get(slug='receptionist'), is_primary=True
+        )
         self.client = Client()
         self.client.login(username='staff', password='staffpass')
 
@@ -2167,6 +2710,108 @@ class DeliveryReportsTests(TestCase):
         self.assertIn('stats', data)
         self.assertEqual(data['driver']['id'], self.driver.id)
 
+    def test_reports_api_counts(self):
+        """Stats, driver performance and zone stats add up."""
+        data = self.client.get('/api/delivery/admin/reports/').json()
+
+        self.assertEqual(data['stats']['total'], 10)
+        self.assertEqual(data['stats']['delivered'], 5)
+        self.assertEqual(data['stats']['failed'], 1)
+        self.assertEqual(data['stats']['pending'], 2)
+        self.assertEqual(data['stats']['average_rating'], 4.67)
+        self.assertEqual(data['driver_performance'], [{
+            'id': self.driver.id, 'name': 'driver', 'total_deliveries': 8,
+            'delivered': 5, 'failed': 1, 'success_rate': 62.5, 'average_rating': 4.67,
+        }])
+        self.assertEqual(data['zone_stats'], [{
+            'code': 'CENTRO', 'name': 'Centro', 'total': 10, 'delivered': 5,
+            'delivery_rate': 50.0,
+        }])
+
+    def test_reports_api_query_count_is_constant(self):
+        """More drivers and zones do not add queries."""
+        url = '/api/delivery/admin/reports/'
+        self.client.get(url)  # warm per-process caches
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(url)
+
+        order = Order.objects.first()
+        for i in range(3):
+            zone = DeliveryZone.objects.create(code=f'Z{i}', name=f'Zone {i}')
+            driver = DeliveryDriver.objects.create(
+                user=User.objects.create_user(f'extra{i}', f'extra{i}@test.com', 'pass'),
+                driver_type='employee', is_active=True, is_available=True
+            )
+            order.pk, order.order_number = None, f'ORD-EXTRA-{i}'
+            order.save()
+            Delivery.objects.create(
+                order=order, zone=zone, driver=driver, status='delivered',
+                scheduled_date=date.today(), delivered_at=timezone.now()
+            )
+
+        with CaptureQueriesContext(connection) as after:
+            data = self.client.get(url).json()
+        self.assertEqual(len(data['driver_performance']), 4)
+        self.assertEqual(len(data['zone_stats']), 4)
+        self.assertEqual(len(after), len(before))
+
+    def test_on_time_rate_uses_local_delivery_time(self):
+        """Deliveries are on time when delivered, in local time, by the window end."""
+        from apps.delivery import analytics
+
+        yesterday = date.today() - timedelta(days=1)
+        delivered = list(Delivery.objects.filter(status='delivered'))
+        for delivery, hour, day in [
+            (delivered[0], 9, yesterday),
+            (delivered[1], 11, yesterday),
+            (delivered[2], 20, yesterday - timedelta(days=1)),
+        ]:
+            delivery.scheduled_date = yesterday
+            delivery.scheduled_time_end = time(10, 0)
+            delivery.delivered_at = timezone.make_aware(datetime.combine(day, time(hour, 30)))
+            delivery.save()
+
+        report = analytics.delivery_report(yesterday, date.today())
+        self.assertEqual(report['stats']['on_time_rate'], 66.7)
+
+    def test_rollups_match_live_aggregates(self):
+        """Reports read from rollups give the same answers as live queries."""
+        from apps.delivery import analytics
+        from apps.delivery.models import DeliveryDailyRollup
+
+        today = date.today()
+        start = today - timedelta(days=20)
+        for i, delivery in enumerate(Delivery.objects.order_by('pk')):
+            delivery.scheduled_date = today - timedelta(days=i % 4)
+            delivery.save()
+        live = analytics.delivery_report(start, today)
+        live_driver = analytics.driver_report(self.driver, start, today)
+
+        self.assertEqual(analytics.update_rollups(), 3)
+        self.assertEqual(
+            analytics.rolled_days(start, today),
+            {today - timedelta(days=i) for i in (1, 2, 3)},
+        )
+        self.assertEqual(analytics.delivery_report(start, today), live)
+        self.assertEqual(analytics.driver_report(self.driver, start, today), live_driver)
+        self.assertEqual(len(live_driver['daily_stats']), 4)
+
+        # A later change retires its day until the next run
+        changed = Delivery.objects.filter(
+            scheduled_date=today - timedelta(days=1), status='delivered'
+        ).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            changed.status = 'failed'
+            changed.save()
+        self.assertFalse(
+            DeliveryDailyRollup.objects.filter(day=today - timedelta(days=1)).exists()
+        )
+        stats = analytics.delivery_report(start, today)['stats']
+        self.assertEqual((stats['delivered'], stats['failed']), (4, 2))
+
+        analytics.update_rollups()
+        self.assertEqual(analytics.delivery_report(start, today)['stats'], stats)
+
 
 class ZoneManagementTests(TestCase):
     """Tests for zone management UI."""
@@ -2694,6 +3339,191 @@ class DeliveryPaymentTests(TestCase):
         self.assertEqual(earnings['total_distance_payment'], Decimal('127.50'))
 
 
+class DeliveryRoutingTests(TestCase):
+    """Tests for offline route sequencing and distance estimates."""
+
+    def setUp(self):
+        """Set up a contractor and a customer."""
+        self.driver_user = User.objects.create_user('router', 'router@test.com', 'pass')
+        self.driver = DeliveryDriver.objects.create(
+            user=self.driver_user, driver_type='contractor', is_active=True,
+            rate_per_delivery=Decimal('50.00'), rate_per_km=Decimal('5.00'),
+        )
+        self.customer = User.objects.create_user('routed', 'routed@test.com', 'pass')
+        self.zone = DeliveryZone.objects.create(code='RUTA', name='Ruta')
+
+    def _stops(self, coordinates, status='assigned', **fields):
+        deliveries = []
+        for latitude, longitude in coordinates:
+            order = Order.objects.create(
+                user=self.customer, order_number=f'ORD-RUTA-{Order.objects.count()}',
+                fulfillment_method='delivery', subtotal=Decimal('100.00'),
+                total=Decimal('100.00'),
+            )
+            deliveries.append(Delivery.objects.create(
+                order=order, zone=self.zone, driver=self.driver, status=status,
+                scheduled_date=date.today(),
+                latitude=Decimal(str(latitude)) if latitude is not None else None,
+                longitude=Decimal(str(longitude)) if longitude is not None else None,
+                **fields
+            ))
+        return deliveries
+
+    def _deliver(self, delivery):
+        delivery.status = 'arrived'
+        delivery.save()
+        delivery.refresh_from_db()
+        delivery.mark_delivered()
+        delivery.refresh_from_db()
+        return delivery
+
+    def test_distance_matrix_matches_haversine(self):
+        """The vectorised matrix equals the scalar great-circle distance."""
+        from apps.delivery import routing
+        from apps.delivery.assignment import distance_km
+
+        points = [(20.63, -87.07), (20.51, -86.95), (21.16, -86.85)]
+        matrix = routing.distance_matrix(points)
+        self.assertEqual(matrix.shape, (3, 3))
+        for i, a in enumerate(points):
+            self.assertAlmostEqual(matrix[i, i], 0.0)
+            for j, b in enumerate(points):
+                self.assertAlmostEqual(matrix[i, j], distance_km(*a, *b), places=6)
+        legs = routing.leg_distances(points)
+        self.assertAlmostEqual(legs[1], matrix[1, 2], places=6)
+
+    def test_sequence_follows_a_street(self):
+        """Shuffled stops along a line are visited in order from the depot."""
+        from apps.delivery import routing
+
+        latitudes = [20.60 + 0.01 * i for i in range(12)]
+        shuffled = latitudes[:]
+        random.Random(7).shuffle(shuffled)
+        stops = self._stops([(lat, -87.07) for lat in shuffled])
+
+        route = routing.sequence(stops, start=(20.59, -87.07))
+        self.assertEqual([float(stop.latitude) for stop in route.stops], latitudes)
+        self.assertEqual(len(route.legs_km), 12)
+        self.assertAlmostEqual(route.total_km, 12 * 1.112 * 1.3, places=1)
+
+    def test_two_opt_removes_crossings(self):
+        """2-opt never lengthens the nearest-neighbour path."""
+        from apps.delivery import routing
+
+        rng = random.Random(3)
+        points = [(20.5 + rng.random() * 0.2, -87.2 + rng.random() * 0.2) for _ in range(60)]
+        dist = routing.distance_matrix(points)
+        greedy = routing.nearest_neighbour(dist, 0)
+        improved = routing.two_opt(dist, greedy)
+        self.assertEqual(sorted(improved), list(range(60)))
+        self.assertEqual(improved[0], 0)
+        self.assertLess(routing.path_length(dist, improved), routing.path_length(dist, greedy))
+
+    def test_sequence_keeps_slots_in_order(self):
+        """Stops are only reordered within their slot; unknown positions are set aside."""
+        from apps.delivery import routing
+
+        late = self._stops([(20.60, -87.07)], scheduled_time_start=time(15, 0))
+        early = self._stops([(20.70, -87.07), (20.65, -87.07)], scheduled_time_start=time(9, 0))
+        missing = self._stops([(None, None)], scheduled_time_start=time(9, 0))
+
+        route = routing.sequence(late + early + missing, start=(20.60, -87.07))
+        self.assertEqual(route.stops, [early[1], early[0], late[0]])
+        self.assertEqual(route.unrouted, missing)
+
+    def test_sequence_without_start(self):
+        """Without a start the first leg is unknown."""
+        from apps.delivery import routing
+
+        route = routing.sequence(self._stops([(20.60, -87.07), (20.62, -87.07)]))
+        self.assertIsNone(route.legs_km[0])
+        self.assertIsNotNone(route.legs_km[1])
+
+    @override_settings(DELIVERY_ROUTING={'DEPOT': '20.60,-87.07'})
+    def test_delivered_distance_estimated_for_payment(self):
+        """Delivering estimates the leg from the previous stop (or the depot)."""
+        from apps.delivery.services import DeliveryPaymentService
+
+        first, second = self._stops([(20.61, -87.07), (20.63, -87.07)], status='out_for_delivery')
+        first = self._deliver(first)
+        second = self._deliver(second)
+
+        # 0.01 and 0.02 degrees of latitude, times the road factor
+        self.assertEqual(first.delivered_distance_km, Decimal('1.45'))
+        self.assertEqual(second.delivered_distance_km, Decimal('2.89'))
+        payment = DeliveryPaymentService.calculate_payment(second)
+        self.assertEqual(payment['distance_payment'], Decimal('14.45'))
+
+    def test_hand_entered_distance_kept(self):
+        """A distance entered before delivery is not overwritten."""
+        first, second = self._stops([(20.61, -87.07), (20.63, -87.07)], status='out_for_delivery')
+        self._deliver(first)
+        second.delivered_distance_km = Decimal('7.00')
+        second.save()
+        self.assertEqual(self._deliver(second).delivered_distance_km, Decimal('7.00'))
+
+    def test_first_stop_without_depot_not_estimated(self):
+        """With no depot the first stop of the day has no known start."""
+        first, second = self._stops([(20.61, -87.07), (20.63, -87.07)], status='out_for_delivery')
+        self.assertIsNone(self._deliver(first).delivered_distance_km)
+        self.assertEqual(self._deliver(second).delivered_distance_km, Decimal('2.89'))
+
+    @override_settings(DELIVERY_ROUTING={'DEPOT': '20.60,-87.07'})
+    def test_estimate_distances_backfills_a_day(self):
+        """The nightly backfill fills empty distances in delivery order."""
+        from apps.delivery import routing
+
+        noon = timezone.make_aware(datetime.combine(date.today(), time(12, 0)))
+        stops = self._stops([(20.61, -87.07), (20.63, -87.07), (20.64, -87.07)], status='delivered')
+        for minutes, stop in zip((10, 20, 30), stops):
+            stop.delivered_at = noon + timedelta(minutes=minutes)
+        stops[2].delivered_distance_km = Decimal('9.99')
+        Delivery.objects.bulk_update(stops, ['delivered_at', 'delivered_distance_km'])
+
+        self.assertEqual(routing.estimate_distances(date.today()), 2)
+        distances = [
+            Delivery.objects.get(pk=stop.pk).delivered_distance_km for stop in stops
+        ]
+        self.assertEqual(distances, [Decimal('1.45'), Decimal('2.89'), Decimal('9.99')])
+
+    def test_driver_route_api(self):
+        """The driver app gets the day's stops in visiting order."""
+        stops = self._stops([(20.66, -87.07), (20.62, -87.07), (20.64, -87.07)])
+        self._stops([(20.65, -87.07)], status='delivered')
+        self.client.force_login(self.driver_user)
+
+        response = self.client.get('/api/driver/route/')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        numbers = [stop['delivery_number'] for stop in data['stops']]
+        self.assertIn(numbers, [
+            [stops[1].delivery_number, stops[2].delivery_number, stops[0].delivery_number],
+            [stops[0].delivery_number, stops[2].delivery_number, stops[1].delivery_number],
+        ])
+        self.assertEqual(self.client.get('/api/driver/route/?date=tomorrow').status_code, 400)
+
+    @pytest.mark.slow
+    def test_sequence_scales_to_hundreds_of_stops(self):
+        """300 stops are sequenced in well under a second."""
+        from types import SimpleNamespace
+        from apps.delivery import routing
+
+        rng = random.Random(11)
+        stops = [
+            SimpleNamespace(
+                latitude=20.5 + rng.random() * 0.3, longitude=-87.2 + rng.random() * 0.3,
+                scheduled_time_start=rng.choice([time(9), time(12), time(15)]),
+            )
+            for _ in range(300)
+        ]
+        started = clock.perf_counter()
+        route = routing.sequence(stops, start=(20.5, -87.0))
+        elapsed = clock.perf_counter() - started
+
+        self.assertEqual(len(route.stops), 300)
+        self.assertLess(elapsed, 0.5)
+
+
 class ContractorPaymentReportsTests(TestCase):
     """Tests for contractor payment reports."""
 
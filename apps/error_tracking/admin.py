@@ -1,12 +1,28 @@
 """Admin configuration for error tracking."""
 from django.contrib import admin
-from django.db.models import Count
 from django.utils import timezone
 from django.utils.html import format_html
 
+from apps.audit.rollups import rollup_counts, rollup_total
+
 from .models import ErrorLog, KnownBug
 
 
+def top_errors(limit: int = 5) -> list[dict]:
+    """Most frequent fingerprints, counted from the daily rollups.
+
+    Raw rows are only read to label each fingerprint, through the
+    (fingerprint, created_at) index.
+    """
+    rows = []
+    for fingerprint, count in rollup_counts('error', 'fingerprint').most_common(limit):
+        latest = ErrorLog.objects.filter(fingerprint=fingerprint).order_by(
+            '-created_at'
+        ).values('error_type', 'url_pattern').first() or {'error_type': '', 'url_pattern': ''}
+        rows.append({'fingerprint': fingerprint, **latest, 'count': count})
+    return rows
+
+
 @admin.register(ErrorLog)
 class ErrorLogAdmin(admin.ModelAdmin):
     """Admin view for error logs."""
@@ -165,13 +181,7 @@ class KnownBugAdmin(admin.ModelAdmin):
 
         # Get stats for dashboard
         extra_context['open_bugs'] = KnownBug.objects.filter(status='open').count()
-        extra_context['total_errors_today'] = ErrorLog.objects.filter(
-            created_at__date=timezone.now().date()
-        ).count()
-        extra_context['top_errors'] = ErrorLog.objects.values(
-            'fingerprint', 'error_type', 'url_pattern'
-        ).annotate(
-            count=Count('id')
-        ).order_by('-count')[:5]
+        extra_context['total_errors_today'] = rollup_total('error', since=timezone.localdate())
+        extra_context['top_errors'] = top_errors()
 
         return super().changelist_view(request, extra_context)
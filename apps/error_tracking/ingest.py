@@ -0,0 +1,192 @@
+"""Coalesced ingestion of captured HTTP errors.
+
+A crawler hitting 404s can produce thousands of identical errors per
+minute. Writing an ``ErrorLog`` row, a ``KnownBug`` lookup and a
+``COUNT(*)`` for each one is wasted work, so ingestion is coalesced:
+
+- Full ``ErrorLog`` rows are sampled per fingerprint: only the first
+  ``SAMPLE_PER_WINDOW`` occurrences per ``SAMPLE_WINDOW`` seconds (per
+  worker) are stored. Every occurrence is still counted.
+- Occurrences are queued in a write-behind buffer and flushed in batches.
+  One flush bulk-inserts the sampled rows, then adds each fingerprint's
+  count to ``KnownBug.occurrence_count`` (known bugs) or to a shared cache
+  counter (unknown fingerprints).
+- The bug threshold is checked against that counter instead of counting
+  ``ErrorLog`` rows. Bug creation is triggered once per fingerprint.
+
+Configuration (``settings.ERROR_TRACKING``):
+    'WRITE_MODE': 'buffered',     # or 'sync' to write inside the request
+    'SAMPLE_PER_WINDOW': 10,
+    'SAMPLE_WINDOW': 60,
+    'BATCH_SIZE': 200,
+    'FLUSH_INTERVAL': 2.0,
+    'QUEUE_SIZE': 10000,
+"""
+import logging
+import threading
+import time
+from collections import Counter
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from apps.core.write_behind import WriteBehindBuffer
+
+from .models import ErrorLog, KnownBug
+
+logger = logging.getLogger(__name__)
+
+COUNT_KEY = 'error_tracking:count:{}'
+TRIGGERED_KEY = 'error_tracking:bug_triggered:{}'
+
+
+def get_config() -> dict:
+    """Error tracking configuration from settings."""
+    return getattr(settings, 'ERROR_TRACKING', {})
+
+
+class ErrorOccurrence(NamedTuple):
+    """One captured error, with its ErrorLog row if it was sampled."""
+    fingerprint: str
+    error_type: str
+    status_code: int
+    url_pattern: str
+    row: dict | None
+
+
+class WindowSampler:
+    """Allow the first N occurrences per key in each fixed time window."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._window = None
+        self._counts: Counter = Counter()
+
+    def allow(self, key: str, limit: int, window: float) -> bool:
+        """Count an occurrence and report whether it is within the limit.
+
+        Args:
+            key: Grouping key (error fingerprint).
+            limit: Occurrences allowed per window.
+            window: Window length in seconds.
+
+        Returns:
+            True if this occurrence should be sampled.
+        """
+        current = int(time.monotonic() // window) if window > 0 else 0
+        with self._lock:
+            if current != self._window:
+                self._window = current
+                self._counts.clear()
+            self._counts[key] += 1
+            return self._counts[key] <= limit
+
+    def reset(self) -> None:
+        """Forget all counts."""
+        with self._lock:
+            self._window = None
+            self._counts.clear()
+
+
+def trigger_bug_creation(fingerprint: str, error_type: str,
+                         status_code: int, url_pattern: str) -> None:
+    """Trigger async bug creation via Celery task."""
+    from .tasks import create_bug_task
+
+    # Generate title from error type and URL pattern
+    title = f"{error_type.replace('_', ' ').title()} on {url_pattern}"
+
+    # Determine severity based on status code
+    if status_code >= 500:
+        severity = 'high'
+    elif status_code == 403:
+        severity = 'medium'
+    elif status_code == 404:
+        severity = 'low'
+    else:
+        severity = 'medium'
+
+    error_data = {
+        'fingerprint': fingerprint,
+        'title': title,
+        'description': f"HTTP {status_code} error detected on URL pattern: {url_pattern}",
+        'severity': severity,
+        'error_type': error_type,
+        'status_code': status_code,
+        'url_pattern': url_pattern,
+    }
+
+    create_bug_task.delay(error_data)
+    logger.info("Triggered bug creation for fingerprint: %s", fingerprint)
+
+
+def _add_to_counter(fingerprint: str, count: int) -> int:
+    """Add occurrences to the shared per-fingerprint counter."""
+    key = COUNT_KEY.format(fingerprint)
+    cache.add(key, 0, None)
+    try:
+        return cache.incr(key, count)
+    except ValueError:
+        # Evicted between add and incr
+        cache.set(key, count, None)
+        return count
+
+
+def write_error_batch(occurrences: list[ErrorOccurrence]) -> int:
+    """Persist sampled rows and fold occurrence counts into bug tracking.
+
+    Args:
+        occurrences: Queued ErrorOccurrence tuples.
+
+    Returns:
+        Number of ErrorLog rows written.
+    """
+    rows = [ErrorLog(**item.row) for item in occurrences if item.row is not None]
+    if rows:
+        ErrorLog.objects.bulk_create(rows, batch_size=500)
+
+    config = get_config()
+    if not config.get('AUTO_CREATE_BUGS', True):
+        return len(rows)
+
+    counts = Counter(item.fingerprint for item in occurrences)
+    latest = {item.fingerprint: item for item in occurrences}
+    known = set(KnownBug.objects.filter(
+        fingerprint__in=counts
+    ).values_list('fingerprint', flat=True))
+
+    threshold = config.get('BUG_THRESHOLD', 1)
+    for fingerprint, count in counts.items():
+        if fingerprint in known:
+            KnownBug.objects.filter(fingerprint=fingerprint).update(
+                occurrence_count=F('occurrence_count') + count
+            )
+            continue
+
+        total = _add_to_counter(fingerprint, count)
+        if total >= threshold and cache.add(TRIGGERED_KEY.format(fingerprint), 1, 3600):
+            item = latest[fingerprint]
+            trigger_bug_creation(fingerprint, item.error_type, item.status_code, item.url_pattern)
+
+    return len(rows)
+
+
+# Per-process sampler and write-behind buffer used by ErrorCaptureMiddleware
+error_sampler = WindowSampler()
+error_buffer = WriteBehindBuffer(
+    'error-log-writer',
+    write_error_batch,
+    batch_size=get_config().get('BATCH_SIZE', 200),
+    flush_interval=get_config().get('FLUSH_INTERVAL', 2.0),
+    max_size=get_config().get('QUEUE_SIZE', 10000),
+)
+
+
+def ingest(occurrence: ErrorOccurrence) -> None:
+    """Queue a captured error, or write it now in sync mode."""
+    if get_config().get('WRITE_MODE', 'buffered') == 'sync':
+        write_error_batch([occurrence])
+    else:
+        error_buffer.add(occurrence)
@@ -1,4 +1,8 @@
-"""Middleware for capturing and logging HTTP errors."""
+"""Middleware for capturing and logging HTTP errors.
+
+Captured errors are sampled and persisted in batches by
+``apps.error_tracking.ingest``.
+"""
 import hashlib
 import logging
 import re
@@ -6,13 +10,15 @@ import traceback as tb
 
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
-from django.db.models import F
 
-from .models import ErrorLog, KnownBug
+from .ingest import ErrorOccurrence, error_sampler, ingest, trigger_bug_creation
 
 logger = logging.getLogger(__name__)
 
 
+# Request attribute holding exception details from process_exception
+EXCEPTION_ATTR = '_error_tracking_exception'
+
 ERROR_TYPE_MAP = {
     400: 'bad_request',
     401: 'unauthorized',
@@ -33,31 +39,25 @@ class ErrorCaptureMiddleware:
 
     def __init__(self, get_response):
         self.get_response = get_response
-        # Thread-local storage for exception info
-        self._exception_info = {}
 
     def __call__(self, request):
-        # Clear any previous exception info for this request
-        request_id = id(request)
-        self._exception_info.pop(request_id, None)
-
         response = self.get_response(request)
 
         # Capture 4xx and 5xx errors
         if response.status_code >= 400:
-            exception_data = self._exception_info.pop(request_id, None)
+            exception_data = getattr(request, EXCEPTION_ATTR, None)
             self.capture_error(request, response, exception_data)
 
         return response
 
     def process_exception(self, request, exception):
         """Capture exception details before they're converted to 500 response."""
-        request_id = id(request)
-        self._exception_info[request_id] = {
+        # Stored on the request so concurrent requests never share it
+        setattr(request, EXCEPTION_ATTR, {
             'exception_type': type(exception).__name__,
             'exception_message': str(exception),
             'traceback': tb.format_exc(),
-        }
+        })
         # Return None to let Django handle the exception normally
         return None
 
@@ -144,11 +144,21 @@ class ErrorCaptureMiddleware:
             url_pattern = self.normalize_url(path)
             fingerprint = self.generate_fingerprint(error_type, status_code, url_pattern)
 
+            config = self.get_config()
+            if not error_sampler.allow(
+                fingerprint,
+                config.get('SAMPLE_PER_WINDOW', 10),
+                config.get('SAMPLE_WINDOW', 60),
+            ):
+                # Counted, but no full row for this occurrence
+                ingest(ErrorOccurrence(fingerprint, error_type, status_code, url_pattern, None))
+                return
+
             # Get user if authenticated
-            user = None
+            user_id = None
             if hasattr(request, 'user') and request.user is not None:
                 if not isinstance(request.user, AnonymousUser) and request.user.is_authenticated:
-                    user = request.user
+                    user_id = request.user.pk
 
             # Prepare exception details
             exception_type = ''
@@ -159,90 +169,35 @@ class ErrorCaptureMiddleware:
                 exception_message = exception_data.get('exception_message', '')
                 traceback_str = exception_data.get('traceback', '')
 
-            # Create error log entry
-            ErrorLog.objects.create(
-                fingerprint=fingerprint,
-                error_type=error_type,
-                status_code=status_code,
-                url_pattern=url_pattern,
-                full_url=self.get_full_url(request),
-                method=request.method,
-                user=user,
-                ip_address=self.get_client_ip(request),
-                user_agent=request.META.get('HTTP_USER_AGENT', '')[:500],
-                request_data={
+            row = {
+                'fingerprint': fingerprint,
+                'error_type': error_type,
+                'status_code': status_code,
+                'url_pattern': url_pattern[:500],
+                'full_url': self.get_full_url(request)[:2000],
+                'method': request.method,
+                'user_id': user_id,
+                'ip_address': self.get_client_ip(request),
+                'user_agent': request.META.get('HTTP_USER_AGENT', '')[:500],
+                'request_data': {
                     'method': request.method,
                     'content_type': request.content_type if hasattr(request, 'content_type') else '',
                 },
-                exception_type=exception_type,
-                exception_message=exception_message,
-                traceback=traceback_str,
-            )
+                'exception_type': exception_type[:200],
+                'exception_message': exception_message,
+                'traceback': traceback_str,
+            }
+            ingest(ErrorOccurrence(fingerprint, error_type, status_code, url_pattern, row))
 
             logger.debug(
                 "Captured error: [%s] %s %s (fingerprint: %s)",
                 status_code, request.method, path, fingerprint
             )
 
-            # Check if this fingerprint is already known
-            config = self.get_config()
-            auto_create_bugs = config.get('AUTO_CREATE_BUGS', True)
-            bug_threshold = config.get('BUG_THRESHOLD', 1)
-
-            if auto_create_bugs:
-                known_bug = KnownBug.objects.filter(fingerprint=fingerprint).first()
-
-                if known_bug:
-                    # Increment occurrence count for existing bug
-                    KnownBug.objects.filter(pk=known_bug.pk).update(
-                        occurrence_count=F('occurrence_count') + 1
-                    )
-                    logger.debug(
-                        "Incremented occurrence count for %s",
-                        known_bug.bug_id
-                    )
-                else:
-                    # Check if we've hit the threshold for creating a bug
-                    error_count = ErrorLog.objects.filter(
-                        fingerprint=fingerprint
-                    ).count()
-
-                    if error_count >= bug_threshold:
-                        # Trigger async bug creation
-                        self.trigger_bug_creation(
-                            fingerprint, error_type, status_code, url_pattern
-                        )
-
         except Exception as e:
             # Don't let error tracking break the response
             logger.exception("Failed to capture error: %s", e)
 
     def trigger_bug_creation(self, fingerprint, error_type, status_code, url_pattern):
         """Trigger async bug creation via Celery task."""
-        from .tasks import create_bug_task
-
-        # Generate title from error type and URL pattern
-        title = f"{error_type.replace('_', ' ').title()} on {url_pattern}"
-
-        # Determine severity based on status code
-        if status_code >= 500:
-            severity = 'high'
-        elif status_code == 403:
-            severity = 'medium'
-        elif status_code == 404:
-            severity = 'low'
-        else:
-            severity = 'medium'
-
-        error_data = {
-            'fingerprint': fingerprint,
-            'title': title,
-            'description': f"HTTP {status_code} error detected on URL pattern: {url_pattern}",
-            'severity': severity,
-            'error_type': error_type,
-            'status_code': status_code,
-            'url_pattern': url_pattern,
-        }
-
-        create_bug_task.delay(error_data)
-        logger.info("Triggered bug creation for fingerprint: %s", fingerprint)
+        trigger_bug_creation(fingerprint, error_type, status_code, url_pattern)
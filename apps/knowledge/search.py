@@ -0,0 +1,264 @@
+"""In-process BM25 retrieval index over the knowledge base.
+
+``icontains`` lookups scan every article and FAQ row for each keyword, and
+the results then had to be re-scored in Python. Instead, each worker keeps
+a small inverted index per language:
+
+- Published articles (title, keywords, AI context, content) and active
+  FAQs (question, answer) are tokenized once: casefolded, accents and
+  stopwords removed, plurals trimmed. Titles, keywords and questions
+  count more than body text.
+- A search scores only the postings of the query terms with BM25,
+  nudged by article priority and featured FAQs, and returns the top
+  snippets that fit a token budget. It makes no database queries.
+- The index is built with one query per table and kept in a
+  ``LocalCache``. KnowledgeArticle/FAQ signals bump its version stamp,
+  so every process rebuilds on its next search
+  (``KNOWLEDGE_INDEX_TTL`` bounds staleness from bulk updates).
+"""
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+
+from django.conf import settings
+
+from apps.core.local_cache import LocalCache
+
+from .models import FAQ, KnowledgeArticle
+
+LANGUAGES = ('es', 'en')
+
+# Characters of article content used when it has no AI context
+SNIPPET_CHARS = 500
+
+# Field weights (term frequency multipliers)
+TITLE_WEIGHT = 3
+KEYWORD_WEIGHT = 3
+BODY_WEIGHT = 1
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+STOPWORDS = frozenset((
+    # Spanish
+    'el la los las un una unos unas de del al a y o e u en con por para '
+    'que es son su sus se lo le les mi mis tu tus me nos como cual cuales '
+    'cuanto donde cuando hay este esta estos estas ese esa muy mas sin '
+    # English
+    'the an of to and or in on at for with by from is are be was your you '
+    'my me we us our it its this that what which how when where do does can'
+).split())
+
+_WORD = re.compile(r'\w+')
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text into index terms.
+
+    Args:
+        text: Any text in Spanish or English
+
+    Returns:
+        Casefolded, accent-free terms without stopwords
+    """
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    terms = []
+    for word in _WORD.findall(stripped):
+        if word in STOPWORDS:
+            continue
+        # Trim plurals so "servicios" matches "servicio"
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+@dataclass(frozen=True)
+class Snippet:
+    """A ranked piece of knowledge ready for prompt injection."""
+
+    kind: str  # 'article' or 'faq'
+    pk: int
+    text: str
+    boost: float = 1.0
+
+    @property
+    def tokens(self) -> float:
+        """Estimated prompt tokens (4 characters per token)."""
+        return len(self.text) / 4
+
+
+class KnowledgeIndex:
+    """BM25 inverted index over one language of the knowledge base."""
+
+    def __init__(self, language: str = 'es'):
+        """Create an empty index.
+
+        Args:
+            language: Language code ('es' or 'en')
+        """
+        self.language = language
+        self.snippets: list[Snippet] = []
+        self._lengths: list[float] = []
+        self._total_length = 0.0
+        self._postings: dict[str, list[tuple[int, float]]] = defaultdict(list)
+
+    @classmethod
+    def build(cls, language: str = 'es') -> 'KnowledgeIndex':
+        """Index published articles and active FAQs (one query each).
+
+        Args:
+            language: Language code ('es' or 'en')
+
+        Returns:
+            Populated index
+        """
+        index = cls(language)
+        articles = KnowledgeArticle.objects.filter(is_published=True).values_list(
+            'pk', f'title_{language}', f'content_{language}', 'ai_context', 'keywords', 'priority'
+        )
+        for pk, title, content, ai_context, keywords, priority in articles.iterator():
+            keywords = ' '.join(k for k in keywords or () if isinstance(k, str))
+            index.add(
+                Snippet('article', pk, ai_context or content[:SNIPPET_CHARS], 1 + priority / 100 * 0.3),
+                [(title, TITLE_WEIGHT), (keywords, KEYWORD_WEIGHT),
+                 (ai_context, BODY_WEIGHT), (content, BODY_WEIGHT)],
+            )
+
+        faqs = FAQ.objects.filter(is_active=True).values_list(
+            'pk', f'question_{language}', f'answer_{language}', 'is_featured'
+        )
+        for pk, question, answer, is_featured in faqs.iterator():
+            index.add(
+                Snippet('faq', pk, f'Q: {question}\nA: {answer}', 1.1 if is_featured else 1.0),
+                [(question, TITLE_WEIGHT), (answer, BODY_WEIGHT)],
+            )
+        return index
+
+    def add(self, snippet: Snippet, fields: list[tuple[str, float]]) -> None:
+        """Index a snippet.
+
+        Args:
+            snippet: Text returned when the document matches
+            fields: (text, weight) pairs to index
+        """
+        frequencies = Counter()
+        for text, weight in fields:
+            for term in tokenize(text or ''):
+                frequencies[term] += weight
+
+        doc = len(self.snippets)
+        self.snippets.append(snippet)
+        self._lengths.append(sum(frequencies.values()))
+        self._total_length += self._lengths[-1]
+        for term, frequency in frequencies.items():
+            self._postings[term].append((doc, frequency))
+
+    def __len__(self):
+        return len(self.snippets)
+
+    def search(
+        self,
+        query: str,
+        limit: int = 5,
+        max_tokens: float = None,
+        kind: str = None,
+    ) -> list[Snippet]:
+        """Return the best matching snippets.
+
+        Args:
+            query: Search text
+            limit: Maximum snippets returned
+            max_tokens: Optional token budget for all returned snippets;
+                snippets that would exceed it are skipped
+            kind: Optional 'article' or 'faq' filter
+
+        Returns:
+            Snippets, most relevant first
+        """
+        terms = set(tokenize(query or ''))
+        if not terms or not self.snippets:
+            return []
+
+        count = len(self.snippets)
+        average_length = self._total_length / count or 1
+        scores = defaultdict(float)
+        for term in terms:
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc, frequency in postings:
+                norm = K1 * (1 - B + B * self._lengths[doc] / average_length)
+                scores[doc] += idf * frequency * (K1 + 1) / (frequency + norm)
+
+        ranked = sorted(
+            ((score * self.snippets[doc].boost, doc) for doc, score in scores.items()
+             if kind is None or self.snippets[doc].kind == kind),
+            key=lambda item: (-item[0], item[1]),
+        )
+
+        results = []
+        seen = set()
+        remaining = max_tokens
+        for _, doc in ranked:
+            snippet = self.snippets[doc]
+            if snippet.text in seen:
+                continue
+            if remaining is not None:
+                if snippet.tokens > remaining:
+                    continue
+                remaining -= snippet.tokens
+            seen.add(snippet.text)
+            results.append(snippet)
+            if len(results) >= limit:
+                break
+        return results
+
+
+# One index per language, rebuilt after knowledge base changes (see signals)
+index_cache = LocalCache(
+    'knowledge:index:version',
+    max_size=len(LANGUAGES),
+    ttl=getattr(settings, 'KNOWLEDGE_INDEX_TTL', 300),
+)
+
+
+def get_index(language: str = 'es') -> KnowledgeIndex:
+    """Return this process's index for a language."""
+    if language not in LANGUAGES:
+        language = 'es'
+    return index_cache.get(f'knowledge_index:{language}', lambda: KnowledgeIndex.build(language))
+
+
+def search_knowledge(
+    query: str,
+    language: str = 'es',
+    limit: int = 5,
+    max_tokens: float = None,
+    kind: str = None,
+) -> list[Snippet]:
+    """Search the knowledge base index.
+
+    Args:
+        query: Search text
+        language: Language code ('es' or 'en')
+        limit: Maximum snippets returned
+        max_tokens: Optional token budget for all returned snippets
+        kind: Optional 'article' or 'faq' filter
+
+    Returns:
+        Snippets, most relevant first
+    """
+    if not query:
+        return []
+    return get_index(language).search(query, limit=limit, max_tokens=max_tokens, kind=kind)
+
+
+def invalidate_index() -> None:
+    """Rebuild the index in every process on its next search."""
+    index_cache.invalidate()
@@ -0,0 +1,18 @@
+"""Knowledge base signals."""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import FAQ, KnowledgeArticle
+from .search import invalidate_index
+
+
+@receiver(post_save, sender=KnowledgeArticle)
+@receiver(post_delete, sender=KnowledgeArticle)
+@receiver(post_save, sender=FAQ)
+@receiver(post_delete, sender=FAQ)
+def invalidate_search_index(sender, update_fields=None, **kwargs):
+    """Rebuild the retrieval index when indexed content changes."""
+    # FAQ.increment_view_count does not change indexed text
+    if update_fields and set(update_fields) <= {'view_count'}:
+        return
+    invalidate_index()
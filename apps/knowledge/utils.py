@@ -1,39 +1,25 @@
 """Utility functions for knowledge base."""
-from django.db.models import Q
-
 from .models import KnowledgeArticle, FAQ
+from .search import search_knowledge
 
 
-def search_knowledge_base(query: str, language: str = 'es') -> list:
+def search_knowledge_base(query: str, language: str = 'es', limit: int = 20) -> list:
     """Search across knowledge base articles.
 
     Args:
         query: Search query string
         language: Language code ('es' or 'en')
+        limit: Maximum number of articles
 
     Returns:
-        List of matching KnowledgeArticle objects
+        List of matching KnowledgeArticle objects, most relevant first
     """
     if not query:
         return []
 
-    # Build search across title, content, and keywords
-    title_field = f'title_{language}'
-    content_field = f'content_{language}'
-
-    filters = (
-        Q(**{f'{title_field}__icontains': query}) |
-        Q(**{f'{content_field}__icontains': query}) |
-        Q(keywords__icontains=query) |
-        Q(ai_context__icontains=query)
-    )
-
-    return list(
-        KnowledgeArticle.objects.filter(
-            filters,
-            is_published=True
-        ).order_by('-priority')
-    )
+    snippets = search_knowledge(query, language, limit=limit, kind='article')
+    articles = KnowledgeArticle.objects.in_bulk([s.pk for s in snippets])
+    return [articles[s.pk] for s in snippets if s.pk in articles]
 
 
 def get_ai_context(keywords: list, language: str = 'es', max_items: int = 5) -> str:
@@ -50,52 +36,8 @@ def get_ai_context(keywords: list, language: str = 'es', max_items: int = 5) ->
     if not keywords:
         return ''
 
-    context_parts = []
-
-    # Search for relevant articles
-    title_field = f'title_{language}'
-    content_field = f'content_{language}'
-
-    for keyword in keywords:
-        articles = KnowledgeArticle.objects.filter(
-            Q(**{f'{title_field}__icontains': keyword}) |
-            Q(keywords__icontains=keyword) |
-            Q(ai_context__icontains=keyword),
-            is_published=True
-        ).order_by('-priority')[:max_items]
-
-        for article in articles:
-            if article.ai_context:
-                context_parts.append(article.ai_context)
-            else:
-                # Use truncated content if no ai_context
-                content = article.get_content(language)
-                context_parts.append(content[:500] if len(content) > 500 else content)
-
-    # Search for relevant FAQs
-    for keyword in keywords:
-        faqs = FAQ.objects.filter(
-            Q(**{f'question_{language}__icontains': keyword}) |
-            Q(**{f'answer_{language}__icontains': keyword}),
-            is_active=True
-        ).order_by('-is_featured', 'order')[:max_items]
-
-        for faq in faqs:
-            q = faq.get_question(language)
-            a = faq.get_answer(language)
-            context_parts.append(f'Q: {q}\nA: {a}')
-
-    # Deduplicate and join
-    seen = set()
-    unique_parts = []
-    for part in context_parts:
-        if part not in seen:
-            seen.add(part)
-            unique_parts.append(part)
-            if len(unique_parts) >= max_items:
-                break
-
-    return '\n\n'.join(unique_parts)
+    snippets = search_knowledge(' '.join(keywords), language, limit=max_items)
+    return '\n\n'.join(snippet.text for snippet in snippets)
 
 
 def get_featured_faqs(language: str = 'es', limit: int = 10) -> list:
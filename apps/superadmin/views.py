@@ -14,6 +14,7 @@ from django.views import View
 from django.views.generic import TemplateView, ListView, CreateView, UpdateView, DeleteView
 
 from apps.audit.models import AuditLog
+from apps.audit.rollups import rollup_counts, rollup_total
 from apps.core.models import ModuleConfig, FeatureFlag
 from apps.practice.models import ClinicSettings
 
@@ -442,7 +443,7 @@ class MonitoringView(SuperuserRequiredMixin, TemplateView):
             'appointments': Appointment.objects.count(),
             'orders': Order.objects.count(),
             'invoices': Invoice.objects.count(),
-            'audit_logs': AuditLog.objects.count(),
+            'audit_logs': rollup_total('audit'),
         }
 
     def _get_activity_stats(self):
@@ -452,17 +453,9 @@ class MonitoringView(SuperuserRequiredMixin, TemplateView):
         last_30_days = today - timezone.timedelta(days=30)
 
         return {
-            'logins_today': AuditLog.objects.filter(
-                action='login',
-                created_at__date=today
-            ).count(),
-            'logins_7_days': AuditLog.objects.filter(
-                action='login',
-                created_at__date__gte=last_7_days
-            ).count(),
-            'actions_30_days': AuditLog.objects.filter(
-                created_at__date__gte=last_30_days
-            ).count(),
+            'logins_today': rollup_counts('audit', 'action', since=today)['login'],
+            'logins_7_days': rollup_counts('audit', 'action', since=last_7_days)['login'],
+            'actions_30_days': rollup_total('audit', since=last_30_days),
         }
 
 
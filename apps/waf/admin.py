@@ -2,6 +2,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
 
+from .ban_list import bump_ban_version
 from .models import WAFConfig, BannedIP, AllowedCountry, SecurityEvent
 
 
@@ -145,6 +146,8 @@ class BannedIPAdmin(admin.ModelAdmin):
     def make_permanent(self, request, queryset):
         """Make selected bans permanent."""
         count = queryset.update(permanent=True, expires_at=None)
+        # update() skips post_save, so notify workers explicitly
+        bump_ban_version()
         self.message_user(request, f'Made {count} ban(s) permanent.')
 
 
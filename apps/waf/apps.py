@@ -11,4 +11,4 @@ class WafConfig(AppConfig):
 
     def ready(self):
         """Initialize WAF when Django starts."""
-        pass
+        import apps.waf.signals  # noqa: F401
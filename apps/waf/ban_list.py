@@ -0,0 +1,208 @@
+"""In-process IP ban list shared by the WAF middleware.
+
+Each worker keeps every active ban in memory, so checking a clean IP needs
+no cache or database round trip. Bans are loaded lazily from ``BannedIP``
+on first use. They stay in sync across workers through a version stamp in
+the Django cache:
+
+- Any change to ``BannedIP`` (middleware auto-ban, admin, shell) bumps the
+  stamp via post_save/post_delete signals.
+- Each worker polls the stamp at most once per ``WAF_BAN_SYNC_INTERVAL``
+  seconds and reloads from the database only when it has changed.
+
+Bans made by the current worker take effect immediately. Bans made by other
+workers take effect within one sync interval.
+
+Configuration:
+    WAF_BAN_SYNC_INTERVAL = 2  # seconds between version checks
+    WAF_BANNED_NETWORKS = ['203.0.113.0/24']  # static CIDR bans
+"""
+import ipaddress
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+BAN_VERSION_KEY = 'waf:bans:version'
+
+
+class IPBanSet:
+    """Banned addresses and CIDR networks with optional expiry.
+
+    Entries are bucketed by (IP version, prefix length), and each bucket maps
+    the masked network integer to its expiry timestamp. A lookup masks the
+    address once per populated prefix length. In practice that is one
+    hash probe for single-IP bans plus one per distinct CIDR length.
+    """
+
+    def __init__(self):
+        # (ip_version, prefixlen) -> {network_int: expires_ts or None}
+        self._tables: dict[tuple[int, int], dict[int, float | None]] = {}
+
+    def __len__(self):
+        return sum(len(table) for table in self._tables.values())
+
+    @staticmethod
+    def _parse(address: str):
+        """Parse an address or CIDR into (version, prefixlen, network_int)."""
+        network = ipaddress.ip_network(address, strict=False)
+        return (
+            network.version,
+            network.prefixlen,
+            int(network.network_address) >> (network.max_prefixlen - network.prefixlen),
+        )
+
+    def add(self, address: str, expires_at: float | None = None) -> None:
+        """Ban an address or network.
+
+        Args:
+            address: IP address or CIDR network.
+            expires_at: Unix timestamp when the ban ends, None for no expiry.
+        """
+        version, prefixlen, key = self._parse(address)
+        self._tables.setdefault((version, prefixlen), {})[key] = expires_at
+
+    def remove(self, address: str) -> None:
+        """Remove an address or network ban if present."""
+        version, prefixlen, key = self._parse(address)
+        self._tables.get((version, prefixlen), {}).pop(key, None)
+
+    def contains(self, ip: str, now: float | None = None) -> bool:
+        """Check if an IP falls under an unexpired ban.
+
+        Args:
+            ip: Client IP address.
+            now: Current Unix time (defaults to time.time()).
+
+        Returns:
+            True if the IP is banned.
+        """
+        if not self._tables:
+            return False
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+
+        value = int(address)
+        bits = address.max_prefixlen
+        for (version, prefixlen), table in self._tables.items():
+            if version != address.version:
+                continue
+            key = value >> (bits - prefixlen)
+            if key in table:
+                expires_at = table[key]
+                if expires_at is None:
+                    return True
+                if expires_at > (now if now is not None else time.time()):
+                    return True
+        return False
+
+
+class BanList:
+    """Per-worker ban list kept in sync through a cache version stamp."""
+
+    def __init__(self):
+        self._bans = IPBanSet()
+        self._version = None
+        self._loaded = False
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def sync_interval(self) -> float:
+        return getattr(settings, 'WAF_BAN_SYNC_INTERVAL', 2)
+
+    def is_banned(self, ip: str) -> bool:
+        """Check if an IP is banned (no I/O except periodic version checks).
+
+        Args:
+            ip: Client IP address.
+
+        Returns:
+            True if the IP is banned.
+        """
+        self._maybe_sync()
+        return self._bans.contains(ip)
+
+    def ban(self, ip: str, expires_at=None) -> None:
+        """Add a ban locally. Other workers pick it up via the version stamp.
+
+        Args:
+            ip: IP address or CIDR network.
+            expires_at: Datetime when the ban ends, None for no expiry.
+        """
+        self._bans.add(ip, expires_at.timestamp() if expires_at else None)
+
+    def unban(self, ip: str) -> None:
+        """Remove a ban locally."""
+        self._bans.remove(ip)
+
+    def reset(self) -> None:
+        """Drop all in-memory state; the next check reloads from the database."""
+        with self._lock:
+            self._bans = IPBanSet()
+            self._version = None
+            self._loaded = False
+            self._next_check = 0.0
+
+    def _maybe_sync(self) -> None:
+        """Reload from the database if the shared version stamp changed."""
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+
+        with self._lock:
+            if now < self._next_check:
+                return
+            self._next_check = now + self.sync_interval
+
+            try:
+                version = cache.get(BAN_VERSION_KEY)
+            except Exception:
+                logger.warning('WAF ban list: version check failed', exc_info=True)
+                return
+
+            if self._loaded and version == self._version:
+                return
+
+            if self._reload():
+                self._version = version
+                self._loaded = True
+
+    def _reload(self) -> bool:
+        """Rebuild the ban set from BannedIP and static networks."""
+        bans = IPBanSet()
+        try:
+            from .models import BannedIP
+            rows = BannedIP.objects.values_list('ip_address', 'expires_at', 'permanent')
+            for ip_address, expires_at, permanent in rows:
+                if permanent or expires_at is None:
+                    bans.add(ip_address)
+                else:
+                    bans.add(ip_address, expires_at.timestamp())
+        except Exception:
+            logger.warning('WAF ban list: could not load BannedIP', exc_info=True)
+            return False
+
+        for network in getattr(settings, 'WAF_BANNED_NETWORKS', []):
+            bans.add(network)
+
+        self._bans = bans
+        return True
+
+
+def bump_ban_version() -> None:
+    """Tell every worker that the ban list changed."""
+    try:
+        cache.set(BAN_VERSION_KEY, time.time_ns(), None)
+    except Exception:
+        logger.warning('WAF ban list: could not bump version', exc_info=True)
+
+
+# Per-process ban list used by WAFMiddleware
+ban_list = BanList()
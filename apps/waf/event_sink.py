@@ -0,0 +1,158 @@
+"""Buffered persistence for WAF security events and bans.
+
+Writing a ``SecurityEvent`` row (and upserting ``BannedIP``) inside the
+request path turns every blocked request into a database write, which is
+exactly what an attack produces in bulk. The sink queues those writes in
+a ``WriteBehindBuffer`` and persists them off the request path:
+
+- ``buffered`` (default): the buffer's daemon thread flushes with
+  ``bulk_create`` every ``WAF_EVENT_FLUSH_INTERVAL`` seconds, or sooner
+  when ``WAF_EVENT_BATCH_SIZE`` events are waiting. Bans wake it at once.
+- ``celery``: each flush hands the batch to ``persist_security_events``.
+- ``sync``: write immediately (previous behavior).
+
+The queue is bounded by ``WAF_EVENT_QUEUE_SIZE``; events beyond it are
+dropped and counted, so a flood cannot exhaust worker memory. Ban upserts
+are deduplicated per IP within a batch. The fail2ban log lines written by
+``security_logger`` are unaffected and stay synchronous.
+"""
+import logging
+
+from django.conf import settings
+
+from apps.core.write_behind import WriteBehindBuffer
+
+logger = logging.getLogger(__name__)
+
+# Column limits on SecurityEvent / BannedIP; one oversized value must not
+# fail a whole bulk insert.
+_MAX_LENGTHS = {'path': 500, 'user_agent': 500, 'reason': 200}
+
+
+def _truncate(fields: dict) -> dict:
+    """Clip string fields to their column sizes."""
+    for name, limit in _MAX_LENGTHS.items():
+        value = fields.get(name)
+        if isinstance(value, str) and len(value) > limit:
+            fields[name] = value[:limit]
+    return fields
+
+
+def write_security_records(events: list[dict], bans: dict[str, dict]) -> int:
+    """Persist queued security events and ban upserts.
+
+    Args:
+        events: SecurityEvent field dicts.
+        bans: Mapping of IP address to BannedIP defaults.
+
+    Returns:
+        Number of SecurityEvent rows written.
+    """
+    from .models import BannedIP, SecurityEvent
+
+    if events:
+        SecurityEvent.objects.bulk_create(
+            [SecurityEvent(**fields) for fields in events],
+            batch_size=500,
+        )
+    for ip, defaults in bans.items():
+        BannedIP.objects.update_or_create(ip_address=ip, defaults=defaults)
+    return len(events)
+
+
+class SecurityEventSink:
+    """Per-worker buffer of SecurityEvent and BannedIP writes.
+
+    Queued items are ``('event', fields)`` or ``('ban', ip, defaults)``.
+    """
+
+    def __init__(self):
+        self.buffer = WriteBehindBuffer(
+            'waf-event-sink',
+            self._persist,
+            batch_size=getattr(settings, 'WAF_EVENT_BATCH_SIZE', 200),
+            flush_interval=getattr(settings, 'WAF_EVENT_FLUSH_INTERVAL', 1.0),
+            max_size=getattr(settings, 'WAF_EVENT_QUEUE_SIZE', 10000),
+        )
+
+    @property
+    def mode(self) -> str:
+        return getattr(settings, 'WAF_EVENT_SINK', 'buffered')
+
+    def emit_event(self, **fields) -> bool:
+        """Queue a SecurityEvent row.
+
+        Args:
+            **fields: SecurityEvent model fields.
+
+        Returns:
+            False if the event was dropped because the queue is full.
+        """
+        return self._emit(('event', _truncate(fields)))
+
+    def emit_ban(self, ip: str, **defaults) -> bool:
+        """Queue a BannedIP upsert (latest defaults win per IP).
+
+        Args:
+            ip: Banned IP address.
+            **defaults: BannedIP fields to set.
+
+        Returns:
+            False if the ban was dropped because the queue is full.
+        """
+        queued = self._emit(('ban', ip, _truncate(defaults)))
+        if queued and self.mode != 'sync':
+            # Other workers learn of the ban from the BannedIP save
+            self.buffer.wake()
+        return queued
+
+    def _emit(self, item: tuple) -> bool:
+        if self.mode == 'sync':
+            try:
+                self._persist([item])
+            except Exception:
+                logger.exception('WAF event sink: failed to persist %s', item[0])
+            return True
+        return self.buffer.add(item)
+
+    def pending(self) -> int:
+        """Number of queued events and bans."""
+        return len(self.buffer)
+
+    def stats(self) -> dict:
+        """Counters for monitoring."""
+        return {'mode': self.mode, **self.buffer.stats()}
+
+    def flush(self) -> int:
+        """Persist everything queued so far.
+
+        Returns:
+            Number of events and bans handed off.
+        """
+        return self.buffer.flush()
+
+    def _persist(self, items: list[tuple]) -> None:
+        """Write a batch, or hand it to Celery in celery mode."""
+        events = [item[1] for item in items if item[0] == 'event']
+        bans = {item[1]: item[2] for item in items if item[0] == 'ban'}
+        if self.mode == 'celery':
+            self._send_to_celery(events, bans)
+        else:
+            write_security_records(events, bans)
+
+    def _send_to_celery(self, events: list[dict], bans: dict[str, dict]) -> None:
+        """Hand a batch to the Celery task."""
+        from .tasks import persist_security_events
+
+        serialized_bans = {
+            ip: {
+                key: value.isoformat() if hasattr(value, 'isoformat') else value
+                for key, value in defaults.items()
+            }
+            for ip, defaults in bans.items()
+        }
+        persist_security_events.delay(events, serialized_bans)
+
+
+# Per-process sink used by WAFMiddleware
+security_event_sink = SecurityEventSink()
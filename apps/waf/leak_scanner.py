@@ -0,0 +1,362 @@
+"""Streaming, budgeted data-leak scanning for WAF responses.
+
+``scan_response`` decodes a whole body and runs every leak regex over it.
+This module scans the raw bytes incrementally instead:
+
+- Bodies are fed in chunks. Each chunk is scanned together with a short
+  overlap from the previous one, so matches spanning a boundary are found.
+  Chunks shorter than the overlap are collected first, so a stream of tiny
+  chunks does not rescan the overlap once per chunk.
+  Matches touching the end of a non-final window are deferred to the next
+  window, so an unfinished number is never judged.
+- Cheap prefilters skip rule groups that cannot match: SSN and card rules
+  need a digit run, API-key rules need their keywords (except the generic
+  40-char key), and email rules need ``@``.
+- Each response has a CPU budget (``WAF_LEAK_SCAN_BUDGET_MS``) and a byte
+  limit (``WAF_LEAK_SCAN_MAX_BYTES``). Past either, scanning stops and the
+  response is passed through.
+- ``StreamingHttpResponse`` bodies are scanned as they stream. The overlap
+  is held back until it has been scanned, and the stream is cut when a
+  leak is found.
+- Per-path sampling (``WAF_LEAK_SCAN_SAMPLING``, longest prefix wins, else
+  ``WAF_LEAK_SCAN_SAMPLE_RATE``) limits which responses are scanned.
+
+Process-wide counters are kept in ``leak_scan_metrics``.
+"""
+import random
+import re
+import threading
+import time
+
+from django.conf import settings
+
+from .pattern_detector import (
+    API_KEY_PATTERNS,
+    CREDIT_CARD_PATTERNS,
+    EMAIL_PATTERNS,
+    SSN_PATTERNS,
+    DetectionResult,
+    _is_valid_ssn,
+    _luhn_checksum,
+)
+from .scanner import extract_literals
+
+# Bytes carried from one window into the next (longer than any bounded match)
+OVERLAP = 256
+
+# Default chunk size when scanning an in-memory body
+CHUNK_SIZE = 64 * 1024
+
+EMAIL_EXPOSURE_THRESHOLD = 5
+
+# Every SSN and card pattern contains three digits, an optional separator
+# and two more digits.
+_DIGIT_PREFILTER = re.compile(rb'\d{3}[-\s]?\d{2}')
+
+
+def _compile_rules(patterns: list[str], flags: int = 0):
+    """Compile str patterns to bytes regexes with optional literal prefilters."""
+    rules = []
+    for pattern in patterns:
+        literals = extract_literals(pattern, flags)
+        rules.append((
+            re.compile(pattern.encode(), flags),
+            frozenset(lit.encode() for lit in literals) if literals else None,
+        ))
+    return rules
+
+
+_ssn_rules = _compile_rules(SSN_PATTERNS, re.IGNORECASE)
+_cc_rules = _compile_rules(CREDIT_CARD_PATTERNS)
+_api_rules = _compile_rules(API_KEY_PATTERNS, re.IGNORECASE)
+_email_rules = _compile_rules(EMAIL_PATTERNS)
+
+
+class LeakScanMetrics:
+    """Process-wide counters for response leak scanning."""
+
+    FIELDS = (
+        'responses_scanned',
+        'responses_sampled_out',
+        'bytes_scanned',
+        'seconds_spent',
+        'budget_exhausted',
+        'truncated',
+        'leaks_detected',
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def add(self, **deltas) -> None:
+        with self._lock:
+            for name, value in deltas.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {name: getattr(self, name) for name in self.FIELDS}
+
+    def reset(self) -> None:
+        for name in self.FIELDS:
+            setattr(self, name, 0.0 if name == 'seconds_spent' else 0)
+
+
+leak_scan_metrics = LeakScanMetrics()
+
+
+def should_sample(path: str) -> bool:
+    """Decide whether to scan the response for this path.
+
+    Args:
+        path: Request path.
+
+    Returns:
+        True if the response should be scanned.
+    """
+    rate = getattr(settings, 'WAF_LEAK_SCAN_SAMPLE_RATE', 1.0)
+    best = -1
+    for prefix, prefix_rate in getattr(settings, 'WAF_LEAK_SCAN_SAMPLING', {}).items():
+        if path.startswith(prefix) and len(prefix) > best:
+            best, rate = len(prefix), prefix_rate
+
+    if rate >= 1:
+        return True
+    if rate <= 0 or random.random() >= rate:
+        leak_scan_metrics.add(responses_sampled_out=1)
+        return False
+    return True
+
+
+def _leak(pattern_type: str, masked: str) -> DetectionResult:
+    return DetectionResult(
+        detected=True,
+        pattern_type=pattern_type,
+        matched_pattern=masked,
+        is_outbound=True,
+    )
+
+
+class LeakScan:
+    """Incremental leak scan over a single response body.
+
+    Usage:
+        scan = LeakScan()
+        for chunk in body_chunks:
+            safe = scan.feed(chunk)      # bytes already scanned, OK to send
+            if scan.result: ...          # leak found
+        safe = scan.finish()
+    """
+
+    def __init__(self, budget_ms: float | None = None, max_bytes: int | None = None):
+        if budget_ms is None:
+            budget_ms = getattr(settings, 'WAF_LEAK_SCAN_BUDGET_MS', 10)
+        if max_bytes is None:
+            max_bytes = getattr(settings, 'WAF_LEAK_SCAN_MAX_BYTES', 1_000_000)
+        self.budget = budget_ms / 1000
+        self.max_bytes = max_bytes
+        self.result: DetectionResult | None = None
+        self.stopped = False  # budget or byte limit reached
+
+        self._tail = b''
+        self._tail_offset = 0  # position of _tail within the body
+        self._pending = b''  # fed but not yet scanned (shorter than OVERLAP)
+        self._emails: set[bytes] = set()
+        self._spent = 0.0
+        self._scanned = 0
+        self._finished = False
+
+    @property
+    def active(self) -> bool:
+        return self.result is None and not self.stopped
+
+    def feed(self, chunk: bytes) -> bytes:
+        """Scan a chunk and return the bytes that are safe to release.
+
+        Args:
+            chunk: Next piece of the response body.
+
+        Returns:
+            Bytes that have been fully scanned (or bypassed). Empty once a
+            leak has been found.
+        """
+        if self.result is not None:
+            return b''
+        if self.stopped:
+            return chunk
+
+        # Scan at least OVERLAP new bytes at a time, so each byte is
+        # scanned at most about twice whatever the chunk size
+        self._pending += chunk
+        if len(self._pending) < OVERLAP:
+            return b''
+        chunk, self._pending = self._pending, b''
+        return self._advance(chunk)
+
+    def _advance(self, chunk: bytes) -> bytes:
+        """Scan ``chunk`` after the carried-over tail; see ``feed``."""
+        if self._scanned + len(chunk) > self.max_bytes:
+            self._stop(truncated=1)
+            released, self._tail = self._tail + chunk, b''
+            return released
+
+        window = self._tail + chunk
+        window_offset = self._tail_offset
+        self._scan(window, final=False, carried=window_offset > 0)
+        self._scanned += len(chunk)
+        if self.result is not None:
+            return b''
+
+        if self.stopped:
+            self._tail = b''
+            return window
+
+        self._tail = window[-OVERLAP:]
+        self._tail_offset = window_offset + len(window) - len(self._tail)
+        return window[:-OVERLAP] if len(window) > OVERLAP else b''
+
+    def finish(self) -> bytes:
+        """Scan the pending bytes and held-back tail, and return them if clean."""
+        pending, self._pending = self._pending, b''
+        released = self._advance(pending) if pending and self.active else pending
+        tail, self._tail = self._tail, b''
+        if self.active and tail:
+            self._scan(tail, final=True, carried=self._tail_offset > 0)
+        if not self._finished:
+            self._finished = True
+            self._record()
+        return b'' if self.result is not None else released + tail
+
+    def _stop(self, budget_exhausted: int = 0, truncated: int = 0) -> None:
+        self.stopped = True
+        leak_scan_metrics.add(budget_exhausted=budget_exhausted, truncated=truncated)
+
+    def _record(self) -> None:
+        leak_scan_metrics.add(
+            responses_scanned=1,
+            bytes_scanned=self._scanned,
+            seconds_spent=self._spent,
+            leaks_detected=1 if self.result is not None else 0,
+        )
+
+    def _scan(self, window: bytes, final: bool, carried: bool) -> None:
+        """Scan a window.
+
+        Matches touching the end of a non-final window may be unfinished, and
+        matches at the very start of a carried-over window may be the tail
+        of a longer token; both are left to the neighbouring window.
+        """
+        start = time.perf_counter()
+        self.result = self._scan_window(
+            window,
+            1 if carried else 0,
+            len(window) if final else len(window) - 1,
+        )
+        self._spent += time.perf_counter() - start
+        if self.result is None and self._spent > self.budget:
+            self._stop(budget_exhausted=1)
+
+    @staticmethod
+    def _matches(rules, window: bytes, first: int, limit: int, folded: bytes | None = None):
+        """Yield matches starting at or after ``first`` and ending by ``limit``."""
+        for regex, literals in rules:
+            if literals is not None and folded is not None:
+                if not any(literal in folded for literal in literals):
+                    continue
+            for match in regex.finditer(window):
+                if match.start() >= first and match.end() <= limit:
+                    yield match
+
+    def _scan_window(self, window: bytes, first: int, limit: int) -> DetectionResult | None:
+        """Run all leak rules over one window, in scan_response priority order."""
+        if _DIGIT_PREFILTER.search(window):
+            for match in self._matches(_ssn_rules, window, first, limit):
+                ssn = b''.join(match.groups()) if match.groups() else match.group(0)
+                ssn = ssn.decode('ascii', 'ignore')
+                if _is_valid_ssn(ssn):
+                    return _leak('ssn_leak', 'XXX-XX-' + ssn[-4:])
+
+            for match in self._matches(_cc_rules, window, first, limit):
+                clean = match.group(0).decode('ascii', 'ignore').replace('-', '').replace(' ', '')
+                if _luhn_checksum(clean):
+                    return _leak('cc_leak', 'XXXX-XXXX-XXXX-' + clean[-4:])
+
+        folded = window.lower()
+        for match in self._matches(_api_rules, window, first, limit, folded):
+            key = (match.group(1) if match.lastindex else match.group(0)).decode('ascii', 'ignore')
+            masked = key[:8] + '...' + key[-4:] if len(key) > 12 else key[:4] + '...'
+            return _leak('api_key_leak', masked)
+
+        if b'@' in window:
+            for match in self._matches(_email_rules, window, first, limit):
+                self._emails.add(match.group(0))
+            if len(self._emails) >= EMAIL_EXPOSURE_THRESHOLD:
+                return _leak('email_exposure', f'{len(self._emails)} emails found')
+
+        return None
+
+
+def scan_body(content: bytes, chunk_size: int = CHUNK_SIZE) -> DetectionResult | None:
+    """Scan an in-memory response body within the configured budget.
+
+    Args:
+        content: Response body bytes.
+        chunk_size: Bytes per scan window.
+
+    Returns:
+        DetectionResult if a leak was found, otherwise None.
+    """
+    scan = LeakScan()
+    for offset in range(0, len(content), chunk_size):
+        scan.feed(content[offset:offset + chunk_size])
+        if not scan.active:
+            break
+    scan.finish()
+    return scan.result
+
+
+def guard_stream(iterator, on_leak):
+    """Wrap a streaming body so it is scanned as it is sent.
+
+    Args:
+        iterator: Iterable of bytes chunks.
+        on_leak: Callback receiving the DetectionResult when a leak is found.
+
+    Yields:
+        Scanned chunks; stops early if a leak is found.
+    """
+    scan = LeakScan()
+    for chunk in iterator:
+        released = scan.feed(chunk)
+        if scan.result is not None:
+            scan.finish()
+            on_leak(scan.result)
+            return
+        if released:
+            yield released
+    released = scan.finish()
+    if scan.result is not None:
+        on_leak(scan.result)
+        return
+    if released:
+        yield released
+
+
+async def aguard_stream(iterator, on_leak):
+    """Async variant of guard_stream for async streaming responses."""
+    scan = LeakScan()
+    async for chunk in iterator:
+        released = scan.feed(chunk)
+        if scan.result is not None:
+            scan.finish()
+            on_leak(scan.result)
+            return
+        if released:
+            yield released
+    released = scan.finish()
+    if scan.result is not None:
+        on_leak(scan.result)
+        return
+    if released:
+        yield released
@@ -13,8 +13,13 @@ from django.core.cache import cache
 from django.http import HttpResponseForbidden, HttpResponse
 from django.utils import timezone
 
+from apps.core.routing import classify_path, classify_request
+
+from .ban_list import ban_list
+from .event_sink import security_event_sink
 from .rate_limiter import TokenBucketRateLimiter
-from .pattern_detector import scan_request, scan_response
+from .leak_scanner import aguard_stream, guard_stream, scan_body, should_sample
+from .pattern_detector import scan_request
 from .security_logger import (
     log_rate_limit,
     log_pattern_detected,
@@ -23,6 +28,14 @@ from .security_logger import (
     log_security_event,
 )
 
+# Used when settings.WAF_EXCLUDED_PATHS is not set
+DEFAULT_EXCLUDED_PATHS = [
+    '/static/',
+    '/media/',
+    '/__reload__/',
+    '/favicon.ico',
+]
+
 
 def get_client_ip(request) -> str:
     """Extract client IP from request."""
@@ -34,16 +47,7 @@ def get_client_ip(request) -> str:
 
 def is_path_excluded(path: str) -> bool:
     """Check if path is excluded from WAF processing."""
-    excluded = getattr(settings, 'WAF_EXCLUDED_PATHS', [
-        '/static/',
-        '/media/',
-        '/__reload__/',
-        '/favicon.ico',
-    ])
-    for excluded_path in excluded:
-        if path.startswith(excluded_path):
-            return True
-    return False
+    return classify_path(path).static
 
 
 class WAFMiddleware:
@@ -84,7 +88,7 @@ class WAFMiddleware:
             return self.get_response(request)
 
         # Skip excluded paths
-        if is_path_excluded(request.path):
+        if classify_request(request).static:
             return self.get_response(request)
 
         ip = get_client_ip(request)
@@ -113,19 +117,29 @@ class WAFMiddleware:
         response = self.get_response(request)
 
         # Data leak detection on responses
-        if self.data_leak_detection and self._should_scan_response(response):
-            content = self._get_response_content(response)
-            if content:
-                result = scan_response(content)
-                if result.detected:
-                    # Log data leak attempt and block response
-                    log_security_event(
-                        'DATA_LEAK_BLOCKED',
-                        ip,
-                        pattern=result.pattern_type,
-                        path=request.path,
-                        matched=result.matched_pattern,
-                    )
+        if (
+            self.data_leak_detection
+            and self._should_scan_response(response)
+            and should_sample(request.path)
+        ):
+            def on_leak(result):
+                # Log data leak attempt
+                log_security_event(
+                    'DATA_LEAK_BLOCKED',
+                    ip,
+                    pattern=result.pattern_type,
+                    path=request.path,
+                    matched=result.matched_pattern,
+                )
+
+            if response.streaming:
+                # Headers are already committed; cut the stream at the leak
+                guard = aguard_stream if getattr(response, 'is_async', False) else guard_stream
+                response.streaming_content = guard(response.streaming_content, on_leak)
+            else:
+                result = scan_body(response.content)
+                if result:
+                    on_leak(result)
                     # Return a generic error instead of the leaky response
                     return HttpResponse(
                         "An error occurred processing your request.",
@@ -140,24 +154,8 @@ class WAFMiddleware:
         return response
 
     def _is_ip_banned(self, ip: str) -> bool:
-        """Check if IP is currently banned."""
-        # Check cache first
-        cache_key = f'waf:banned:{ip}'
-        if cache.get(cache_key):
-            return True
-
-        # Check database
-        try:
-            from .models import BannedIP
-            ban = BannedIP.objects.filter(ip_address=ip).first()
-            if ban and ban.is_active:
-                # Cache the ban status
-                cache.set(cache_key, True, self.ban_duration)
-                return True
-        except Exception:
-            pass
-
-        return False
+        """Check if IP is currently banned (in-process ban list, no I/O)."""
+        return ban_list.is_banned(ip)
 
     def _record_strike(self, ip: str, event_type: str, path: str):
         """Record a strike against an IP."""
@@ -169,41 +167,32 @@ class WAFMiddleware:
         if strikes >= self.max_strikes:
             self._ban_ip(ip, f'Auto-banned after {strikes} strikes ({event_type})')
 
-        # Save to database
-        try:
-            from .models import SecurityEvent
-            SecurityEvent.objects.create(
-                event_type=event_type,
-                ip_address=ip,
-                path=path,
-                method=getattr(self, '_current_request', {}).get('method', 'GET'),
-                action_taken='logged' if strikes < self.max_strikes else 'banned',
-            )
-        except Exception:
-            pass
+        # Queue for persistence off the request path
+        security_event_sink.emit_event(
+            event_type=event_type,
+            ip_address=ip,
+            path=path,
+            method=getattr(self, '_current_request', {}).get('method', 'GET'),
+            action_taken='logged' if strikes < self.max_strikes else 'banned',
+        )
 
     def _ban_ip(self, ip: str, reason: str):
         """Ban an IP address."""
-        # Cache the ban
-        cache_key = f'waf:banned:{ip}'
-        cache.set(cache_key, True, self.ban_duration)
+        expires_at = timezone.now() + timezone.timedelta(seconds=self.ban_duration)
+
+        # Ban locally right away
+        ban_list.ban(ip, expires_at)
 
         # Log the ban
         log_ip_banned(ip, reason, self.ban_duration)
 
-        # Save to database
-        try:
-            from .models import BannedIP
-            BannedIP.objects.update_or_create(
-                ip_address=ip,
-                defaults={
-                    'reason': reason,
-                    'auto_banned': True,
-                    'expires_at': timezone.now() + timezone.timedelta(seconds=self.ban_duration),
-                }
-            )
-        except Exception:
-            pass
+        # Queue the BannedIP upsert; its signal syncs other workers
+        security_event_sink.emit_ban(
+            ip,
+            reason=reason,
+            auto_banned=True,
+            expires_at=expires_at,
+        )
 
     def _should_scan_response(self, response) -> bool:
         """Determine if response should be scanned for data leaks."""
@@ -215,22 +204,3 @@ class WAFMiddleware:
         content_type = response.get('Content-Type', '')
         scannable_types = ('text/html', 'text/plain', 'application/json', 'text/xml')
         return any(t in content_type for t in scannable_types)
-
-    def _get_response_content(self, response) -> str | None:
-        """Extract text content from response."""
-        try:
-            # Handle streaming responses
-            if hasattr(response, 'streaming_content'):
-                return None  # Don't scan streaming responses
-
-            content = response.content
-            if isinstance(content, bytes):
-                content = content.decode('utf-8', errors='ignore')
-
-            # Don't scan very large responses
-            if len(content) > 1_000_000:  # 1MB limit
-                return None
-
-            return content
-        except Exception:
-            return None
@@ -2,6 +2,8 @@
 import re
 from typing import NamedTuple
 
+from .scanner import MultiPatternScanner
+
 
 class DetectionResult(NamedTuple):
     """Result of pattern detection."""
@@ -93,11 +95,34 @@ PATH_TRAVERSAL_PATTERNS = [
     r"(?:c:\\boot\.ini)",
 ]
 
-# Compile patterns for performance
+# Compile patterns (kept for callers that iterate the rules directly)
 _sql_patterns = [re.compile(p, re.IGNORECASE) for p in SQL_INJECTION_PATTERNS]
 _xss_patterns = [re.compile(p, re.IGNORECASE) for p in XSS_PATTERNS]
 _path_patterns = [re.compile(p, re.IGNORECASE) for p in PATH_TRAVERSAL_PATTERNS]
 
+# Single-pass scanners built from the rule lists above. Rule order is
+# preserved, so results match the original per-regex loops exactly.
+_sql_scanner = MultiPatternScanner([('sqli', SQL_INJECTION_PATTERNS)])
+_xss_scanner = MultiPatternScanner([('xss', XSS_PATTERNS)])
+_path_scanner = MultiPatternScanner([('path_traversal', PATH_TRAVERSAL_PATTERNS)])
+_attack_scanner = MultiPatternScanner([
+    ('sqli', SQL_INJECTION_PATTERNS),
+    ('xss', XSS_PATTERNS),
+    ('path_traversal', PATH_TRAVERSAL_PATTERNS),
+])
+
+
+def _scan(scanner: MultiPatternScanner, text: str) -> DetectionResult:
+    """Run a scanner and wrap its match in a DetectionResult."""
+    match = scanner.scan(text)
+    if match:
+        return DetectionResult(
+            detected=True,
+            pattern_type=match.pattern_type,
+            matched_pattern=match.matched
+        )
+    return DetectionResult(detected=False, pattern_type=None, matched_pattern=None)
+
 
 def detect_sql_injection(text: str) -> DetectionResult:
     """Detect SQL injection patterns in text.
@@ -108,15 +133,7 @@ def detect_sql_injection(text: str) -> DetectionResult:
     Returns:
         DetectionResult with detection status and matched pattern.
     """
-    for pattern in _sql_patterns:
-        match = pattern.search(text)
-        if match:
-            return DetectionResult(
-                detected=True,
-                pattern_type='sqli',
-                matched_pattern=match.group(0)
-            )
-    return DetectionResult(detected=False, pattern_type=None, matched_pattern=None)
+    return _scan(_sql_scanner, text)
 
 
 def detect_xss(text: str) -> DetectionResult:
@@ -128,15 +145,7 @@ def detect_xss(text: str) -> DetectionResult:
     Returns:
         DetectionResult with detection status and matched pattern.
     """
-    for pattern in _xss_patterns:
-        match = pattern.search(text)
-        if match:
-            return DetectionResult(
-                detected=True,
-                pattern_type='xss',
-                matched_pattern=match.group(0)
-            )
-    return DetectionResult(detected=False, pattern_type=None, matched_pattern=None)
+    return _scan(_xss_scanner, text)
 
 
 def detect_path_traversal(text: str) -> DetectionResult:
@@ -148,42 +157,22 @@ def detect_path_traversal(text: str) -> DetectionResult:
     Returns:
         DetectionResult with detection status and matched pattern.
     """
-    for pattern in _path_patterns:
-        match = pattern.search(text)
-        if match:
-            return DetectionResult(
-                detected=True,
-                pattern_type='path_traversal',
-                matched_pattern=match.group(0)
-            )
-    return DetectionResult(detected=False, pattern_type=None, matched_pattern=None)
+    return _scan(_path_scanner, text)
 
 
 def detect_all(text: str) -> DetectionResult:
     """Detect all attack patterns in text.
 
+    Scans SQL injection, XSS and path traversal rules in a single pass,
+    in that priority order.
+
     Args:
         text: Text to scan.
 
     Returns:
         First DetectionResult found, or negative result.
     """
-    # Check SQL injection
-    result = detect_sql_injection(text)
-    if result.detected:
-        return result
-
-    # Check XSS
-    result = detect_xss(text)
-    if result.detected:
-        return result
-
-    # Check path traversal
-    result = detect_path_traversal(text)
-    if result.detected:
-        return result
-
-    return DetectionResult(detected=False, pattern_type=None, matched_pattern=None)
+    return _scan(_attack_scanner, text)
 
 
 def scan_request(request) -> DetectionResult:
@@ -253,8 +242,8 @@ CREDIT_CARD_PATTERNS = [
 API_KEY_PATTERNS = [
     # AWS Access Key
     r"(?:AKIA|A3T|AGPA|AIDA|AROA|AIPA|ANPA|ANVA|ASIA)[A-Z0-9]{16}",
-    # AWS Secret Key
-    r"(?:[A-Za-z0-9+/]{40})",
+    # AWS Secret Key (anchored at the start of a run so the scan stays linear)
+    r"(?:(?<![A-Za-z0-9+/])[A-Za-z0-9+/]{40})",
     # Generic API keys (long alphanumeric strings)
     r"(?:api[_-]?key|apikey|api[_-]?secret)['\"]?\s*[:=]\s*['\"]?([a-zA-Z0-9_-]{20,})",
     # Bearer tokens
@@ -1,6 +1,81 @@
-"""Rate limiting using token bucket algorithm with Django cache backend."""
+"""Rate limiting using token bucket algorithm with Django cache backend.
+
+When the default cache is Django's ``RedisCache``, refill and consume run as
+a single Lua script on the Redis server: one round trip per request and no
+lost updates between concurrent workers. Other cache backends fall back to
+get/compute/set, serialized with a lock inside the process.
+"""
+import threading
 import time
+
 from django.core.cache import cache
+from django.core.cache.backends.redis import RedisCacheClient
+
+
+# Refill and consume a token bucket stored as a Redis hash.
+# KEYS[1] = bucket key
+# ARGV[1] = capacity, ARGV[2] = refill rate (tokens/sec), ARGV[3] = TTL (sec)
+# Returns {allowed (0/1), remaining tokens}
+TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local ttl = tonumber(ARGV[3])
+
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1])
+local ts = tonumber(bucket[2])
+
+if tokens == nil or ts == nil then
+    tokens = capacity
+else
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+end
+
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+
+redis.call('HSET', KEYS[1], 'tokens', string.format('%.6f', tokens), 'ts', string.format('%.6f', now))
+redis.call('EXPIRE', KEYS[1], ttl)
+
+return {allowed, math.floor(tokens)}
+"""
+
+_script = None
+_script_lock = threading.Lock()
+
+# Serializes the non-Redis fallback within this process
+_fallback_lock = threading.Lock()
+
+
+def _get_redis_client(key: str):
+    """Return a raw redis-py client if the default cache is RedisCache.
+
+    Args:
+        key: Final (prefixed and versioned) cache key.
+
+    Returns:
+        redis.Redis client, or None for non-Redis caches.
+    """
+    backend_client = getattr(cache, '_cache', None)
+    if isinstance(backend_client, RedisCacheClient):
+        return backend_client.get_client(key, write=True)
+    return None
+
+
+def _get_script(client):
+    """Get the registered token bucket script (loaded once per process)."""
+    global _script
+    if _script is None:
+        with _script_lock:
+            if _script is None:
+                _script = client.register_script(TOKEN_BUCKET_LUA)
+    return _script
 
 
 class TokenBucketRateLimiter:
@@ -10,21 +85,42 @@ class TokenBucketRateLimiter:
     Tokens are consumed on each request and refill over time.
     """
 
-    def __init__(self, max_requests: int = 200, window_seconds: int = 60):
+    def __init__(self, max_requests: int = 200, window_seconds: int = 60, atomic: bool = True):
         """Initialize rate limiter.
 
         Args:
             max_requests: Maximum requests allowed in the window.
             window_seconds: Time window in seconds.
+            atomic: Use the server-side Lua script when the cache is Redis.
         """
         self.max_requests = max_requests
         self.window_seconds = window_seconds
         self.refill_rate = max_requests / window_seconds  # tokens per second
+        self.atomic = atomic
 
     def _get_bucket_key(self, ip: str) -> str:
         """Get cache key for an IP's bucket."""
         return f"waf:rate:{ip}"
 
+    def _get_atomic_key(self, ip: str) -> str:
+        """Get the final Redis key for an IP's hash bucket.
+
+        Kept apart from the pickled fallback bucket so the two formats never
+        collide on the same key.
+        """
+        return cache.make_and_validate_key(f"{self._get_bucket_key(ip)}:tb")
+
+    def _get_atomic_target(self, ip: str):
+        """Return (redis_client, final_key) if the atomic path is available."""
+        if not self.atomic:
+            return None, None
+        key = self._get_atomic_key(ip)
+        return _get_redis_client(key), key
+
+    def _script_args(self) -> tuple:
+        """Lua script ARGV: capacity, refill rate, TTL."""
+        return (self.max_requests, self.refill_rate, self.window_seconds * 2)
+
     def is_allowed(self, ip: str) -> tuple[bool, int]:
         """Check if a request from this IP is allowed.
 
@@ -34,6 +130,50 @@ class TokenBucketRateLimiter:
         Returns:
             Tuple of (allowed: bool, remaining: int)
         """
+        client, key = self._get_atomic_target(ip)
+        if client is not None:
+            allowed, remaining = _get_script(client)(
+                keys=[key], args=self._script_args(), client=client
+            )
+            return bool(allowed), int(remaining)
+
+        with _fallback_lock:
+            return self._is_allowed_fallback(ip)
+
+    def is_allowed_many(self, ips: list[str]) -> list[tuple[bool, int]]:
+        """Check several buckets with one Redis round trip per server.
+
+        With several Redis servers configured, keys are spread across them,
+        so the buckets are grouped by server and pipelined per group.
+
+        Args:
+            ips: Client IP addresses (or other bucket identifiers).
+
+        Returns:
+            List of (allowed, remaining) tuples in the same order as ``ips``.
+        """
+        if not ips:
+            return []
+
+        groups = {}
+        for index, ip in enumerate(ips):
+            client, key = self._get_atomic_target(ip)
+            if client is None:
+                return [self.is_allowed(ip) for ip in ips]
+            groups.setdefault(client, []).append((index, key))
+
+        results = [None] * len(ips)
+        for client, entries in groups.items():
+            script = _get_script(client)
+            pipe = client.pipeline(transaction=False)
+            for _, key in entries:
+                script(keys=[key], args=self._script_args(), client=pipe)
+            for (index, _), (allowed, remaining) in zip(entries, pipe.execute()):
+                results[index] = (bool(allowed), int(remaining))
+        return results
+
+    def _is_allowed_fallback(self, ip: str) -> tuple[bool, int]:
+        """Token bucket using cache get/set (non-Redis caches)."""
         key = self._get_bucket_key(ip)
         now = time.time()
 
@@ -79,8 +219,14 @@ class TokenBucketRateLimiter:
         Returns:
             Number of remaining requests allowed.
         """
-        key = self._get_bucket_key(ip)
-        bucket = cache.get(key)
+        client, final_key = self._get_atomic_target(ip)
+        if client is not None:
+            tokens, ts = client.hmget(final_key, 'tokens', 'ts')
+            if tokens is None or ts is None:
+                return self.max_requests
+            bucket = {'tokens': float(tokens), 'last_update': float(ts)}
+        else:
+            bucket = cache.get(self._get_bucket_key(ip))
 
         if bucket is None:
             return self.max_requests
@@ -100,6 +246,10 @@ class TokenBucketRateLimiter:
         key = self._get_bucket_key(ip)
         cache.delete(key)
 
+        client, atomic_key = self._get_atomic_target(ip)
+        if client is not None:
+            client.delete(atomic_key)
+
 
 # Default rate limiter instance
 rate_limiter = TokenBucketRateLimiter()
@@ -0,0 +1,188 @@
+"""Single-pass multi-pattern scanning engine for WAF rule lists.
+
+Running every rule as its own case-insensitive regex search means the text is
+walked once per rule, and ``re.IGNORECASE`` disables the literal-prefix fast
+path, so each walk is slow. This engine compiles the rule lists once into:
+
+1. A set of *required literals* per rule, extracted from the parsed regex.
+   At least one of them must appear in any text the rule can match.
+2. The original compiled regex for each rule.
+
+A scan folds the text to lower case once, tests each distinct literal with a
+plain substring search, and only runs the regexes whose literals are present.
+Clean traffic (the normal case) never runs a regex at all. Rules are still
+evaluated in list order, so the reported match is exactly the one the
+per-regex loop would report.
+"""
+import re
+from typing import Iterable, NamedTuple, Sequence
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover
+    import sre_parse
+
+
+# Non-ASCII characters that ``re.IGNORECASE`` treats as equal to an ASCII
+# letter but that ``str.lower()`` does not map onto it.
+_UNICODE_CASE_FOLD = str.maketrans({
+    'İ': 'i',  # LATIN CAPITAL LETTER I WITH DOT ABOVE
+    'ı': 'i',  # LATIN SMALL LETTER DOTLESS I
+    'ſ': 's',  # LATIN SMALL LETTER LONG S
+    'K': 'k',  # KELVIN SIGN
+})
+
+_REPEAT_OPS = tuple(
+    getattr(sre_parse, name)
+    for name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT')
+    if hasattr(sre_parse, name)
+)
+
+
+class ScanRule(NamedTuple):
+    """A compiled rule with its literal prefilter."""
+    pattern_type: str
+    regex: re.Pattern
+    literals: frozenset[str] | None  # None = always run the regex
+
+
+class ScanMatch(NamedTuple):
+    """First rule that matched a scanned text."""
+    pattern_type: str
+    matched: str
+
+
+def _best(current: frozenset[str] | None, candidate: frozenset[str] | None):
+    """Prefer the literal set whose shortest member is longest (most selective)."""
+    if not candidate:
+        return current
+    if current is None or min(map(len, candidate)) > min(map(len, current)):
+        return candidate
+    return current
+
+
+def _required_literals(items) -> frozenset[str] | None:
+    """Return literals of which at least one occurs in every match of ``items``.
+
+    Args:
+        items: A parsed regex sequence (``sre_parse.SubPattern`` or list of ops).
+
+    Returns:
+        Frozenset of literal strings, or None if no literal is guaranteed.
+    """
+    best = None
+    run: list[str] = []
+
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            run.append(chr(av))
+            continue
+
+        if run:
+            best = _best(best, frozenset({''.join(run)}))
+            run = []
+
+        if op is sre_parse.SUBPATTERN:
+            best = _best(best, _required_literals(av[-1]))
+        elif op is sre_parse.BRANCH:
+            alternatives = [_required_literals(branch) for branch in av[1]]
+            if alternatives and all(alternatives):
+                best = _best(best, frozenset().union(*alternatives))
+        elif op in _REPEAT_OPS and av[0] >= 1:
+            best = _best(best, _required_literals(av[2]))
+
+    if run:
+        best = _best(best, frozenset({''.join(run)}))
+    return best
+
+
+def extract_literals(pattern: str, flags: int = 0) -> frozenset[str] | None:
+    """Extract the required literals of a regex pattern.
+
+    Args:
+        pattern: Regex source.
+        flags: Regex flags the pattern is compiled with.
+
+    Returns:
+        Frozenset of literals (lower-cased for case-insensitive patterns),
+        or None if the pattern cannot be prefiltered.
+    """
+    try:
+        literals = _required_literals(sre_parse.parse(pattern, flags & ~re.IGNORECASE))
+    except Exception:
+        return None
+    if literals and flags & re.IGNORECASE:
+        literals = frozenset(lit.lower() for lit in literals)
+    return literals
+
+
+class MultiPatternScanner:
+    """Scan text against ordered rule lists with a shared literal prefilter.
+
+    Usage:
+        scanner = MultiPatternScanner([
+            ('sqli', SQL_INJECTION_PATTERNS),
+            ('xss', XSS_PATTERNS),
+        ])
+        match = scanner.scan(text)
+        if match:
+            match.pattern_type, match.matched
+    """
+
+    def __init__(
+        self,
+        rule_sets: Iterable[tuple[str, Sequence[str]]],
+        flags: int = re.IGNORECASE,
+    ):
+        """Compile rule lists into a scanner.
+
+        Args:
+            rule_sets: ``(pattern_type, patterns)`` pairs in priority order.
+            flags: Regex flags applied to every pattern.
+        """
+        self.flags = flags
+        self.rules: list[ScanRule] = [
+            ScanRule(pattern_type, re.compile(pattern, flags), extract_literals(pattern, flags))
+            for pattern_type, patterns in rule_sets
+            for pattern in patterns
+        ]
+
+    def _fold(self, text: str) -> str:
+        """Fold text the same way the literals were folded."""
+        if not self.flags & re.IGNORECASE:
+            return text
+        if text.isascii():
+            return text.lower()
+        return text.translate(_UNICODE_CASE_FOLD).lower()
+
+    def scan(self, text: str) -> ScanMatch | None:
+        """Return the first rule (in priority order) matching ``text``.
+
+        Args:
+            text: Text to scan.
+
+        Returns:
+            ScanMatch for the first matching rule, or None if clean.
+        """
+        if not text:
+            return None
+
+        folded = self._fold(text)
+        present: dict[str, bool] = {}
+
+        for rule in self.rules:
+            if rule.literals is not None:
+                for literal in rule.literals:
+                    hit = present.get(literal)
+                    if hit is None:
+                        hit = present[literal] = literal in folded
+                    if hit:
+                        break
+                else:
+                    continue
+
+            match = rule.regex.search(text)
+            if match:
+                return ScanMatch(rule.pattern_type, match.group(0))
+
+        return None
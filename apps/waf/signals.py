@@ -0,0 +1,23 @@
+"""Signal handlers keeping worker ban lists in sync with BannedIP."""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .ban_list import ban_list, bump_ban_version
+from .models import BannedIP
+
+
+@receiver(post_save, sender=BannedIP)
+def banned_ip_saved(sender, instance, **kwargs):
+    """Apply the ban locally and notify other workers."""
+    if instance.permanent:
+        ban_list.ban(instance.ip_address)
+    else:
+        ban_list.ban(instance.ip_address, instance.expires_at)
+    bump_ban_version()
+
+
+@receiver(post_delete, sender=BannedIP)
+def banned_ip_deleted(sender, instance, **kwargs):
+    """Lift the ban locally and notify other workers."""
+    ban_list.unban(instance.ip_address)
+    bump_ban_version()
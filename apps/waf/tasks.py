@@ -0,0 +1,29 @@
+"""Celery tasks for WAF persistence."""
+import logging
+
+from celery import shared_task
+from django.utils.dateparse import parse_datetime
+
+from .event_sink import write_security_records
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def persist_security_events(events: list[dict], bans: dict[str, dict]) -> int:
+    """Persist a batch of SecurityEvent rows and BannedIP upserts.
+
+    Args:
+        events: SecurityEvent field dicts.
+        bans: Mapping of IP address to BannedIP defaults (datetimes as ISO strings).
+
+    Returns:
+        Number of SecurityEvent rows written.
+    """
+    for defaults in bans.values():
+        if isinstance(defaults.get('expires_at'), str):
+            defaults['expires_at'] = parse_datetime(defaults['expires_at'])
+
+    written = write_security_records(events, bans)
+    logger.info("Persisted %d security events and %d bans", written, len(bans))
+    return written
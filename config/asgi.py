@@ -2,6 +2,9 @@
 ASGI config for Pet-Friendly Vet project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Production runs it under gunicorn with uvicorn workers, so async views such
+as the streaming AI chat (apps.ai_assistant.views.ChatStreamView) wait on
+the network without holding a worker.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
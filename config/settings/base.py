@@ -241,6 +241,55 @@ SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
 SESSION_CACHE_ALIAS = 'default'
 
 
+# Per-day availability bitmaps (apps.appointments.availability_cache), refreshed
+# by appointment and schedule block signals; a TTL of 0 disables the cache
+APPOINTMENT_AVAILABILITY_CACHE = {
+    'TTL': int(os.getenv('AVAILABILITY_CACHE_TTL', str(24 * 3600))),
+    'GRANULARITY': 5,
+}
+
+
+# Driver GPS ingestion (apps.delivery.locations): latest positions in the cache,
+# breadcrumbs flushed in batches, driver rows written through periodically by
+# the write_through_driver_locations task, breadcrumbs past RETENTION_DAYS
+# deleted by the purge_driver_location_pings task
+DRIVER_LOCATIONS = {
+    'WRITE_MODE': os.getenv('DRIVER_LOCATION_WRITE_MODE', 'buffered'),
+    'MAX_POINTS': 120,
+    'POSITION_TTL': 3600,
+    'WRITE_THROUGH_INTERVAL': 60,
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 2.0,
+    'QUEUE_SIZE': 20000,
+    'RETENTION_DAYS': int(os.getenv('DRIVER_LOCATION_RETENTION_DAYS', '30')),
+}
+
+
+# Offline route sequencing and distance estimates (apps.delivery.routing);
+# DEPOT is 'latitude,longitude' of where drivers start their day
+DELIVERY_ROUTING = {
+    'DEPOT': os.getenv('DELIVERY_DEPOT', ''),
+    'ROAD_FACTOR': 1.3,
+    'MAX_LEG_KM': 60,
+    'MAX_PASSES': 50,
+}
+
+
+# Server-sent delivery events (apps.delivery.events): status transitions and
+# driver positions on Redis Streams of the default cache, relayed to tracking
+# pages and the dispatch dashboard
+DELIVERY_EVENTS = {
+    'ENABLED': os.getenv('DELIVERY_EVENTS_ENABLED', 'True').lower() == 'true',
+    'MAXLEN': 100,
+    'DISPATCH_MAXLEN': 5000,
+    'STREAM_TTL': 86400,
+    'HEARTBEAT': 15,
+    'MAX_DURATION': 600,
+    'RETRY': 3000,
+    'POLL_INTERVAL': 0.5,
+}
+
+
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -266,6 +315,48 @@ AI_MODEL = os.getenv('AI_MODEL', 'anthropic/claude-sonnet-4')
 AI_MAX_TOKENS = int(os.getenv('AI_MAX_TOKENS', '4096'))
 AI_RATE_LIMIT_PER_USER = int(os.getenv('AI_RATE_LIMIT_PER_USER', '50'))
 AI_COST_LIMIT_DAILY = float(os.getenv('AI_COST_LIMIT_DAILY', '10.00'))
+# Pooled OpenRouter connections (apps.ai_assistant.clients)
+AI_HTTP_POOL = {
+    'MAX_CONNECTIONS': int(os.getenv('AI_HTTP_MAX_CONNECTIONS', '100')),
+    'MAX_KEEPALIVE': int(os.getenv('AI_HTTP_MAX_KEEPALIVE', '20')),
+    'KEEPALIVE_EXPIRY': 30.0,
+    'CONNECT_TIMEOUT': 5.0,
+}
+# OpenRouter request resilience (apps.ai_assistant.resilience): concurrency
+# per process, per-call deadline and retries, shared circuit breaker
+AI_RESILIENCE = {
+    'MAX_CONCURRENCY': int(os.getenv('AI_MAX_CONCURRENCY', '16')),
+    'DEADLINE': float(os.getenv('AI_REQUEST_DEADLINE', '45')),
+    'MAX_ATTEMPTS': 3,
+    'BACKOFF': 0.5,
+    'RETRY_RATIO': 0.2,
+    'RETRY_MIN': 3,
+    'RETRY_WINDOW': 10.0,
+    'BREAKER_FAILURES': 5,
+    'BREAKER_RESET': 30.0,
+}
+# Tool calls (apps.ai_assistant.tools): per-call timeout, threads for sync handlers
+AI_TOOL_TIMEOUT = float(os.getenv('AI_TOOL_TIMEOUT', '15'))
+AI_TOOL_WORKERS = int(os.getenv('AI_TOOL_WORKERS', '8'))
+# Cached answers to repeated tool-less questions (apps.ai_assistant.response_cache)
+AI_RESPONSE_CACHE = {
+    'ENABLED': os.getenv('AI_RESPONSE_CACHE_ENABLED', 'True').lower() == 'true',
+    'TTL': int(os.getenv('AI_RESPONSE_CACHE_TTL', str(6 * 3600))),
+    'MAX_QUERY_LENGTH': 300,
+}
+# Seconds a worker keeps its knowledge retrieval index without a rebuild
+# (apps.knowledge.search); saves and deletes rebuild it right away
+KNOWLEDGE_INDEX_TTL = int(os.getenv('KNOWLEDGE_INDEX_TTL', '300'))
+# Chat memory (apps.ai_assistant.memory): recent turns sent with each message;
+# older turns are folded into Conversation.summary by a Celery task
+AI_CHAT_MEMORY = {
+    'WINDOW_MESSAGES': 12,
+    'WINDOW_TOKENS': 1500,
+    'SUMMARY_TRIGGER_TOKENS': 3000,
+    'SUMMARY_MAX_TOKENS': 400,
+}
+# Messages returned per page by the chat history endpoint
+AI_CHAT_HISTORY_LIMIT = 100
 
 
 # Rate Limiting Configuration (django-ratelimit)
@@ -357,6 +448,10 @@ ERROR_TRACKING = {
     'BUG_THRESHOLD': int(os.getenv('ERROR_BUG_THRESHOLD', '1')),
     'EXCLUDE_PATHS': ['/health/', '/static/', '/media/', '/favicon.ico'],
     'EXCLUDE_STATUS_CODES': [],
+    # Coalesced ingestion (see apps.error_tracking.ingest)
+    'WRITE_MODE': os.getenv('ERROR_TRACKING_WRITE_MODE', 'buffered'),
+    'SAMPLE_PER_WINDOW': int(os.getenv('ERROR_SAMPLE_PER_WINDOW', '10')),
+    'SAMPLE_WINDOW': 60,
 }
 
 # GitHub API for automatic bug issue creation
@@ -62,3 +62,26 @@ RATELIMIT_ENABLE = False
 
 # Disable WAF for tests (except WAF-specific tests which handle it)
 WAF_ENABLED = False
+
+# Persist WAF security events, audit views, errors and GPS pings inline so tests can assert on them
+WAF_EVENT_SINK = 'sync'
+AUDIT_WRITE_MODE = 'sync'
+ERROR_TRACKING = {**ERROR_TRACKING, 'WRITE_MODE': 'sync'}
+DRIVER_LOCATIONS = {**DRIVER_LOCATIONS, 'WRITE_MODE': 'sync'}
+DELIVERY_EVENTS = {**DELIVERY_EVENTS, 'POLL_INTERVAL': 0.01}
+
+# Check the feature flag version stamp on every lookup (tests clear the cache)
+FEATURE_CACHE_SYNC_INTERVAL = 0
+
+
+# Don't serve AI answers cached by earlier tests (response cache tests enable it)
+AI_RESPONSE_CACHE = {**AI_RESPONSE_CACHE, 'ENABLED': False}
+
+# Rebuild the knowledge index on every search (test rollbacks send no signals)
+KNOWLEDGE_INDEX_TTL = 0
+
+# Retry OpenRouter failures without sleeping
+AI_RESILIENCE = {**AI_RESILIENCE, 'BACKOFF': 0}
+
+# Compute availability from the database (cache tests enable it; rollbacks send no signals)
+APPOINTMENT_AVAILABILITY_CACHE = {**APPOINTMENT_AVAILABILITY_CACHE, 'TTL': 0}
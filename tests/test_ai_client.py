@@ -1,9 +1,35 @@
 """Tests for OpenRouter API client."""
+import json
+
+import httpx
 import pytest
 from unittest.mock import patch, MagicMock, AsyncMock
+from apps.ai_assistant import clients, resilience
 from apps.ai_assistant.clients import OpenRouterClient
 
 
+@pytest.fixture(autouse=True)
+def fresh_http_clients():
+    """Each test builds its own pooled clients (some patch httpx)."""
+    clients.reset_http_clients()
+    resilience.reset()
+    yield
+    clients.reset_http_clients()
+    resilience.reset()
+
+
+def _sse_transport(lines, status_code=200):
+    """httpx transport answering every request with the given SSE lines."""
+    def handler(request):
+        body = ''.join(f'{line}\n' for line in lines)
+        return httpx.Response(status_code, text=body, headers={'Content-Type': 'text/event-stream'})
+    return httpx.MockTransport(handler)
+
+
+def _chunk(text):
+    return 'data: ' + json.dumps({'choices': [{'delta': {'content': text}}]})
+
+
 class TestOpenRouterClient:
     """Tests for OpenRouterClient."""
 
@@ -231,3 +257,87 @@ class TestOpenRouterClient:
             assert result['error'] is True
             assert result['status_code'] == 429
             assert 'Rate limit' in result['message']
+
+
+class TestPooledHTTPClients:
+    """Tests for the process-wide pooled clients."""
+
+    def test_sync_client_is_reused(self):
+        """chat_sync should share one client across messages."""
+        assert clients.get_http_client() is clients.get_http_client()
+
+    async def test_async_client_is_reused_per_loop(self):
+        """Async calls on one event loop should share one client."""
+        first = clients.get_async_http_client()
+        assert clients.get_async_http_client() is first
+        await first.aclose()
+        assert clients.get_async_http_client() is not first
+
+    def test_pool_limits_from_settings(self, settings):
+        """AI_HTTP_POOL should configure the connection pool."""
+        settings.AI_HTTP_POOL = {'MAX_CONNECTIONS': 7, 'MAX_KEEPALIVE': 3}
+        with patch('httpx.Client') as mock_client_class:
+            clients.get_http_client()
+        limits = mock_client_class.call_args.kwargs['limits']
+        assert limits.max_connections == 7
+        assert limits.max_keepalive_connections == 3
+
+
+class TestStreamChat:
+    """Tests for OpenRouterClient.stream_chat."""
+
+    async def _collect(self, transport, settings):
+        settings.OPENROUTER_API_KEY = 'test-key'
+        client = OpenRouterClient()
+        pooled = httpx.AsyncClient(transport=transport)
+        with patch.object(clients, 'get_async_http_client', return_value=pooled):
+            return [event async for event in client.stream_chat([{'role': 'user', 'content': 'Hi'}])]
+
+    async def test_yields_deltas_until_done(self, settings):
+        """Content deltas should be yielded in order, skipping comments."""
+        events = await self._collect(_sse_transport([
+            ': OPENROUTER PROCESSING', '',
+            _chunk('Hel'), '', _chunk('lo!'), '',
+            'data: [DONE]', _chunk('ignored'),
+        ]), settings)
+        assert events == [{'delta': 'Hel'}, {'delta': 'lo!'}]
+
+    async def test_accumulates_tool_call_fragments(self, settings):
+        """Tool call fragments should be joined into complete calls by index."""
+        def fragment(index, **fields):
+            return 'data: ' + json.dumps({'choices': [{'delta': {'tool_calls': [
+                {'index': index, **fields}
+            ]}}]})
+
+        events = await self._collect(_sse_transport([
+            fragment(0, id='call_a', function={'name': 'get_clinic_hours', 'arguments': '{"da'}),
+            fragment(1, id='call_b', function={'name': 'get_contact_info', 'arguments': ''}),
+            fragment(0, function={'arguments': 'y": "monday"}'}),
+            'data: [DONE]',
+        ]), settings)
+        assert events == [{'tool_calls': [
+            {'id': 'call_a', 'type': 'function',
+             'function': {'name': 'get_clinic_hours', 'arguments': '{"day": "monday"}'}},
+            {'id': 'call_b', 'type': 'function',
+             'function': {'name': 'get_contact_info', 'arguments': ''}},
+        ]}]
+
+    async def test_api_error(self, settings):
+        """A non-200 response should yield one error event."""
+        events = await self._collect(_sse_transport(['Rate limit exceeded'], 429), settings)
+        assert events[0]['error'] is True
+        assert events[0]['status_code'] == 429
+        assert 'Rate limit' in events[0]['message']
+
+    async def test_network_error(self, settings):
+        """Transport failures should yield an error event, not raise."""
+        def handler(request):
+            raise httpx.ConnectError('connection refused')
+        events = await self._collect(httpx.MockTransport(handler), settings)
+        assert events == [{'error': True, 'message': 'connection refused'}]
+
+    async def test_no_api_key(self, settings):
+        """Missing API key should yield an error event."""
+        settings.OPENROUTER_API_KEY = ''
+        events = [e async for e in OpenRouterClient().stream_chat([])]
+        assert 'API key not configured' in events[0]['message']
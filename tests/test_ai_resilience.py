@@ -0,0 +1,200 @@
+"""Tests for OpenRouter request resilience against a local stub server."""
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from apps.ai_assistant import clients, resilience
+from apps.ai_assistant.clients import OpenRouterClient
+
+OK = (200, {'choices': [{'message': {'content': 'Hi!'}}]}, 0)
+
+
+class StubOpenRouter(ThreadingHTTPServer):
+    """Answers /chat/completions from a script of (status, body, delay)."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.script = []
+        self.default = OK
+        self.requests = []
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/api/v1'
+
+    def next_reply(self, body):
+        with self.lock:
+            self.requests.append(body)
+            return self.script.pop(0) if self.script else self.default
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        status, reply, delay = self.server.next_reply(body)
+        time.sleep(delay)
+        data = json.dumps(reply).encode()
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client gave up (deadline tests)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub(settings):
+    server = StubOpenRouter()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    settings.OPENROUTER_API_KEY = 'test-key'
+    settings.OPENROUTER_BASE_URL = server.base_url
+    settings.AI_RESILIENCE = {**resilience.DEFAULTS, 'BACKOFF': 0.01, 'DEADLINE': 5.0}
+    clients.reset_http_clients()
+    resilience.reset()
+    yield server
+    server.shutdown()
+    server.server_close()
+    clients.reset_http_clients()
+    resilience.reset()
+
+
+def _configure(settings, **values):
+    settings.AI_RESILIENCE = {**settings.AI_RESILIENCE, **values}
+
+
+def _chat(text='Hello'):
+    return OpenRouterClient().chat_sync([{'role': 'user', 'content': text}])
+
+
+class TestRetries:
+    """Test deadline-aware retries."""
+
+    def test_retries_server_errors_then_succeeds(self, stub):
+        """A 503 followed by a 200 should return the 200."""
+        stub.script = [(503, {'error': 'busy'}, 0)]
+        result = _chat()
+        assert result['choices'][0]['message']['content'] == 'Hi!'
+        assert len(stub.requests) == 2
+        metrics = resilience.client_metrics()
+        assert metrics['count'] == 2
+        assert metrics['errors'] == {'http_503': 1}
+
+    def test_client_errors_are_not_retried(self, stub):
+        """A 400 is returned at once."""
+        stub.default = (400, {'error': 'bad request'}, 0)
+        result = _chat()
+        assert result['status_code'] == 400
+        assert len(stub.requests) == 1
+
+    def test_gives_up_after_max_attempts(self, stub, settings):
+        """Persistent 5xx stops at MAX_ATTEMPTS."""
+        _configure(settings, MAX_ATTEMPTS=3, BREAKER_FAILURES=10)
+        stub.default = (502, {'error': 'bad gateway'}, 0)
+        assert _chat()['status_code'] == 502
+        assert len(stub.requests) == 3
+
+    def test_deadline_bounds_the_whole_call(self, stub, settings):
+        """A slow upstream fails within the deadline instead of the 60 s timeout."""
+        _configure(settings, DEADLINE=0.3)
+        stub.default = (200, OK[1], 1.0)
+        started = time.monotonic()
+        result = _chat()
+        assert result['error'] is True
+        assert time.monotonic() - started < 0.9
+        assert resilience.client_metrics()['errors'].get('timeout') == 1
+
+    def test_retry_budget_limits_retries(self, stub, settings):
+        """Once the budget is spent, failures are returned without retrying."""
+        _configure(settings, RETRY_MIN=1, RETRY_RATIO=0, BREAKER_FAILURES=10)
+        stub.default = (503, {'error': 'busy'}, 0)
+        _chat('first')
+        _chat('second')
+        assert len(stub.requests) == 3  # 2 for the first call, 1 for the second
+        # Each call is refused its next retry once
+        assert resilience.client_metrics()['errors']['retry_budget'] == 2
+
+
+class TestCircuitBreaker:
+    """Test the shared circuit breaker."""
+
+    def test_opens_then_probes_and_closes(self, stub, settings):
+        """Failures open the circuit; one half-open probe closes it again."""
+        _configure(settings, MAX_ATTEMPTS=1, BREAKER_FAILURES=2, BREAKER_RESET=0.2)
+        stub.script = [(500, {}, 0), (500, {}, 0)]
+        _chat('a')
+        _chat('b')
+        assert resilience.breaker.state == 'open'
+
+        rejected = _chat('c')
+        assert rejected['message'] == 'OpenRouter circuit open'
+        assert len(stub.requests) == 2
+
+        time.sleep(0.25)
+        assert resilience.breaker.state == 'half-open'
+        assert 'choices' in _chat('d')
+        assert resilience.breaker.state == 'closed'
+
+    def test_failed_probe_reopens(self, stub, settings):
+        """A failing probe re-opens the circuit at once."""
+        _configure(settings, MAX_ATTEMPTS=1, BREAKER_FAILURES=1, BREAKER_RESET=0.2)
+        stub.default = (500, {}, 0)
+        _chat('a')
+        time.sleep(0.25)
+        _chat('probe')
+        assert resilience.breaker.state == 'open'
+        assert len(stub.requests) == 2
+
+
+class TestCoalescingAndConcurrency:
+    """Test single-flight coalescing and the per-process limit."""
+
+    def test_identical_sync_requests_share_one_call(self, stub):
+        """Concurrent identical requests hit the upstream once."""
+        stub.default = (200, OK[1], 0.2)
+        with ThreadPoolExecutor(5) as pool:
+            results = list(pool.map(lambda _: _chat('same'), range(5)))
+        assert len(stub.requests) == 1
+        assert all(r == results[0] for r in results)
+        results[1]['choices'].clear()
+        assert results[2]['choices']  # followers get their own copy
+
+    async def test_identical_async_requests_share_one_call(self, stub):
+        """The async path coalesces on the event loop."""
+        stub.default = (200, OK[1], 0.2)
+        client = OpenRouterClient()
+        results = await asyncio.gather(*(
+            client.chat([{'role': 'user', 'content': 'same'}]) for _ in range(5)
+        ))
+        assert len(stub.requests) == 1
+        assert {r['choices'][0]['message']['content'] for r in results} == {'Hi!'}
+
+    def test_concurrency_limit_fails_fast(self, stub, settings):
+        """Callers that cannot get a slot before the deadline are rejected."""
+        _configure(settings, MAX_CONCURRENCY=1, DEADLINE=5.0)
+        resilience.limiter.reset()
+        stub.default = (200, OK[1], 1.5)
+        with ThreadPoolExecutor(2) as pool:
+            first = pool.submit(_chat, 'one')
+            while not stub.requests:
+                time.sleep(0.01)
+            # The first call holds the only slot well past this deadline
+            _configure(settings, DEADLINE=0.3)
+            second = pool.submit(_chat, 'two')
+            results = [first.result(), second.result()]
+        assert 'choices' in results[0]
+        assert results[1]['message'] == 'Too many concurrent AI requests'
+        assert len(stub.requests) == 1
@@ -0,0 +1,201 @@
+"""Tests for the AI response cache."""
+import time
+from unittest.mock import patch
+
+import pytest
+from django.core.cache import cache
+
+from apps.ai_assistant import response_cache
+from apps.ai_assistant.models import AIUsage
+from apps.ai_assistant.services import AIService
+from apps.knowledge.models import FAQ, KnowledgeCategory
+
+
+@pytest.fixture
+def response_cache_on(settings):
+    """Enable the response cache on an empty cache."""
+    settings.AI_RESPONSE_CACHE = {'ENABLED': True, 'TTL': 600, 'MAX_QUERY_LENGTH': 300}
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def _answer(text, usage=None):
+    response = {'choices': [{'message': {'content': text}}]}
+    if usage:
+        response['usage'] = usage
+    return response
+
+
+def _tool_call():
+    return {'choices': [{'message': {'content': None, 'tool_calls': [
+        {'id': 'call_0', 'type': 'function',
+         'function': {'name': 'get_clinic_hours', 'arguments': '{}'}},
+    ]}}]}
+
+
+class TestQueryNormalization:
+    """Test query normalization and near-duplicate signatures."""
+
+    def test_normalize_strips_accents_case_and_punctuation(self):
+        """Accents, casing and punctuation should not matter."""
+        assert response_cache.normalize_query('  ¿Cuál es su HORARIO?! ') == 'cual es su horario'
+
+    @pytest.mark.parametrize('language,first,second', [
+        ('es', '¿Cuál es su horario?', 'cual es el horario'),
+        ('es', 'Hola, ¿qué servicios ofrecen?', '¿Qué servicios ofrecen por favor?'),
+        ('en', 'What are your hours?', 'what are the hours please'),
+    ])
+    def test_near_duplicates_share_a_signature(self, language, first, second):
+        """Filler words should not change the near-duplicate key."""
+        sign = lambda text: response_cache.query_signature(
+            response_cache.normalize_query(text), language
+        )
+        assert sign(first) == sign(second)
+
+    def test_different_questions_differ(self):
+        """Questions about different things should not collide."""
+        sign = lambda text: response_cache.query_signature(
+            response_cache.normalize_query(text), 'en'
+        )
+        assert sign('Are you open on monday?') != sign('Are you open on sunday?')
+        assert sign('Where is the clinic?') != sign('When is the clinic open?')
+
+
+@pytest.mark.django_db
+class TestResponseCache:
+    """Test caching in front of AIService."""
+
+    def test_repeated_question_is_served_from_cache(self, response_cache_on):
+        """A near-duplicate question should not call the model again."""
+        with patch('apps.ai_assistant.clients.OpenRouterClient.chat_sync') as chat:
+            chat.return_value = _answer(
+                'Martes a domingo, 9am-8pm.',
+                usage={'prompt_tokens': 120, 'completion_tokens': 12, 'cost': 0.0004},
+            )
+            first = AIService(language='es', session_id='s1').get_response_sync('¿Cuál es su horario?')
+            second = AIService(language='es', session_id='s2').get_response_sync('cual es el horario')
+
+        assert first == second == 'Martes a domingo, 9am-8pm.'
+        assert chat.call_count == 1
+
+        miss, hit = AIUsage.objects.order_by('id')
+        assert (miss.cache_hit, miss.input_tokens, miss.output_tokens) == (False, 120, 12)
+        assert (hit.cache_hit, hit.input_tokens, hit.session_id) == (True, 0, 's2')
+        assert AIUsage.objects.cache_hit_ratio() == 0.5
+
+    def test_scope_separates_language_and_permission_level(self, response_cache_on, django_user_model):
+        """Answers should not be shared across languages or permission levels."""
+        customer = django_user_model.objects.create_user(
+            username='cached_customer', email='c@example.com', password='x'
+        )
+        with patch('apps.ai_assistant.clients.OpenRouterClient.chat_sync') as chat:
+            chat.return_value = _answer('Hours')
+            AIService(language='es').get_response_sync('horario')
+            AIService(language='en').get_response_sync('horario')
+            AIService(user=customer, language='es').get_response_sync('horario')
+        assert chat.call_count == 3
+
+    def test_tool_answers_and_errors_are_not_cached(self, response_cache_on):
+        """Answers that needed tools, and fallbacks, should not be cached."""
+        with patch('apps.ai_assistant.clients.OpenRouterClient.chat_sync') as chat:
+            chat.side_effect = [_tool_call(), _answer('Open 9-8'), {'error': True}, _answer('Later')]
+            service = AIService(language='en')
+            assert service.get_response_sync('hours') == 'Open 9-8'
+            assert 'trouble connecting' in service.get_response_sync('contact')
+            assert service.get_response_sync('hours') == 'Later'
+        assert chat.call_count == 4
+
+    def test_knowledge_changes_invalidate(self, response_cache_on):
+        """Saving an FAQ should invalidate; counting a view should not."""
+        category = KnowledgeCategory.objects.create(
+            name='General', name_es='General', name_en='General', slug='general'
+        )
+        with patch('apps.ai_assistant.clients.OpenRouterClient.chat_sync') as chat:
+            chat.return_value = _answer('Old answer')
+            service = AIService(language='en')
+            service.get_response_sync('services')
+
+            faq = FAQ.objects.create(
+                category=category, question='Services?', question_es='¿Servicios?',
+                question_en='Services?', answer='All', answer_es='Todos', answer_en='All',
+            )
+            chat.return_value = _answer('New answer')
+            assert service.get_response_sync('services') == 'New answer'
+
+            faq.increment_view_count()
+            assert service.get_response_sync('services') == 'New answer'
+        assert chat.call_count == 2
+
+    def test_system_prompt_change_misses(self, response_cache_on):
+        """A different system prompt should not reuse old answers."""
+        with patch('apps.ai_assistant.clients.OpenRouterClient.chat_sync') as chat:
+            chat.return_value = _answer('Answer')
+            AIService(language='en').get_response_sync('contact')
+            with patch.object(AIService, 'build_system_prompt', return_value='New prompt'):
+                AIService(language='en').get_response_sync('contact')
+        assert chat.call_count == 2
+
+    async def test_stream_hit_yields_cached_answer(self, response_cache_on):
+        """The streaming path should serve and fill the same cache."""
+        calls = []
+
+        async def fake_stream(self, messages, tools=None):
+            calls.append(messages)
+            yield {'delta': 'Tue-'}
+            yield {'delta': 'Sun'}
+            yield {'usage': {'prompt_tokens': 50, 'completion_tokens': 2}}
+
+        with patch('apps.ai_assistant.clients.OpenRouterClient.stream_chat', fake_stream):
+            first = [c async for c in AIService(language='en').stream_response('Hours?')]
+            second = [c async for c in AIService(language='en').stream_response('hours')]
+
+        assert first == ['Tue-', 'Sun']
+        assert second == ['Tue-Sun']
+        assert len(calls) == 1
+        assert await AIUsage.objects.filter(cache_hit=True).acount() == 1
+
+    def test_disabled(self, response_cache_on, settings):
+        """ENABLED=False should bypass the cache."""
+        settings.AI_RESPONSE_CACHE = {'ENABLED': False}
+        with patch('apps.ai_assistant.clients.OpenRouterClient.chat_sync') as chat:
+            chat.return_value = _answer('Answer')
+            AIService().get_response_sync('horario')
+            AIService().get_response_sync('horario')
+        assert chat.call_count == 2
+
+
+@pytest.mark.slow
+@pytest.mark.django_db
+class TestResponseCacheBenchmark:
+    """A day of quick-action questions against a slow model."""
+
+    def test_quick_action_latency(self, response_cache_on):
+        """Cached answers should avoid the model round trip."""
+        from apps.ai_assistant.views import QUICK_ACTIONS
+
+        questions = [action['es'] for action in QUICK_ACTIONS] * 25
+
+        def slow_model(messages, tools=None):
+            time.sleep(0.02)  # stand-in for a 1-5 s OpenRouter round trip
+            return _answer('Respuesta')
+
+        def run():
+            start = time.perf_counter()
+            for question in questions:
+                AIService(language='es').get_response_sync(question)
+            return time.perf_counter() - start
+
+        with patch('apps.ai_assistant.clients.OpenRouterClient.chat_sync', side_effect=slow_model) as chat:
+            with patch.dict('django.conf.settings.AI_RESPONSE_CACHE', {'ENABLED': False}):
+                uncached = run()
+            AIUsage.objects.all().delete()
+            cached = run()
+
+        print(
+            f"\n{len(questions)} quick actions: uncached {uncached * 1000:.0f} ms,"
+            f" cached {cached * 1000:.0f} ms, model calls {chat.call_count - len(questions)},"
+            f" hit ratio {AIUsage.objects.cache_hit_ratio():.0%}"
+        )
+        assert chat.call_count - len(questions) == len(QUICK_ACTIONS)
+        assert cached < uncached
@@ -1,13 +1,17 @@
 """Tests for AI service."""
+import json
+
 import pytest
 from unittest.mock import patch, MagicMock, AsyncMock
 from django.contrib.auth import get_user_model
 
-from apps.ai_assistant.services import AIService
+from apps.ai_assistant.services import MAX_TOOL_ROUNDS, AIService
+from apps.ai_assistant.tools import Tool, ToolRegistry
 
 User = get_user_model()
 
 
+@pytest.mark.django_db
 class TestAIService:
     """Tests for AIService class."""
 
@@ -51,6 +55,7 @@ class TestAIService:
         assert 'Tuesday-Sunday' in prompt
 
     @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
     async def test_get_response_success(self):
         """Test successful AI response."""
         service = AIService(language='en')
@@ -68,6 +73,7 @@ class TestAIService:
             mock_chat.assert_called_once()
 
     @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
     async def test_get_response_api_error(self):
         """Test fallback on API error."""
         service = AIService(language='en')
@@ -83,6 +89,7 @@ class TestAIService:
             assert '+52 998 316 2438' in response
 
     @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
     async def test_get_response_malformed_response(self):
         """Test fallback on malformed response."""
         service = AIService(language='es')
@@ -97,6 +104,7 @@ class TestAIService:
             assert 'problemas para conectar' in response
 
     @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
     async def test_get_response_empty_choices(self):
         """Test fallback on empty choices."""
         service = AIService(language='en')
@@ -151,6 +159,48 @@ class TestAIService:
 
             assert 'trouble connecting' in response
 
+    @pytest.mark.django_db(transaction=True)
+    async def test_stream_response_yields_chunks(self):
+        """Streamed deltas should be passed through as text."""
+        service = AIService(language='en')
+
+        async def fake_stream(messages, tools=None):
+            yield {'delta': 'Hi '}
+            yield {'delta': 'there!'}
+
+        with patch.object(service.client, 'stream_chat', fake_stream):
+            chunks = [chunk async for chunk in service.stream_response('Hello')]
+
+        assert chunks == ['Hi ', 'there!']
+
+    @pytest.mark.django_db(transaction=True)
+    async def test_stream_response_error_before_text(self):
+        """An error before any text should yield the fallback response."""
+        service = AIService(language='es')
+
+        async def fake_stream(messages, tools=None):
+            yield {'error': True, 'message': 'timeout'}
+
+        with patch.object(service.client, 'stream_chat', fake_stream):
+            chunks = [chunk async for chunk in service.stream_response('Hola')]
+
+        assert len(chunks) == 1
+        assert 'problemas para conectar' in chunks[0]
+
+    @pytest.mark.django_db(transaction=True)
+    async def test_stream_response_error_mid_stream(self):
+        """An error after some text should end the stream without fallback."""
+        service = AIService(language='en')
+
+        async def fake_stream(messages, tools=None):
+            yield {'delta': 'Partial'}
+            yield {'error': True, 'message': 'reset'}
+
+        with patch.object(service.client, 'stream_chat', fake_stream):
+            chunks = [chunk async for chunk in service.stream_response('Hello')]
+
+        assert chunks == ['Partial']
+
     def test_fallback_response_english(self):
         """Test English fallback message."""
         service = AIService(language='en')
@@ -170,18 +220,19 @@ class TestAIService:
         assert 'WhatsApp' in response
 
     def test_get_available_tools_anonymous(self):
-        """Test tools for anonymous user."""
+        """Anonymous users should get the registered public tools."""
         service = AIService()
         tools = service.get_available_tools()
 
-        assert len(tools) == 2
         tool_names = [t['function']['name'] for t in tools]
-        assert 'get_business_hours' in tool_names
-        assert 'get_services' in tool_names
-        assert 'schedule_appointment' not in tool_names
+        assert 'get_clinic_hours' in tool_names
+        assert 'list_user_pets' not in tool_names
+        assert all(
+            ToolRegistry.get_tool(name).permission_level == 'public' for name in tool_names
+        )
 
     def test_get_available_tools_authenticated(self, django_user_model):
-        """Test tools for authenticated user."""
+        """Customers should also get customer tools, but not staff tools."""
         user = django_user_model.objects.create_user(
             username='authuser',
             email='auth@example.com',
@@ -190,11 +241,12 @@ class TestAIService:
         service = AIService(user=user)
         tools = service.get_available_tools()
 
-        assert len(tools) == 3
         tool_names = [t['function']['name'] for t in tools]
-        assert 'get_business_hours' in tool_names
-        assert 'get_services' in tool_names
-        assert 'schedule_appointment' in tool_names
+        assert 'get_clinic_hours' in tool_names
+        assert 'list_user_pets' in tool_names
+        assert not any(
+            ToolRegistry.get_tool(name).permission_level == 'staff' for name in tool_names
+        )
 
     def test_get_available_tools_unauthenticated_user(self):
         """Test tools for user object that is not authenticated."""
@@ -204,6 +256,220 @@ class TestAIService:
         service = AIService(user=mock_user)
         tools = service.get_available_tools()
 
-        assert len(tools) == 2
         tool_names = [t['function']['name'] for t in tools]
-        assert 'schedule_appointment' not in tool_names
+        assert 'list_user_pets' not in tool_names
+        assert tools is AIService().get_available_tools()
+
+
+def _tool_call_response(*names, arguments='{}'):
+    return {'choices': [{'message': {
+        'content': None,
+        'tool_calls': [
+            {'id': f'call_{i}', 'type': 'function',
+             'function': {'name': name, 'arguments': arguments}}
+            for i, name in enumerate(names)
+        ],
+    }}]}
+
+
+def _text_response(text):
+    return {'choices': [{'message': {'content': text}}]}
+
+
+@pytest.mark.django_db(transaction=True)
+class TestAgentLoop:
+    """Tests for the multi-turn tool-calling loop."""
+
+    async def test_runs_tools_and_feeds_results_back(self):
+        """Tool results should be sent back before the final answer."""
+        service = AIService(language='en')
+
+        with patch.object(service.client, 'chat', new_callable=AsyncMock) as mock_chat:
+            mock_chat.side_effect = [
+                _tool_call_response('get_clinic_hours', 'get_contact_info'),
+                _text_response('We open at 9.'),
+            ]
+            response = await service.get_response('When do you open?')
+
+        assert response == 'We open at 9.'
+        second_messages = mock_chat.call_args_list[1].args[0]
+        assert second_messages[2]['role'] == 'assistant'
+        assert [m['tool_call_id'] for m in second_messages[3:]] == ['call_0', 'call_1']
+        assert 'tuesday' in second_messages[3]['content'].lower()
+        assert mock_chat.call_args_list[0].kwargs['tools'] == service.get_available_tools()
+
+    async def test_stops_offering_tools_after_max_rounds(self):
+        """After MAX_TOOL_ROUNDS the model is called without tools."""
+        service = AIService(language='en')
+
+        with patch.object(service.client, 'chat', new_callable=AsyncMock) as mock_chat:
+            mock_chat.side_effect = (
+                [_tool_call_response('get_clinic_hours')] * MAX_TOOL_ROUNDS
+                + [_text_response('Done.')]
+            )
+            response = await service.get_response('Loop')
+
+        assert response == 'Done.'
+        assert mock_chat.call_args_list[-1].kwargs['tools'] is None
+
+    def test_sync_loop(self):
+        """get_response_sync should run the same loop."""
+        service = AIService(language='en')
+
+        with patch.object(service.client, 'chat_sync') as mock_chat:
+            mock_chat.side_effect = [
+                _tool_call_response('get_clinic_hours'),
+                _text_response('Tuesday to Sunday.'),
+            ]
+            assert service.get_response_sync('Hours?') == 'Tuesday to Sunday.'
+        assert mock_chat.call_args_list[1].args[0][-1]['role'] == 'tool'
+
+    async def test_stream_runs_tools_between_rounds(self):
+        """Streamed tool calls should be executed and the next round streamed."""
+        service = AIService(language='en')
+        rounds = iter([
+            [{'delta': 'Checking... '},
+             {'tool_calls': _tool_call_response('get_clinic_hours')['choices'][0]['message']['tool_calls']}],
+            [{'delta': 'Open 9-8.'}],
+        ])
+        seen = []
+
+        async def fake_stream(messages, tools=None):
+            seen.append(list(messages))
+            for event in next(rounds):
+                yield event
+
+        with patch.object(service.client, 'stream_chat', fake_stream):
+            chunks = [chunk async for chunk in service.stream_response('Hours?')]
+
+        assert chunks == ['Checking... ', 'Open 9-8.']
+        assert seen[1][2]['content'] == 'Checking... '
+        assert seen[1][3]['role'] == 'tool'
+
+
+@pytest.mark.django_db
+class TestToolSchemaCache:
+    """Tests for the per-permission schema index and module filter."""
+
+    def test_schemas_are_cached_per_level(self):
+        """Repeated lookups should return the same list without rebuilding."""
+        first = ToolRegistry.get_tool_schemas(None)
+        with patch('apps.ai_assistant.tools.Tool.to_openai_format') as to_openai:
+            assert ToolRegistry.get_tool_schemas(None) is first
+        assert not to_openai.called
+
+    def test_disabled_module_tools_are_hidden(self, django_user_model):
+        """Tools of a disabled ModuleConfig should not be offered."""
+        from apps.core.models import ModuleConfig
+
+        staff = django_user_model.objects.create_user(
+            username='schema_staff', email='s@example.com', password='x', role='staff'
+        )
+        names = {s['function']['name'] for s in ToolRegistry.get_tool_schemas(staff)}
+        assert any(ToolRegistry.get_tool(n).module == 'inventory' for n in names)
+
+        ModuleConfig.objects.create(app_name='inventory', display_name='Inventory', is_enabled=False)
+        names = {s['function']['name'] for s in ToolRegistry.get_tool_schemas(staff)}
+        assert not any(ToolRegistry.get_tool(n).module == 'inventory' for n in names)
+
+    def test_customer_calls_are_pinned_to_themselves(self, django_user_model):
+        """A customer's user_id argument should be replaced with their own id."""
+        customer = django_user_model.objects.create_user(
+            username='pinned', email='p@example.com', password='x'
+        )
+        result = ToolRegistry.execute('list_user_pets', {'user_id': customer.pk + 100}, {'user': customer})
+        assert result.success
+        assert 'not found' not in json.dumps(result.data).lower()
+
+    def test_calls_above_level_are_denied(self):
+        """Anonymous callers should not reach customer tools."""
+        result = ToolRegistry.execute('list_user_pets', {'user_id': 1}, {'user': None})
+        assert not result.success
+        assert 'not available' in result.error
+
+    def test_public_tools_read_no_personal_data(self):
+        """Only read-only tools without personal data should reach anonymous users.
+
+        Adding a tool here means it neither changes data nor returns
+        anything about customers or staff beyond the clinic's public
+        contact details.
+        """
+        public = {
+            'get_clinic_hours', 'get_services', 'get_contact_info',
+            'list_services', 'check_availability',
+            'search_products', 'get_product_details', 'get_store_categories',
+            'get_medication_info', 'check_coupon',
+            'triage_emergency', 'get_oncall_status', 'get_emergency_referrals',
+            'get_first_aid_instructions',
+        }
+        tools = ToolRegistry.get_tools_for_user(None)
+        assert {t.name for t in tools} == public
+        assert not any(
+            set(ToolRegistry.OWNER_PARAMS) & set(t.parameters.get('properties', {})) for t in tools
+        )
+
+    def test_anonymous_cannot_reach_staff_tools(self):
+        """Customer records should not be searchable without a staff role."""
+        result = ToolRegistry.execute('search_customers', {'query': 'a'}, {'user': None})
+        assert not result.success
+        assert 'not available' in result.error
+
+    def test_anonymous_owner_arguments_are_refused(self):
+        """A public tool taking a user_id should not run for anonymous users."""
+        ToolRegistry.register(Tool(
+            name='test_public_owner', description='Test', handler=lambda user_id: user_id,
+            parameters={'type': 'object', 'properties': {'user_id': {'type': 'integer'}}},
+        ))
+        try:
+            result = ToolRegistry.execute('test_public_owner', {'user_id': 1}, {'user': None})
+        finally:
+            ToolRegistry.unregister('test_public_owner')
+        assert not result.success
+        assert 'signing in' in result.error
+
+    def test_vets_get_staff_tools(self, django_user_model):
+        """The vet role should reach staff tools such as clinical notes."""
+        vet = django_user_model.objects.create_user(
+            username='schema_vet', email='v@example.com', password='x', role='vet'
+        )
+        assert 'create_clinical_note' in {t.name for t in ToolRegistry.get_tools_for_user(vet)}
+
+
+@pytest.mark.slow
+@pytest.mark.django_db
+class TestToolSchemaBenchmark:
+    """Per-message prompt building: rebuilt tool list vs cached schemas."""
+
+    def test_schema_lookup_latency(self, django_user_model, settings):
+        """Cached schemas should be far cheaper than filtering and serializing."""
+        import time
+        from apps.core.middleware.module_activation import get_module_enabled_status
+
+        settings.FEATURE_CACHE_SYNC_INTERVAL = 60  # production-like steady state
+        staff = django_user_model.objects.create_user(
+            username='bench_staff', email='b@example.com', password='x', role='staff'
+        )
+        ToolRegistry.get_tool_schemas(staff)
+        messages = 2000
+
+        start = time.perf_counter()
+        for _ in range(messages):
+            # Filter by role, check each tool's module, serialize each tool
+            role_levels = {'public': 0, 'customer': 1, 'staff': 2, 'admin': 3}
+            [
+                t.to_openai_format() for t in ToolRegistry.get_tools()
+                if role_levels.get(t.permission_level, 0) <= role_levels['staff']
+                and (t.module == 'core' or get_module_enabled_status(t.module))
+            ]
+        rebuilt = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(messages):
+            ToolRegistry.get_tool_schemas(staff)
+        cached = time.perf_counter() - start
+
+        print(
+            f"\n{len(ToolRegistry.get_tool_schemas(staff))} tools: rebuilt"
+            f" {rebuilt / messages * 1e6:.1f} us/message, cached {cached / messages * 1e6:.1f} us/message"
+        )
+        assert cached < rebuilt
@@ -1,5 +1,8 @@
 """Tests for AI assistant views."""
+import asyncio
 import json
+import time
+
 import pytest
 from unittest.mock import patch, MagicMock
 from django.test import Client
@@ -599,3 +602,198 @@ class TestChatViewEdgeCases:
         mock_ai_service.assert_called_once()
         call_kwargs = mock_ai_service.call_args[1]
         assert call_kwargs['language'] == 'en'
+
+
+def _fake_stream(*chunks, delay=0.0):
+    """AIService.stream_response replacement yielding the given chunks."""
+    async def stream_response(message, context=None):
+        for chunk in chunks:
+            if delay:
+                await asyncio.sleep(delay)
+            yield chunk
+    return stream_response
+
+
+async def _read_events(response):
+    """Parse an SSE response into (event, data) pairs."""
+    body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+    events = []
+    for block in body.strip().split('\n\n'):
+        name, data = block.split('\n')
+        events.append((name[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+
+@pytest.fixture
+def stream_cache():
+    """Start with empty rate-limit counters."""
+    from django.core.cache import cache
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.mark.django_db(transaction=True)
+class TestChatStreamView:
+    """Test the async SSE chat endpoint."""
+
+    @patch('apps.ai_assistant.views.AIService')
+    async def test_streams_tokens_and_saves_messages(self, mock_ai_service, async_client, stream_cache):
+        """Tokens should stream as events and both messages be saved."""
+        mock_ai_service.return_value.stream_response = _fake_stream('Hello', ' there!')
+
+        response = await async_client.post(
+            '/chat/stream/',
+            data=json.dumps({'message': 'Hi', 'session_id': 'stream123'}),
+            content_type='application/json'
+        )
+
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'text/event-stream'
+        assert response['Cache-Control'] == 'no-cache'
+        assert response.is_async
+        events = await _read_events(response)
+        assert events == [
+            ('token', {'delta': 'Hello'}),
+            ('token', {'delta': ' there!'}),
+            ('done', {'session_id': 'stream123', 'response': 'Hello there!'}),
+        ]
+
+        roles = [m async for m in Message.objects.filter(
+            conversation__session_id='stream123'
+        ).order_by('created_at').values_list('role', 'content')]
+        assert roles == [('user', 'Hi'), ('assistant', 'Hello there!')]
+
+    async def test_empty_message_returns_400(self, async_client, stream_cache):
+        """Empty message should be rejected before streaming."""
+        response = await async_client.post(
+            '/chat/stream/',
+            data=json.dumps({'message': '  '}),
+            content_type='application/json'
+        )
+        assert response.status_code == 400
+
+    async def test_invalid_json_returns_400(self, async_client, stream_cache):
+        """Invalid JSON should be rejected before streaming."""
+        response = await async_client.post(
+            '/chat/stream/', data='nope', content_type='application/json'
+        )
+        assert response.status_code == 400
+
+    @patch('apps.ai_assistant.views.AIService')
+    async def test_rate_limited(self, mock_ai_service, async_client, stream_cache, settings):
+        """The 11th message in a minute should get 429."""
+        settings.RATELIMIT_ENABLE = True
+        mock_ai_service.return_value.stream_response = _fake_stream('ok')
+        for _ in range(10):
+            response = await async_client.post(
+                '/chat/stream/',
+                data=json.dumps({'message': 'Hi', 'session_id': 'limit'}),
+                content_type='application/json'
+            )
+            await _read_events(response)
+        response = await async_client.post(
+            '/chat/stream/',
+            data=json.dumps({'message': 'Hi', 'session_id': 'limit'}),
+            content_type='application/json'
+        )
+        assert response.status_code == 429
+
+    @patch('apps.ai_assistant.views.AIService')
+    async def test_stream_error_event(self, mock_ai_service, async_client, stream_cache):
+        """An exception while streaming should end with error and done events."""
+        async def broken(message, context=None):
+            yield 'Part'
+            raise RuntimeError('boom')
+        mock_ai_service.return_value.stream_response = broken
+
+        response = await async_client.post(
+            '/chat/stream/',
+            data=json.dumps({'message': 'Hi', 'session_id': 'broken'}),
+            content_type='application/json'
+        )
+        events = await _read_events(response)
+        assert [name for name, _ in events] == ['token', 'error', 'done']
+
+    async def test_admin_stream_requires_staff(self, async_client, regular_user, stream_cache):
+        """Non-staff users should get 403 from the admin stream."""
+        await async_client.aforce_login(regular_user)
+        response = await async_client.post(
+            '/chat/admin/api/stream/',
+            data=json.dumps({'message': 'Hi'}),
+            content_type='application/json'
+        )
+        assert response.status_code == 403
+
+    @patch('apps.ai_assistant.views.AIService')
+    async def test_admin_stream(self, mock_ai_service, async_client, admin_user, stream_cache):
+        """Staff should get a streamed response in an admin session."""
+        mock_ai_service.return_value.stream_response = _fake_stream('Admin response')
+        await async_client.aforce_login(admin_user)
+
+        response = await async_client.post(
+            '/chat/admin/api/stream/',
+            data=json.dumps({'message': 'show appointments'}),
+            content_type='application/json'
+        )
+        events = await _read_events(response)
+        assert events[-1][1]['session_id'].startswith(f'admin_{admin_user.id}_')
+        assert events[-1][1]['response'] == 'Admin response'
+
+
+@pytest.mark.slow
+@pytest.mark.django_db(transaction=True)
+class TestChatStreamBenchmark:
+    """Concurrent chats against a slow upstream: blocking workers vs async stream."""
+
+    async def test_concurrent_chat_latency(self, async_client, stream_cache, settings):
+        """Async streaming should serve concurrent chats without queueing on workers."""
+        from django.test import Client
+
+        settings.RATELIMIT_ENABLE = False
+        users, workers, upstream = 20, 4, 0.2
+
+        def slow_sync(message, context=None):
+            time.sleep(upstream)
+            return 'reply'
+
+        with patch('apps.ai_assistant.views.AIService') as mock_ai_service:
+            mock_ai_service.return_value.get_response_sync = slow_sync
+            mock_ai_service.return_value.stream_response = _fake_stream('re', 'ply', delay=upstream / 2)
+
+            def blocking_chat(i):
+                return Client().post(
+                    '/chat/',
+                    data=json.dumps({'message': 'Hi', 'session_id': f'sync{i}'}),
+                    content_type='application/json'
+                ).status_code
+
+            def run_blocking():
+                return [blocking_chat(i) for i in range(users)]
+
+            # Each sync worker serves its chats one after another, so
+            # `workers` workers take the serial time divided by `workers`
+            start = time.perf_counter()
+            statuses = await asyncio.to_thread(run_blocking)
+            blocking = (time.perf_counter() - start) / workers
+            assert statuses == [200] * users
+
+            async def streaming_chat(i):
+                response = await async_client.post(
+                    '/chat/stream/',
+                    data=json.dumps({'message': 'Hi', 'session_id': f'async{i}'}),
+                    content_type='application/json'
+                )
+                return await _read_events(response)
+
+            start = time.perf_counter()
+            results = await asyncio.gather(*(streaming_chat(i) for i in range(users)))
+            streaming = time.perf_counter() - start
+
+        assert all(events[-1][0] == 'done' for events in results)
+        print(
+            f"\n{users} concurrent chats, {upstream * 1000:.0f} ms upstream:"
+            f" {workers} blocking workers {blocking * 1000:.0f} ms,"
+            f" async streaming {streaming * 1000:.0f} ms"
+        )
+        assert streaming < blocking
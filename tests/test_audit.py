@@ -231,3 +231,106 @@ class TestAuditMiddleware:
         middleware = AuditMiddleware(lambda r: None)
         assert middleware._should_audit('/store/') is False
         assert middleware._should_audit('/accounts/') is False
+
+
+@pytest.fixture
+def buffered_audit(settings):
+    """Buffered audit mode with the flush thread kept idle."""
+    from apps.audit.services import audit_buffer
+
+    settings.AUDIT_WRITE_MODE = 'buffered'
+    audit_buffer.clear()
+    original = audit_buffer.flush_interval, audit_buffer.batch_size
+    audit_buffer.flush_interval, audit_buffer.batch_size = 3600, 10 ** 6
+    yield audit_buffer
+    audit_buffer.clear()
+    audit_buffer.flush_interval, audit_buffer.batch_size = original
+
+
+def _staff_get(request_factory, user, path):
+    """Run one staff GET through AuditMiddleware."""
+    from django.http import HttpResponse
+
+    request = request_factory.get(path)
+    request.user = user
+    return AuditMiddleware(lambda r: HttpResponse('OK'))(request)
+
+
+class TestAuditWriteBehind:
+    """Test write-behind persistence of middleware page views."""
+
+    def test_normal_view_buffered_until_flush(self, db, staff_user, request_factory, buffered_audit):
+        """Normal-sensitivity views should be queued, then bulk inserted."""
+        _staff_get(request_factory, staff_user, '/inventory/stock/')
+        _staff_get(request_factory, staff_user, '/crm/')
+        assert AuditLog.objects.count() == 0
+        assert len(buffered_audit) == 2
+
+        assert buffered_audit.flush() == 2
+        log = AuditLog.objects.get(resource_type='inventory.stock')
+        assert log.user == staff_user
+        assert log.action == 'view'
+        assert AuditLog.objects.count() == 2
+
+    def test_high_sensitivity_written_synchronously(self, db, staff_user, request_factory, buffered_audit):
+        """High-sensitivity views should be written before the response returns."""
+        _staff_get(request_factory, staff_user, '/pharmacy/prescriptions/')
+        assert AuditLog.objects.filter(sensitivity='high').count() == 1
+        assert len(buffered_audit) == 0
+
+    def test_sync_mode(self, db, staff_user, request_factory, settings):
+        """Sync mode should write every view immediately."""
+        settings.AUDIT_WRITE_MODE = 'sync'
+        _staff_get(request_factory, staff_user, '/inventory/')
+        assert AuditLog.objects.filter(resource_type='inventory.dashboard').exists()
+
+    def test_celery_mode(self, db, staff_user, request_factory, buffered_audit, settings):
+        """Celery mode should hand batches to the persist task."""
+        settings.AUDIT_WRITE_MODE = 'celery'
+        _staff_get(request_factory, staff_user, '/billing/')
+        buffered_audit.flush()
+        assert AuditLog.objects.filter(resource_type='billing.dashboard').exists()
+
+    def test_non_audited_path_not_queued(self, db, staff_user, request_factory, buffered_audit):
+        """Paths outside the audited prefixes should not be queued."""
+        _staff_get(request_factory, staff_user, '/store/')
+        assert len(buffered_audit) == 0
+
+
+@pytest.mark.slow
+class TestAuditThroughputBenchmark:
+    """Throughput of a staff browsing session, sync vs write-behind."""
+
+    SESSION = [
+        '/inventory/', '/inventory/stock/', '/inventory/alerts/', '/crm/',
+        '/crm/customers/', '/practice/schedule/', '/practice/tasks/', '/billing/',
+        '/referrals/', '/inventory/movements/', '/practice/', '/inventory/expiring/',
+    ]
+
+    def test_staff_session_throughput(
+        self, db, staff_user, request_factory, settings, buffered_audit
+    ):
+        """Write-behind should serve more requests per second than sync inserts."""
+        import time
+        from django.http import HttpResponse
+
+        middleware = AuditMiddleware(lambda r: HttpResponse('OK'))
+        requests = []
+        for _ in range(25):
+            for path in self.SESSION:
+                request = request_factory.get(path)
+                request.user = staff_user
+                requests.append(request)
+
+        results = {}
+        for mode in ('sync', 'buffered'):
+            settings.AUDIT_WRITE_MODE = mode
+            start = time.perf_counter()
+            for request in requests:
+                middleware(request)
+            results[mode] = len(requests) / (time.perf_counter() - start)
+        # Flushed here, inside the test transaction, not by the idle thread
+        buffered_audit.flush()
+
+        assert AuditLog.objects.count() == 2 * len(requests)
+        assert results['buffered'] > results['sync']
@@ -0,0 +1,205 @@
+"""Tests for log rollups and the archive_logs command."""
+import datetime
+import gzip
+import json
+import time
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+
+from apps.audit.models import AuditLog, DailyRollup
+from apps.audit.rollups import (
+    day_bounds,
+    frontier,
+    rollup_counts,
+    rollup_total,
+    update_rollups,
+)
+from apps.error_tracking.models import ErrorLog
+from apps.waf.models import SecurityEvent
+
+User = get_user_model()
+
+ACTIONS = ['view', 'view', 'update', 'login']
+
+
+@pytest.fixture
+def staff_user(db):
+    """Create a staff user for testing."""
+    return User.objects.create_user(
+        username='rollup_staff',
+        email='rollup_staff@example.com',
+        password='testpass123',
+        is_staff=True,
+    )
+
+
+def _backdated_logs(user, days_ago: int, count: int):
+    """Create audit rows dated ``days_ago`` local days before today."""
+    day = timezone.localdate() - datetime.timedelta(days=days_ago)
+    created = AuditLog.objects.bulk_create([
+        AuditLog(
+            user=user,
+            action=ACTIONS[i % len(ACTIONS)],
+            resource_type='inventory.stock',
+            ip_address='10.0.0.1',
+            sensitivity='high' if i % 5 == 0 else 'normal',
+        )
+        for i in range(count)
+    ])
+    AuditLog.objects.filter(pk__in=[log.pk for log in created]).update(
+        created_at=day_bounds(day)[0] + datetime.timedelta(hours=12)
+    )
+    return day
+
+
+def _raw_action_counts():
+    return {
+        row['action']: row['n']
+        for row in AuditLog.objects.values('action').annotate(n=Count('id')).order_by()
+    }
+
+
+class TestDailyRollups:
+    """Test incremental rollup maintenance and reads."""
+
+    def test_update_rollups_counts_each_day(self, db, staff_user):
+        """Each day should get per-dimension counts and a total."""
+        day = _backdated_logs(staff_user, 3, 8)
+        _backdated_logs(staff_user, 1, 4)
+
+        rolled = update_rollups(['audit'])
+        assert rolled['audit'] == 4  # three days ago through today
+
+        assert DailyRollup.objects.get(
+            source='audit', day=day, dimension='action', key='view'
+        ).count == 4
+        assert DailyRollup.objects.get(
+            source='audit', day=day, dimension='user_action', key=f'{staff_user.pk}:update'
+        ).count == 2
+        assert frontier('audit') == timezone.localdate()
+
+    def test_counts_match_raw_rows(self, db, staff_user):
+        """Rollups plus rows after the frontier should equal a raw aggregate."""
+        _backdated_logs(staff_user, 10, 12)
+        update_rollups(['audit'])
+        AuditLog.objects.create(user=staff_user, action='login', resource_type='auth')
+
+        assert dict(rollup_counts('audit', 'action')) == _raw_action_counts()
+        assert rollup_total('audit') == AuditLog.objects.count()
+
+    def test_counts_without_rollups_fall_back_to_raw(self, db, staff_user):
+        """Before the first rollup run, counts should come from raw rows."""
+        _backdated_logs(staff_user, 2, 4)
+        assert rollup_total('audit') == 4
+
+    def test_since_limits_days(self, db, staff_user):
+        """``since`` should exclude older days."""
+        _backdated_logs(staff_user, 20, 5)
+        recent = _backdated_logs(staff_user, 2, 3)
+        update_rollups(['audit'])
+        assert rollup_total('audit', since=recent) == 3
+        assert rollup_total('audit') == 8
+
+    def test_incremental_update_only_rerolls_frontier(self, db, staff_user):
+        """A second run should re-roll the frontier day only."""
+        _backdated_logs(staff_user, 5, 4)
+        update_rollups(['audit'])
+        assert update_rollups(['audit'])['audit'] == 1
+
+    def test_security_and_error_sources(self, db):
+        """SecurityEvent and ErrorLog should roll up by their own dimensions."""
+        SecurityEvent.objects.create(event_type='sqli', ip_address='1.2.3.4', path='/x')
+        SecurityEvent.objects.create(event_type='sqli', ip_address='1.2.3.5', path='/y')
+        ErrorLog.objects.create(
+            fingerprint='abc', error_type='server_error', status_code=500,
+            url_pattern='/x', full_url='http://testserver/x', method='GET',
+        )
+        update_rollups()
+        assert rollup_counts('security', 'event_type')['sqli'] == 2
+        assert rollup_counts('security', 'ip')['1.2.3.4'] == 1
+        assert rollup_counts('error', 'status_code')['500'] == 1
+
+    def test_error_dashboard_reads_rollups(self, db):
+        """Known-bug dashboard stats should come from error rollups."""
+        from apps.error_tracking.admin import top_errors
+
+        for fingerprint, count in (('abc', 3), ('def', 1)):
+            ErrorLog.objects.bulk_create([
+                ErrorLog(
+                    fingerprint=fingerprint, error_type='server_error', status_code=500,
+                    url_pattern=f'/{fingerprint}/', full_url='http://testserver/', method='GET',
+                )
+                for _ in range(count)
+            ])
+        ErrorLog.objects.update(
+            created_at=day_bounds(timezone.localdate() - datetime.timedelta(days=3))[0]
+        )
+        update_rollups(['error'])
+        ErrorLog.objects.filter(fingerprint='def').delete()  # archived
+
+        assert top_errors() == [
+            {'fingerprint': 'abc', 'error_type': 'server_error', 'url_pattern': '/abc/', 'count': 3},
+            {'fingerprint': 'def', 'error_type': '', 'url_pattern': '', 'count': 1},
+        ]
+        assert rollup_total('error', since=timezone.localdate()) == 0
+
+
+class TestArchiveLogsCommand:
+    """Test archiving old months to compressed files."""
+
+    def test_archives_old_months(self, db, staff_user, tmp_path):
+        """Rows past retention should move to a .jsonl.gz file, keeping totals."""
+        old_day = _backdated_logs(staff_user, 200, 6)
+        _backdated_logs(staff_user, 1, 2)
+
+        call_command('archive_logs', months=2, source=['audit'], output_dir=str(tmp_path))
+
+        path = tmp_path / f'audit-{old_day:%Y-%m}.jsonl.gz'
+        with gzip.open(path, 'rt') as archive:
+            rows = [json.loads(line) for line in archive]
+        assert len(rows) == 6
+        assert rows[0]['resource_type'] == 'inventory.stock'
+
+        assert AuditLog.objects.count() == 2
+        assert rollup_total('audit') == 8
+
+    def test_dry_run_changes_nothing(self, db, staff_user, tmp_path):
+        """--dry-run should not write files or delete rows."""
+        _backdated_logs(staff_user, 200, 3)
+        call_command('archive_logs', months=2, output_dir=str(tmp_path), dry_run=True)
+        assert AuditLog.objects.count() == 3
+        assert not list(tmp_path.iterdir())
+
+
+@pytest.mark.slow
+class TestRollupBenchmark:
+    """Dashboard aggregation over long history: raw GROUP BY vs rollups."""
+
+    def test_dashboard_aggregate_latency(self, db, staff_user):
+        """Rollup reads should beat a raw aggregate over a year of rows."""
+        for days_ago in range(365):
+            _backdated_logs(staff_user, days_ago, 300)
+        update_rollups(['audit'])
+        # Give the planner table statistics, as a production database has
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        def best_of(func, runs=5):
+            timings = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                func()
+                timings.append(time.perf_counter() - start)
+            return min(timings)
+
+        raw = best_of(_raw_action_counts)
+        rolled = best_of(lambda: rollup_counts('audit', 'action'))
+        print(f"\nraw GROUP BY: {raw * 1000:.2f} ms, rollups: {rolled * 1000:.2f} ms")
+
+        assert dict(rollup_counts('audit', 'action')) == _raw_action_counts()
+        assert rolled < raw
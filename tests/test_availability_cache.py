@@ -0,0 +1,190 @@
+"""Tests for cached per-day availability bitmaps."""
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.appointments import availability_cache
+from apps.appointments.availability import AvailabilityEngine
+from apps.appointments.models import Appointment, ScheduleBlock, ServiceType
+from apps.appointments.services import AvailabilityService
+
+User = get_user_model()
+
+
+def _next_weekday(weekday):
+    days = (weekday - date.today().weekday()) % 7 or 7
+    return date.today() + timedelta(days=days)
+
+
+def _at(day, hour, minute=0):
+    return timezone.make_aware(datetime.combine(day, time(hour, minute)))
+
+
+def _times(slots):
+    return [slot['time'] for slot in slots]
+
+
+@pytest.fixture
+def cache_enabled(settings):
+    settings.APPOINTMENT_AVAILABILITY_CACHE = {'TTL': 60, 'GRANULARITY': 5}
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def vet(db):
+    vet = User.objects.create_user(
+        username='cachevet', email='cachevet@test.com', password='pass', role='vet'
+    )
+    ScheduleBlock.objects.create(
+        staff=vet, day_of_week=1, start_time=time(9), end_time=time(11)
+    )
+    return vet
+
+
+@pytest.fixture
+def service(db):
+    return ServiceType.objects.create(
+        name='Consultation', duration_minutes=30, price=Decimal('450.00')
+    )
+
+
+@pytest.fixture
+def location(db):
+    from apps.locations.models import Location
+    from apps.parties.models import Organization
+    organization = Organization.objects.create(name='Cache Clinic', org_type='clinic')
+    return Location.objects.create(name='Cache Clinic', organization=organization)
+
+
+@pytest.fixture
+def book(vet, service, location):
+    owner = User.objects.create_user(username='cacheowner', email='cacheowner@test.com')
+
+    def book(start, minutes=30):
+        return Appointment.objects.create(
+            owner=owner, service=service, location=location, veterinarian=vet,
+            scheduled_start=start, scheduled_end=start + timedelta(minutes=minutes),
+        )
+    return book
+
+
+@pytest.mark.django_db
+class TestAvailabilityCache:
+    """Test bitmap answers and signal-driven refreshes."""
+
+    def test_bitmap_marks_free_cells(self, vet, book, cache_enabled):
+        """Bits are set for free 5-minute cells inside blocks only."""
+        tuesday = _next_weekday(1)
+        book(_at(tuesday, 10), minutes=15)
+        engine = AvailabilityEngine(tuesday)
+
+        free, blocks, exact = availability_cache.build_entry(engine, tuesday, 1)['staff'][vet.pk]
+        assert blocks == ((108, 132),)
+        assert exact is True
+        cells = [i for i in range(288) if free >> i & 1]
+        assert cells == list(range(108, 120)) + list(range(123, 132))
+
+    def test_calendar_is_served_without_queries(self, vet, service, cache_enabled):
+        """After the first build, a 14-day calendar needs no database access."""
+        tuesday = _next_weekday(1)
+        end = tuesday + timedelta(days=13)
+        first = AvailabilityService.get_available_slots_range(tuesday, end, service)
+
+        with CaptureQueriesContext(connection) as queries:
+            again = AvailabilityService.get_available_slots_range(tuesday, end, service)
+            single = AvailabilityService.get_available_slots(tuesday, service, staff=vet)
+        assert len(queries) == 0
+        assert again == first
+        assert _times(single) == [time(9), time(9, 30), time(10), time(10, 30)]
+        assert first == AvailabilityEngine(tuesday, end).slots_by_date(timedelta(minutes=30))
+
+    def test_booking_refreshes_day(
+        self, vet, service, book, cache_enabled, django_capture_on_commit_callbacks
+    ):
+        """A new booking is reflected once its transaction commits."""
+        tuesday = _next_weekday(1)
+        AvailabilityService.get_available_slots(tuesday, service)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            appointment = book(_at(tuesday, 9, 30))
+        with CaptureQueriesContext(connection) as queries:
+            slots = AvailabilityService.get_available_slots(tuesday, service)
+        assert len(queries) == 0
+        assert _times(slots) == [time(9), time(10), time(10, 30)]
+
+        appointment.status = 'cancelled'
+        with django_capture_on_commit_callbacks(execute=True):
+            appointment.save(update_fields=['status'])
+        assert time(9, 30) in _times(AvailabilityService.get_available_slots(tuesday, service))
+
+    def test_stale_reader_does_not_overwrite_refresh(
+        self, vet, service, book, cache_enabled, django_capture_on_commit_callbacks
+    ):
+        """A miss filled from an engine loaded before a booking keeps the rebuilt day."""
+        tuesday = _next_weekday(1)
+
+        def load_then_book(*args, **kwargs):
+            engine = AvailabilityEngine(*args, **kwargs)
+            # The booking's refresh loads its own engine
+            reader.side_effect = AvailabilityEngine
+            with django_capture_on_commit_callbacks(execute=True):
+                book(_at(tuesday, 9, 30))
+            return engine
+
+        with patch.object(availability_cache, 'AvailabilityEngine', side_effect=load_then_book) as reader:
+            stale = AvailabilityService.get_available_slots(tuesday, service)
+        assert time(9, 30) in _times(stale)
+
+        slots = AvailabilityService.get_available_slots(tuesday, service)
+        assert _times(slots) == [time(9), time(10), time(10, 30)]
+
+    def test_reschedule_refreshes_old_and_new_day(
+        self, vet, service, book, cache_enabled, django_capture_on_commit_callbacks
+    ):
+        """Moving an appointment frees its old day and blocks the new one."""
+        tuesday = _next_weekday(1)
+        next_tuesday = tuesday + timedelta(days=7)
+        with django_capture_on_commit_callbacks(execute=True):
+            appointment = book(_at(tuesday, 9))
+        AvailabilityService.get_available_slots_range(tuesday, next_tuesday, service)
+
+        appointment = Appointment.objects.get(pk=appointment.pk)
+        appointment.scheduled_start = _at(next_tuesday, 9)
+        appointment.scheduled_end = _at(next_tuesday, 9, 30)
+        with django_capture_on_commit_callbacks(execute=True):
+            appointment.save()
+
+        by_date = AvailabilityService.get_available_slots_range(tuesday, next_tuesday, service)
+        assert time(9) in _times(by_date[tuesday])
+        assert time(9) not in _times(by_date[next_tuesday])
+
+    def test_schedule_change_retires_cached_days(
+        self, vet, service, cache_enabled, django_capture_on_commit_callbacks
+    ):
+        """A new schedule block shows up on already cached days."""
+        tuesday = _next_weekday(1)
+        assert len(AvailabilityService.get_available_slots(tuesday, service)) == 4
+
+        with django_capture_on_commit_callbacks(execute=True):
+            ScheduleBlock.objects.create(
+                staff=vet, day_of_week=1, start_time=time(15), end_time=time(16)
+            )
+        assert len(AvailabilityService.get_available_slots(tuesday, service)) == 6
+
+    def test_unaligned_booking_falls_back_to_engine(self, vet, service, book, cache_enabled):
+        """Days the bitmap cannot represent exactly are answered by the engine."""
+        tuesday = _next_weekday(1)
+        book(_at(tuesday, 9, 32), minutes=20)
+
+        slots = AvailabilityService.get_available_slots(tuesday, service)
+        assert slots == AvailabilityEngine(tuesday).slots(tuesday, timedelta(minutes=30))
+        assert _times(slots) == [time(9), time(10), time(10, 30)]
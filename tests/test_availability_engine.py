@@ -0,0 +1,248 @@
+"""Tests for the interval-based availability engine."""
+import random
+import time as clock
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.appointments.availability import (
+    AvailabilityEngine,
+    merge_intervals,
+    subtract_intervals,
+)
+from apps.appointments.models import Appointment, ScheduleBlock, ServiceType
+from apps.appointments.services import AvailabilityService
+
+User = get_user_model()
+
+
+def _next_weekday(weekday):
+    days = (weekday - date.today().weekday()) % 7 or 7
+    return date.today() + timedelta(days=days)
+
+
+def _at(day, hour, minute=0):
+    return timezone.make_aware(datetime.combine(day, time(hour, minute)))
+
+
+class TestIntervalHelpers:
+    """Test merge and subtraction over sorted intervals."""
+
+    def test_merge_overlapping_and_touching(self):
+        assert merge_intervals([(50, 60), (10, 20), (15, 30), (30, 40)]) == (
+            [10, 50], [40, 60]
+        )
+
+    def test_subtract_busy_from_window(self):
+        starts, ends = merge_intervals([(0, 5), (20, 30), (40, 45), (90, 120)])
+        assert subtract_intervals(10, 100, starts, ends) == [(10, 20), (30, 40), (45, 90)]
+        assert subtract_intervals(10, 20, starts, ends) == [(10, 20)]
+        assert subtract_intervals(20, 30, starts, ends) == []
+
+
+@pytest.mark.django_db
+class TestAvailabilityEngine:
+    """Test multi-day, multi-vet availability from two queries."""
+
+    @pytest.fixture
+    def location(self):
+        from apps.locations.models import Location
+        from apps.parties.models import Organization
+        organization = Organization.objects.create(name='Engine Clinic', org_type='clinic')
+        return Location.objects.create(name='Engine Clinic', organization=organization)
+
+    @pytest.fixture
+    def owner(self):
+        return User.objects.create_user(
+            username='engineowner', email='engineowner@test.com', password='pass'
+        )
+
+    @pytest.fixture
+    def vets(self):
+        vets = [
+            User.objects.create_user(
+                username=f'enginevet{i}', email=f'enginevet{i}@test.com',
+                password='pass', role='vet'
+            )
+            for i in range(2)
+        ]
+        for weekday in (1, 2):  # Tuesday, Wednesday
+            ScheduleBlock.objects.create(
+                staff=vets[0], day_of_week=weekday, start_time=time(9), end_time=time(12)
+            )
+        ScheduleBlock.objects.create(
+            staff=vets[1], day_of_week=1, start_time=time(14), end_time=time(16)
+        )
+        return vets
+
+    @pytest.fixture
+    def service(self):
+        return ServiceType.objects.create(
+            name='Consultation', duration_minutes=30, price=Decimal('450.00')
+        )
+
+    def _book(self, owner, service, location, vet, start, minutes=30, status='scheduled'):
+        return Appointment.objects.create(
+            owner=owner, service=service, location=location, veterinarian=vet,
+            scheduled_start=start, scheduled_end=start + timedelta(minutes=minutes),
+            status=status,
+        )
+
+    def test_range_and_vets_in_two_queries(self, vets, service):
+        """A week for every vet costs one block and one appointment query."""
+        tuesday = _next_weekday(1)
+        with CaptureQueriesContext(connection) as queries:
+            by_date = AvailabilityService.get_available_slots_range(
+                tuesday, tuesday + timedelta(days=6), service, staff=vets
+            )
+        assert len(queries) == 2
+        assert len(by_date) == 7
+        assert len(by_date[tuesday]) == 6 + 4
+        assert len(by_date[tuesday + timedelta(days=1)]) == 6
+        assert by_date[tuesday + timedelta(days=2)] == []
+
+    def test_booked_intervals_are_subtracted(self, vets, service, owner, location):
+        """Slots overlapping any booking, even off-grid, are excluded."""
+        tuesday = _next_weekday(1)
+        self._book(owner, service, location, vets[0], _at(tuesday, 9, 45), minutes=30)
+        self._book(owner, service, location, vets[0], _at(tuesday, 11), status='cancelled')
+
+        slots = AvailabilityService.get_available_slots(tuesday, service, staff=vets[0])
+        assert [s['time'] for s in slots] == [
+            time(9), time(10, 30), time(11), time(11, 30)
+        ]
+
+    def test_booking_from_previous_day_blocks_morning(self, vets, service, owner, location):
+        """Appointments overlapping the range start are loaded too."""
+        tuesday = _next_weekday(1)
+        self._book(owner, service, location, vets[0], _at(tuesday, 9) - timedelta(hours=10),
+                   minutes=11 * 60)
+
+        slots = AvailabilityService.get_available_slots(tuesday, service, staff=vets[0])
+        assert slots[0]['time'] == time(10)
+
+    def test_engine_answers_repeated_checks_without_queries(self, vets, service, owner, location):
+        """One loaded engine serves any number of slot checks."""
+        tuesday = _next_weekday(1)
+        self._book(owner, service, location, vets[1], _at(tuesday, 14, 30))
+        engine = AvailabilityEngine(tuesday, staff=vets)
+        duration = timedelta(minutes=30)
+
+        with CaptureQueriesContext(connection) as queries:
+            assert engine.is_free(_at(tuesday, 14), duration, vets[1].pk) is True
+            assert engine.is_free(_at(tuesday, 14, 15), duration, vets[1].pk) is False
+            assert engine.is_free(_at(tuesday, 15, 45), duration, vets[1].pk) is False
+            assert engine.is_free(_at(tuesday, 9, 10), duration, vets[0].pk) is True
+            assert engine.free_intervals(tuesday, vets[1].pk) == [
+                (_at(tuesday, 14), _at(tuesday, 14, 30)),
+                (_at(tuesday, 15), _at(tuesday, 16)),
+            ]
+        assert len(queries) == 0
+
+    def test_check_availability_tool_accepts_range(self, vets, service):
+        """The AI tool returns every day of a range in one call."""
+        from apps.ai_assistant.tools import MAX_AVAILABILITY_DAYS, check_availability
+
+        tuesday = _next_weekday(1)
+        result = check_availability(
+            service_id=service.id, date=tuesday.isoformat(),
+            end_date=(tuesday + timedelta(days=1)).isoformat()
+        )
+        assert [len(day['slots']) for day in result['days']] == [10, 6]
+        assert result['days'][0]['slots'][0] == {'time': '09:00', 'staff_id': vets[0].id}
+
+        too_long = check_availability(
+            service_id=service.id, date=tuesday.isoformat(),
+            end_date=(tuesday + timedelta(days=MAX_AVAILABILITY_DAYS)).isoformat()
+        )
+        assert 'error' in too_long
+
+
+def _legacy_slots(day, service, staff_ids):
+    """Previous per-slot algorithm, kept as the benchmark baseline."""
+    duration = timedelta(minutes=service.duration_minutes)
+    blocks = ScheduleBlock.objects.filter(
+        day_of_week=day.weekday(), is_active=True, staff_id__in=staff_ids
+    ).order_by('staff', 'start_time')
+    if not blocks.exists():
+        return []
+    booked = {}
+    for appt in Appointment.objects.filter(
+        scheduled_start__gte=timezone.make_aware(datetime.combine(day, time.min)),
+        scheduled_start__lte=timezone.make_aware(datetime.combine(day, time.max)),
+        status__in=AvailabilityService.BLOCKING_STATUSES,
+        veterinarian_id__in=staff_ids,
+    ):
+        booked.setdefault(appt.veterinarian_id, []).append(
+            (appt.scheduled_start, appt.scheduled_end)
+        )
+    slots = []
+    for block in blocks:
+        current = datetime.combine(day, block.start_time)
+        block_end = datetime.combine(day, block.end_time)
+        while current + duration <= block_end:
+            start = timezone.make_aware(current)
+            if not any(start < b_end and start + duration > b_start
+                       for b_start, b_end in booked.get(block.staff_id, [])):
+                slots.append({'time': current.time(), 'staff_id': block.staff_id})
+            current += duration
+    return slots
+
+
+@pytest.mark.slow
+@pytest.mark.django_db
+class TestAvailabilityBenchmark:
+    """Two weeks of availability for a busy multi-vet clinic."""
+
+    def test_engine_vs_per_slot_scan(self):
+        from apps.locations.models import Location
+        from apps.parties.models import Organization
+
+        rng = random.Random(11)
+        organization = Organization.objects.create(name='Bench Clinic', org_type='clinic')
+        location = Location.objects.create(name='Bench Clinic', organization=organization)
+        owner = User.objects.create_user(username='benchowner', email='benchowner@test.com')
+        service = ServiceType.objects.create(
+            name='Short visit', duration_minutes=10, price=Decimal('100.00')
+        )
+        vets = [
+            User.objects.create_user(username=f'benchvet{i}', email=f'benchvet{i}@test.com')
+            for i in range(15)
+        ]
+        ScheduleBlock.objects.bulk_create([
+            ScheduleBlock(staff=vet, day_of_week=weekday, start_time=start, end_time=end)
+            for vet in vets
+            for weekday in range(6)
+            for start, end in ((time(8), time(13)), (time(14), time(20)))
+        ])
+        first_day = _next_weekday(0)
+        days = [first_day + timedelta(days=i) for i in range(14)]
+        Appointment.objects.bulk_create([
+            Appointment(
+                owner=owner, service=service, location=location, veterinarian=vet,
+                scheduled_start=start, scheduled_end=start + timedelta(minutes=20),
+                status=rng.choice(('scheduled', 'confirmed', 'cancelled')),
+            )
+            for vet in vets for day in days for _ in range(30)
+            for start in [_at(day, rng.randint(8, 19), rng.randrange(0, 60, 5))]
+        ], batch_size=1000)
+        staff_ids = [vet.pk for vet in vets]
+
+        started = clock.perf_counter()
+        legacy = {day: _legacy_slots(day, service, staff_ids) for day in days}
+        scan = clock.perf_counter() - started
+
+        started = clock.perf_counter()
+        engine = AvailabilityService.get_available_slots_range(
+            days[0], days[-1], service, staff=staff_ids
+        )
+        intervals = clock.perf_counter() - started
+
+        assert engine == legacy
+        print(f'\nper-slot scan: {scan * 1000:.1f} ms, engine: {intervals * 1000:.1f} ms')
+        assert intervals < scan
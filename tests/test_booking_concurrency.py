@@ -0,0 +1,197 @@
+"""Tests for race-free appointment booking."""
+import threading
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.appointments.models import Appointment, ScheduleBlock, ServiceType
+from apps.appointments.services import AvailabilityService, BookingConflict
+
+User = get_user_model()
+
+
+def _next_tuesday():
+    return date.today() + timedelta(days=(1 - date.today().weekday()) % 7 or 7)
+
+
+def _at(hour, minute=0):
+    return timezone.make_aware(datetime.combine(_next_tuesday(), time(hour, minute)))
+
+
+@pytest.fixture
+def clinic(db):
+    from apps.locations.models import Location
+    from apps.parties.models import Organization
+
+    organization = Organization.objects.create(name='Booking Clinic', org_type='clinic')
+    vet = User.objects.create_user(
+        username='bookingvet', email='bookingvet@test.com', role='vet'
+    )
+    ScheduleBlock.objects.create(
+        staff=vet, day_of_week=1, start_time=time(9), end_time=time(17)
+    )
+    return {
+        'location': Location.objects.create(name='Booking Clinic', organization=organization),
+        'vet': vet,
+        'service': ServiceType.objects.create(
+            name='Consultation', duration_minutes=30, price=Decimal('450.00'),
+            requires_pet=False,
+        ),
+        'owners': [
+            User.objects.create_user(username=f'booker{i}', email=f'booker{i}@test.com')
+            for i in range(8)
+        ],
+    }
+
+
+def _book(clinic, owner, start):
+    return AvailabilityService.book_appointment(
+        owner=owner, pet=None, service=clinic['service'], staff=clinic['vet'],
+        start_time=start, location=clinic['location'],
+    )
+
+
+def _book_in_parallel(clinic, starts):
+    """Book one start per owner from separate threads, released together."""
+    barrier = threading.Barrier(len(starts))
+    results = [None] * len(starts)
+
+    def worker(i, start):
+        try:
+            barrier.wait()
+            results[i] = _book(clinic, clinic['owners'][i], start)
+        except Exception as e:
+            results[i] = e
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(i, s)) for i, s in enumerate(starts)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+@pytest.mark.django_db(transaction=True)
+class TestParallelBooking:
+    """Fire simultaneous bookings at the same vet."""
+
+    def test_only_one_booking_wins_a_slot(self, clinic):
+        """Parallel requests for one slot: one booking, the rest conflict."""
+        results = _book_in_parallel(clinic, [_at(10)] * 8)
+
+        booked = [r for r in results if isinstance(r, Appointment)]
+        conflicts = [r for r in results if isinstance(r, BookingConflict)]
+        assert len(booked) == 1
+        assert len(conflicts) == 7
+        assert Appointment.objects.filter(veterinarian=clinic['vet']).count() == 1
+
+    def test_overlapping_times_conflict(self, clinic):
+        """Overlapping but different start times still book only once."""
+        results = _book_in_parallel(clinic, [_at(10), _at(10, 15), _at(10, 20)])
+        assert sum(isinstance(r, Appointment) for r in results) == 1
+
+    def test_distinct_slots_all_succeed(self, clinic):
+        """Parallel bookings for different slots do not block each other."""
+        starts = [_at(9) + timedelta(minutes=30 * i) for i in range(8)]
+        results = _book_in_parallel(clinic, starts)
+
+        assert all(isinstance(r, Appointment) for r in results), results
+        assert Appointment.objects.filter(veterinarian=clinic['vet']).count() == 8
+
+
+@pytest.mark.django_db
+class TestBookingConflict:
+    """Test the conflict error seen by staff forms and the AI tool."""
+
+    def test_conflict_is_a_value_error(self, clinic):
+        _book(clinic, clinic['owners'][0], _at(11))
+        with pytest.raises(BookingConflict) as exc_info:
+            _book(clinic, clinic['owners'][1], _at(11, 15))
+        assert isinstance(exc_info.value, ValueError)
+        assert exc_info.value.staff_id == clinic['vet'].pk
+
+    def test_staff_save_rejects_overlap_but_allows_self_edit(self, clinic):
+        """Staff appointments may leave the schedule but not double-book."""
+        first = _book(clinic, clinic['owners'][0], _at(11))
+        first.notes = 'Rescheduled by phone'
+        AvailabilityService.save_appointment(first)
+
+        evening = Appointment(
+            owner=clinic['owners'][1], service=clinic['service'],
+            location=clinic['location'], veterinarian=clinic['vet'],
+            scheduled_start=_at(18), scheduled_end=_at(18, 30),
+        )
+        AvailabilityService.save_appointment(evening)
+
+        clash = Appointment(
+            owner=clinic['owners'][2], service=clinic['service'],
+            location=clinic['location'], veterinarian=clinic['vet'],
+            scheduled_start=_at(11, 15), scheduled_end=_at(11, 45),
+        )
+        with pytest.raises(BookingConflict):
+            AvailabilityService.save_appointment(clash)
+        clash.status = 'cancelled'
+        AvailabilityService.save_appointment(clash)
+        assert Appointment.objects.count() == 3
+
+    def test_ai_tool_flags_conflict(self, clinic):
+        """The booking tool tells the assistant the slot was taken."""
+        from apps.ai_assistant.tools import book_appointment
+
+        _book(clinic, clinic['owners'][0], _at(12))
+        result = book_appointment(
+            user_id=clinic['owners'][1].id, service_id=clinic['service'].id,
+            staff_id=clinic['vet'].id, date=_next_tuesday().isoformat(), time='12:00',
+        )
+        assert result['conflict'] is True
+        assert 'not available' in result['error']
+
+    @pytest.mark.skipif(
+        connection.vendor != 'postgresql', reason='exclusion constraint is PostgreSQL-only'
+    )
+    def test_exclusion_constraint_backs_the_lock(self, clinic):
+        """Inserts that bypass the service are rejected by the database."""
+        _book(clinic, clinic['owners'][0], _at(13))
+        clash = Appointment(
+            owner=clinic['owners'][1], service=clinic['service'],
+            location=clinic['location'], veterinarian=clinic['vet'],
+            scheduled_start=_at(13, 10), scheduled_end=_at(13, 40),
+        )
+        with pytest.raises(BookingConflict):
+            with AvailabilityService._translate_conflict(clash), transaction.atomic():
+                clash.save()
+
+
+@pytest.mark.django_db
+class TestOverlapConstraintMigration:
+    """The constraint migration reports existing overlaps instead of failing."""
+
+    def test_finds_overlapping_blocking_appointments(self, clinic):
+        """Only overlapping, blocking pairs for the same vet are reported."""
+        import importlib
+
+        migration = importlib.import_module(
+            'apps.appointments.migrations.0005_vet_overlap_constraint'
+        )
+
+        def add(owner, start, end, status='scheduled'):
+            return Appointment.objects.create(
+                owner=clinic['owners'][owner], service=clinic['service'],
+                location=clinic['location'], veterinarian=clinic['vet'],
+                scheduled_start=start, scheduled_end=end, status=status,
+            )
+
+        first = add(0, _at(9), _at(9, 30))
+        second = add(1, _at(9, 15), _at(9, 45))
+        add(2, _at(9, 45), _at(10))                 # back to back
+        add(3, _at(9, 50), _at(9, 55), 'cancelled')
+
+        with connection.cursor() as cursor:
+            overlaps = migration.find_overlaps(cursor, Appointment._meta.db_table)
+        assert [(a, b) for a, b, _, _ in overlaps] == [(first.pk, second.pk)]
@@ -0,0 +1,220 @@
+"""Tests for conversation memory (history window and summaries)."""
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.ai_assistant.memory import ConversationMemory, estimate_tokens
+from apps.ai_assistant.models import Conversation, Message
+
+User = get_user_model()
+
+MEMORY = {
+    'WINDOW_MESSAGES': 4,
+    'WINDOW_TOKENS': 100,
+    'SUMMARY_TRIGGER_TOKENS': 150,
+    'SUMMARY_MAX_TOKENS': 50,
+}
+
+
+@pytest.fixture
+def memory_settings(settings):
+    settings.AI_CHAT_MEMORY = MEMORY
+    return settings
+
+
+@pytest.fixture
+def conversation(db):
+    return Conversation.objects.create(session_id='memory-test', language='en')
+
+
+def _turns(conversation, count, size=20):
+    """Create alternating user/assistant messages of ``size`` characters."""
+    return [
+        Message.objects.create(
+            conversation=conversation,
+            role='user' if i % 2 == 0 else 'assistant',
+            content=f'{i:02d}'.ljust(size, '.'),
+        )
+        for i in range(count)
+    ]
+
+
+def _answer(text):
+    return {'choices': [{'message': {'content': text}}]}
+
+
+@pytest.mark.django_db
+class TestConversationMemory:
+    """Test the rolling window and stored summary."""
+
+    def test_messages_record_token_count(self, conversation):
+        """Saving a message should record its estimated tokens."""
+        message = Message.objects.create(conversation=conversation, role='user', content='x' * 41)
+        assert message.token_count == estimate_tokens('x' * 41) == 11
+
+    def test_window_is_bounded_by_count_and_tokens(self, conversation, memory_settings):
+        """Only the newest messages within both limits are replayed."""
+        _turns(conversation, 10)
+        Message.objects.create(conversation=conversation, role='tool', content='{}')
+
+        history = ConversationMemory(conversation).messages()
+        assert [m['content'][:2] for m in history] == ['06', '07', '08', '09']
+        assert {m['role'] for m in history} == {'user', 'assistant'}
+
+        memory_settings.AI_CHAT_MEMORY = {**MEMORY, 'WINDOW_TOKENS': 12}
+        assert [m['content'][:2] for m in ConversationMemory(conversation).messages()] == ['08', '09']
+
+    def test_summary_replaces_older_turns(self, conversation, memory_settings):
+        """The summary is sent first and summarized turns are not replayed."""
+        messages = _turns(conversation, 6)
+        conversation.summary = 'Customer asked about Luna.'
+        conversation.summary_through = messages[3]
+        conversation.save()
+
+        history = ConversationMemory(conversation).messages()
+        assert history[0] == {
+            'role': 'system',
+            'content': 'Summary of the earlier conversation:\nCustomer asked about Luna.',
+        }
+        assert [m['content'][:2] for m in history[1:]] == ['04', '05']
+
+    def test_summarize_folds_turns_older_than_window(self, conversation, memory_settings):
+        """Turns before the window go into the summary; the window stays."""
+        messages = _turns(conversation, 8)
+        client = MagicMock()
+        client.chat_sync.return_value = _answer('Summary of 00-03.')
+
+        assert ConversationMemory(conversation).summarize(client) is True
+
+        conversation.refresh_from_db()
+        assert conversation.summary == 'Summary of 00-03.'
+        assert conversation.summary_through == messages[3]
+        sent = client.chat_sync.call_args.args[0]
+        assert sent[1]['content'].startswith('User: 00')
+        assert '03' in sent[1]['content'] and '04' not in sent[1]['content']
+        assert client.chat_sync.call_args.kwargs['max_tokens'] == MEMORY['SUMMARY_MAX_TOKENS']
+        assert [m['content'][:2] for m in ConversationMemory(conversation).messages()[1:]] == [
+            '04', '05', '06', '07'
+        ]
+
+    def test_failed_summary_keeps_history(self, conversation, memory_settings):
+        """An upstream error should leave the conversation unchanged."""
+        _turns(conversation, 8)
+        client = MagicMock()
+        client.chat_sync.return_value = {'error': True, 'message': 'down'}
+
+        assert ConversationMemory(conversation).summarize(client) is False
+        conversation.refresh_from_db()
+        assert conversation.summary == '' and conversation.summary_through is None
+
+    def test_schedule_summary_only_past_trigger(self, conversation, memory_settings):
+        """Summarization is queued once unsummarized tokens pass the trigger."""
+        _turns(conversation, 4)
+        memory = ConversationMemory(conversation)
+        with patch('apps.ai_assistant.clients.OpenRouterClient.chat_sync') as chat:
+            chat.return_value = _answer('Short summary.')
+            assert memory.schedule_summary() is False
+
+            _turns(conversation, 6, size=100)
+            assert memory.schedule_summary() is True
+        assert chat.call_count == 1
+        conversation.refresh_from_db()
+        assert conversation.summary == 'Short summary.'
+        assert ConversationMemory(conversation).needs_summary() is False
+
+
+@pytest.mark.django_db
+class TestChatWithMemory:
+    """Test prior turns reaching the model through the chat views."""
+
+    def test_follow_up_sends_prior_turns(self, client, memory_settings):
+        """The second message should carry the first exchange."""
+        with patch('apps.ai_assistant.clients.OpenRouterClient.chat_sync') as chat:
+            chat.return_value = _answer('We are open 9-8.')
+            for text in ('What are your hours?', 'And on Monday?'):
+                response = client.post(
+                    reverse('ai_assistant:chat'),
+                    data=json.dumps({'message': text, 'session_id': 'follow-up', 'language': 'en'}),
+                    content_type='application/json',
+                )
+                assert response.status_code == 200
+
+        first, second = (call.args[0] for call in chat.call_args_list)
+        assert [m['role'] for m in first] == ['system', 'user']
+        assert [m['content'] for m in second[1:]] == [
+            'What are your hours?', 'We are open 9-8.', 'And on Monday?'
+        ]
+
+    def test_history_bypasses_response_cache(self, client, settings, memory_settings):
+        """Answers that depend on prior turns must not be served from cache."""
+        from django.core.cache import cache
+
+        settings.AI_RESPONSE_CACHE = {'ENABLED': True, 'TTL': 60, 'MAX_QUERY_LENGTH': 300}
+        cache.clear()
+        with patch('apps.ai_assistant.clients.OpenRouterClient.chat_sync') as chat:
+            chat.return_value = _answer('Yes.')
+            for session in ('a', 'b', 'b'):
+                client.post(
+                    reverse('ai_assistant:chat'),
+                    data=json.dumps({'message': 'Open today?', 'session_id': session}),
+                    content_type='application/json',
+                )
+        cache.clear()
+        # Session b's first message is a cache hit; its follow-up is not
+        assert chat.call_count == 2
+
+
+@pytest.mark.django_db
+class TestConversationLists:
+    """Test list endpoints without per-row queries."""
+
+    @pytest.fixture
+    def admin_user(self):
+        return User.objects.create_user(
+            username='memoryadmin', email='memoryadmin@example.com',
+            password='testpass123', role='admin'
+        )
+
+    def test_conversation_list_query_count_is_flat(self, client, admin_user):
+        """Message counts and previews come from annotations, not per row."""
+        def queries_for(url, **headers):
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url, **headers)
+            return len(queries), response
+
+        client.force_login(admin_user)
+        url = reverse('ai_assistant:conversation_list')
+        _turns(Conversation.objects.create(session_id='list-0', user=admin_user), 1)
+        client.get(url)  # warm per-process caches and StoreSettings
+        json_queries, _ = queries_for(url, HTTP_ACCEPT='application/json')
+        page_queries, _ = queries_for(url)
+
+        for i in range(1, 5):
+            _turns(Conversation.objects.create(session_id=f'list-{i}', user=admin_user), i + 1)
+        assert queries_for(url, HTTP_ACCEPT='application/json')[0] == json_queries
+        count, page = queries_for(url)
+        assert count == page_queries
+        assert b'04..' in page.content
+
+        data = client.get(url, HTTP_ACCEPT='application/json').json()
+        counts = {c['session_id']: c['message_count'] for c in data['conversations']}
+        assert counts == {f'list-{i}': i + 1 for i in range(5)}
+
+    def test_history_pages_from_newest(self, client, conversation, settings):
+        """History returns the newest page, then older pages via ``before``."""
+        settings.AI_CHAT_HISTORY_LIMIT = 3
+        _turns(conversation, 5)
+        url = reverse('ai_assistant:chat_history') + '?session_id=memory-test'
+
+        data = client.get(url).json()
+        assert [m['content'][:2] for m in data['messages']] == ['02', '03', '04']
+        assert data['has_more'] is True
+
+        older = client.get(f"{url}&before={data['messages'][0]['id']}").json()
+        assert [m['content'][:2] for m in older['messages']] == ['00', '01']
+        assert older['has_more'] is False
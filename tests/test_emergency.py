@@ -586,6 +586,62 @@ class TestEmergencyAITools:
         assert contact.status == 'escalated'
         assert contact.escalated_at is not None
 
+    def test_customer_cannot_escalate_another_customers_emergency(self, user, staff_user):
+        """A customer's call should not touch someone else's emergency record."""
+        from apps.ai_assistant.tools import ToolRegistry
+        from apps.emergency.models import EmergencyContact, OnCallSchedule
+        from apps.practice.models import StaffProfile
+
+        OnCallSchedule.objects.create(
+            staff=StaffProfile.objects.create(user=staff_user, role='veterinarian'),
+            date=timezone.now().date(),
+            start_time=time(0, 0),
+            end_time=time(23, 59),
+            contact_phone='+529981234567',
+            is_active=True,
+        )
+        other = User.objects.create_user(username='other', email='other@example.com')
+        contact = EmergencyContact.objects.create(
+            owner=other,
+            phone='+529987654321',
+            channel='web',
+            reported_symptoms='Critical symptoms',
+            pet_species='dog',
+        )
+
+        result = ToolRegistry.execute('escalate_to_oncall', {
+            'emergency_contact_id': contact.id,
+            'callback_number': '+529980000000',
+            'user_id': other.id,
+        }, {'user': user})
+
+        assert result.data['escalated'] is False
+        assert 'contact_phone' not in result.data
+        contact.refresh_from_db()
+        assert contact.status == 'initiated'
+        assert contact.handled_by is None
+
+    def test_customer_cannot_report_another_customers_pet(self, user):
+        """A customer's emergency should not attach someone else's pet."""
+        from apps.ai_assistant.tools import ToolRegistry
+        from apps.emergency.models import EmergencyContact
+        from apps.pets.models import Pet
+
+        other = User.objects.create_user(username='other', email='other@example.com')
+        pet = Pet.objects.create(name='Luna', species='dog', owner=other)
+
+        result = ToolRegistry.execute('create_emergency_contact', {
+            'phone': '+529981234567',
+            'channel': 'web',
+            'symptoms': 'Vomiting',
+            'pet_species': 'dog',
+            'owner_id': other.id,
+            'pet_id': pet.id,
+        }, {'user': user})
+
+        assert result.data['success'] is False
+        assert not EmergencyContact.objects.exists()
+
     def test_create_emergency_contact_tool_exists(self):
         """Test create_emergency_contact tool is registered."""
         from apps.ai_assistant.tools import ToolRegistry
@@ -8,6 +8,7 @@ from django.contrib.auth import get_user_model
 from django.http import HttpResponse, HttpResponseNotFound, HttpResponseForbidden
 from django.test import RequestFactory, override_settings
 
+from apps.error_tracking.ingest import error_buffer, error_sampler
 from apps.error_tracking.middleware import ErrorCaptureMiddleware
 from apps.error_tracking.models import ErrorLog, KnownBug
 from apps.error_tracking.services import BugCreationService
@@ -16,6 +17,22 @@ from apps.error_tracking.tasks import create_bug_task
 User = get_user_model()
 
 
+@pytest.fixture(autouse=True)
+def reset_error_ingestion():
+    """Start each test with empty sampling windows and counters."""
+    from django.core.cache import cache
+
+    error_sampler.reset()
+    error_buffer.clear()
+    cache.clear()
+    # Flush only when a test asks (the test database is per-thread)
+    original = error_buffer.batch_size, error_buffer.flush_interval
+    error_buffer.batch_size, error_buffer.flush_interval = 10 ** 6, 3600
+    yield
+    error_buffer.clear()
+    error_buffer.batch_size, error_buffer.flush_interval = original
+
+
 class TestErrorLogModel:
     """Tests for ErrorLog model."""
 
@@ -846,3 +863,120 @@ class TestCeleryTasks:
         assert result is not None
         # Bug should be created in database
         assert KnownBug.objects.filter(fingerprint='integration_test').exists()
+
+
+def _tracking(**overrides):
+    """ERROR_TRACKING settings with overrides."""
+    from django.conf import settings
+    return {**settings.ERROR_TRACKING, **overrides}
+
+
+def _not_found(path='/crawler/probe/'):
+    """Run one 404 request through ErrorCaptureMiddleware."""
+    request = RequestFactory().get(path)
+    request.user = None
+    request.META['REMOTE_ADDR'] = '127.0.0.1'
+    return ErrorCaptureMiddleware(lambda r: HttpResponseNotFound('Not Found'))(request)
+
+
+class TestErrorIngestion:
+    """Tests for coalesced error ingestion."""
+
+    @pytest.mark.django_db
+    def test_exception_info_is_request_scoped(self):
+        """Exception details should travel on the request, not the middleware."""
+        middleware = ErrorCaptureMiddleware(lambda r: HttpResponse(status=500))
+        first = RequestFactory().get('/boom/')
+        second = RequestFactory().get('/other/')
+        first.user = second.user = None
+
+        try:
+            raise ValueError('first failure')
+        except ValueError as e:
+            middleware.process_exception(first, e)
+
+        middleware(second)
+        middleware(first)
+
+        assert ErrorLog.objects.get(url_pattern='/boom/').exception_type == 'ValueError'
+        assert ErrorLog.objects.get(url_pattern='/other/').exception_type == ''
+        assert not hasattr(middleware, '_exception_info')
+
+    @pytest.mark.django_db
+    def test_rows_sampled_per_window(self, settings):
+        """Only the first SAMPLE_PER_WINDOW occurrences should be stored."""
+        settings.ERROR_TRACKING = _tracking(SAMPLE_PER_WINDOW=2, AUTO_CREATE_BUGS=False)
+        for _ in range(5):
+            _not_found()
+        assert ErrorLog.objects.count() == 2
+
+    @pytest.mark.django_db
+    def test_known_bug_counts_every_occurrence(self, settings):
+        """Sampled-out occurrences should still reach occurrence_count."""
+        settings.ERROR_TRACKING = _tracking(SAMPLE_PER_WINDOW=1)
+        middleware = ErrorCaptureMiddleware(None)
+        bug = KnownBug.objects.create(
+            bug_id='B-900',
+            fingerprint=middleware.generate_fingerprint('not_found', 404, '/crawler/probe/'),
+            title='Probe', description='Crawler probe', severity='low',
+        )
+
+        for _ in range(4):
+            _not_found()
+
+        bug.refresh_from_db()
+        assert bug.occurrence_count == 5  # default 1 + 4
+        assert ErrorLog.objects.count() == 1
+
+    @pytest.mark.django_db
+    def test_threshold_uses_counter_and_triggers_once(self, settings):
+        """Bug creation should trigger once the counter reaches the threshold."""
+        settings.ERROR_TRACKING = _tracking(SAMPLE_PER_WINDOW=1, BUG_THRESHOLD=3)
+        with patch('apps.error_tracking.ingest.trigger_bug_creation') as trigger:
+            _not_found()
+            _not_found()
+            assert not trigger.called
+            for _ in range(3):
+                _not_found()
+        assert trigger.call_count == 1
+        assert trigger.call_args.args[1:] == ('not_found', 404, '/crawler/probe/')
+
+    @pytest.mark.django_db
+    def test_buffered_mode_writes_on_flush(self, settings):
+        """Buffered mode should defer rows and counts to the next flush."""
+        settings.ERROR_TRACKING = _tracking(WRITE_MODE='buffered', AUTO_CREATE_BUGS=False)
+        _not_found()
+        _not_found('/crawler/other/')
+        assert ErrorLog.objects.count() == 0
+        assert len(error_buffer) == 2
+
+        assert error_buffer.flush() == 2
+        assert ErrorLog.objects.count() == 2
+
+
+@pytest.mark.slow
+class TestErrorIngestionBenchmark:
+    """404 flood from a crawler: per-request inserts vs coalesced ingestion."""
+
+    @pytest.mark.django_db
+    def test_crawler_flood_throughput(self, settings):
+        """Coalesced ingestion should handle a 404 flood faster."""
+        import time
+
+        paths = [f'/wp-admin/probe-{i % 20}.php' for i in range(2000)]
+
+        def run(**config):
+            settings.ERROR_TRACKING = _tracking(**config)
+            error_sampler.reset()
+            start = time.perf_counter()
+            for path in paths:
+                _not_found(path)
+            error_buffer.flush()
+            return len(paths) / (time.perf_counter() - start)
+
+        with patch('apps.error_tracking.ingest.trigger_bug_creation'):
+            per_request = run(WRITE_MODE='sync', SAMPLE_PER_WINDOW=10 ** 9)
+            coalesced = run(WRITE_MODE='buffered', SAMPLE_PER_WINDOW=10)
+
+        print(f"\nper-request: {per_request:.0f} errors/s, coalesced: {coalesced:.0f} errors/s")
+        assert coalesced > per_request
@@ -223,3 +223,138 @@ class TestFeatureFlagCacheInvalidation:
 
         # Should reflect new state
         assert is_enabled('appointments.online_booking') is False
+
+
+@pytest.fixture
+def steady_state(settings):
+    """Only re-check the version stamp once a minute, like production."""
+    from apps.core.local_cache import flag_cache
+
+    settings.FEATURE_CACHE_SYNC_INTERVAL = 60
+    flag_cache.clear()
+    yield flag_cache
+    flag_cache.clear()
+
+
+@pytest.mark.django_db
+class TestLocalFlagCache:
+    """Tests for the process-local tier in front of the Django cache."""
+
+    def test_steady_state_makes_no_network_calls(
+        self, steady_state, online_booking_flag, django_assert_num_queries
+    ):
+        """Warm lookups should touch neither the database nor the Django cache."""
+        from unittest.mock import patch
+        from apps.core.context_processors import get_enabled_modules
+        from apps.core.feature_flags import is_enabled
+        from apps.core.middleware.module_activation import get_module_enabled_status
+
+        assert is_enabled('appointments.online_booking') is True
+
+        with patch('django.core.cache.cache.get') as cache_get, django_assert_num_queries(0):
+            for _ in range(100):
+                assert is_enabled('appointments.online_booking') is True
+                assert get_module_enabled_status('appointments') is True
+                assert 'appointments' in get_enabled_modules()
+        assert not cache_get.called
+
+    def test_first_lookup_preloads_every_flag(
+        self, steady_state, online_booking_flag, sms_reminders_flag, django_assert_num_queries
+    ):
+        """The first lookup should warm flags and modules with one query per table."""
+        from apps.core.feature_flags import is_enabled
+
+        with django_assert_num_queries(2):
+            assert is_enabled('appointments.online_booking') is True
+        with django_assert_num_queries(0):
+            assert is_enabled('appointments.online_booking') is True
+            assert is_enabled('appointments.sms_reminders') is False
+
+    def test_save_in_this_process_applies_immediately(self, steady_state, online_booking_flag):
+        """A post_save in this process should drop local entries at once."""
+        from apps.core.feature_flags import is_enabled
+
+        assert is_enabled('appointments.online_booking') is True
+        online_booking_flag.is_enabled = False
+        online_booking_flag.save()
+        assert is_enabled('appointments.online_booking') is False
+
+    def test_version_bumped_on_commit(
+        self, steady_state, online_booking_flag, django_capture_on_commit_callbacks
+    ):
+        """Other processes should only be told once the save commits."""
+        from django.core.cache import cache
+        from apps.core.feature_flags import is_enabled
+
+        assert is_enabled('appointments.online_booking') is True
+        version = cache.get(steady_state.version_key)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            online_booking_flag.is_enabled = False
+            online_booking_flag.save()
+            assert is_enabled('appointments.online_booking') is False
+            assert cache.get(steady_state.version_key) == version
+        assert cache.get(steady_state.version_key) != version
+
+    def test_version_bump_from_another_process(self, settings, online_booking_flag):
+        """A changed version stamp should drop local entries at the next check."""
+        from django.core.cache import cache
+        from apps.core.feature_flags import is_enabled
+        from apps.core.local_cache import flag_cache
+
+        assert is_enabled('appointments.online_booking') is True
+        # Another worker changed the flag: DB row, Django cache and stamp
+        FeatureFlag.objects.filter(pk=online_booking_flag.pk).update(is_enabled=False)
+        cache.delete('feature_flag:appointments.online_booking')
+        cache.set(flag_cache.version_key, 'other-worker', None)
+
+        assert is_enabled('appointments.online_booking') is False
+
+    def test_lru_and_ttl(self, settings):
+        """Entries should expire after ttl and the oldest be evicted past max_size."""
+        from unittest.mock import patch
+        from apps.core.local_cache import LocalCache
+
+        settings.FEATURE_CACHE_SYNC_INTERVAL = 60
+        local = LocalCache('test:local:version', max_size=2, ttl=10)
+        local.get('a', lambda: 1)
+        local.get('b', lambda: 2)
+        local.get('a', lambda: 'reloaded')
+        local.get('c', lambda: 3)
+        assert local.get('a', lambda: 'reloaded') == 1
+        assert local.get('b', lambda: 'reloaded') == 'reloaded'
+
+        with patch('apps.core.local_cache.time.monotonic', return_value=10 ** 9):
+            assert local.get('a', lambda: 'expired') == 'expired'
+
+
+@pytest.mark.slow
+@pytest.mark.django_db
+class TestLocalFlagCacheBenchmark:
+    """Flag checks: Django cache per call vs process-local tier."""
+
+    def test_flag_check_latency(self, steady_state, online_booking_flag):
+        """Local lookups should be faster than Django cache lookups."""
+        import time
+        from apps.core import feature_flags
+
+        key = 'appointments.online_booking'
+        cache_key = f'feature_flag:{key}'
+        calls = 20000
+
+        start = time.perf_counter()
+        for _ in range(calls):
+            feature_flags._load_flag(key, cache_key)
+        django_cache = time.perf_counter() - start
+
+        feature_flags.is_enabled(key)
+        start = time.perf_counter()
+        for _ in range(calls):
+            feature_flags.is_enabled(key)
+        local = time.perf_counter() - start
+
+        print(
+            f"\nDjango cache: {django_cache / calls * 1e6:.2f} us/check,"
+            f" local: {local / calls * 1e6:.2f} us/check"
+        )
+        assert local < django_cache
@@ -0,0 +1,200 @@
+"""Tests for the knowledge base retrieval index."""
+import random
+import time
+
+import pytest
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+
+from apps.knowledge.models import FAQ, KnowledgeArticle, KnowledgeCategory
+from apps.knowledge.search import KnowledgeIndex, Snippet, search_knowledge, tokenize
+
+
+@pytest.fixture
+def category(db):
+    return KnowledgeCategory.objects.create(
+        name='Services', name_es='Servicios', name_en='Services', slug='services-idx'
+    )
+
+
+def _article(category, slug, title_en, title_es, ai_context='', keywords=(), is_published=True):
+    return KnowledgeArticle.objects.create(
+        category=category, slug=slug,
+        title=title_en, title_en=title_en, title_es=title_es,
+        content=title_en, content_en=title_en, content_es=title_es,
+        ai_context=ai_context, keywords=list(keywords), is_published=is_published,
+    )
+
+
+class TestTokenize:
+    """Test index tokenization."""
+
+    def test_accents_case_stopwords_and_plurals(self):
+        """Terms should match across accents, casing and plurals."""
+        assert tokenize('¿Cuáles son los SERVICIOS de Vacunación?') == ['servicio', 'vacunacion']
+        assert tokenize('What are your hours') == ['hour']
+
+
+class TestKnowledgeIndex:
+    """Test BM25 ranking without the database."""
+
+    @pytest.fixture
+    def index(self):
+        index = KnowledgeIndex('en')
+        index.add(Snippet('article', 1, 'Vaccines: rabies, parvo.'),
+                  [('Vaccination', 3), ('vaccine shots', 3), ('All core vaccines', 1)])
+        index.add(Snippet('article', 2, 'Surgery is done on Tuesdays.'),
+                  [('Surgery', 3), ('Surgery is done on Tuesdays, vaccination first', 1)])
+        index.add(Snippet('faq', 3, 'Q: Hours?\nA: 9am to 8pm'),
+                  [('What are your hours?', 3), ('9am to 8pm', 1)])
+        return index
+
+    def test_title_and_keyword_matches_rank_first(self, index):
+        """A title/keyword hit should outrank a passing mention."""
+        assert [s.pk for s in index.search('vaccination')] == [1, 2]
+
+    def test_kind_filter_and_limit(self, index):
+        """Results can be restricted to articles or FAQs and capped."""
+        assert [s.pk for s in index.search('hours vaccination', kind='faq')] == [3]
+        assert len(index.search('vaccination', limit=1)) == 1
+
+    def test_token_budget_skips_snippets_that_do_not_fit(self, index):
+        """Snippets over the remaining budget are skipped, not truncated."""
+        budget = Snippet('faq', 0, 'Q: Hours?\nA: 9am to 8pm').tokens
+        results = index.search('vaccination hours', max_tokens=budget)
+        assert [s.pk for s in results] == [3]
+
+    def test_no_match(self, index):
+        """Unknown terms and empty queries return nothing."""
+        assert index.search('grooming') == []
+        assert index.search('') == []
+
+
+@pytest.mark.django_db
+class TestSearchKnowledge:
+    """Test the per-process index over the database."""
+
+    def test_indexes_both_languages_and_only_published(self, category):
+        """Each language is indexed; unpublished articles never match."""
+        _article(category, 'vax', 'Vaccination', 'Vacunación', ai_context='All vaccines.')
+        _article(category, 'draft', 'Vaccination draft', 'Borrador de vacunación', is_published=False)
+
+        assert [s.text for s in search_knowledge('vaccination', 'en')] == ['All vaccines.']
+        assert [s.text for s in search_knowledge('vacunacion', 'es')] == ['All vaccines.']
+
+    def test_search_makes_no_queries_once_built(self, category):
+        """A warm index should answer without touching the database."""
+        from apps.knowledge import search
+
+        _article(category, 'hours', 'Hours', 'Horario', ai_context='Open 9-8.')
+        FAQ.objects.create(
+            category=category, question='Hours?', question_en='Hours?', question_es='¿Horario?',
+            answer='9-8', answer_en='9-8', answer_es='9-8',
+        )
+        search.index_cache.ttl = 60
+        try:
+            search_knowledge('hours', 'en')
+            with CaptureQueriesContext(connection) as queries:
+                results = search_knowledge('hours', 'en')
+            assert len(queries) == 0
+            assert {s.kind for s in results} == {'article', 'faq'}
+        finally:
+            search.index_cache.ttl = 0
+            search.index_cache.clear()
+
+    def test_saving_content_rebuilds_index(self, category):
+        """Edits and deletes should be visible to the next search."""
+        from apps.knowledge import search
+
+        article = _article(category, 'groom', 'Grooming', 'Estética', ai_context='Baths.')
+        search.index_cache.ttl = 60
+        try:
+            assert search_knowledge('grooming', 'en')[0].text == 'Baths.'
+            article.ai_context = 'Baths and haircuts.'
+            article.save()
+            assert search_knowledge('grooming', 'en')[0].text == 'Baths and haircuts.'
+            article.delete()
+            assert search_knowledge('grooming', 'en') == []
+        finally:
+            search.index_cache.ttl = 0
+            search.index_cache.clear()
+
+    def test_context_builder_uses_faqs_within_budget(self, category):
+        """AIContextBuilder should inject FAQ answers and respect max_tokens."""
+        from apps.ai_assistant.context import AIContextBuilder
+
+        FAQ.objects.create(
+            category=category, question='Do you board pets?', question_en='Do you board pets?',
+            question_es='¿Hospedan mascotas?', answer='Yes, boarding is available.',
+            answer_en='Yes, boarding is available.', answer_es='Sí, tenemos hospedaje.',
+        )
+        builder = AIContextBuilder(language='en')
+        prompt = builder.build_system_prompt(user_query='boarding')
+        assert 'boarding is available' in prompt
+
+        tight = AIContextBuilder(language='en', max_tokens=1)
+        assert 'boarding is available' not in tight.build_system_prompt(user_query='boarding')
+
+
+@pytest.mark.slow
+@pytest.mark.django_db
+class TestKnowledgeSearchBenchmark:
+    """Retrieval over a synthetic 10k-article corpus."""
+
+    def test_index_vs_icontains(self, category):
+        """Indexed search should beat per-keyword icontains scans."""
+        from apps.knowledge import search
+
+        rng = random.Random(7)
+        vocabulary = [f'term{i}' for i in range(2000)]
+        KnowledgeArticle.objects.bulk_create([
+            KnowledgeArticle(
+                category=category, slug=f'synthetic-{i}',
+                title=f'Article {i}', title_en=f'Article {i}', title_es=f'Artículo {i}',
+                content=' '.join(rng.choices(vocabulary, k=80)),
+                content_en=' '.join(rng.choices(vocabulary, k=80)),
+                content_es=' '.join(rng.choices(vocabulary, k=80)),
+                ai_context=' '.join(rng.choices(vocabulary, k=20)),
+                keywords=rng.choices(vocabulary, k=3),
+                is_published=True, priority=rng.randint(0, 100),
+            )
+            for i in range(10_000)
+        ], batch_size=1000)
+        queries = [' '.join(rng.choices(vocabulary, k=3)) for _ in range(50)]
+
+        def icontains(query):
+            found = []
+            for keyword in query.split():
+                found.extend(KnowledgeArticle.objects.filter(
+                    Q(title_en__icontains=keyword) | Q(keywords__icontains=keyword)
+                    | Q(ai_context__icontains=keyword) | Q(content_en__icontains=keyword),
+                    is_published=True,
+                ).order_by('-priority')[:5])
+            return found
+
+        start = time.perf_counter()
+        for query in queries:
+            icontains(query)
+        scan = time.perf_counter() - start
+
+        search.index_cache.ttl = 600
+        try:
+            start = time.perf_counter()
+            search_knowledge(queries[0], 'en')
+            build = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for query in queries:
+                results = search_knowledge(query, 'en', max_tokens=2000)
+                assert sum(s.tokens for s in results) <= 2000
+            indexed = time.perf_counter() - start
+        finally:
+            search.index_cache.ttl = 0
+            search.index_cache.clear()
+
+        print(
+            f"\n{len(queries)} queries over 10k articles: icontains {scan * 1000:.0f} ms,"
+            f" index build {build * 1000:.0f} ms, indexed {indexed * 1000:.0f} ms"
+        )
+        assert indexed < scan
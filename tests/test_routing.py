@@ -0,0 +1,204 @@
+"""Tests for the shared compiled route classifier."""
+import re
+import time
+
+import pytest
+from django.http import Http404, HttpResponse
+from django.test import RequestFactory
+
+from apps.audit.middleware import AuditMiddleware
+from apps.core.middleware import dynamic_urls, module_activation
+from apps.core.routing import (
+    RouteClassifier,
+    _exact_rule,
+    _prefix_rule,
+    _regex_rule,
+    classify_path,
+    classify_request,
+    get_classifier,
+    reset_classifier,
+)
+from apps.waf.middleware import DEFAULT_EXCLUDED_PATHS
+
+CORPUS = [
+    '/', '/about/', '/aboutus/', '/contact/', '/services/dental/', '/login/', '/register/',
+    '/static/css/site.css', '/media/pets/1.jpg', '/favicon.ico', '/__reload__/events/',
+    '/accounts/login/', '/_allauth/browser/v1/config', '/api/public/hours/', '/i18n/setlang/',
+    '/admin/', '/admin', '/administrator/', '/accounting/', '/inventory/stock/12/',
+    '/operations/appointments/', '/admin-tools/', '/audit/logs/',
+    '/staff-abc123/operations/appointments/', '/staff-abc123/customers/crm-notes/5/',
+    '/en/staff-abc123/operations/inventory/', '/panel-abc123/', '/es/panel-XyZ789/auth/user/',
+    '/practice/settings/', '/practice/schedule/', '/pharmacy/prescriptions/9/',
+    '/referrals/outbound/3/', '/crm/customers/42/', '/crm/customers/', '/billing/invoices/',
+    '/store/products/', '/store/cart/', '/wp-admin/setup.php', '/health/', '/password/reset/',
+]
+
+
+def _legacy(path):
+    """The per-middleware linear scans the classifier replaces."""
+    staff = module_activation.STAFF_URL_PATTERN.match(path)
+    return {
+        'static': any(path.startswith(p) for p in DEFAULT_EXCLUDED_PATHS),
+        'always_allowed': any(re.match(p, path) for p in module_activation.ALWAYS_ALLOWED_PATTERNS),
+        'module': staff.group(1).replace('-', '_') if staff else None,
+        'public': path in dynamic_urls.PUBLIC_PATHS or any(
+            path.startswith(p) for p in dynamic_urls.STATIC_PREFIXES
+        ),
+        'blocked': any(
+            p.match(path) for p in dynamic_urls.BLOCKED_PATTERNS + dynamic_urls.DIRECT_MODULE_PATTERNS
+        ),
+        'admin_panel': bool(dynamic_urls.ADMIN_PATTERN.match(path)),
+        'staff_portal': bool(dynamic_urls.STAFF_PATTERN.match(path)),
+        'audited': any(path.startswith(p) for p in AuditMiddleware.AUDITED_PREFIXES),
+        'high_sensitivity': any(
+            re.match(p, path) for p in AuditMiddleware.HIGH_SENSITIVITY_PATTERNS
+        ),
+    }
+
+
+@pytest.fixture(autouse=True)
+def fresh_classifier():
+    reset_classifier()
+    yield
+    reset_classifier()
+
+
+class TestRouteClassifier:
+    """Test the trie + combined regex classifier."""
+
+    @pytest.mark.parametrize('path', CORPUS)
+    def test_matches_legacy_scans(self, path):
+        """Every flag should equal the linear scan it replaces."""
+        route = classify_path(path)
+        assert {flag: getattr(route, flag) for flag in _legacy(path)} == _legacy(path)
+
+    def test_prefix_exact_and_regex_rules(self):
+        """Prefix, exact and regex rules should combine on one path."""
+        classifier = RouteClassifier([
+            _prefix_rule('static', '/static/'),
+            _exact_rule('public', '/about/'),
+            _regex_rule('blocked', r'^/admin(/.*)?$'),
+            _regex_rule('audited', r'^/static/'),  # pure literal regex becomes a prefix
+            _regex_rule('module', r'^/staff-[a-z0-9]+/[a-z]+/([a-z-]+)/'),
+        ])
+        assert classifier.classify('/static/x.css').static
+        assert classifier.classify('/static/x.css').audited
+        assert classifier.classify('/about/').public
+        assert not classifier.classify('/about/team/').public
+        assert classifier.classify('/admin').blocked
+        assert not classifier.classify('/administrator').blocked
+        assert classifier.classify('/staff-ab12/operations/crm-notes/').module == 'crm_notes'
+        assert classifier.rules[3].kind == 'prefix'
+
+    def test_compiled_pattern_flags_are_kept(self):
+        """Flags of compiled patterns should apply in the combined regex."""
+        classifier = RouteClassifier([
+            _regex_rule('blocked', re.compile(r'^/wp-admin/', re.IGNORECASE)),
+            _regex_rule('audited', re.compile(r'^/audit/ # staff pages', re.VERBOSE)),
+            _regex_rule('module', re.compile(r'^/staff-[a-z0-9]+/[a-z]+/([a-z-]+)/', re.I)),
+        ])
+        assert classifier.classify('/WP-Admin/setup.php').blocked
+        assert not classifier.classify('/wp-content/').blocked
+        assert classifier.classify('/audit/logs/').audited
+        assert classifier.classify('/STAFF-AB12/Operations/crm-notes/').module == 'crm_notes'
+        assert classifier.rules[0].kind == 'regex'
+
+    def test_classify_request_attaches_and_follows_rewrites(self):
+        """The result should be attached once and refreshed after a path rewrite."""
+        request = RequestFactory().get('/staff-abc123/operations/inventory/')
+        route = classify_request(request)
+        assert request.route_class is route
+        assert route.staff_portal and route.module == 'inventory'
+        assert classify_request(request) is route
+
+        request.path = '/inventory/'
+        rewritten = classify_request(request)
+        assert rewritten.audited and not rewritten.staff_portal
+        assert request.route_class is rewritten
+
+    def test_setting_change_rebuilds(self, settings):
+        """Changing WAF_EXCLUDED_PATHS should rebuild the classifier."""
+        assert not classify_path('/assets/app.js').static
+        settings.WAF_EXCLUDED_PATHS = ['/assets/']
+        assert classify_path('/assets/app.js').static
+        assert not classify_path('/static/app.js').static
+
+
+@pytest.mark.slow
+class TestRouteClassifierBenchmark:
+    """Mixed URL corpus through the path-based middleware stack."""
+
+    @pytest.mark.django_db
+    def test_middleware_stack_throughput(self, settings):
+        """Compiled classification should beat the per-middleware linear scans."""
+        from apps.waf.middleware import WAFMiddleware
+
+        settings.WAF_ENABLED = True
+        corpus = CORPUS * 50
+
+        def best_of(func, runs=5):
+            timings = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                func()
+                timings.append(time.perf_counter() - start)
+            return min(timings)
+
+        class _Request:
+            __slots__ = ('path', 'route_class')
+
+            def __init__(self, path):
+                self.path = path
+                self.route_class = None
+
+        def legacy():
+            for path in corpus:
+                _legacy(path)
+
+        def compiled():
+            classify_path.cache_clear()
+            for path in corpus:
+                classify_request(_Request(path))
+
+        def uncached():
+            classifier = get_classifier()
+            for path in corpus:
+                classifier.classify(path)
+
+        legacy_time = best_of(legacy)
+        compiled_time = best_of(compiled)
+        uncached_time = best_of(uncached)
+
+        # Full stack: WAF -> dynamic URLs -> module activation -> audit
+        def view(request):
+            return HttpResponse('OK')
+
+        stack = WAFMiddleware(dynamic_urls.DynamicURLMiddleware(
+            module_activation.ModuleActivationMiddleware(AuditMiddleware(view))
+        ))
+        factory = RequestFactory()
+        requests = [factory.get(path) for path in corpus]
+        for request in requests:
+            request.session = {'staff_token': 'abc123', 'admin_token': 'abc123'}
+            request.user = type('Anonymous', (), {
+                'is_authenticated': False, 'is_staff': False, 'is_superuser': False,
+            })()
+
+        def full_stack():
+            for request in requests:
+                request.path = request.path_info = request.META['PATH_INFO']
+                request.route_class = None
+                try:
+                    stack(request)
+                except Http404:
+                    pass
+
+        stack_time = best_of(full_stack, runs=3)
+        print(
+            f"\nclassification per request: legacy {legacy_time / len(corpus) * 1e6:.1f} us,"
+            f" compiled {compiled_time / len(corpus) * 1e6:.1f} us"
+            f" ({uncached_time / len(corpus) * 1e6:.1f} us uncached);"
+            f" full path-middleware stack {stack_time / len(corpus) * 1e6:.1f} us/request"
+        )
+        assert uncached_time < legacy_time
+        assert compiled_time < legacy_time
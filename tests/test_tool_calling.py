@@ -9,6 +9,10 @@ Tests validate tool calling infrastructure:
 - Tool errors handled gracefully
 - Permission escalation prevented
 """
+import asyncio
+import json
+import time
+
 import pytest
 from django.contrib.auth import get_user_model
 
@@ -737,3 +741,147 @@ class TestGetVaccinationStatusTool:
         result = get_vaccination_status(pet_id=pet_with_vaccinations.id, user_id=other_user.id)
 
         assert 'error' in result
+
+
+@pytest.fixture
+def temp_tools():
+    """Register tools for one test and remove them afterwards."""
+    from apps.ai_assistant.tools import Tool, ToolRegistry
+
+    names = []
+
+    def register(name, handler, timeout=None):
+        ToolRegistry.register(Tool(
+            name=name, description=name, parameters={'type': 'object', 'properties': {}},
+            handler=handler, timeout=timeout,
+        ))
+        names.append(name)
+
+    yield register
+    for name in names:
+        ToolRegistry.unregister(name)
+
+
+def _calls(*names, arguments='{}'):
+    return [
+        {'id': f'call_{i}', 'function': {'name': name, 'arguments': arguments}}
+        for i, name in enumerate(names)
+    ]
+
+
+class TestConcurrentToolExecution:
+    """Test concurrent execution of independent tool calls."""
+
+    async def test_sync_handlers_run_concurrently_in_call_order(self, temp_tools):
+        """Blocking handlers should overlap and results keep call order."""
+        from apps.ai_assistant.tools import handle_tool_calls
+
+        def slow(label, delay):
+            def handler():
+                time.sleep(delay)
+                return {'label': label}
+            return handler
+
+        temp_tools('slow_a', slow('a', 0.2))
+        temp_tools('slow_b', slow('b', 0.1))
+        temp_tools('slow_c', slow('c', 0.15))
+
+        start = time.perf_counter()
+        results = await handle_tool_calls(_calls('slow_a', 'slow_b', 'slow_c'), {})
+        elapsed = time.perf_counter() - start
+
+        assert [r['tool_call_id'] for r in results] == ['call_0', 'call_1', 'call_2']
+        assert [json.loads(r['content'])['label'] for r in results] == ['a', 'b', 'c']
+        assert elapsed < 0.4
+
+    async def test_async_handlers_are_awaited(self, temp_tools):
+        """Coroutine handlers should run on the event loop."""
+        from apps.ai_assistant.tools import handle_tool_calls
+
+        async def handler(value=0):
+            await asyncio.sleep(0)
+            return {'value': value}
+
+        temp_tools('async_tool', handler)
+        results = await handle_tool_calls(_calls('async_tool', arguments='{"value": 3}'), {})
+        assert json.loads(results[0]['content']) == {'value': 3}
+
+    async def test_timeout_returns_error_without_blocking_others(self, temp_tools):
+        """A tool past its timeout should fail alone."""
+        from apps.ai_assistant.tools import handle_tool_calls
+
+        temp_tools('hangs', lambda: time.sleep(1), timeout=0.05)
+        temp_tools('fast', lambda: {'ok': True})
+
+        start = time.perf_counter()
+        results = await handle_tool_calls(_calls('hangs', 'fast'), {})
+        assert time.perf_counter() - start < 0.5
+        assert results[0]['content'].startswith('Error: Tool took too long')
+        assert json.loads(results[1]['content']) == {'ok': True}
+
+    async def test_errors_and_unknown_tools(self, temp_tools):
+        """Failures should become error results in their own slot."""
+        from apps.ai_assistant.tools import handle_tool_calls
+
+        def broken():
+            raise ValueError('boom')
+
+        temp_tools('broken', broken)
+        results = await handle_tool_calls(_calls('broken', 'missing_tool', 'get_clinic_hours'), {})
+        assert results[0]['content'] == 'Error: Tool execution failed. Please try again.'
+        assert "not found" in results[1]['content']
+        assert not results[2]['content'].startswith('Error')
+
+    async def test_cancellation_cancels_pending_async_calls(self, temp_tools):
+        """Cancelling the turn should cancel in-flight async handlers."""
+        from apps.ai_assistant.tools import handle_tool_calls
+
+        cancelled = asyncio.Event()
+
+        async def waits():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        temp_tools('waits', waits)
+        task = asyncio.create_task(handle_tool_calls(_calls('waits'), {}))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert cancelled.is_set()
+
+
+@pytest.mark.slow
+class TestToolExecutionBenchmark:
+    """A mocked multi-tool turn: sequential execute vs concurrent executor."""
+
+    async def test_multi_tool_turn_latency(self, temp_tools):
+        """Five independent ORM-bound calls should take about the slowest one."""
+        from apps.ai_assistant.tools import ToolRegistry, handle_tool_calls
+
+        latencies = {
+            'bench_availability': 0.06, 'bench_pet_profile': 0.03,
+            'bench_product_search': 0.05, 'bench_invoices': 0.04, 'bench_reminders': 0.02,
+        }
+        for name, delay in latencies.items():
+            temp_tools(name, lambda delay=delay: time.sleep(delay) or {'delay': delay})
+        calls = _calls(*latencies)
+
+        start = time.perf_counter()
+        for call in calls:
+            ToolRegistry.execute(call['function']['name'], {}, {})
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = await handle_tool_calls(calls, {})
+        concurrent = time.perf_counter() - start
+
+        print(
+            f"\n{len(calls)}-tool turn: sequential {sequential * 1000:.0f} ms,"
+            f" concurrent {concurrent * 1000:.0f} ms"
+        )
+        assert [json.loads(r['content'])['delay'] for r in results] == list(latencies.values())
+        assert concurrent < sequential
@@ -0,0 +1,58 @@
+"""Tests for the write-behind buffer in apps.core."""
+import threading
+
+from apps.core.write_behind import WriteBehindBuffer
+
+
+def _buffer(**kwargs):
+    """Buffer whose flush thread stays idle unless a test wakes it."""
+    flushed = []
+    options = {'batch_size': 10 ** 6, 'flush_interval': 3600}
+    options.update(kwargs)
+    return WriteBehindBuffer('test-buffer', flushed.extend, **options), flushed
+
+
+class TestWriteBehindBuffer:
+    """Test WriteBehindBuffer batching, bounds and failure handling."""
+
+    def test_items_flushed_in_one_batch(self):
+        """flush should hand every queued item to the flush function."""
+        buffer, flushed = _buffer()
+        for i in range(5):
+            buffer.add(i)
+        assert len(buffer) == 5
+        assert buffer.flush() == 5
+        assert flushed == [0, 1, 2, 3, 4]
+        assert len(buffer) == 0
+
+    def test_bounded(self):
+        """Items beyond max_size should be dropped and counted."""
+        buffer, _ = _buffer(max_size=3)
+        results = [buffer.add(i) for i in range(5)]
+        assert results == [True, True, True, False, False]
+        assert buffer.stats()['dropped'] == 2
+
+    def test_failure_counted(self):
+        """A failing flush should count items instead of raising."""
+        def explode(items):
+            raise RuntimeError('db down')
+
+        buffer = WriteBehindBuffer('failing', explode, batch_size=10 ** 6, flush_interval=3600)
+        buffer.add('x')
+        assert buffer.flush() == 0
+        assert buffer.stats()['failed'] == 1
+
+    def test_batch_size_triggers_background_flush(self):
+        """Reaching batch_size should flush from the background thread."""
+        done = threading.Event()
+        flushed = []
+
+        def collect(items):
+            flushed.extend(items)
+            done.set()
+
+        buffer = WriteBehindBuffer('batch', collect, batch_size=3, flush_interval=3600)
+        for i in range(3):
+            buffer.add(i)
+        assert done.wait(5)
+        assert flushed == [0, 1, 2]